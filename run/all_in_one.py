@@ -40,10 +40,13 @@ import subprocess
 import requests
 import json
 import re
+import hashlib
 import signal
 import atexit
 import time
-from typing import List, Dict, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Optional
 
 # Google API imports
 from google.oauth2.credentials import Credentials
@@ -54,7 +57,67 @@ from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
 from googleapiclient.errors import HttpError
 
 # Import VideoStatusChecker
-from video_checker import VideoStatusChecker
+from video_checker import (VideoStatusChecker, CLAIM_COLUMN_INDEX, DEFAULT_CLAIM_TIMEOUT_SECONDS,
+                           format_claim, format_released, is_claim_active, is_released, parse_claim)
+
+# Import pipeline engine (chế độ xử lý chồng lấp nhiều video)
+from pipeline_engine import PipelineStage, StagedPipeline
+
+# Import async engine (pipeline chạy trên event loop asyncio)
+from async_engine import AsyncStagedPipeline, run_subprocess_async
+
+# Import step graph (chạy song song các bước độc lập trong một video)
+from step_graph import Step, StepGraph
+
+# Import artifact dẫn xuất lười (chỉ tính output có nơi dùng, mỗi output một lần)
+from artifacts import ArtifactGraph, LazyArtifacts
+
+# Import prefetcher (tải trước video tiếp theo trong nền)
+from prefetcher import VideoPrefetcher
+
+# Import job ledger (checkpoint từng bước để tiếp tục sau crash)
+from job_ledger import JobLedger, file_sha256
+
+# Import hàng đợi thử lại (phân loại lỗi, backoff, dead-letter)
+from retry_queue import classify_failure, dead_letter_reason, retry_delay
+
+# Import lease queue (chế độ nhiều worker dùng chung hàng đợi)
+from lease_queue import LeaseQueue, default_worker_id
+
+# Import scheduler (sắp xếp video theo thời lượng)
+from scheduler import SCHEDULE_POLICIES, fair_share_order, schedule_videos
+
+# Import deadlines (thời hạn từng video/bước, hủy FFmpeg và HTTP khi quá hạn)
+from deadlines import (Deadline, DeadlineExceeded, check_deadline, current_deadline, deadline_scope,
+                       effective_timeout, run_subprocess, run_subprocess_streaming)
+
+# Import range downloader (tải video lớn bằng nhiều request byte-range song song)
+from range_downloader import DEFAULT_PART_SIZE, RangeDownloader, file_md5, needs_seeking
+
+# Import remote media (FFmpeg đọc file Drive qua HTTP Range, chỉ tải phần audio)
+from remote_media import drive_media_url, fresh_access_token, http_input_options
+
+# Import rate limiter (giới hạn request đồng thời từng dịch vụ theo AIMD)
+from rate_limiter import create_limiters
+
+# Import drive lister (liệt kê video theo trang, có thể duyệt thư mục con song song)
+from drive_lister import DriveLister
+
+# Import planner (ước tính chi phí/thời gian trước khi xử lý)
+from planner import BatchPlanner, format_plan
+
+# Import token calculator + budget gate (hoãn video vượt quota ngày còn lại)
+from token_calculator import TokenCalculator
+from budget_gate import BudgetGate
+
+# Import change watcher (chế độ daemon theo Drive changes feed)
+from change_watcher import ChangeWatcher, DriveChangesSource
+
+# Import cấu hình nhiều folder (mỗi folder một Google Sheet)
+from folder_config import load_folder_configs
+
+# Import HTTP API nhận job (chế độ --serve)
+from job_api import JobApiServer
 
 # Configuration
 SCOPES = [
@@ -63,6 +126,53 @@ SCOPES = [
     'https://www.googleapis.com/auth/spreadsheets'
 ]
 
+# Các bước xử lý một video: (tên, inputs, outputs) - mỗi bước là method _step_<tên>
+# Các bước không phụ thuộc nhau (ví dụ upload voice và Deepgram) sẽ chạy song song
+VIDEO_STEP_SPECS = [
+    ('download', ['video_file_id'], ['video_path']),
+    ('extract_voice', ['video_path'], ['voice_path']),
+    ('upload_voice', ['voice_path'], ['voice_file_id']),
+    ('transcribe', ['voice_path'], ['transcript_path', 'detected_language', 'is_chinese']),
+    ('translate', ['transcript_path', 'is_chinese'], ['text_path']),
+    ('upload_text', ['text_path'], ['text_file_id']),
+    ('rewrite', ['text_path'], ['rewritten_text_path', 'prompt_hash']),
+    ('upload_rewritten', ['rewritten_text_path'], ['rewritten_text_file_id']),
+    ('format_main', ['rewritten_text_path'], ['main_content_path']),
+    ('format_no_timeline', ['rewritten_text_path'], ['text_no_timeline_path'])
+]
+
+# Tên tất cả các bước (theo thứ tự khai báo)
+VIDEO_STEPS = [name for name, _, _ in VIDEO_STEP_SPECS]
+
+# Output dạng file: text được lưu nội dung vào ledger, media chỉ lưu đường dẫn + hash
+TEXT_ARTIFACT_KEYS = ['transcript_path', 'text_path', 'rewritten_text_path',
+                      'main_content_path', 'text_no_timeline_path']
+MEDIA_ARTIFACT_KEYS = ['video_path', 'voice_path']
+
+# Nhóm các bước theo stage của pipeline (chế độ --pipeline)
+PIPELINE_STAGES = [
+    ('download', ['download']),
+    ('extract_voice', ['extract_voice']),
+    ('transcribe', ['transcribe']),
+    ('rewrite', ['translate', 'rewrite']),
+    ('format', ['format_main', 'format_no_timeline']),
+    ('upload', ['upload_voice', 'upload_text', 'upload_rewritten'])
+]
+
+# Nơi dùng kết quả (sink) -> các output của job cần cho sink đó.
+# Bước không có output nào được sink (hoặc bước cần cho sink) dùng sẽ không được chạy,
+# nên bỏ một cột Sheets / một lần upload chỉ cần sửa ở đây.
+OUTPUT_SINKS = {
+    'drive_voice': ['voice_file_id'],
+    'drive_text': ['text_file_id'],
+    'drive_rewritten': ['rewritten_text_file_id'],
+    'sheet': ['video_file_id', 'voice_file_id', 'text_file_id', 'rewritten_text_file_id',
+              'text_path', 'main_content_path', 'text_no_timeline_path', 'prompt_hash']
+}
+
+# Stage có thể chạy lại riêng (--from-stage / --only-stage): các stage pipeline + ghi Sheets
+REPROCESS_STAGES = [stage_name for stage_name, _ in PIPELINE_STAGES] + ['sheet']
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -101,6 +211,12 @@ class AllInOneProcessor:
         # Flag để kiểm tra xem có đang dừng không
         self._shutdown_requested = False
         
+        # Drain: tín hiệu dừng đầu tiên ngừng nhận video mới và chờ các bước đang chạy
+        # tối đa drain_grace_seconds, sau đó hủy (các bước đã xong vẫn nằm trong ledger)
+        self.drain_grace_seconds = 600
+        self._drain_timer = None
+        self._active_deadlines = {}
+        
         """
         Khởi tạo processor với các API keys và services
         """
@@ -144,16 +260,125 @@ class AllInOneProcessor:
         self.sheets_service = None  # Google Sheets service
         self.temp_dir = tempfile.mkdtemp()  # Thư mục tạm để lưu file
         
+        # Workspace riêng cho từng video (thư mục con của temp_dir), xóa ngay khi không cần nữa:
+        # media sau khi video xong, text sau khi đã ghi Google Sheets.
+        # text_workspace_root: đặt text trên tmpfs (ví dụ /dev/shm), None = cùng workspace với media
+        self.text_workspace_root = None
+        self._text_temp_dir = None
+        self._workspace_lock = threading.Lock()
+        
+        # Artifact text dẫn xuất từ bản viết lại, chỉ tính khi format_main/format_no_timeline cần
+        self.text_artifact_graph = self._build_text_artifact_graph()
+        
+        # Service Google riêng cho từng thread (httplib2 không thread-safe)
+        self._thread_local = threading.local()
+        self._deadline_lock = threading.Lock()
+        # Đọc/ghi Google Sheets của các job chạy đồng thời (chế độ --serve) không chen vào nhau
+        self._sheet_lock = threading.RLock()
+        
+        # Dòng giữ chỗ: ghi dòng "đang xử lý" (cột J) ngay khi nhận video để các runner khác
+        # dùng chung Sheet bỏ qua video này; dòng quá hạn (runner bị dừng) được nhận lại
+        self.sheet_claims = True
+        self.sheet_claim_timeout_seconds = DEFAULT_CLAIM_TIMEOUT_SECONDS
+        self.worker_id = default_worker_id()
+        # Dòng giữ chỗ đang giữ: thread heartbeat ghi lại thời điểm ở cột J (mỗi 1/4 thời hạn)
+        # để video xử lý lâu (hoặc chờ quota) không bị runner khác coi là quá hạn và nhận lại
+        self._active_sheet_claims = {}  # id(claim) -> claim
+        self._claim_heartbeat_thread = None
+        self._claim_heartbeat_stop = threading.Event()
+        
+        # Cấu hình pipeline (chế độ --pipeline): số worker mỗi stage
+        self.pipeline_workers = {
+            'download': 2,
+            'extract_voice': max(1, (os.cpu_count() or 2) // 2),  # Mỗi worker chạy 1 process FFmpeg
+            'transcribe': 4,
+            'rewrite': 4,
+            'format': 2,
+            'upload': 4
+        }
+        self.pipeline_queue_size = 2  # Số video tối đa chờ trước mỗi stage
+        self.step_workers = 4  # Số bước chạy song song trong một video
+        
+        # Engine cho chế độ pipeline: 'threads' (StagedPipeline) hoặc 'async' (AsyncStagedPipeline)
+        self.engine = 'threads'
+        self.async_blocking_workers = 16  # Số thread cho các lời gọi blocking (Drive, Deepgram, Gemini)
+        
+        # Giới hạn request đồng thời cho Deepgram, Gemini, Drive, Sheets (tự điều chỉnh theo 429/độ trễ)
+        self.limiters = create_limiters()
+        
+        # Quota ngày: usage thực tế và reservation lưu trong config/token_usage.sqlite3 (dùng chung giữa
+        # các lần chạy/process), video có ước tính vượt quota còn lại bị hoãn đến khi quota reset (None = tắt)
+        self.token_calculator = TokenCalculator(
+            os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'token_usage.sqlite3'))
+        self.budget_gate = BudgetGate(self.token_calculator)
+        self.budget_poll_seconds = 60  # Chu kỳ kiểm tra lại quota khi đang hoãn video
+        
+        # Cấu hình prefetch: tải trước video tiếp theo trong khi đang xử lý video hiện tại
+        self.prefetch_lookahead = 2  # Số video tối đa tải trước (0 = tắt)
+        self.prefetch_budget_bytes = 2 * 1024 * 1024 * 1024  # Dung lượng tối đa video trong thư mục tạm
+        self._prefetcher = None
+        
+        # Tải video lớn bằng nhiều request byte-range song song (worker pool dùng chung cho mọi video)
+        self.download_workers = 4  # Số đoạn tải cùng lúc (1 = một kết nối như MediaIoBaseDownload)
+        self.download_part_bytes = DEFAULT_PART_SIZE
+        self.range_download_min_bytes = 64 * 1024 * 1024  # File nhỏ hơn tải một kết nối
+        self._download_executor = None
+        self._download_executor_lock = threading.Lock()
+        
+        # Stream video từ Drive thẳng vào stdin của FFmpeg (tách voice trong lúc tải, không lưu MP4);
+        # container cần seek (MP4 có moov ở cuối) vẫn được tải về file trước
+        self.stream_extract = False
+        self.stream_part_bytes = 8 * 1024 * 1024  # Kích thước mỗi đoạn khi stream (giữ ít bộ nhớ)
+        self.stream_probe_bytes = 64 * 1024  # Số byte đầu file đọc để kiểm tra vị trí moov
+        
+        # FFmpeg đọc video trên Drive qua HTTP (Range + OAuth) và chỉ lấy audio, không tải cả file
+        self.remote_demux = False
+        self._creds_lock = threading.Lock()
+        
+        # Job ledger: checkpoint từng bước của từng video (None = tắt)
+        self.ledger_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'job_ledger.sqlite3')
+        self._ledger = None
+        
+        # Hàng đợi thử lại (lưu trong ledger): video lỗi tạm thời được thử lại ngay trong lần chạy
+        # nếu lịch thử lại trong khoảng retry_wait_seconds, lâu hơn thì để lần chạy sau
+        self.retry_wait_seconds = 600
+        
+        # Thứ tự xử lý video: name, shortest, longest, fair (xem scheduler.py)
+        self.schedule_policy = 'name'
+        
+        # Deadline: budget thời gian (giây) cho cả video và cho từng bước (None = không giới hạn)
+        # Bước quá hạn bị hủy (kill FFmpeg, bỏ HTTP request); các bước đã xong vẫn được lưu trong ledger
+        self.video_budget_seconds = 4 * 3600
+        self.step_budgets = {
+            'download': 1800,
+            'extract_voice': 3600,
+            'upload_voice': 600,
+            'transcribe': 1200,
+            'translate': 1800,
+            'upload_text': 300,
+            'rewrite': 1200,
+            'upload_rewritten': 300,
+            'format_main': 900,
+            'format_no_timeline': 300
+        }
+        
         # Khởi tạo Google API services
         self._authenticate_google_apis()
         
+        # Liệt kê video theo trang (pageSize 1000); recursive = duyệt cả thư mục con (song song)
+        self.drive_lister = DriveLister(self._get_drive_service,
+                                        execute=lambda request: self._execute('drive', request),
+                                        recursive=False, workers=4)
+        
         # Khởi tạo VideoStatusChecker sau khi có services
         try:
             self.video_checker = VideoStatusChecker(
                 self.drive_service, 
                 self.sheets_service,
                 self.spreadsheet_id,
-                self.sheet_name
+                self.sheet_name,
+                claim_timeout_seconds=self.sheet_claim_timeout_seconds,
+                lister=self.drive_lister
             )
             logger.info("✅ VideoStatusChecker đã được khởi tạo")
         except Exception as e:
@@ -163,13 +388,39 @@ class AllInOneProcessor:
     def _signal_handler(self, signum, frame):
         """
         Signal handler để xử lý dừng an toàn
+        
+        - Lần 1: drain - ngừng nhận video mới, các bước đang chạy được hoàn thành
+          (hoặc bị hủy sau drain_grace_seconds), video đã xong vẫn được ghi Sheets
+        - Lần 2: thoát ngay
         """
+        if self._shutdown_requested:
+            logger.info(f"🛑 Nhận tín hiệu dừng lần 2 (signal {signum}), thoát ngay")
+            self.cleanup()
+            os._exit(1)
+        
         logger.info(f"🛑 Nhận tín hiệu dừng (signal {signum})")
-        logger.info("🔄 Đang dừng chương trình an toàn...")
+        logger.info(f"🔄 Ngừng nhận video mới, chờ các bước đang chạy tối đa {self.drain_grace_seconds}s "
+                    f"(gửi tín hiệu dừng lần nữa để thoát ngay)...")
         self._shutdown_requested = True
-        self.cleanup()
-        logger.info("✅ Đã dừng chương trình an toàn")
-        sys.exit(0)
+        
+        self._drain_timer = threading.Timer(self.drain_grace_seconds, self._cancel_active_videos)
+        self._drain_timer.daemon = True
+        self._drain_timer.start()
+    
+    def _cancel_active_videos(self):
+        """
+        Hết thời gian drain: hủy deadline của các video đang xử lý
+        
+        FFmpeg bị kill, request HTTP bị bỏ; video được ghi 'timeout' trong ledger
+        để lần chạy sau tiếp tục từ bước bị hủy.
+        """
+        with self._deadline_lock:
+            deadlines = list(self._active_deadlines.values())
+        
+        if deadlines:
+            logger.warning(f"⏰ Hết thời gian drain, hủy {len(deadlines)} video đang xử lý")
+        for deadline in deadlines:
+            deadline.cancel()
         
     def _authenticate_google_apis(self):
         """
@@ -222,6 +473,85 @@ class AllInOneProcessor:
             logger.error(f"❌ Lỗi xác thực Google APIs: {str(e)}")
             raise
 
+    def _get_drive_service(self):
+        """
+        Lấy Google Drive service dùng được trong thread hiện tại
+        
+        Service của googleapiclient (httplib2) không thread-safe, nên mỗi worker
+        thread dùng một service riêng, tạo từ cùng credentials.
+        """
+        if threading.current_thread() is threading.main_thread():
+            return self.drive_service
+        
+        service = getattr(self._thread_local, 'drive_service', None)
+        if service is None:
+            service = build('drive', 'v3', credentials=self.creds, cache_discovery=False)
+            self._thread_local.drive_service = service
+        return service
+
+    def _get_sheets_service(self):
+        """
+        Lấy Google Sheets service dùng được trong thread hiện tại
+        """
+        if threading.current_thread() is threading.main_thread():
+            return self.sheets_service
+        
+        service = getattr(self._thread_local, 'sheets_service', None)
+        if service is None:
+            service = build('sheets', 'v4', credentials=self.creds, cache_discovery=False)
+            self._thread_local.sheets_service = service
+        return service
+
+    def _http_post(self, service: str, *args, latency_key: str = None, **kwargs):
+        """
+        requests.post qua limiter của dịch vụ (deepgram, gemini)
+        
+        Args:
+            service: Tên dịch vụ trong self.limiters
+            latency_key: Loại request có độ trễ ổn định để theo dõi (None = chỉ dựa vào 429/503)
+            *args, **kwargs: Tham số của requests.post
+            
+        Returns:
+            Response của requests
+        """
+        response = self.limiters[service].call(requests.post, *args, latency_key=latency_key, **kwargs)
+        if response.status_code == 200:
+            self._track_api_usage(service, response)
+        return response
+    
+    def _track_api_usage(self, service: str, response):
+        """
+        Ghi usage thực tế (phút Deepgram, token Gemini) vào TokenCalculator để tính quota ngày
+        
+        Args:
+            service: 'deepgram' hoặc 'gemini'
+            response: Response thành công của requests
+        """
+        try:
+            data = response.json()
+            if service == 'deepgram':
+                duration = float(data.get('metadata', {}).get('duration') or 0)
+                self.token_calculator.track_api_call('transcribe', audio_duration=duration, api_type='deepgram')
+            elif service == 'gemini':
+                usage = data.get('usageMetadata', {})
+                self.token_calculator.track_gemini_tokens('generate', usage.get('promptTokenCount', 0),
+                                                          usage.get('candidatesTokenCount', 0))
+        except Exception as e:
+            logger.warning(f"⚠️ Không ghi được usage {service}: {str(e)}")
+
+    def _execute(self, service: str, request):
+        """
+        Gọi request.execute() của googleapiclient qua limiter của dịch vụ (drive, sheets)
+        
+        Args:
+            service: Tên dịch vụ trong self.limiters
+            request: HttpRequest của googleapiclient
+            
+        Returns:
+            Kết quả của request.execute()
+        """
+        return self.limiters[service].call(request.execute, latency_key=getattr(request, 'methodId', None))
+
     def detect_chinese_characters(self, text: str) -> bool:
         """
         Phát hiện xem text có chứa ký tự tiếng Trung không
@@ -264,7 +594,7 @@ class AllInOneProcessor:
         try:
             # Tạo tên file output cho text
             base_name = os.path.splitext(output_name)[0]
-            output_path = os.path.join(self.temp_dir, f"{base_name}_transcript.txt")
+            output_path = self._artifact_path(f"{base_name}_transcript.txt")
             
             logger.info(f"📝 Bắt đầu chuyển đổi audio thành text: {os.path.basename(audio_path)}")
             
@@ -381,7 +711,7 @@ class AllInOneProcessor:
                 
                 logger.info(f"🔄 Đang gửi request đến Deepgram API với ngôn ngữ: {language} và timeline")
                 logger.info(f"📊 Tham số tối ưu cho timeline: {params}")
-                response = requests.post(url, headers=headers, params=params, data=audio_file, timeout=600)
+                response = self._http_post('deepgram', url, headers=headers, params=params, data=audio_file, timeout=effective_timeout(600))
                 
                 logger.info(f"📡 Response status: {response.status_code}")
                 
@@ -656,7 +986,7 @@ class AllInOneProcessor:
             logger.info(f"🔧 FFmpeg command: {' '.join(cmd)}")
             
             # Chạy FFmpeg
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            result = run_subprocess(cmd, timeout=300)
             
             if result.returncode == 0:
                 logger.info(f"✅ Đã xử lý audio thành công: {os.path.basename(processed_audio_path)}")
@@ -768,7 +1098,7 @@ Returns:
         try:
             # Tạo tên file output cho text đã dịch
             base_name = os.path.splitext(output_name)[0]
-            output_path = os.path.join(self.temp_dir, f"{base_name}_translated.txt")
+            output_path = self._artifact_path(f"{base_name}_translated.txt")
             
             logger.info(f"🔄 Đang dịch text tiếng Trung sang tiếng Việt (chế độ sát nghĩa): {os.path.basename(text_path)}")
             
@@ -1010,15 +1340,16 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             max_retries = 3
             for attempt in range(max_retries):
                 try:
-                    response = requests.post(url, json=data, timeout=120)
+                    response = self._http_post('gemini', url, json=data, timeout=effective_timeout(120),
+                                               latency_key='translate_sentence')
                     
                     if response.status_code == 200:
                         result = response.json()
                         translated_sentence = result['candidates'][0]['content']['parts'][0]['text'].strip()
                         return translated_sentence
                     elif response.status_code == 429:  # Rate limit
+                        # Limiter Gemini đã giảm số request đồng thời và tạm dừng -> thử lại ngay
                         logger.warning(f"⚠️ Rate limit, thử lại lần {attempt + 1}/{max_retries}")
-                        time.sleep(2 ** attempt)  # Exponential backoff
                         continue
                     else:
                         logger.warning(f"⚠️ Lỗi API cho câu: {sentence[:50]}...")
@@ -1036,6 +1367,8 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
                     time.sleep(1)
                     continue
                 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"❌ Lỗi dịch câu: {str(e)}")
             logger.error(f"❌ Câu gốc: {sentence[:100]}...")
@@ -1163,7 +1496,7 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             }
             
             # Gửi request đến Gemini API
-            response = requests.post(url, json=data, timeout=180)
+            response = self._http_post('gemini', url, json=data, timeout=effective_timeout(180))
             
             if response.status_code == 200:
                 result = response.json()
@@ -1257,11 +1590,11 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             query = f"'{folder_id}' in parents and name='{video_name}'"
             
             # Gọi Google Drive API để tìm file
-            results = self.drive_service.files().list(
+            results = self._execute('drive', self.drive_service.files().list(
                 q=query,
                 fields="files(id,name,size,mimeType)",
                 orderBy="name"
-            ).execute()
+            ))
             
             files = results.get('files', [])
             
@@ -1282,7 +1615,7 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
     
     def get_all_videos_in_folder(self, folder_id: str) -> List[Dict]:
         """
-        Lấy tất cả video trong Google Drive folder
+        Lấy tất cả video trong Google Drive folder (đọc hết các trang, cả thư mục con nếu bật --recursive)
         
         Args:
             folder_id: ID của folder trên Google Drive
@@ -1291,57 +1624,14 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             List chứa thông tin tất cả video
         """
         try:
-            # Tạo query để tìm tất cả file video trong folder
-            query = f"'{folder_id}' in parents and (mimeType contains 'video/' or name contains '.mp4' or name contains '.avi' or name contains '.mov')"
-            
             logger.info(f"🔍 Tìm kiếm video trong folder ID: {folder_id}")
-            logger.info(f"🔍 Query: {query}")
-            
-            # Gọi Google Drive API để tìm file
-            results = self.drive_service.files().list(
-                q=query,
-                fields="files(id,name,size,mimeType,trashed)",
-                orderBy="name"
-            ).execute()
-            
-            files = results.get('files', [])
-            logger.info(f"📄 Tổng số file tìm thấy: {len(files)}")
-            
-            # Hiển thị tất cả file để debug
-            for i, file in enumerate(files):
-                name = file.get('name', 'Unknown')
-                mime_type = file.get('mimeType', 'Unknown')
-                size = file.get('size', 'Unknown')
-                trashed = file.get('trashed', False)
-                logger.info(f"  {i+1}. {name} (MIME: {mime_type}, Size: {size}, Trashed: {trashed})")
             
-            # Lọc chỉ lấy file video (không bị xóa)
             video_files = []
-            for file in files:
-                name = file.get('name', '').lower()
-                mime_type = file.get('mimeType', '')
-                trashed = file.get('trashed', False)
-                
-                # Bỏ qua file đã bị xóa
-                if trashed:
-                    logger.info(f"⏭️ Bỏ qua file đã xóa: {file.get('name', 'Unknown')}")
-                    continue
-                
-                # Kiểm tra có phải file video không
-                if (mime_type.startswith('video/') or 
-                    name.endswith('.mp4') or 
-                    name.endswith('.avi') or 
-                    name.endswith('.mov') or
-                    name.endswith('.mkv')):
-                    video_files.append(file)
-                    logger.info(f"✅ Thêm video: {file.get('name', 'Unknown')}")
-                else:
-                    logger.info(f"⏭️ Bỏ qua file không phải video: {file.get('name', 'Unknown')} (MIME: {mime_type})")
-            
-            logger.info(f"📁 Tìm thấy {len(video_files)} video trong folder")
-            for video in video_files:
+            for video in self.drive_lister.iter_videos(folder_id):
+                video_files.append(video)
                 logger.info(f"  - {video['name']} (ID: {video['id']}, Size: {video.get('size', 'Unknown')} bytes)")
             
+            logger.info(f"📁 Tìm thấy {len(video_files)} video trong folder")
             return video_files
             
         except Exception as e:
@@ -1366,19 +1656,39 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
                 logger.info(f"Đã tạo thư mục tạm: {self.temp_dir}")
             
             # Đường dẫn file video sẽ lưu
-            video_path = os.path.join(self.temp_dir, f"{video_name}")
+            video_path = self._artifact_path(video_name)
             
             logger.info(f"🔄 Đang tải video: {video_name}")
             
-            # Tải file từ Google Drive
-            request = self.drive_service.files().get_media(fileId=file_id)
-            with open(video_path, 'wb') as f:
-                downloader = MediaIoBaseDownload(f, request)
-                done = False
-                while done is False:
-                    status, done = downloader.next_chunk()
-                    if status:
-                        logger.info(f"📥 Tải: {int(status.progress() * 100)}%")
+            # Kích thước + MD5 để chia đoạn và kiểm tra file sau khi tải
+            size, md5 = self._drive_media_info(file_id)
+            
+            if self.download_workers > 1 and size >= self.range_download_min_bytes:
+                # File lớn: nhiều request byte-range song song, thử lại từng đoạn, kiểm tra MD5
+                deadline = current_deadline()
+                downloader = RangeDownloader(
+                    lambda start, end: self._fetch_video_range(file_id, start, end),
+                    size, md5=md5, part_size=self.download_part_bytes,
+                    check=deadline.check if deadline is not None else None,
+                    executor=self._get_download_executor()
+                )
+                logger.info(f"⚡ Tải {size / (1024 * 1024):.0f} MB bằng {self.download_workers} kết nối song song")
+                downloader.download(video_path)
+            else:
+                # Tải file từ Google Drive
+                request = self._get_drive_service().files().get_media(fileId=file_id)
+                with open(video_path, 'wb') as f:
+                    downloader = MediaIoBaseDownload(f, request)
+                    done = False
+                    while done is False:
+                        check_deadline()
+                        status, done = self.limiters['drive'].call(downloader.next_chunk, latency_key='download_chunk')
+                        if status:
+                            logger.info(f"📥 Tải: {int(status.progress() * 100)}%")
+                
+                if md5 and file_md5(video_path) != md5.lower():
+                    os.remove(video_path)
+                    raise ValueError(f"Checksum MD5 không khớp: {video_name}")
             
             logger.info(f"✅ Tải video thành công: {video_path}")
             return video_path
@@ -1387,6 +1697,48 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             logger.error(f"❌ Lỗi tải video: {str(e)}")
             raise
     
+    def _drive_media_info(self, file_id: str) -> Tuple[int, Optional[str]]:
+        """
+        Kích thước và md5Checksum của file Drive
+        
+        Args:
+            file_id: ID của file trên Google Drive
+            
+        Returns:
+            Tuple (size, md5Checksum) - size = 0 nếu Drive không trả về
+        """
+        metadata = self._execute('drive', self._get_drive_service().files().get(
+            fileId=file_id, fields='size,md5Checksum'))
+        return int(metadata.get('size') or 0), metadata.get('md5Checksum')
+    
+    def _fetch_video_range(self, file_id: str, start: int, end: int) -> bytes:
+        """
+        Tải một đoạn byte của file Drive (chạy trong thread của worker pool tải video)
+        
+        Args:
+            file_id: ID của file trên Google Drive
+            start: Byte đầu tiên
+            end: Byte cuối cùng (tính cả byte này)
+            
+        Returns:
+            Nội dung đoạn
+        """
+        request = self._get_drive_service().files().get_media(fileId=file_id)
+        request.headers['Range'] = f'bytes={start}-{end}'
+        return self.limiters['drive'].call(request.execute, latency_key='download_range')
+    
+    def _get_download_executor(self) -> ThreadPoolExecutor:
+        """
+        Worker pool tải đoạn video (tạo ở lần gọi đầu tiên, dùng chung cho mọi video)
+        
+        Mỗi thread giữ Drive service riêng (_get_drive_service) giữa các lần tải.
+        """
+        with self._download_executor_lock:
+            if self._download_executor is None:
+                self._download_executor = ThreadPoolExecutor(max_workers=self.download_workers,
+                                                             thread_name_prefix='range-dl')
+            return self._download_executor
+    
     def convert_to_mp3(self, video_path: str, output_name: str) -> str:
         """
         Chuyển đổi video thành MP3 bằng FFmpeg
@@ -1401,7 +1753,7 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
         try:
             # Tạo tên file MP3 output
             base_name = os.path.splitext(output_name)[0]
-            output_path = os.path.join(self.temp_dir, f"{base_name}.mp3")
+            output_path = self._artifact_path(f"{base_name}.mp3")
             
             logger.info(f"🔄 Đang tách audio từ: {os.path.basename(video_path)}")
             
@@ -1419,7 +1771,7 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             
             # Chạy lệnh FFmpeg
             logger.info("Đang chạy FFmpeg...")
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=3600)
+            result = run_subprocess(cmd, timeout=3600)
             
             # Kiểm tra kết quả
             if result.returncode == 0:
@@ -1438,6 +1790,109 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             logger.error(f"❌ Lỗi chuyển đổi video: {str(e)}")
             raise
     
+    def _voice_only_cmd(self, video_path: str, output_path: str, input_options: List[str] = None) -> List[str]:
+        """
+        Lệnh FFmpeg nâng cao để tách voice (filter phức tạp để nhận diện và tách voice)
+        
+        input_options: Tham số cho đầu vào, đặt trước -i (ví dụ header HTTP khi đọc từ Drive)
+        """
+        return [
+            os.path.join(os.path.dirname(os.path.dirname(__file__)), "tools", "ffmpeg.exe"),  # Đường dẫn FFmpeg
+            *(input_options or []),
+            "-i", video_path,  # Input file
+            "-vn",  # Không có video
+            "-af", "highpass=f=150,lowpass=f=4000,volume=2.0,anlmdn=s=7:p=0.002:r=0.01",  # Filter nâng cao
+            "-acodec", "mp3",  # Codec audio MP3
+            "-ab", "192k",  # Bitrate cao hơn cho chất lượng tốt
+            "-ar", "44100",  # Sample rate cao hơn
+            "-ac", "1",  # Mono channel cho voice
+            "-y",  # Ghi đè file nếu tồn tại
+            output_path  # Output file
+        ]
+    
+    def _voice_simple_cmd(self, video_path: str, output_path: str) -> List[str]:
+        """
+        Lệnh FFmpeg đơn giản để tách voice (fallback)
+        """
+        return [
+            os.path.join(os.path.dirname(os.path.dirname(__file__)), "tools", "ffmpeg.exe"),
+            "-i", video_path,
+            "-vn",
+            "-af", "highpass=f=300,lowpass=f=2000,volume=2.0",  # Filter đơn giản
+            "-acodec", "mp3",
+            "-ab", "96k",  # Bitrate thấp cho voice
+            "-ar", "16000",  # Sample rate thấp
+            "-ac", "1",  # Mono
+            "-y",
+            output_path
+        ]
+    
+    def extract_voice_streaming(self, file_id: str, size: int, md5: Optional[str], output_name: str) -> str:
+        """
+        Tách voice trong lúc tải video: các đoạn byte từ Drive được ghi thẳng vào stdin của FFmpeg
+        
+        Dùng cùng lệnh FFmpeg với extract_voice_only (đầu vào pipe:0), không lưu file MP4.
+        Các đoạn được tải trước song song (download_workers) nhưng ghi theo đúng thứ tự.
+        
+        Args:
+            file_id: ID của file video trên Google Drive
+            size: Kích thước file (byte)
+            md5: md5Checksum của file (kiểm tra sau khi stream xong)
+            output_name: Tên file output (không có extension)
+            
+        Returns:
+            Đường dẫn đến file MP3 chỉ có voice
+        """
+        base_name = os.path.splitext(output_name)[0]
+        output_path = self._artifact_path(f"{base_name}_voice_only.mp3")
+        logger.info(f"🌊 Đang tách voice trong lúc tải (stream): {output_name}")
+        
+        deadline = current_deadline()
+        downloader = RangeDownloader(
+            lambda start, end: self._fetch_video_range(file_id, start, end),
+            size, md5=md5, part_size=self.stream_part_bytes, workers=self.download_workers,
+            check=deadline.check if deadline is not None else None,
+            executor=self._get_download_executor()
+        )
+        result = run_subprocess_streaming(self._voice_only_cmd('pipe:0', output_path), downloader.stream,
+                                          timeout=3600)
+        if result.returncode == 0 and os.path.exists(output_path):
+            logger.info(f"✅ Tách voice (stream) thành công: {os.path.getsize(output_path):,} bytes")
+            return output_path
+        raise Exception(f"FFmpeg lỗi (stream): {result.stderr[-1000:]}")
+    
+    def extract_voice_remote(self, file_id: str, output_name: str) -> str:
+        """
+        Tách voice bằng FFmpeg đọc thẳng file trên Drive qua HTTP, không tải cả video
+        
+        FFmpeg gửi request Range (kèm OAuth bearer token của self.creds) để đọc chỉ mục
+        container rồi chỉ đọc các gói audio, bỏ qua dữ liệu video. Container cần seek
+        (MP4 có moov ở cuối) vẫn đọc được vì HTTP hỗ trợ seek.
+        
+        Args:
+            file_id: ID của file video trên Google Drive
+            output_name: Tên file output (không có extension)
+            
+        Returns:
+            Đường dẫn đến file MP3 chỉ có voice
+        """
+        base_name = os.path.splitext(output_name)[0]
+        output_path = self._artifact_path(f"{base_name}_voice_only.mp3")
+        logger.info(f"🛰️ Đang tách voice trực tiếp từ Drive (chỉ đọc audio): {output_name}")
+        
+        token = fresh_access_token(self.creds, Request(), self._creds_lock)
+        cmd = self._voice_only_cmd(drive_media_url(file_id), output_path, http_input_options(token))
+        try:
+            result = run_subprocess(cmd, timeout=3600)
+        except subprocess.TimeoutExpired as e:
+            # Thông báo mặc định chứa cả lệnh (có token)
+            raise Exception(f"FFmpeg (remote) quá {e.timeout:.0f}s") from None
+        if result.returncode == 0 and os.path.exists(output_path):
+            logger.info(f"✅ Tách voice (remote) thành công: {os.path.getsize(output_path):,} bytes")
+            return output_path
+        # Không đưa lệnh vào thông báo lỗi (có token)
+        raise Exception(f"FFmpeg lỗi (remote): {result.stderr[-1000:]}")
+    
     def extract_voice_only(self, video_path: str, output_name: str) -> str:
         """
         Tách voice từ video, loại bỏ background music
@@ -1457,29 +1912,16 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
         try:
             # Tạo tên file voice output
             base_name = os.path.splitext(output_name)[0]
-            output_path = os.path.join(self.temp_dir, f"{base_name}_voice_only.mp3")
+            output_path = self._artifact_path(f"{base_name}_voice_only.mp3")
             
             logger.info(f"🎤 Đang tách voice từ: {os.path.basename(video_path)}")
             logger.info("🔧 Sử dụng filter nâng cao để loại bỏ background music...")
             
-            # Lệnh FFmpeg nâng cao để tách voice
-            # Sử dụng filter phức tạp hơn để nhận diện và tách voice
-            cmd = [
-                os.path.join(os.path.dirname(os.path.dirname(__file__)), "tools", "ffmpeg.exe"),  # Đường dẫn FFmpeg
-                "-i", video_path,  # Input file
-                "-vn",  # Không có video
-                "-af", "highpass=f=150,lowpass=f=4000,volume=2.0,anlmdn=s=7:p=0.002:r=0.01",  # Filter nâng cao
-                "-acodec", "mp3",  # Codec audio MP3
-                "-ab", "192k",  # Bitrate cao hơn cho chất lượng tốt
-                "-ar", "44100",  # Sample rate cao hơn
-                "-ac", "1",  # Mono channel cho voice
-                "-y",  # Ghi đè file nếu tồn tại
-                output_path  # Output file
-            ]
+            cmd = self._voice_only_cmd(video_path, output_path)
             
             # Chạy lệnh FFmpeg
             logger.info("Đang chạy FFmpeg với voice filter nâng cao...")
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=3600)  # Timeout dài hơn
+            result = run_subprocess(cmd, timeout=3600)  # Timeout dài hơn
             
             # Kiểm tra kết quả
             if result.returncode == 0:
@@ -1496,6 +1938,8 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
                 logger.warning("⚠️ Filter phức tạp thất bại, thử filter đơn giản...")
                 return self._extract_voice_simple(video_path, output_name)
                 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"❌ Lỗi tách voice: {str(e)}")
             # Fallback về phương pháp đơn giản
@@ -1512,25 +1956,14 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
         """
         try:
             base_name = os.path.splitext(output_name)[0]
-            output_path = os.path.join(self.temp_dir, f"{base_name}_voice_simple.mp3")
+            output_path = self._artifact_path(f"{base_name}_voice_simple.mp3")
             
             logger.info("🔄 Thử phương pháp tách voice đơn giản...")
             
             # Lệnh FFmpeg đơn giản để tách voice
-            cmd = [
-                os.path.join(os.path.dirname(os.path.dirname(__file__)), "tools", "ffmpeg.exe"),
-                "-i", video_path,
-                "-vn",
-                "-af", "highpass=f=300,lowpass=f=2000,volume=2.0",  # Filter đơn giản
-                "-acodec", "mp3",
-                "-ab", "96k",  # Bitrate thấp cho voice
-                "-ar", "16000",  # Sample rate thấp
-                "-ac", "1",  # Mono
-                "-y",
-                output_path
-            ]
+            cmd = self._voice_simple_cmd(video_path, output_path)
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            result = run_subprocess(cmd, timeout=300)
             
             if result.returncode == 0 and os.path.exists(output_path):
                 file_size = os.path.getsize(output_path)
@@ -1545,6 +1978,46 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             logger.error(f"❌ Lỗi tách voice đơn giản: {str(e)}")
             raise
     
+    async def extract_voice_only_async(self, video_path: str, output_name: str,
+                                       deadline: Deadline = None, output_dir: str = None) -> str:
+        """
+        Tách voice từ video trên event loop (engine async), cùng lệnh FFmpeg với extract_voice_only
+        
+        Args:
+            video_path: Đường dẫn đến file video
+            output_name: Tên file output (không có extension)
+            deadline: Deadline của bước tách voice
+            output_dir: Thư mục lưu file (workspace của job; event loop không dùng workspace theo thread)
+            
+        Returns:
+            Đường dẫn đến file MP3 chỉ có voice
+        """
+        base_name = os.path.splitext(output_name)[0]
+        output_dir = output_dir or self.temp_dir
+        output_path = os.path.join(output_dir, f"{base_name}_voice_only.mp3")
+        logger.info(f"🎤 Đang tách voice (async) từ: {os.path.basename(video_path)}")
+        
+        try:
+            result = await run_subprocess_async(self._voice_only_cmd(video_path, output_path),
+                                                timeout=3600, deadline=deadline)
+            if result.returncode == 0 and os.path.exists(output_path):
+                logger.info(f"✅ Tách voice thành công: {os.path.getsize(output_path):,} bytes")
+                return output_path
+            logger.warning("⚠️ Filter phức tạp thất bại, thử filter đơn giản...")
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Lỗi tách voice: {str(e)}")
+        
+        # Fallback về phương pháp đơn giản
+        output_path = os.path.join(output_dir, f"{base_name}_voice_simple.mp3")
+        result = await run_subprocess_async(self._voice_simple_cmd(video_path, output_path),
+                                            timeout=300, deadline=deadline)
+        if result.returncode == 0 and os.path.exists(output_path):
+            logger.info(f"✅ Tách voice đơn giản thành công: {os.path.getsize(output_path):,} bytes")
+            return output_path
+        raise Exception(f"FFmpeg lỗi: {result.stderr}")
+    
     def mp3_to_text(self, audio_path: str, output_name: str) -> str:
         """
         Chuyển đổi MP3 thành text bằng Deepgram API (Legacy method - kept for compatibility)
@@ -1568,7 +2041,7 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
         """
         try:
             base_name = os.path.splitext(output_name)[0]
-            output_path = os.path.join(self.temp_dir, f"{base_name}_transcript_retry.txt")
+            output_path = self._artifact_path(f"{base_name}_transcript_retry.txt")
             
             logger.info("🔄 Thử lại với model khác...")
             
@@ -1586,7 +2059,7 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
                     "punctuate": "true"
                 }
                 
-                response = requests.post(url, headers=headers, params=params, data=audio_file, timeout=600)
+                response = self._http_post('deepgram', url, headers=headers, params=params, data=audio_file, timeout=effective_timeout(600))
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -1628,7 +2101,7 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
         try:
             # Tạo tên file output cho text đã viết lại
             base_name = os.path.splitext(output_name)[0]
-            output_path = os.path.join(self.temp_dir, f"{base_name}_rewritten.txt")
+            output_path = self._artifact_path(f"{base_name}_rewritten.txt")
             
             logger.info(f"🔄 Đang viết lại text (nội dung mới): {os.path.basename(text_path)}")
             
@@ -1974,7 +2447,7 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             
             # Gửi request đến Gemini API
             logger.info("Đang gửi request đến Gemini API để viết lại nội dung...")
-            response = requests.post(url, json=data, timeout=360)
+            response = self._http_post('gemini', url, json=data, timeout=effective_timeout(360))
             
             # Kiểm tra response
             if response.status_code == 200:
@@ -2017,6 +2490,20 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             raise
 
     def get_prompt_from_sheets(self) -> str:
+        """
+        Đọc prompt template từ Google Sheets và ghi nhận hash của prompt cho thread hiện tại
+        
+        Hash (self._thread_local.prompt_hash) được ghi vào cột I của Sheets để chế độ
+        --backfill-prompt biết dòng nào được viết lại bằng prompt cũ.
+        
+        Returns:
+            Nội dung prompt template từ sheet "Prompt"
+        """
+        prompt = self._read_prompt_from_sheets()
+        self._thread_local.prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+        return prompt
+    
+    def _read_prompt_from_sheets(self) -> str:
         """
         Đọc prompt template từ Google Sheets
         
@@ -2030,12 +2517,14 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             # Thử với tên sheet khác nếu lỗi
             range_name = 'Prompt!A1:Z200'
             
-            # Thực hiện request để đọc prompt
+            # Thực hiện request để đọc prompt (Sheet của folder đang xử lý nếu chạy nhiều folder)
+            sheets_service = self._get_sheets_service()
+            spreadsheet_id = getattr(self._thread_local, 'spreadsheet_id', None) or self.spreadsheet_id
             try:
-                result = self.sheets_service.spreadsheets().values().get(
-                    spreadsheetId=self.spreadsheet_id,
+                result = self._execute('sheets', sheets_service.spreadsheets().values().get(
+                    spreadsheetId=spreadsheet_id,
                     range=range_name
-                ).execute()
+                ))
             except Exception as e:
                 logger.warning(f"⚠️ Lỗi với tên sheet 'Prompt', thử với tên khác: {str(e)}")
                 # Thử với tên sheet khác
@@ -2043,10 +2532,10 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
                 for alt_name in alternative_names:
                     try:
                         range_name = f'{alt_name}!A1:Z200'
-                        result = self.sheets_service.spreadsheets().values().get(
-                            spreadsheetId=self.spreadsheet_id,
+                        result = self._execute('sheets', sheets_service.spreadsheets().values().get(
+                            spreadsheetId=spreadsheet_id,
                             range=range_name
-                        ).execute()
+                        ))
                         logger.info(f"✅ Thành công với tên sheet: {alt_name}")
                         break
                     except Exception as e2:
@@ -2430,7 +2919,8 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
     #         logger.error(f"❌ Lỗi chuyển đổi text thành speech: {str(e)}")
     #         raise
     
-    def create_text_without_timeline(self, text_path: str, output_name: str) -> str:
+    def create_text_without_timeline(self, text_path: str, output_name: str,
+                                     artifacts: Optional[LazyArtifacts] = None) -> str:
         """
         Tạo văn bản không có timeline từ text gốc hoặc text đã viết lại
         Giữ nguyên format như text cải tiến: câu dẫn, icon 👉, format 1 câu cách 1 hàng
@@ -2438,6 +2928,7 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
         Args:
             text_path: Đường dẫn đến file text (có thể có timeline)
             output_name: Tên file output (không có extension)
+            artifacts: Artifact dẫn xuất dùng chung với create_main_content_only (None = tạo mới từ text_path)
             
         Returns:
             Đường dẫn đến file text không có timeline
@@ -2445,19 +2936,14 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
         try:
             # Tạo tên file output cho text không có timeline
             base_name = os.path.splitext(output_name)[0]
-            output_path = os.path.join(self.temp_dir, f"{base_name}_no_timeline.txt")
+            output_path = self._artifact_path(f"{base_name}_no_timeline.txt")
             
             logger.info(f"📝 Đang tạo text không có timeline: {os.path.basename(text_path)}")
             
-            # Đọc text từ file
-            with open(text_path, 'r', encoding='utf-8') as f:
-                original_text = f.read()
-            
-            # Trích xuất nội dung chính có timeline
-            main_content = self._extract_main_content_with_timeline(original_text)
-            
-            # Bỏ timeline nhưng giữ nguyên format: câu dẫn + icon 👉 + format 1 câu cách 1 hàng
-            text_no_timeline = self._remove_timeline_keep_format(main_content)
+            # Nội dung chính có timeline -> bỏ timeline nhưng giữ nguyên format
+            # (nội dung chính chỉ được trích xuất một lần nếu create_main_content_only đã cần nó)
+            artifacts = artifacts or self.text_artifact_graph.evaluate({'rewritten_text_path': text_path})
+            text_no_timeline = artifacts.get('text_no_timeline')
             
             # Lưu text không có timeline vào file
             with open(output_path, 'w', encoding='utf-8') as f:
@@ -2474,13 +2960,15 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             logger.error(f"❌ Lỗi tạo text không timeline: {str(e)}")
             raise
 
-    def create_main_content_only(self, text_path: str, output_name: str) -> str:
+    def create_main_content_only(self, text_path: str, output_name: str,
+                                 artifacts: Optional[LazyArtifacts] = None) -> str:
         """
         Tạo file chỉ chứa nội dung chính có timeline (cho cột Text cải tiến)
         
         Args:
             text_path: Đường dẫn đến file text đã viết lại
             output_name: Tên file output (không có extension)
+            artifacts: Artifact dẫn xuất dùng chung với create_text_without_timeline (None = tạo mới từ text_path)
             
         Returns:
             Đường dẫn đến file chỉ có nội dung chính với timeline
@@ -2488,22 +2976,16 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
         try:
             # Tạo tên file output cho nội dung chính
             base_name = os.path.splitext(output_name)[0]
-            output_path = os.path.join(self.temp_dir, f"{base_name}_main_content.txt")
+            output_path = self._artifact_path(f"{base_name}_main_content.txt")
             
             logger.info(f"📝 Đang tạo nội dung chính có timeline: {os.path.basename(text_path)}")
             
-            # Đọc text từ file
-            with open(text_path, 'r', encoding='utf-8') as f:
-                original_text = f.read()
-            
             # Trích xuất chỉ nội dung chính có timeline
-            main_content = self._extract_main_content_with_timeline(original_text)
+            artifacts = artifacts or self.text_artifact_graph.evaluate({'rewritten_text_path': text_path})
+            main_content = artifacts.get('main_content')
             
-            # Bọc theo format yêu cầu: Câu vào đề + Nội dung chính
-            lead_in = self._generate_lead_in_hook(self._format_main_content_only(main_content))
+            # Bọc theo format yêu cầu: Nội dung chính (đã bỏ câu vào đề)
             formatted = []
-            # formatted.append("CÂU VÀO ĐỀ ->")  # ĐÃ COMMENT - BỎ CÂU VÀO ĐỀ
-            # formatted.append(lead_in if lead_in else "...")  # ĐÃ COMMENT - BỎ CÂU VÀO ĐỀ
             formatted.append("NỘI DUNG CHÍNH ->")
             formatted.append(main_content.strip())
 
@@ -2536,7 +3018,7 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
         try:
             # Tạo tên file output cho gợi ý
             base_name = os.path.splitext(output_name)[0]
-            output_path = os.path.join(self.temp_dir, f"{base_name}_suggestions.txt")
+            output_path = self._artifact_path(f"{base_name}_suggestions.txt")
             
             logger.info(f"💡 Đang tạo gợi ý tiêu đề, captions, CTA: {os.path.basename(text_path)}")
             
@@ -3693,6 +4175,23 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             logger.error(f"❌ Lỗi format main content: {str(e)}")
             return text
     
+    def update_drive_file(self, file_id: str, file_path: str):
+        """
+        Ghi đè nội dung file (text, mp3) đã có trên Google Drive (giữ nguyên ID và link)
+        
+        Args:
+            file_id: ID file trên Drive
+            file_path: Đường dẫn file nội dung mới
+        """
+        mime_type = 'audio/mpeg' if file_path.lower().endswith('.mp3') else 'text/plain'
+        media = MediaFileUpload(file_path, mimetype=mime_type, resumable=True)
+        self._execute('drive', self._get_drive_service().files().update(
+            fileId=file_id,
+            media_body=media,
+            fields='id'
+        ))
+        logger.info(f"✅ Đã cập nhật file Drive: {file_id}")
+    
     def upload_to_drive(self, file_path: str, folder_id: str) -> str:
         """
         Upload file lên Google Drive
@@ -3727,11 +4226,11 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             logger.info(f"🔄 Đang upload: {os.path.basename(file_path)}")
             
             # Upload file lên Google Drive
-            file = self.drive_service.files().create(
+            file = self._execute('drive', self._get_drive_service().files().create(
                 body=file_metadata,
                 media_body=media,
                 fields='id,name'
-            ).execute()
+            ))
             
             # Lấy thông tin file đã upload
             file_id = file.get('id')
@@ -3744,35 +4243,983 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             logger.error(f"❌ Lỗi upload: {str(e)}")
             raise
     
-    def process_all(self, input_folder_id: str, voice_folder_id: str, 
-                   text_original_folder_id: str, text_rewritten_folder_id: str, 
-                   # text_to_speech_folder_id: str,  # ĐÃ COMMENT
-                   video_name: str = "video1.mp4") -> Dict:
+    def _new_video_job(self, video_info: Dict, voice_folder_id: str,
+                       text_original_folder_id: str, text_rewritten_folder_id: str,
+                       rerun_steps: set = None) -> Dict:
         """
-        Xử lý một video: Video -> Voice Only -> Text -> Rewrite -> Drive (TTS đã comment)
+        Tạo job xử lý cho một video
         
-        Luồng xử lý hoàn chỉnh:
-        1. Tìm video trong folder input
-        2. Tải video từ Google Drive
-        3. Tách voice từ video (loại bỏ background music)
-        4. Upload voice only lên Google Drive
-        5. Chuyển đổi voice thành text bằng Deepgram
-        6. Upload text gốc lên Google Drive
-        7. Viết lại text bằng Gemini
-        8. Upload text đã viết lại lên Google Drive
+        Job là dict chứa thông tin đầu vào và được các bước (_step_*) cập nhật dần
         
         Args:
-            input_folder_id: ID folder chứa video input
+            video_info: Thông tin video từ Drive (id, name, ...)
             voice_folder_id: ID folder để upload voice only
             text_original_folder_id: ID folder để upload text gốc
             text_rewritten_folder_id: ID folder để upload text đã viết lại
-            video_name: Tên video cần xử lý
+            rerun_steps: Các bước chạy lại dù đã có trong ledger (chế độ --from-stage/--only-stage)
             
         Returns:
-            Dict chứa kết quả xử lý
+            Dict job
+        """
+        job = {
+            'status': 'pending',
+            'video_name': video_info['name'],
+            'video_file_id': video_info['id'],
+            'video_info': video_info,
+            'folders': {
+                'voice': voice_folder_id,
+                'text_original': text_original_folder_id,
+                'text_rewritten': text_rewritten_folder_id
+            },
+            'completed_steps': set()
+        }
+        self._resume_job(job, rerun_steps)
+        return job
+    
+    def _get_ledger(self) -> Optional[JobLedger]:
+        """
+        Lấy job ledger (mở file SQLite ở lần gọi đầu tiên)
+        
+        Returns:
+            JobLedger hoặc None nếu ledger bị tắt/không mở được
+        """
+        if self._ledger is None and self.ledger_path:
+            try:
+                self._ledger = JobLedger(self.ledger_path)
+                logger.info(f"📒 Job ledger: {self.ledger_path}")
+            except Exception as e:
+                logger.warning(f"⚠️ Không thể mở job ledger, chạy không checkpoint: {str(e)}")
+                self.ledger_path = None
+        return self._ledger
+    
+    def _media_artifact_ok(self, artifact: Dict) -> bool:
+        """
+        Kiểm tra file media trong ledger còn trên máy và đúng hash không
+        """
+        path = artifact.get('path')
+        if not path or not os.path.exists(path):
+            return False
+        return artifact.get('sha256') is None or file_sha256(path) == artifact['sha256']
+    
+    def _resume_job(self, job: Dict, rerun_steps: set = None):
+        """
+        Khôi phục các bước đã hoàn thành của video từ job ledger
+        
+        - Giá trị (Drive ID, ngôn ngữ, ...) được nạp lại vào job
+        - File text được ghi lại vào thư mục tạm từ nội dung đã lưu
+        - File media (video, voice) không còn trên máy thì bước tạo ra nó
+          được chạy lại, nhưng chỉ khi một bước chưa xong còn cần đến nó
+        - Các bước trong rerun_steps luôn chạy lại, các bước khác dùng kết quả đã lưu
+          (kể cả khi video đã ghi Sheets)
+        
+        Args:
+            job: Job vừa tạo bởi _new_video_job
+            rerun_steps: Các bước chạy lại dù đã có trong ledger (None = tiếp tục bình thường)
         """
+        ledger = self._get_ledger()
+        if ledger is None:
+            return
+        
         try:
-            logger.info(f"🚀 === BẮT ĐẦU XỬ LÝ: {video_name} ===")
+            video_state = ledger.get_video(job['video_file_id'])
+            completed = ledger.get_completed_steps(job['video_file_id'])
+            
+            # Video đã ghi Sheets mà vẫn được đưa vào xử lý -> người dùng muốn chạy lại từ đầu
+            if rerun_steps is None and video_state and video_state['sheet_written']:
+                if completed:
+                    logger.info(f"🔁 {job['video_name']} đã ghi Sheets trước đó, xử lý lại từ đầu")
+                    ledger.clear_steps(job['video_file_id'], list(completed))
+                # Lần xử lý lại này lỗi thì lần thử lại sau tiếp tục từ bước lỗi, không làm lại từ đầu
+                ledger.mark_sheet_written([job['video_file_id']], written=False)
+                return
+            
+            done = set()
+            media_ok = {}
+            for name, _, outputs in VIDEO_STEP_SPECS:
+                if name in completed and name in (rerun_steps or ()):
+                    # Bước upload chạy lại ghi đè file Drive cũ thay vì tạo file mới
+                    job.setdefault('previous_drive_ids', {}).update(
+                        {key: value for key, value in completed[name]['values'].items() if key.endswith('_file_id')})
+                if name not in completed or name in (rerun_steps or ()):
+                    continue
+                done.add(name)
+                job.update(completed[name]['values'])
+                for key, artifact in completed[name]['artifacts'].items():
+                    if artifact['kind'] == 'text':
+                        path = os.path.join(self._job_workspace(job)['text'], os.path.basename(artifact['path']))
+                        with open(path, 'w', encoding='utf-8') as f:
+                            f.write(artifact['content'])
+                        job[key] = path
+                    else:
+                        job[key] = artifact['path']
+                        media_ok[key] = self._media_artifact_ok(artifact)
+            
+            # Bước tạo media đã mất phải chạy lại nếu bước chưa xong cần media đó
+            changed = True
+            while changed:
+                changed = False
+                needed = {key for name, inputs, _ in VIDEO_STEP_SPECS if name not in done for key in inputs}
+                for name, _, outputs in VIDEO_STEP_SPECS:
+                    if name in done and any(key in needed and not media_ok.get(key, True) for key in outputs):
+                        done.discard(name)
+                        changed = True
+            
+            for name, _, outputs in VIDEO_STEP_SPECS:
+                if name not in done:
+                    for key in outputs:
+                        job.pop(key, None)
+            
+            job['completed_steps'] = done
+            if rerun_steps is not None:
+                extra = [name for name in VIDEO_STEPS if name not in done and name not in rerun_steps]
+                if extra:
+                    logger.warning(f"⚠️ {job['video_name']}: ledger thiếu kết quả, phải chạy thêm: {', '.join(extra)}")
+            elif done:
+                remaining = [name for name in VIDEO_STEPS if name not in done]
+                if remaining:
+                    logger.info(f"♻️ Tiếp tục {job['video_name']} từ bước: {', '.join(remaining)}")
+                else:
+                    logger.info(f"♻️ {job['video_name']} đã xử lý xong trước đó, dùng lại kết quả")
+                    
+        except Exception as e:
+            logger.warning(f"⚠️ Không thể khôi phục {job['video_name']} từ ledger: {str(e)}")
+            job['completed_steps'] = set()
+    
+    def _job_workspace(self, job: Dict) -> Dict[str, str]:
+        """
+        Lấy (tạo nếu chưa có) workspace của job
+        
+        Args:
+            job: Job của video
+            
+        Returns:
+            Dict {'media': thư mục video/voice, 'text': thư mục file text}
+        """
+        with self._workspace_lock:
+            workspace = job.get('workspace')
+            if workspace is None:
+                prefix = re.sub(r'[^\w.-]', '_', os.path.splitext(job['video_name'])[0])[:40] + '_'
+                media_dir = tempfile.mkdtemp(prefix=prefix, dir=self.temp_dir)
+                text_dir = media_dir
+                if self.text_workspace_root:
+                    if self._text_temp_dir is None:
+                        self._text_temp_dir = tempfile.mkdtemp(prefix='all_in_one_', dir=self.text_workspace_root)
+                    text_dir = tempfile.mkdtemp(prefix=prefix, dir=self._text_temp_dir)
+                workspace = job['workspace'] = {'media': media_dir, 'text': text_dir}
+            return workspace
+    
+    def _artifact_path(self, file_name: str) -> str:
+        """
+        Đường dẫn lưu artifact trong workspace của job đang chạy trên thread hiện tại
+        
+        File .txt vào thư mục text (có thể là tmpfs), file khác vào thư mục media;
+        ngoài một bước của job (không có workspace) thì dùng temp_dir.
+        """
+        workspace = getattr(self._thread_local, 'workspace', None)
+        if workspace is None:
+            return os.path.join(self.temp_dir, file_name)
+        return os.path.join(workspace['text'] if file_name.endswith('.txt') else workspace['media'], file_name)
+    
+    def _evict_job_media(self, job: Dict):
+        """
+        Video đã ra khỏi pipeline: xóa media (video, voice); job lỗi thì xóa cả workspace
+        
+        Text của video thành công được giữ đến khi ghi Google Sheets xong (_release_workspaces).
+        Video tải trước (nằm ngoài workspace) cũng được bỏ, kể cả khi job lỗi trước bước tách voice.
+        """
+        self._discard_prefetched(job)
+        workspace = job.get('workspace')
+        if workspace is None:
+            return
+        if job.get('status') == 'error':
+            self._release_workspaces([job])
+            return
+        for key in MEDIA_ARTIFACT_KEYS:
+            path = job.get(key)
+            if path and os.path.dirname(path) == workspace['media'] and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except Exception as e:
+                    logger.warning(f"⚠️ Không thể xóa {os.path.basename(path)}: {str(e)}")
+    
+    def _release_workspaces(self, items: List[Dict]):
+        """
+        Xóa workspace của các job/kết quả (sau khi đã ghi Google Sheets)
+        
+        Args:
+            items: Job hoặc kết quả xử lý có key 'workspace'
+        """
+        for item in items:
+            workspace = item.get('workspace')
+            if not workspace:
+                continue
+            for path in {workspace['media'], workspace['text']}:
+                shutil.rmtree(path, ignore_errors=True)
+    
+    def _step_download(self, job: Dict):
+        """Bước: Tải video từ Google Drive (lấy từ prefetcher nếu đã tải trước)"""
+        if self._prefetcher is not None:
+            video_path = self._prefetcher.get(job['video_file_id'])
+            if video_path:
+                logger.info(f"📦 Dùng video đã tải trước: {job['video_name']}")
+                job['video_path'] = video_path
+                return
+        
+        if self.remote_demux:
+            # Bước tách voice đọc file trên Drive; video_path chỉ dùng nếu phải tải về
+            job['video_path'] = self._artifact_path(job['video_name'])
+            job['video_remote'] = True
+            return
+        
+        if self.stream_extract and self._prepare_video_stream(job):
+            return
+        
+        logger.info("📥 Tải video từ Google Drive...")
+        job['video_path'] = self.download_video(job['video_file_id'], job['video_name'])
+    
+    def _prepare_video_stream(self, job: Dict) -> bool:
+        """
+        Chế độ stream: kiểm tra video có đọc tuần tự được không thay vì tải cả file
+        
+        Video stream được thì bước tách voice tự tải (job['video_stream']); video_path
+        chỉ là chỗ lưu file nếu stream thất bại và phải tải về.
+        
+        Returns:
+            True nếu video sẽ được stream vào FFmpeg
+        """
+        try:
+            size, md5 = self._drive_media_info(job['video_file_id'])
+            if size <= 0:
+                return False
+            head = self._fetch_video_range(job['video_file_id'], 0, min(size, self.stream_probe_bytes) - 1)
+            if needs_seeking(head):
+                logger.info(f"📥 {job['video_name']}: container cần seek (moov ở cuối), tải cả file trước")
+                return False
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ Không kiểm tra được {job['video_name']} để stream, tải cả file: {str(e)}")
+            return False
+        
+        job['video_path'] = self._artifact_path(job['video_name'])
+        job['video_stream'] = {'size': size, 'md5': md5}
+        logger.info(f"🌊 {job['video_name']}: sẽ stream thẳng vào FFmpeg ({size / (1024 * 1024):.0f} MB)")
+        return True
+    
+    def _step_extract_voice(self, job: Dict):
+        """Bước: Tách voice từ video (loại bỏ background music)"""
+        logger.info("🎤 Tách voice từ video...")
+        try:
+            stream = job.pop('video_stream', None)
+            remote = job.pop('video_remote', False)
+            if (stream is not None or remote) and not os.path.exists(job['video_path']):
+                try:
+                    if remote:
+                        job['voice_path'] = self.extract_voice_remote(job['video_file_id'], job['video_name'])
+                    else:
+                        job['voice_path'] = self.extract_voice_streaming(job['video_file_id'], stream['size'],
+                                                                         stream['md5'], job['video_name'])
+                    return
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    mode = 'Đọc từ Drive' if remote else 'Stream'
+                    logger.warning(f"⚠️ {mode} thất bại ({str(e)[:200]}), tải cả file rồi tách voice")
+                    job['video_path'] = self.download_video(job['video_file_id'], job['video_name'])
+            job['voice_path'] = self.extract_voice_only(job['video_path'], job['video_name'])
+        finally:
+            # Video chỉ cần cho bước này -> trả lại budget cho prefetcher
+            if self._prefetcher is not None:
+                self._prefetcher.release(job['video_file_id'])
+    
+    def _upload_step_file(self, job: Dict, key: str, file_path: str, folder_id: str) -> str:
+        """
+        Upload file của một bước upload; khi chạy lại stage thì ghi đè file Drive của lần trước
+        (giữ nguyên ID và link, không để lại file cũ)
+        
+        Args:
+            job: Job của video
+            key: Key Drive ID của bước (voice_file_id, text_file_id, rewritten_text_file_id)
+            file_path: File cần upload
+            folder_id: Folder Drive khi upload file mới
+            
+        Returns:
+            ID file trên Drive
+        """
+        previous_id = job.get('previous_drive_ids', {}).get(key)
+        if previous_id:
+            try:
+                self.update_drive_file(previous_id, file_path)
+                return previous_id
+            except HttpError as e:
+                if e.resp.status != 404:
+                    raise
+                logger.warning(f"⚠️ File Drive cũ {previous_id} không còn, upload file mới")
+        return self.upload_to_drive(file_path, folder_id)
+    
+    def _step_upload_voice(self, job: Dict):
+        """Bước: Upload voice only lên Google Drive"""
+        logger.info("☁️ Upload voice only...")
+        job['voice_file_id'] = self._upload_step_file(job, 'voice_file_id', job['voice_path'], job['folders']['voice'])
+    
+    def _step_transcribe(self, job: Dict):
+        """Bước: Chuyển đổi voice thành text bằng Deepgram"""
+        logger.info("📝 Chuyển đổi voice thành text...")
+        transcript_path, detected_language, is_chinese = self.extract_text_with_language_detection(
+            job['voice_path'], job['video_name']
+        )
+        job['transcript_path'] = transcript_path
+        job['detected_language'] = detected_language
+        job['is_chinese'] = is_chinese
+    
+    def _step_translate(self, job: Dict):
+        """Bước: Dịch tiếng Trung sang tiếng Việt nếu cần (text gốc = bản dịch hoặc transcript)"""
+        if job['is_chinese']:
+            logger.info("🌐 Dịch tiếng Trung sang tiếng Việt...")
+            job['text_path'] = self.translate_chinese_to_vietnamese(job['transcript_path'], job['video_name'])
+        else:
+            job['text_path'] = job['transcript_path']
+    
+    def _step_upload_text(self, job: Dict):
+        """Bước: Upload text gốc (hoặc đã dịch) lên Google Drive"""
+        logger.info("📄 Upload text gốc...")
+        job['text_file_id'] = self._upload_step_file(job, 'text_file_id', job['text_path'],
+                                                     job['folders']['text_original'])
+    
+    def _step_rewrite(self, job: Dict):
+        """Bước: Viết lại text bằng Gemini"""
+        logger.info("✍️ Viết lại text...")
+        job['rewritten_text_path'] = self.rewrite_text(job['text_path'], job['video_name'])
+        job['prompt_hash'] = getattr(self._thread_local, 'prompt_hash', '')
+    
+    def _step_upload_rewritten(self, job: Dict):
+        """Bước: Upload text đã viết lại lên Google Drive"""
+        logger.info("📄 Upload text đã viết lại...")
+        job['rewritten_text_file_id'] = self._upload_step_file(
+            job, 'rewritten_text_file_id', job['rewritten_text_path'], job['folders']['text_rewritten']
+        )
+    
+    def _step_format_main(self, job: Dict):
+        """Bước: Tạo nội dung chính có timeline (cho cột Text cải tiến)"""
+        logger.info("📝 Tạo nội dung chính có timeline...")
+        job['main_content_path'] = self.create_main_content_only(
+            job['rewritten_text_path'], job['video_name'], self._text_artifacts(job)
+        )
+    
+    def _step_format_no_timeline(self, job: Dict):
+        """Bước: Tạo text không có timeline (cho cột Text no timeline)"""
+        logger.info("📄 Tạo text không có timeline...")
+        job['text_no_timeline_path'] = self.create_text_without_timeline(
+            job['rewritten_text_path'], job['video_name'], self._text_artifacts(job)
+        )
+    
+    def _build_text_artifact_graph(self) -> ArtifactGraph:
+        """
+        Khai báo các artifact text dẫn xuất từ file đã viết lại (nguồn: rewritten_text_path)
+        
+        Returns:
+            ArtifactGraph dùng cho create_main_content_only / create_text_without_timeline
+        """
+        graph = ArtifactGraph()
+        graph.declare('rewritten_text', self._read_text_artifact, ['rewritten_text_path'])
+        graph.declare('main_content', self._extract_main_content_with_timeline, ['rewritten_text'])
+        graph.declare('text_no_timeline', self._remove_timeline_keep_format, ['main_content'])
+        return graph
+    
+    def _read_text_artifact(self, path: str) -> str:
+        """
+        Đọc nội dung file text (artifact nguồn)
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    
+    def _text_artifacts(self, job: Dict) -> LazyArtifacts:
+        """
+        Artifact dẫn xuất của bản viết lại hiện tại, dùng chung giữa các bước format của job
+        
+        Tạo lại khi rewritten_text_path đổi (chạy lại stage rewrite).
+        """
+        with self._workspace_lock:
+            artifacts = job.get('text_artifacts')
+            if artifacts is None or artifacts.get('rewritten_text_path') != job['rewritten_text_path']:
+                artifacts = self.text_artifact_graph.evaluate({'rewritten_text_path': job['rewritten_text_path']})
+                job['text_artifacts'] = artifacts
+            return artifacts
+    
+    def _consumed_steps(self, step_names: List[str]) -> List[str]:
+        """
+        Lọc các bước có output được sink (OUTPUT_SINKS) dùng, trực tiếp hoặc qua bước khác
+        
+        Args:
+            step_names: Danh sách tên bước (xem VIDEO_STEP_SPECS)
+            
+        Returns:
+            Các bước cần chạy (giữ thứ tự), bước không ai dùng output bị bỏ
+        """
+        needed = {key for keys in OUTPUT_SINKS.values() for key in keys}
+        consumed = set()
+        for name, inputs, outputs in reversed(VIDEO_STEP_SPECS):
+            if any(key in needed for key in outputs):
+                consumed.add(name)
+                needed.update(inputs)
+        
+        skipped = [name for name in step_names if name not in consumed]
+        if skipped:
+            logger.debug(f"⏭️ Bỏ qua bước không có nơi dùng output: {', '.join(skipped)}")
+        return [name for name in step_names if name in consumed]
+    
+    def _build_step_graph(self, step_names: List[str]) -> StepGraph:
+        """
+        Tạo đồ thị phụ thuộc cho các bước được chọn
+        
+        Args:
+            step_names: Danh sách tên bước (xem VIDEO_STEP_SPECS)
+            
+        Returns:
+            StepGraph chứa các bước theo inputs/outputs đã khai báo
+        """
+        steps = [
+            Step(name, lambda job, name=name: self._run_step(name, job), inputs, outputs)
+            for name, inputs, outputs in VIDEO_STEP_SPECS
+            if name in step_names
+        ]
+        return StepGraph(steps)
+    
+    def _run_steps(self, job: Dict, step_names: List[str]):
+        """
+        Chạy các bước cho một job, song song các bước không phụ thuộc nhau
+        
+        Các bước đã hoàn thành (khôi phục từ ledger) được bỏ qua.
+        
+        Args:
+            job: Job của video
+            step_names: Danh sách tên bước (xem VIDEO_STEP_SPECS)
+        """
+        completed = job.get('completed_steps', set())
+        step_names = [name for name in self._consumed_steps(step_names) if name not in completed]
+        if step_names:
+            self._build_step_graph(step_names).run(job, max_workers=self.step_workers)
+    
+    def _video_deadline(self, job: Dict) -> Deadline:
+        """
+        Deadline của cả video (bắt đầu tính từ bước đầu tiên được chạy)
+        """
+        with self._deadline_lock:
+            if 'deadline' not in job:
+                job['deadline'] = Deadline(self.video_budget_seconds, job['video_name'])
+                self._active_deadlines[job['video_file_id']] = job['deadline']
+            return job['deadline']
+    
+    def _finish_video_deadline(self, job: Dict):
+        """
+        Bỏ video khỏi danh sách đang xử lý (không bị hủy khi drain nữa)
+        """
+        with self._deadline_lock:
+            self._active_deadlines.pop(job['video_file_id'], None)
+    
+    def _run_step(self, name: str, job: Dict):
+        """
+        Chạy một bước trong deadline của nó và ghi checkpoint vào ledger
+        
+        Bước quá hạn bị hủy và raise DeadlineExceeded; kết quả của bước đó không
+        được ghi vào ledger (có thể không đầy đủ) nên lần chạy sau sẽ làm lại.
+        
+        Args:
+            name: Tên bước
+            job: Job của video
+        """
+        step_deadline = Deadline(self.step_budgets.get(name), f"{job['video_name']}/{name}",
+                                 parent=self._video_deadline(job))
+        # Google Sheet của folder chứa video (chế độ nhiều folder), dùng để đọc prompt
+        self._thread_local.spreadsheet_id = job.get('spreadsheet_id')
+        self._thread_local.workspace = self._job_workspace(job)
+        try:
+            with deadline_scope(step_deadline):
+                step_deadline.check()
+                getattr(self, f'_step_{name}')(job)
+                # Code bên trong có thể đã nuốt lỗi hết hạn và trả về kết quả dở dang
+                step_deadline.check()
+        finally:
+            self._thread_local.spreadsheet_id = None
+            self._thread_local.workspace = None
+        self._checkpoint_step(name, job)
+    
+    def _checkpoint_step(self, name: str, job: Dict):
+        """
+        Đánh dấu bước đã xong và ghi checkpoint (giá trị + artifact) vào ledger
+        
+        Args:
+            name: Tên bước
+            job: Job của video
+        """
+        job.setdefault('completed_steps', set()).add(name)
+        
+        ledger = self._get_ledger()
+        if ledger is None:
+            return
+        
+        try:
+            outputs = next(outputs for step, _, outputs in VIDEO_STEP_SPECS if step == name)
+            values = {key: job[key] for key in outputs
+                      if key not in TEXT_ARTIFACT_KEYS and key not in MEDIA_ARTIFACT_KEYS}
+            text_files = {key: job[key] for key in outputs if key in TEXT_ARTIFACT_KEYS}
+            media_files = {key: job[key] for key in outputs if key in MEDIA_ARTIFACT_KEYS}
+            ledger.record_step(job['video_file_id'], job['video_name'], name,
+                               values, text_files, media_files)
+        except Exception as e:
+            logger.warning(f"⚠️ Không thể ghi checkpoint bước {name}: {str(e)}")
+    
+    def _record_job_status(self, job: Dict):
+        """
+        Ghi trạng thái cuối cùng của video vào ledger
+        """
+        ledger = self._get_ledger()
+        if ledger is None:
+            return
+        
+        # Video quá hạn được ghi 'timeout' để lần chạy sau tiếp tục từ bước bị hủy
+        status = job.get('status', 'error')
+        if job.get('error_type') == DeadlineExceeded.__name__:
+            status = 'timeout'
+        
+        try:
+            ledger.mark_video(job['video_file_id'], job['video_name'], status, job.get('error'))
+        except Exception as e:
+            logger.warning(f"⚠️ Không thể ghi trạng thái {job['video_name']} vào ledger: {str(e)}")
+        
+        self._record_retry(job, ledger)
+    
+    def _record_retry(self, job: Dict, ledger: JobLedger):
+        """
+        Cập nhật hàng đợi thử lại: video lỗi được lên lịch thử lại (backoff) hoặc vào dead-letter
+        
+        Video bị hủy do dừng (drain) không tính là một lần lỗi: lần chạy sau tự tiếp tục.
+        Kết quả ghi vào job['retry'] = {'kind', 'attempts', 'next_attempt_at'} (None = dead-letter).
+        """
+        try:
+            if job.get('status') == 'success':
+                ledger.clear_retry([job['video_file_id']])
+                return
+            if job.get('status') != 'error' or self._shutdown_requested:
+                return
+            
+            failed_step = job.get('failed_step') or job.get('failed_stage')
+            kind = classify_failure(job.get('error'), job.get('error_type'), failed_step)
+            previous = ledger.get_retry(job['video_file_id'])
+            attempts = (previous['attempts'] if previous else 0) + 1
+            delay = retry_delay(kind, attempts)
+            
+            if delay is None:
+                reason = dead_letter_reason(kind, attempts, job.get('error'))
+                ledger.set_retry(job['video_file_id'], job['video_name'], kind, attempts, reason, failed_step)
+                logger.error(f"☠️ {job['video_name']} vào dead-letter: {reason}")
+                next_attempt_at = None
+            else:
+                next_attempt_at = time.time() + delay
+                ledger.set_retry(job['video_file_id'], job['video_name'], kind, attempts,
+                                 job.get('error'), failed_step, next_attempt_at)
+                logger.info(f"🔁 {job['video_name']}: lỗi {kind} lần {attempts}, thử lại sau {delay:.0f}s "
+                            f"từ bước {failed_step}")
+            job['retry'] = {'kind': kind, 'attempts': attempts, 'next_attempt_at': next_attempt_at}
+        except Exception as e:
+            logger.warning(f"⚠️ Không thể cập nhật hàng đợi thử lại cho {job['video_name']}: {str(e)}")
+    
+    def _job_result(self, job: Dict) -> Dict:
+        """
+        Chuyển job thành dict kết quả (định dạng dùng cho update_sheets_with_results)
+        """
+        if job.get('status') == 'error':
+            return {
+                'status': 'error',
+                'video_name': job['video_name'],
+                'video_file_id': job['video_file_id'],
+                'error': job.get('error', 'Unknown error'),
+                'failure_kind': job.get('retry', {}).get('kind'),
+                'sheet_claim': job.get('sheet_claim')
+            }
+        
+        return {
+            'status': 'success',
+            'video_name': job['video_name'],
+            'video_file_id': job['video_file_id'],  # ID của file video MP4
+            'voice_file_id': job['voice_file_id'],
+            'text_file_id': job['text_file_id'],
+            'rewritten_text_file_id': job['rewritten_text_file_id'],
+            # 'tts_file_id': tts_file_id,  # ĐÃ COMMENT
+            'voice_path': job['voice_path'],
+            'text_path': job['text_path'],
+            'rewritten_text_path': job['rewritten_text_path'],
+            'main_content_path': job.get('main_content_path'),
+            'text_no_timeline_path': job.get('text_no_timeline_path'),
+            'prompt_hash': job.get('prompt_hash', ''),
+            'workspace': job.get('workspace'),
+            'sheet_claim': job.get('sheet_claim'),  # Dòng giữ chỗ cần ghi kết quả vào (None = thêm dòng mới)
+            # 'suggestions_path': suggestions_path,  # ĐÃ LOẠI BỎ
+            # 'tts_audio_path': tts_audio_path  # ĐÃ COMMENT
+        }
+    
+    def _start_prefetch(self, jobs: List[Dict]):
+        """
+        Bắt đầu tải trước video của các job sẽ xử lý (nếu prefetch được bật)
+        
+        Args:
+            jobs: Danh sách job theo thứ tự xử lý
+        """
+        # Chế độ stream/remote không tải trước cả file video
+        if self.prefetch_lookahead <= 0 or self.stream_extract or self.remote_demux or len(jobs) < 2:
+            return
+        
+        jobs_by_id = {job['video_file_id']: job for job in jobs}
+        
+        def download(file_id: str, video_name: str) -> str:
+            # Video tải trước nằm trong workspace của job: hai video cùng tên không ghi đè nhau
+            # và file bị xóa cùng media của job (_evict_job_media)
+            self._thread_local.workspace = self._job_workspace(jobs_by_id[file_id])
+            try:
+                return self.download_video(file_id, video_name)
+            finally:
+                self._thread_local.workspace = None
+        
+        self._prefetcher = VideoPrefetcher(
+            download,
+            lookahead=self.prefetch_lookahead,
+            byte_budget=self.prefetch_budget_bytes
+        )
+        self._prefetcher.start([job['video_info'] for job in jobs])
+    
+    def _stop_prefetch(self):
+        """
+        Dừng prefetcher sau khi xử lý xong batch
+        """
+        if self._prefetcher is not None:
+            self._prefetcher.stop()
+            self._prefetcher = None
+    
+    def _process_video_job(self, job: Dict) -> Dict:
+        """
+        Xử lý trọn vẹn một video (các bước độc lập chạy song song theo đồ thị phụ thuộc)
+        
+        Args:
+            job: Job tạo bởi _new_video_job
+            
+        Returns:
+            Dict kết quả xử lý
+        """
+        try:
+            self._run_steps(job, VIDEO_STEPS)
+            job['status'] = 'success'
+        except Exception as e:
+            logger.error(f"❌ Lỗi xử lý video {job['video_name']} (bước {job.get('failed_step')}): {str(e)}")
+            job['status'] = 'error'
+            job['error'] = str(e)
+            job['error_type'] = type(e).__name__
+        
+        self._finish_video_deadline(job)
+        self._release_budget(job)
+        self._evict_job_media(job)
+        self._record_job_status(job)
+        return self._job_result(job)
+    
+    def _budget_admission(self, jobs: List[Dict]):
+        """
+        Nhận video theo quota ngày còn lại (generator dùng cho cả chế độ tuần tự và pipeline)
+        
+        Video có ước tính vượt quota còn lại bị hoãn; khi hết video nhận được thì chờ đến
+        lần reset quota (0h) hoặc đến khi video đang chạy trả lại reservation rồi thử lại.
+        Video vượt cả quota một ngày bị bỏ qua. Video được nhận thì giữ chỗ dòng Sheets
+        (_claim_sheet_row); runner khác đã giữ chỗ trước thì video bị bỏ qua.
+        Video bị bỏ qua hoặc bị hoãn được bỏ khỏi prefetcher để không giữ chỗ lookahead.
+        
+        Args:
+            jobs: Danh sách job theo thứ tự xử lý
+            
+        Yields:
+            Job đã được nhận (đã giữ reservation và dòng Sheets)
+        """
+        if self.budget_gate is None:
+            for job in jobs:
+                if self._shutdown_requested:
+                    return
+                if self._claim_sheet_row(job):
+                    yield job
+                else:
+                    self._discard_prefetched(job)
+            return
+        
+        pending = []
+        for job in jobs:
+            if self.budget_gate.exceeds_daily_quota(job):
+                logger.warning(f"⚠️ Bỏ qua {job['video_name']}: ước tính vượt quota của cả một ngày")
+                self._discard_prefetched(job)
+                continue
+            pending.append(job)
+        
+        while pending and not self._shutdown_requested:
+            deferred = []
+            for job in pending:
+                if self._shutdown_requested:
+                    return
+                if not self.budget_gate.try_reserve(job):
+                    # Video bị hoãn sẽ được tải trực tiếp khi đến lượt
+                    self._discard_prefetched(job)
+                    deferred.append(job)
+                elif self._claim_sheet_row(job):
+                    yield job
+                else:
+                    self._discard_prefetched(job)
+                    self._release_budget(job)
+            
+            if deferred:
+                self._wait_for_budget(len(deferred))
+            pending = deferred
+    
+    def _discard_prefetched(self, job: Dict):
+        """
+        Bỏ video của job khỏi prefetcher (xóa file đã tải trước, trả lại chỗ lookahead)
+        """
+        if self._prefetcher is not None:
+            self._prefetcher.discard(job['video_file_id'])
+    
+    def _wait_for_budget(self, deferred_count: int):
+        """
+        Chờ đến khi quota reset hoặc có video đang chạy trả lại reservation (vẫn kiểm tra tín hiệu dừng)
+        
+        Args:
+            deferred_count: Số video đang bị hoãn (dùng cho log)
+        """
+        wait_seconds = self.budget_gate.seconds_until_reset()
+        reserved = self.budget_gate.reserved_count
+        logger.info(f"⏳ Hoãn {deferred_count} video vì quota ngày: chờ reset quota sau {wait_seconds / 3600:.1f}h"
+                    f"{f' hoặc {reserved} video đang chạy xong' if reserved else ''}")
+        
+        end_time = time.time() + wait_seconds
+        next_check = time.time() + self.budget_poll_seconds
+        while not self._shutdown_requested and time.time() < end_time:
+            time.sleep(1)
+            if time.time() >= next_check:
+                if self.budget_gate.reserved_count < reserved:
+                    return
+                next_check = time.time() + self.budget_poll_seconds
+        if not self._shutdown_requested:
+            logger.info("🔄 Quota ngày đã reset, tiếp tục các video bị hoãn")
+    
+    def _release_budget(self, job: Dict):
+        """
+        Trả reservation quota của video đã xong
+        """
+        if self.budget_gate is not None:
+            self.budget_gate.release(job)
+    
+    def _run_jobs_with_retries(self, jobs: List[Dict], use_pipeline: bool = False) -> List[Dict]:
+        """
+        Xử lý các job (tuần tự hoặc pipeline) và thử lại ngay các video lỗi tạm thời
+        
+        Video lỗi có lịch thử lại trong khoảng retry_wait_seconds được chờ đến hạn rồi
+        chạy lại (tiếp tục từ bước lỗi nhờ ledger, giữ nguyên dòng giữ chỗ Sheets);
+        lịch xa hơn hoặc dead-letter thì giữ kết quả lỗi cho lần chạy sau.
+        
+        Args:
+            jobs: Danh sách job theo thứ tự xử lý
+            use_pipeline: True để xử lý chồng lấp nhiều video qua pipeline nhiều stage
+            
+        Returns:
+            Job của lần chạy cuối cùng của từng video (theo thứ tự ban đầu)
+        """
+        final_jobs = {}
+        while jobs:
+            if use_pipeline:
+                # Stage download của pipeline đã tự tải trước (giới hạn bởi hàng đợi)
+                self._run_jobs_pipeline(jobs)
+            else:
+                # Không tải trước video đã qua bước download (khôi phục từ ledger)
+                self._start_prefetch([job for job in jobs if 'download' not in job['completed_steps']])
+                try:
+                    self._run_jobs_sequential(jobs)
+                finally:
+                    self._stop_prefetch()
+            
+            retry_jobs = []
+            for job in jobs:
+                final_jobs[job['video_file_id']] = job
+                next_attempt_at = (job.get('retry') or {}).get('next_attempt_at')
+                if (job.get('status') == 'error' and next_attempt_at is not None
+                        and next_attempt_at - time.time() <= self.retry_wait_seconds):
+                    retry_jobs.append(job)
+            
+            if not retry_jobs or not self._wait_for_retry(retry_jobs):
+                break
+            jobs = [self._retry_job(job) for job in retry_jobs]
+        
+        return list(final_jobs.values())
+    
+    def _wait_for_retry(self, jobs: List[Dict]) -> bool:
+        """
+        Chờ đến lịch thử lại sớm nhất của các video lỗi (vẫn kiểm tra tín hiệu dừng)
+        
+        Returns:
+            False nếu có tín hiệu dừng trong lúc chờ
+        """
+        wait_until = min(job['retry']['next_attempt_at'] for job in jobs)
+        logger.info(f"🔁 Thử lại {len(jobs)} video lỗi tạm thời sau {max(0, wait_until - time.time()):.0f}s...")
+        while not self._shutdown_requested and time.time() < wait_until:
+            time.sleep(min(1, max(0, wait_until - time.time())))
+        return not self._shutdown_requested
+    
+    def _retry_job(self, job: Dict) -> Dict:
+        """
+        Tạo job mới cho lần thử lại (khôi phục các bước đã xong từ ledger)
+        
+        Thông tin folder/Sheet và dòng giữ chỗ của job cũ được giữ nguyên.
+        """
+        retry = self._new_video_job(job['video_info'], job['folders']['voice'],
+                                    job['folders']['text_original'], job['folders']['text_rewritten'])
+        for key in ('folder_name', 'spreadsheet_id', 'sheet_name', 'claim_sheet_row', 'sheet_claim'):
+            if key in job:
+                retry[key] = job[key]
+        logger.info(f"🔁 Thử lại {retry['video_name']} (lần {job['retry']['attempts'] + 1}), "
+                    f"còn {len(set(VIDEO_STEPS) - retry['completed_steps'])} bước")
+        return retry
+    
+    def _run_jobs_sequential(self, jobs: List[Dict]) -> List[Dict]:
+        """
+        Xử lý từng video một (chế độ mặc định)
+        """
+        results = []
+        total_videos = len(jobs)
+        
+        for i, job in enumerate(self._budget_admission(jobs), 1):
+            if self._shutdown_requested:
+                logger.info(f"🛑 Ngừng nhận video mới: {total_videos - i + 1} video chưa xử lý")
+                break
+            
+            video_name = job['video_name']
+            logger.info(f"\n🎬 === XỬ LÝ VIDEO {i}/{total_videos}: {video_name} ===")
+            
+            result = self._process_video_job(job)
+            results.append(result)
+            
+            if result['status'] == 'success':
+                logger.info(f"✅ Hoàn thành video {i}/{total_videos}: {video_name}")
+        
+        return results
+    
+    def _run_jobs_pipeline(self, jobs: List[Dict]) -> List[Dict]:
+        """
+        Xử lý nhiều video chồng lấp nhau qua pipeline nhiều stage
+        
+        Mỗi stage (download, tách voice, transcription, dịch/viết lại, format, upload)
+        có worker pool riêng, nối với nhau bằng hàng đợi có giới hạn.
+        """
+        if self.engine == 'async':
+            return self._run_jobs_async(jobs)
+        
+        stages = []
+        for stage_name, step_names in PIPELINE_STAGES:
+            stages.append(PipelineStage(
+                stage_name,
+                lambda job, step_names=step_names: self._run_steps(job, step_names),
+                workers=self.pipeline_workers.get(stage_name, 1),
+                queue_size=self.pipeline_queue_size
+            ))
+        
+        logger.info(f"🏭 Xử lý {len(jobs)} video bằng pipeline...")
+        pipeline = StagedPipeline(stages, on_result=self._on_pipeline_result,
+                                  should_stop=lambda: self._shutdown_requested)
+        finished_jobs = pipeline.run(self._budget_admission(jobs))
+        
+        return [self._job_result(job) for job in finished_jobs]
+    
+    def _on_pipeline_result(self, job: Dict):
+        """
+        Callback khi một video ra khỏi pipeline (thành công hoặc lỗi ở một stage)
+        """
+        if job.get('status') != 'error':
+            job['status'] = 'success'
+            logger.info(f"✅ Hoàn thành video: {job['video_name']}")
+        else:
+            logger.error(f"❌ Lỗi xử lý video {job['video_name']} (stage {job.get('failed_stage')}): {job.get('error')}")
+        self._finish_video_deadline(job)
+        self._release_budget(job)
+        self._evict_job_media(job)
+        self._record_job_status(job)
+    
+    async def _run_extract_voice_async(self, job: Dict):
+        """
+        Stage tách voice của engine async: FFmpeg chạy bằng asyncio.create_subprocess_exec
+        """
+        if 'extract_voice' in job.get('completed_steps', ()):
+            return
+        
+        step_deadline = Deadline(self.step_budgets.get('extract_voice'), f"{job['video_name']}/extract_voice",
+                                 parent=self._video_deadline(job))
+        try:
+            job['voice_path'] = await self.extract_voice_only_async(
+                job['video_path'], job['video_name'], deadline=step_deadline,
+                output_dir=self._job_workspace(job)['media'])
+            step_deadline.check()
+        except Exception:
+            job['failed_step'] = 'extract_voice'
+            raise
+        self._checkpoint_step('extract_voice', job)
+    
+    def _run_jobs_async(self, jobs: List[Dict]) -> List[Dict]:
+        """
+        Xử lý nhiều video qua pipeline trên một event loop asyncio
+        
+        FFmpeg chạy như subprocess async (không chiếm thread); các bước gọi Drive,
+        Deepgram và Gemini vẫn dùng client blocking nên chạy trong thread pool giới
+        hạn (async_blocking_workers), mỗi thread có Drive/Sheets service riêng.
+        """
+        stages = []
+        for stage_name, step_names in PIPELINE_STAGES:
+            if stage_name == 'extract_voice' and not (self.stream_extract or self.remote_demux):
+                handler = self._run_extract_voice_async
+            else:
+                handler = lambda job, step_names=step_names: self._run_steps(job, step_names)
+            stages.append(PipelineStage(
+                stage_name,
+                handler,
+                workers=self.pipeline_workers.get(stage_name, 1),
+                queue_size=self.pipeline_queue_size
+            ))
+        
+        logger.info(f"⚡ Xử lý {len(jobs)} video bằng async engine...")
+        pipeline = AsyncStagedPipeline(stages, on_result=self._on_pipeline_result,
+                                       should_stop=lambda: self._shutdown_requested,
+                                       blocking_workers=self.async_blocking_workers)
+        finished_jobs = pipeline.run(self._budget_admission(jobs))
+        
+        return [self._job_result(job) for job in finished_jobs]
+    
+    def process_all(self, input_folder_id: str, voice_folder_id: str, 
+                   text_original_folder_id: str, text_rewritten_folder_id: str, 
+                   # text_to_speech_folder_id: str,  # ĐÃ COMMENT
+                   video_name: str = "video1.mp4") -> Dict:
+        """
+        Xử lý một video: Video -> Voice Only -> Text -> Rewrite -> Drive (TTS đã comment)
+        
+        Luồng xử lý hoàn chỉnh:
+        1. Tìm video trong folder input
+        2. Tải video từ Google Drive
+        3. Tách voice từ video (loại bỏ background music)
+        4. Upload voice only lên Google Drive
+        5. Chuyển đổi voice thành text bằng Deepgram
+        6. Upload text gốc lên Google Drive
+        7. Viết lại text bằng Gemini
+        8. Upload text đã viết lại lên Google Drive
+        
+        Args:
+            input_folder_id: ID folder chứa video input
+            voice_folder_id: ID folder để upload voice only
+            text_original_folder_id: ID folder để upload text gốc
+            text_rewritten_folder_id: ID folder để upload text đã viết lại
+            video_name: Tên video cần xử lý
+            
+        Returns:
+            Dict chứa kết quả xử lý
+        """
+        try:
+            logger.info(f"🚀 === BẮT ĐẦU XỬ LÝ: {video_name} ===")
             
             # Bước 1: Tìm video trong folder input
             logger.info("📂 Bước 1: Tìm video trong folder...")
@@ -3784,296 +5231,1120 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
                     'error': f'Không tìm thấy video {video_name}'
                 }
             
-            file_id = video_info['id']
+            # Các bước còn lại: tải, tách voice, transcription, dịch, viết lại, upload, format
+            job = self._new_video_job(video_info, voice_folder_id,
+                                      text_original_folder_id, text_rewritten_folder_id)
+            result = self._process_video_job(job)
+            
+            if result['status'] == 'success':
+                logger.info("✅ === HOÀN THÀNH XỬ LÝ ===")
+            
+            return result
+            
+        except Exception as e:
+            logger.error(f"❌ Lỗi trong quá trình xử lý: {str(e)}")
+            return {
+                'status': 'error',
+                'video_name': video_name,
+                'error': str(e)
+            }
+    
+    def _check_videos_to_process(self, input_folder_id: str) -> Dict:
+        """
+        Kiểm tra video nào trong folder cần xử lý (chưa có trong Google Sheets)
+        
+        Args:
+            input_folder_id: ID folder chứa video input
+            
+        Returns:
+            Dict video_status của VideoStatusChecker (videos_to_process, videos_skipped, ...)
+        """
+        logger.info("🔍 Bước 1: Kiểm tra trạng thái video...")
+        
+        if self.video_checker is None:
+            logger.warning("⚠️ VideoStatusChecker không khả dụng, bỏ qua kiểm tra trạng thái")
+            # Tạo video_status mặc định để tiếp tục xử lý
+            video_status = {
+                'videos_to_process': [{'name': 'video1.mp4', 'id': 'default_id'}],
+                'videos_skipped': [],
+                'total_drive_videos': 1,
+                'total_sheet_videos': 0,
+                'check_timestamp': '2025-08-13T10:00:00'
+            }
+        else:
+            try:
+                with self._sheet_lock:
+                    video_status = self.video_checker.check_video_status(input_folder_id)
+                
+                # Hiển thị summary của video checker
+                try:
+                    summary = self.video_checker.get_check_summary(video_status)
+                    logger.info(summary)
+                except Exception as e:
+                    logger.warning(f"⚠️ Không thể hiển thị summary: {str(e)}")
+            except Exception as e:
+                logger.error(f"❌ Lỗi kiểm tra trạng thái video: {str(e)}")
+                # Tạo video_status mặc định để tiếp tục xử lý
+                video_status = {
+                    'videos_to_process': [{'name': 'video1.mp4', 'id': 'default_id'}],
+                    'videos_skipped': [],
+                    'total_drive_videos': 1,
+                    'total_sheet_videos': 0,
+                    'check_timestamp': '2025-08-13T10:00:00'
+                }
+        
+        return video_status
+    
+    def process_all_videos(self, input_folder_id: str, voice_folder_id: str, 
+                          text_original_folder_id: str, text_rewritten_folder_id: str,
+                          # text_to_speech_folder_id: str  # ĐÃ COMMENT
+                          use_pipeline: bool = False) -> List[Dict]:
+        """
+        Xử lý tất cả video trong folder: Video -> Voice Only -> Text -> Rewrite -> Drive (TTS đã comment)
+        
+        Args:
+            input_folder_id: ID folder chứa video input
+            voice_folder_id: ID folder để upload voice only
+            text_original_folder_id: ID folder để upload text gốc
+            text_rewritten_folder_id: ID folder để upload text đã viết lại
+            use_pipeline: True để xử lý chồng lấp nhiều video qua pipeline nhiều stage
+            
+        Returns:
+            List chứa kết quả xử lý tất cả video
+        """
+        try:
+            logger.info(f"🚀 === BẮT ĐẦU XỬ LÝ TẤT CẢ VIDEO ===")
+            
+            # BƯỚC MỚI: Check video status trước khi xử lý
+            video_status = self._check_videos_to_process(input_folder_id)
+            
+            if not video_status['videos_to_process']:
+                logger.info("🎉 Tất cả video đã được xử lý! Không có gì để làm.")
+                return []
+            
+            # Chỉ xử lý video mới, sắp xếp theo policy (mặc định giữ thứ tự tên)
+            videos_to_process = schedule_videos(self._filter_retry_queue(video_status['videos_to_process']),
+                                                self.schedule_policy)
+            if not videos_to_process:
+                logger.info("⏳ Các video còn lại đang chờ thử lại hoặc nằm trong dead-letter.")
+                return []
+            logger.info(f" Bắt đầu xử lý {len(videos_to_process)} video mới...")
+            
+            return self._process_video_batch(videos_to_process, voice_folder_id,
+                                             text_original_folder_id, text_rewritten_folder_id,
+                                             use_pipeline=use_pipeline)
+            
+        except Exception as e:
+            logger.error(f"❌ Lỗi trong quá trình xử lý tất cả video: {str(e)}")
+            return []
+    
+    def _filter_retry_queue(self, videos: List[Dict]) -> List[Dict]:
+        """
+        Bỏ các video nằm trong dead-letter hoặc chưa đến lịch thử lại
+        
+        Args:
+            videos: Danh sách video từ Drive
+            
+        Returns:
+            Danh sách video được xử lý trong lần chạy này
+        """
+        ledger = self._get_ledger()
+        if ledger is None:
+            return videos
+        
+        try:
+            retries = {entry['video_file_id']: entry for entry in ledger.list_retries()}
+        except Exception as e:
+            logger.warning(f"⚠️ Không thể đọc hàng đợi thử lại: {str(e)}")
+            return videos
+        
+        selected = []
+        for video in videos:
+            entry = retries.get(video['id'])
+            if entry is None:
+                selected.append(video)
+            elif entry['status'] == 'dead':
+                logger.info(f"☠️ Bỏ qua {video['name']} (dead-letter): {entry['reason']}")
+            elif entry['next_attempt_at'] - time.time() > self.retry_wait_seconds:
+                logger.info(f"⏳ Bỏ qua {video['name']}: thử lại sau "
+                            f"{(entry['next_attempt_at'] - time.time()) / 60:.0f} phút (lỗi {entry['kind']})")
+            else:
+                selected.append(video)
+        return selected
+    
+    def list_dead_letters(self) -> List[Dict]:
+        """
+        In danh sách video trong dead-letter (kèm lý do) và video đang chờ thử lại
+        
+        Returns:
+            List video trong dead-letter
+        """
+        ledger = self._get_ledger()
+        if ledger is None:
+            logger.error("❌ Hàng đợi thử lại cần job ledger (không dùng được với --no-ledger)")
+            return []
+        
+        dead = ledger.list_retries('dead')
+        pending = ledger.list_retries('pending')
+        logger.info(f"☠️ === DEAD-LETTER: {len(dead)} VIDEO ===")
+        for entry in dead:
+            logger.info(f"  - {entry['video_name']} [{entry['video_file_id']}] "
+                        f"(bước {entry['failed_step']}, {entry['attempts']} lần): {entry['reason']}")
+        logger.info(f"🔁 Đang chờ thử lại: {len(pending)} video")
+        for entry in pending:
+            logger.info(f"  - {entry['video_name']}: lỗi {entry['kind']} lần {entry['attempts']}, thử lại lúc "
+                        f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['next_attempt_at']))}")
+        return dead
+    
+    def requeue_dead_letters(self, video_names: List[str] = None) -> int:
+        """
+        Đưa video ra khỏi dead-letter để lần chạy sau xử lý lại (sau khi đã sửa nguyên nhân lỗi)
+        
+        Args:
+            video_names: Chỉ đưa ra các video này (None = tất cả)
+            
+        Returns:
+            Số video được đưa ra khỏi dead-letter
+        """
+        ledger = self._get_ledger()
+        if ledger is None:
+            logger.error("❌ Hàng đợi thử lại cần job ledger (không dùng được với --no-ledger)")
+            return 0
+        
+        dead = [entry for entry in ledger.list_retries('dead')
+                if video_names is None or entry['video_name'] in video_names]
+        ledger.clear_retry([entry['video_file_id'] for entry in dead])
+        for entry in dead:
+            logger.info(f"♻️ Đưa ra khỏi dead-letter: {entry['video_name']}")
+        return len(dead)
+    
+    def _process_video_batch(self, videos_to_process: List[Dict], voice_folder_id: str,
+                             text_original_folder_id: str, text_rewritten_folder_id: str,
+                             use_pipeline: bool = False) -> List[Dict]:
+        """
+        Xử lý một danh sách video (theo thứ tự cho trước) và ghi kết quả vào Google Sheets
+        
+        Args:
+            videos_to_process: Danh sách video từ Drive
+            voice_folder_id: ID folder để upload voice only
+            text_original_folder_id: ID folder để upload text gốc
+            text_rewritten_folder_id: ID folder để upload text đã viết lại
+            use_pipeline: True để xử lý chồng lấp nhiều video qua pipeline nhiều stage
+            
+        Returns:
+            List kết quả xử lý
+        """
+        # Hiển thị danh sách video sẽ xử lý
+        logger.info("📋 DANH SÁCH VIDEO SẼ XỬ LÝ:")
+        for i, video in enumerate(videos_to_process, 1):
+            logger.info(f"  {i}. {video['name']}")
+        
+        # Bước 2: Xử lý từng video (hoặc chồng lấp qua pipeline)
+        total_videos = len(videos_to_process)
+        jobs = [
+            self._new_video_job(video_info, voice_folder_id,
+                                text_original_folder_id, text_rewritten_folder_id)
+            for video_info in videos_to_process
+        ]
+        for job in jobs:
+            job['claim_sheet_row'] = True
+        
+        jobs = self._run_jobs_with_retries(jobs, use_pipeline)
+        results = [self._job_result(job) for job in jobs if job.get('status') in ('success', 'error')]
+        
+        # Video đã giữ chỗ nhưng chưa chạy xong (dừng giữa chừng) -> trả dòng để runner khác nhận
+        self._release_sheet_claims([job for job in jobs if job.get('status') not in ('success', 'error')])
+        
+        if self._shutdown_requested:
+            logger.info(f"🛑 === ĐÃ DỪNG (DRAIN): xử lý {len(results)}/{total_videos} video ===")
+        else:
+            logger.info(f"✅ === HOÀN THÀNH XỬ LÝ TẤT CẢ VIDEO ===")
+        logger.info(f"📊 Tổng số video: {total_videos}")
+        logger.info(f"✅ Thành công: {len([r for r in results if r['status'] == 'success'])}")
+        logger.info(f"❌ Thất bại: {len([r for r in results if r['status'] == 'error'])}")
+        for name, limiter in self.limiters.items():
+            logger.info(f"🚦 {name}: giới hạn {limiter.limit} request đồng thời, {limiter.stats}")
+        
+        # Bước cuối: Cập nhật Google Sheets
+        if results:
+            self._write_results_to_sheets(results)
+        
+        return results
+    
+    def reprocess_videos(self, input_folder_id: str, voice_folder_id: str,
+                         text_original_folder_id: str, text_rewritten_folder_id: str,
+                         stages: List[str], video_names: List[str] = None,
+                         include_dependents: bool = False, use_pipeline: bool = False) -> List[Dict]:
+        """
+        Chạy lại một số stage của các video đã xử lý, các stage khác dùng kết quả trong ledger
+        
+        Ví dụ sửa prompt viết lại hoặc formatter: chạy lại rewrite + format + sheet mà
+        không tải video, không chạy FFmpeg và không gọi lại Deepgram.
+        
+        Args:
+            input_folder_id: ID folder chứa video input
+            voice_folder_id: ID folder để upload voice only
+            text_original_folder_id: ID folder để upload text gốc
+            text_rewritten_folder_id: ID folder để upload text đã viết lại
+            stages: Các stage cần chạy lại (trong REPROCESS_STAGES)
+            video_names: Tên video cần chạy lại (có hoặc không có đuôi file; None = mọi video đã có trong Sheets)
+            include_dependents: True để chạy lại cả các bước dùng output của bước được chạy lại (--from-stage)
+            use_pipeline: True để xử lý chồng lấp nhiều video qua pipeline nhiều stage
             
-            # Bước 2: Tải video từ Google Drive
-            logger.info("📥 Bước 2: Tải video từ Google Drive...")
-            video_path = self.download_video(file_id, video_name)
+        Returns:
+            List kết quả xử lý
+        """
+        if self._get_ledger() is None:
+            logger.error("❌ Chạy lại stage cần job ledger (không dùng được với --no-ledger)")
+            return []
+        
+        stage_steps = dict(PIPELINE_STAGES)
+        rerun_steps = {step for stage in stages if stage != 'sheet' for step in stage_steps[stage]}
+        if include_dependents:
+            # Chỉ các bước phụ thuộc mới chạy lại (ví dụ từ rewrite thì không upload lại voice)
+            changed_keys = set()
+            for name, inputs, outputs in VIDEO_STEP_SPECS:
+                if name in rerun_steps or changed_keys.intersection(inputs):
+                    rerun_steps.add(name)
+                    changed_keys.update(outputs)
+        logger.info(f"🔁 === CHẠY LẠI STAGE: {', '.join(stages)} ({', '.join(s for s in VIDEO_STEPS if s in rerun_steps)}) ===")
+        
+        # Video đã ghi Sheets nằm trong videos_skipped; chỉ định tên thì tìm trong cả folder
+        video_status = self._check_videos_to_process(input_folder_id)
+        if video_names:
+            wanted = {os.path.splitext(name.strip().lower())[0] for name in video_names}
+            candidates = video_status['videos_skipped'] + video_status['videos_to_process']
+            videos = [video for video in candidates
+                      if os.path.splitext(video['name'].strip().lower())[0] in wanted]
+            found = {os.path.splitext(video['name'].strip().lower())[0] for video in videos}
+            for name in sorted(wanted - found):
+                logger.warning(f"⚠️ Không tìm thấy video {name} trong folder")
+        else:
+            videos = video_status['videos_skipped']
+        
+        if not videos:
+            logger.info("✅ Không có video nào để chạy lại")
+            return []
+        
+        return self._rerun_video_batch(videos, voice_folder_id, text_original_folder_id, text_rewritten_folder_id,
+                                       rerun_steps, 'sheet' in stages, use_pipeline=use_pipeline)
+    
+    def _rerun_video_batch(self, videos: List[Dict], voice_folder_id: str,
+                           text_original_folder_id: str, text_rewritten_folder_id: str,
+                           rerun_steps: set, write_sheet: bool, use_pipeline: bool = False) -> List[Dict]:
+        """
+        Chạy lại các bước rerun_steps của video đã xử lý và ghi đè dòng Sheets đã có
+        
+        Các bước upload chạy lại ghi đè file Drive của lần trước (giữ nguyên link).
+        
+        Args:
+            videos: Danh sách video từ Drive
+            voice_folder_id: ID folder để upload voice only
+            text_original_folder_id: ID folder để upload text gốc
+            text_rewritten_folder_id: ID folder để upload text đã viết lại
+            rerun_steps: Các bước chạy lại, các bước khác dùng kết quả trong ledger
+            write_sheet: True để ghi đè dòng Sheets của video (replace_sheet_rows)
+            use_pipeline: True để xử lý chồng lấp nhiều video qua pipeline nhiều stage
             
-            # Bước 3: Tách voice từ video (loại bỏ background music)
-            logger.info("🎤 Bước 3: Tách voice từ video...")
-            voice_path = self.extract_voice_only(video_path, video_name)
+        Returns:
+            List kết quả xử lý
+        """
+        jobs = [
+            self._new_video_job(video_info, voice_folder_id, text_original_folder_id,
+                                text_rewritten_folder_id, rerun_steps=rerun_steps)
+            for video_info in schedule_videos(videos, self.schedule_policy)
+        ]
+        
+        if use_pipeline:
+            results = self._run_jobs_pipeline(jobs)
+        else:
+            results = self._run_jobs_sequential(jobs)
+        
+        logger.info(f"✅ Chạy lại xong: {len([r for r in results if r['status'] == 'success'])}/{len(results)} video thành công")
+        
+        if write_sheet:
+            with self._sheet_lock:
+                replaced = self.replace_sheet_rows(results)
+            self._mark_sheet_written(replaced)
+            self._release_workspaces(replaced)
+        else:
+            # Không ghi Sheets: kết quả đã nằm trong ledger và trên Drive, workspace không còn cần
+            self._release_workspaces(results)
+        
+        return results
+    
+    def _drive_file_id_from_link(self, link: str) -> Optional[str]:
+        """
+        Lấy Drive file ID từ link dạng https://drive.google.com/file/d/<ID>/view (hoặc ?id=<ID>)
+        """
+        match = re.search(r'/d/([\w-]+)', link or '') or re.search(r'[?&]id=([\w-]+)', link or '')
+        return match.group(1) if match else None
+    
+    def download_text_from_drive(self, file_id: str, output_name: str) -> str:
+        """
+        Tải file text từ Google Drive về thư mục tạm
+        
+        Args:
+            file_id: ID file text trên Drive
+            output_name: Tên file lưu trong thư mục tạm
             
-            # Bước 4: Upload voice only lên Google Drive
-            logger.info("☁️ Bước 4: Upload voice only lên Google Drive...")
-            voice_file_id = self.upload_to_drive(voice_path, voice_folder_id)
+        Returns:
+            Đường dẫn file text đã tải
+        """
+        content = self._execute('drive', self._get_drive_service().files().get_media(fileId=file_id))
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+        
+        text_path = self._artifact_path(output_name)
+        with open(text_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return text_path
+    
+    def backfill_prompt(self, workers: int = None) -> List[Dict]:
+        """
+        Viết lại các dòng Sheets được tạo bằng prompt cũ (hash cột I khác prompt hiện tại)
+        
+        Chỉ chạy rewrite_text và formatter: transcript lấy từ file Drive ở cột D, không tải
+        video, không gọi Deepgram. Các dòng chạy song song và đi qua budget gate; file text
+        viết lại ở cột F được cập nhật tại chỗ, cột G-I được ghi lại bằng batch update.
+        
+        Args:
+            workers: Số dòng xử lý song song (mặc định số worker stage rewrite)
             
-            # Bước 5: Chuyển đổi voice thành text bằng Deepgram
-            logger.info("📝 Bước 5: Chuyển đổi voice thành text...")
-            text_path, detected_language, is_chinese = self.extract_text_with_language_detection(voice_path, video_name)
+        Returns:
+            List kết quả (status, video_name, ...) của các dòng đã xử lý
+        """
+        logger.info("🔁 === BACKFILL PROMPT ===")
+        self.get_prompt_from_sheets()
+        current_hash = self._thread_local.prompt_hash
+        logger.info(f"🔑 Hash prompt hiện tại: {current_hash}")
+        
+        rows = self._execute('sheets', self.sheets_service.spreadsheets().values().get(
+            spreadsheetId=self.spreadsheet_id,
+            range=f'{self.sheet_name}!A2:I'
+        )).get('values', [])
+        
+        jobs = []
+        for row_number, row in enumerate(rows, 2):
+            row = row + [''] * (9 - len(row))
+            text_file_id = self._drive_file_id_from_link(row[3])
+            if not text_file_id or row[8] == current_hash:
+                continue
+            jobs.append({
+                'row': row_number,
+                'video_name': row[1] or f'row{row_number}',
+                'video_file_id': f'row{row_number}',  # Khóa reservation của budget gate
+                'text_file_id': text_file_id,
+                'rewritten_text_file_id': self._drive_file_id_from_link(row[5]),
+                'transcript_chars': len(row[4]),
+                'status': 'pending'
+            })
+        
+        if not jobs:
+            logger.info("✅ Tất cả dòng đã dùng prompt hiện tại")
+            return []
+        logger.info(f"📋 {len(jobs)} dòng được viết lại bằng prompt cũ")
+        
+        workers = workers or self.pipeline_workers.get('rewrite', 4)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backfill') as executor:
+            for job in self._budget_admission(jobs):
+                executor.submit(self._backfill_row, job)
+        
+        done_jobs = [job for job in jobs if job['status'] in ('success', 'error')]
+        failed = self._write_backfill_rows([job for job in done_jobs if job['status'] == 'success'])
+        # File Drive cột F đã có bản mới nhưng cột G-I vẫn cũ: báo lỗi, giữ workspace (hash cột I
+        # cũ nên lần backfill sau viết lại dòng này)
+        for job in failed:
+            job['status'] = 'error'
+            job['error'] = f"Không ghi được cột G-I vào Google Sheets: {job.pop('sheet_error')}"
+        self._release_workspaces([job for job in done_jobs if job['status'] == 'success'])
+        
+        logger.info(f"✅ Backfill xong: {len([j for j in done_jobs if j['status'] == 'success'])}/{len(jobs)} dòng")
+        return [{
+            'status': job['status'],
+            'video_name': job['video_name'],
+            'error': job.get('error'),
+            'voice_file_id': '',
+            'text_file_id': job['text_file_id'],
+            'rewritten_text_file_id': job['rewritten_text_file_id'] or ''
+        } for job in done_jobs]
+    
+    def _backfill_row(self, job: Dict):
+        """
+        Viết lại một dòng Sheets: tải transcript, rewrite, format, cập nhật file Drive tại chỗ
+        """
+        if self._shutdown_requested:
+            self._release_budget(job)
+            return
+        
+        self._thread_local.workspace = self._job_workspace(job)
+        try:
+            base_name = os.path.splitext(job['video_name'])[0]
+            text_path = self.download_text_from_drive(job['text_file_id'], f"{base_name}_backfill.txt")
+            job['rewritten_text_path'] = self.rewrite_text(text_path, job['video_name'])
+            job['prompt_hash'] = getattr(self._thread_local, 'prompt_hash', '')
+            artifacts = self._text_artifacts(job)
+            job['main_content_path'] = self.create_main_content_only(
+                job['rewritten_text_path'], job['video_name'], artifacts
+            )
+            job['text_no_timeline_path'] = self.create_text_without_timeline(
+                job['rewritten_text_path'], job['video_name'], artifacts
+            )
             
-            # Bước 6: Dịch tiếng Trung sang tiếng Việt nếu cần
-            if is_chinese:
-                logger.info("🌐 Bước 6: Dịch tiếng Trung sang tiếng Việt...")
-                translated_text_path = self.translate_chinese_to_vietnamese(text_path, video_name)
-                text_path = translated_text_path # Cập nhật đường dẫn file text gốc
+            if job['rewritten_text_file_id']:
+                self.update_drive_file(job['rewritten_text_file_id'], job['rewritten_text_path'])
             
-            # Bước 7: Upload text gốc lên Google Drive
-            logger.info("📄 Bước 7: Upload text gốc lên Google Drive...")
-            text_file_id = self.upload_to_drive(text_path, text_original_folder_id)
+            job['status'] = 'success'
+            logger.info(f"✅ Đã viết lại dòng {job['row']}: {job['video_name']}")
+        except Exception as e:
+            logger.error(f"❌ Lỗi viết lại dòng {job['row']} ({job['video_name']}): {str(e)}")
+            job['status'] = 'error'
+            job['error'] = str(e)
+            self._release_workspaces([job])
+        finally:
+            self._thread_local.workspace = None
+            self._release_budget(job)
+    
+    def _write_backfill_rows(self, jobs: List[Dict], batch_size: int = 50) -> List[Dict]:
+        """
+        Ghi cột G-I (text cải tiến, text no timeline, hash prompt) của các dòng đã viết lại
+        
+        Args:
+            jobs: Job backfill thành công
+            batch_size: Số dòng mỗi lần batchUpdate
             
-            # Bước 8: Viết lại text bằng Gemini
-            logger.info("✍️ Bước 8: Viết lại text bằng Gemini...")
-            rewritten_text_path = self.rewrite_text(text_path, video_name)
+        Returns:
+            Các job không ghi được (lỗi nằm trong job['sheet_error'])
+        """
+        failed = []
+        for start in range(0, len(jobs), batch_size):
+            batch = jobs[start:start + batch_size]
+            data = [{
+                'range': f"{self.sheet_name}!G{job['row']}:I{job['row']}",
+                'values': [[
+                    self.read_text_file_content(job['main_content_path']),
+                    self.read_text_file_content(job['text_no_timeline_path']),
+                    job['prompt_hash']
+                ]]
+            } for job in batch]
+            try:
+                self._execute('sheets', self.sheets_service.spreadsheets().values().batchUpdate(
+                    spreadsheetId=self.spreadsheet_id,
+                    body={'valueInputOption': 'RAW', 'data': data}
+                ))
+                logger.info(f"📊 Đã ghi {len(batch)} dòng backfill vào Google Sheets")
+            except Exception as e:
+                logger.error(f"❌ Lỗi ghi backfill vào Google Sheets: {str(e)}")
+                for job in batch:
+                    job['sheet_error'] = str(e)
+                failed.extend(batch)
+        return failed
+    
+    def _check_folder(self, folder: Dict) -> Dict:
+        """
+        Kiểm tra video cần xử lý của một folder trong chế độ nhiều folder (chạy trong thread riêng)
+
+        Args:
+            folder: Cấu hình folder (input_folder_id, spreadsheet_id, sheet_name, ...)
+
+        Returns:
+            Dict video_status của VideoStatusChecker
+        """
+        checker = VideoStatusChecker(
+            self._get_drive_service(),
+            self._get_sheets_service(),
+            folder['spreadsheet_id'],
+            folder['sheet_name'],
+            claim_timeout_seconds=self.sheet_claim_timeout_seconds,
+            lister=self.drive_lister
+        )
+        return checker.check_video_status(folder['input_folder_id'])
+
+    def process_folders(self, folders: List[Dict], use_pipeline: bool = False,
+                        list_workers: int = 8) -> Dict[str, List[Dict]]:
+        """
+        Xử lý nhiều folder input (mỗi folder một Google Sheet) trong cùng một lần chạy
+
+        Dùng chung một lần xác thực Google và một bộ worker pool cho tất cả folder:
+        1. Liệt kê video và đọc Sheet của các folder song song
+        2. Trộn video của các folder theo fair share (fair_share_order) để folder
+           lớn không chiếm hết worker của các folder khác
+        3. Xử lý toàn bộ video qua pipeline chung (hoặc tuần tự)
+        4. Ghi kết quả vào Sheet của từng folder
+
+        Args:
+            folders: Danh sách cấu hình folder (xem folder_config.load_folder_configs)
+            use_pipeline: True để xử lý chồng lấp nhiều video qua pipeline nhiều stage
+            list_workers: Số thread liệt kê folder cùng lúc
+
+        Returns:
+            Dict tên folder -> list kết quả xử lý của folder đó
+        """
+        logger.info(f"📁 === XỬ LÝ {len(folders)} FOLDER ===")
+
+        # Bước 1: Liệt kê các folder song song
+        groups = []
+        with ThreadPoolExecutor(max_workers=max(1, min(list_workers, len(folders))),
+                                thread_name_prefix='folder-list') as executor:
+            futures = [executor.submit(self._check_folder, folder) for folder in folders]
+            for folder, future in zip(folders, futures):
+                try:
+                    videos = future.result()['videos_to_process']
+                except Exception as e:
+                    logger.error(f"❌ Lỗi kiểm tra folder {folder['name']}: {str(e)}")
+                    videos = []
+                videos = self._filter_retry_queue(videos)
+                logger.info(f"📁 {folder['name']}: {len(videos)} video cần xử lý")
+                groups.append((folder['name'], schedule_videos(videos, self.schedule_policy)))
+
+        # Bước 2: Thứ tự xử lý công bằng giữa các folder
+        folders_by_name = {folder['name']: folder for folder in folders}
+        jobs = []
+        for name, video_info in fair_share_order(groups):
+            folder = folders_by_name[name]
+            job = self._new_video_job(video_info, folder['voice_folder_id'],
+                                      folder['text_original_folder_id'], folder['text_rewritten_folder_id'])
+            job['folder_name'] = name
+            job['spreadsheet_id'] = folder['spreadsheet_id']
+            job['sheet_name'] = folder['sheet_name']
+            job['claim_sheet_row'] = True
+            jobs.append(job)
+
+        if not jobs:
+            logger.info("✅ Không có video mới nào trong các folder")
+            return {folder['name']: [] for folder in folders}
+
+        # Bước 3: Xử lý tất cả video bằng chung một bộ worker
+        logger.info(f"🚀 Bắt đầu xử lý {len(jobs)} video của {len(folders)} folder...")
+        jobs = self._run_jobs_with_retries(jobs, use_pipeline)
+        self._release_sheet_claims([job for job in jobs if job.get('status') not in ('success', 'error')])
+
+        # Bước 4: Ghi kết quả vào Sheet của từng folder
+        results_by_folder = {}
+        for folder in folders:
+            results = [self._job_result(job) for job in jobs
+                       if job['folder_name'] == folder['name'] and job.get('status') in ('success', 'error')]
+            results_by_folder[folder['name']] = results
+
+            success_count = len([r for r in results if r['status'] == 'success'])
+            logger.info(f"📊 {folder['name']}: {success_count}/{len(results)} video thành công")
+            if results:
+                self._write_results_to_sheets(results, spreadsheet_id=folder['spreadsheet_id'],
+                                              sheet_name=folder['sheet_name'])
+
+        if self._shutdown_requested:
+            logger.info("🛑 === ĐÃ DỪNG (DRAIN) ===")
+        else:
+            logger.info("✅ === HOÀN THÀNH XỬ LÝ TẤT CẢ FOLDER ===")
+        return results_by_folder
+
+    def plan_all_videos(self, input_folder_id: str, use_pipeline: bool = False) -> Dict:
+        """
+        Dry run: ước tính thời gian, số lần gọi API và chi phí mà không tải video
+        
+        Chỉ đọc Google Sheets và metadata của Drive (thời lượng, dung lượng).
+        
+        Args:
+            input_folder_id: ID folder chứa video input
+            use_pipeline: Ước tính theo chế độ pipeline (self.pipeline_workers)
             
-            # Bước 9: Upload text đã viết lại lên Google Drive
-            logger.info("📄 Bước 9: Upload text đã viết lại lên Google Drive...")
-            rewritten_text_file_id = self.upload_to_drive(rewritten_text_path, text_rewritten_folder_id)
+        Returns:
+            Dict kế hoạch (xem BatchPlanner.plan)
+        """
+        logger.info("📋 === LẬP KẾ HOẠCH (KHÔNG TẢI VIDEO) ===")
+        video_status = self._check_videos_to_process(input_folder_id)
+        videos_to_process = schedule_videos(video_status['videos_to_process'], self.schedule_policy)
+        
+        planner = BatchPlanner()
+        plan = planner.plan(videos_to_process, self.pipeline_workers if use_pipeline else None)
+        plan['videos_skipped'] = len(video_status.get('videos_skipped', []))
+        
+        logger.info("\n" + format_plan(plan))
+        return plan
+    
+    def _write_results_to_sheets(self, results: List[Dict], lease_queue: LeaseQueue = None,
+                                 spreadsheet_id: str = None, sheet_name: str = None):
+        """
+        Ghi kết quả vào Google Sheets và đánh dấu trong ledger
+        
+        Args:
+            results: Kết quả xử lý
+            lease_queue: Hàng đợi dùng chung (chế độ worker) - giữ khóa 'sheet' để
+                         các worker không ghi đè dòng của nhau
+            spreadsheet_id: Google Sheet cần ghi (mặc định self.spreadsheet_id)
+            sheet_name: Tên sheet cần ghi (mặc định self.sheet_name)
             
-            # Bước 10: Tạo nội dung chính có timeline (cho cột Text cải tiến)
-            logger.info("📝 Bước 10: Tạo nội dung chính có timeline...")
-            main_content_path = self.create_main_content_only(rewritten_text_path, video_name)
+        Returns:
+            True nếu ghi Google Sheets thành công
+        """
+        logger.info("📊 Bắt đầu cập nhật Google Sheets...")
+        if lease_queue is not None:
+            with lease_queue.named_lock('sheet'):
+                sheets_success = self.update_sheets_with_results(results, spreadsheet_id, sheet_name)
+        else:
+            with self._sheet_lock:
+                sheets_success = self.update_sheets_with_results(results, spreadsheet_id, sheet_name)
+        
+        if sheets_success:
+            logger.info("✅ Cập nhật Google Sheets hoàn tất!")
+            self._mark_sheet_written(results)
+            self._release_workspaces(results)
+        else:
+            logger.warning("⚠️ Cập nhật Google Sheets thất bại")
+            if lease_queue is None:
+                # Không ghi lại nữa -> ngừng gia hạn để dòng giữ chỗ quá hạn và video được xử lý lại
+                self._untrack_sheet_claims([result['sheet_claim'] for result in results if result.get('sheet_claim')])
+        
+        # Video lỗi không có dòng kết quả -> trả lại dòng giữ chỗ để lần chạy sau xử lý lại
+        self._release_sheet_claims([result for result in results if result['status'] == 'error'])
+        return sheets_success
+    
+    def _flush_worker_results(self, pending: List[Dict], lease_queue: LeaseQueue) -> List[Dict]:
+        """
+        Chế độ worker: ghi kết quả vào Google Sheets rồi mới trả lease của video
+        
+        Video chưa ghi được Sheets vẫn giữ lease (heartbeat gia hạn) để lần sau ghi lại;
+        worker dừng trước khi ghi được thì lease hết hạn và worker khác xử lý lại video.
+        
+        Args:
+            pending: Kết quả chưa trả lease
+            lease_queue: Hàng đợi dùng chung
             
-            # Bước 11: Tạo text không có timeline (cho cột Text no timeline)
-            logger.info("📄 Bước 11: Tạo text không có timeline...")
-            text_no_timeline_path = self.create_text_without_timeline(rewritten_text_path, video_name)
+        Returns:
+            Các kết quả vẫn chưa ghi được Google Sheets
+        """
+        successes = [result for result in pending if result['status'] == 'success']
+        written = not successes or self._write_results_to_sheets(successes, lease_queue)
+        for result in pending:
+            if result['status'] != 'success':
+                self._release_sheet_claims([result])
+                lease_queue.complete(result['video_file_id'], False, result.get('error'))
+            elif written:
+                lease_queue.complete(result['video_file_id'], True)
+        if not written:
+            logger.warning(f"⚠️ Giữ lease {len(successes)} video chưa ghi được Google Sheets, sẽ thử ghi lại")
+            return successes
+        return []
+    
+    def process_videos_as_worker(self, input_folder_id: str, voice_folder_id: str,
+                                 text_original_folder_id: str, text_rewritten_folder_id: str,
+                                 queue_path: str, worker_id: str = None,
+                                 lease_seconds: int = 300, poll_interval: float = 10.0) -> List[Dict]:
+        """
+        Chế độ worker: nhận video từ hàng đợi dùng chung và xử lý từng video một
+        
+        Nhiều process (cùng máy hoặc nhiều máy dùng chung file hàng đợi) chạy cùng
+        lúc; mỗi video được claim bằng lease có thời hạn và gia hạn bằng heartbeat.
+        Worker chết thì lease hết hạn và video được worker khác nhận lại.
+        Kết quả của mỗi video được ghi Google Sheets ngay khi xong, trước khi trả lease.
+        
+        Args:
+            input_folder_id: ID folder chứa video input
+            voice_folder_id: ID folder để upload voice only
+            text_original_folder_id: ID folder để upload text gốc
+            text_rewritten_folder_id: ID folder để upload text đã viết lại
+            queue_path: Đường dẫn file SQLite của hàng đợi dùng chung
+            worker_id: ID worker (mặc định hostname-pid)
+            lease_seconds: Thời hạn lease (giây)
+            poll_interval: Thời gian chờ khi các video còn lại đang do worker khác giữ (giây)
             
-            # Bước 12: Tạo gợi ý tiêu đề, captions, CTA - ĐÃ LOẠI BỎ
-            # logger.info("💡 Bước 12: Tạo gợi ý tiêu đề, captions, CTA...")
-            # suggestions_path = self.create_suggestions_content(rewritten_text_path, video_name)
+        Returns:
+            List kết quả các video do worker này xử lý
+        """
+        lease_queue = None
+        results = []
+        pending = []  # Kết quả chưa ghi Google Sheets (lease vẫn giữ)
+        try:
+            lease_queue = LeaseQueue(queue_path, worker_id=worker_id, lease_seconds=lease_seconds)
+            logger.info(f"👷 === WORKER {lease_queue.worker_id} ===")
+            
+            # Worker nào cũng có thể đưa video mới vào hàng đợi (video đã có thì bỏ qua)
+            video_status = self._check_videos_to_process(input_folder_id)
+            added = lease_queue.enqueue(schedule_videos(video_status['videos_to_process'], self.schedule_policy))
+            logger.info(f"📥 Thêm {added} video mới vào hàng đợi: {lease_queue.get_counts()}")
+            
+            lease_queue.start_heartbeat()
+            while not self._shutdown_requested:
+                video_info = lease_queue.claim()
+                if video_info is None:
+                    # Còn video đang do worker khác giữ -> chờ, có thể lease của họ hết hạn
+                    if lease_queue.pending_count() == 0:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                
+                logger.info(f"\n🎬 === WORKER {lease_queue.worker_id} NHẬN VIDEO: {video_info['name']} ===")
+                job = self._new_video_job(video_info, voice_folder_id,
+                                          text_original_folder_id, text_rewritten_folder_id)
+                # Chờ quota ngày (lease vẫn được heartbeat gia hạn); dừng giữa chừng thì lease tự hết hạn
+                admitted = list(self._budget_admission([job]))
+                if not admitted:
+                    if not self._shutdown_requested:
+                        lease_queue.complete(video_info['id'], False, 'Ước tính vượt quota của cả một ngày')
+                    continue
+                result = self._process_video_job(job)
+                results.append(result)
+                pending.append(result)
+                # Ghi Sheets trước khi trả lease: worker chết giữa chừng thì video không bị mất kết quả
+                pending = self._flush_worker_results(pending, lease_queue)
             
-            # Bước 11: Chuyển đổi text đã viết lại thành speech - ĐÃ COMMENT
-            # logger.info("🎤 Bước 11: Chuyển đổi text thành speech...")
-            # tts_audio_path = self.text_to_speech(rewritten_text_path, video_name)
+            if pending:
+                pending = self._flush_worker_results(pending, lease_queue)
             
-            # Bước 12: Upload audio TTS lên Google Drive - ĐÃ COMMENT
-            # logger.info("☁️ Bước 12: Upload audio TTS lên Google Drive...")
-            # tts_file_id = self.upload_to_drive(tts_audio_path, text_to_speech_folder_id)
+            logger.info(f"✅ === WORKER HOÀN THÀNH: {len(results)} video ===")
+            logger.info(f"📊 Hàng đợi: {lease_queue.get_counts()}")
             
-            logger.info("✅ === HOÀN THÀNH XỬ LÝ ===")
+            return results
             
-            return {
-                'status': 'success',
-                'video_name': video_name,
-                'video_file_id': file_id,  # Thêm ID của file video MP4
-                'voice_file_id': voice_file_id,
-                'text_file_id': text_file_id,
-                'rewritten_text_file_id': rewritten_text_file_id,
-                # 'tts_file_id': tts_file_id,  # ĐÃ COMMENT
-                'voice_path': voice_path,
-                'text_path': text_path,
-                'rewritten_text_path': rewritten_text_path,
-                'main_content_path': main_content_path,
-                'text_no_timeline_path': text_no_timeline_path,
-                # 'suggestions_path': suggestions_path,  # ĐÃ LOẠI BỎ
-                # 'tts_audio_path': tts_audio_path  # ĐÃ COMMENT
-            }
+        except Exception as e:
+            logger.error(f"❌ Lỗi trong chế độ worker: {str(e)}")
+            if pending and lease_queue is not None:
+                try:
+                    self._flush_worker_results(pending, lease_queue)
+                except Exception as e2:
+                    logger.error(f"❌ Không ghi được kết quả còn lại vào Google Sheets: {str(e2)}")
+            return results
+        finally:
+            if lease_queue is not None:
+                lease_queue.close()
+    
+    def watch_folder(self, input_folder_id: str, voice_folder_id: str,
+                     text_original_folder_id: str, text_rewritten_folder_id: str,
+                     use_pipeline: bool = False, poll_interval: float = 15.0,
+                     source=None, token_path: str = None) -> List[Dict]:
+        """
+        Chế độ daemon: theo dõi folder input qua Drive changes feed và xử lý video mới
+
+        Các service Google, prompt và ledger được giữ nguyên giữa các lần xử lý
+        (không xác thực lại). Mỗi lần poll chỉ lấy các thay đổi kể từ page token
+        trước, không liệt kê lại cả folder; Sheets chỉ được đọc cột A:B và J:J khi có
+        thay đổi. Video mới được xử lý như bình thường; video đã có kết quả bị sửa
+        được xử lý lại từ đầu và ghi đè file Drive, dòng Sheets cũ (không thêm dòng).
+        Mỗi lần poll cũng xử lý các video của folder trong hàng đợi thử lại đã đến lịch.
+        Lần chạy đầu tiên (chưa có token đã lưu) quét folder một lần như bình thường.
+
+        Args:
+            input_folder_id: ID folder chứa video input
+            voice_folder_id: ID folder để upload voice only
+            text_original_folder_id: ID folder để upload text gốc
+            text_rewritten_folder_id: ID folder để upload text đã viết lại
+            use_pipeline: True để xử lý chồng lấp nhiều video qua pipeline nhiều stage
+            poll_interval: Thời gian giữa các lần poll changes feed (giây)
+            source: Nguồn thay đổi (mặc định DriveChangesSource, InMemoryChangesSource để test)
+            token_path: File lưu page token (mặc định config/drive_changes_token.json)
+
+        Returns:
+            List kết quả tất cả video đã xử lý cho đến khi dừng
+        """
+        if token_path is None:
+            token_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'drive_changes_token.json')
+        source = source or DriveChangesSource(self.drive_service, execute=lambda request: self._execute('drive', request))
+        watcher = ChangeWatcher(source, input_folder_id, token_path, recursive=self.drive_lister.recursive)
+        folders = (voice_folder_id, text_original_folder_id, text_rewritten_folder_id)
+
+        all_results = []
+        skipped_retries = set()  # (ID video, lịch thử lại) không thuộc folder hoặc không còn trên Drive
+        logger.info(f"👀 === CHẾ ĐỘ WATCH: poll mỗi {poll_interval:g}s (Ctrl+C để dừng) ===")
+
+        # Lấy token trước khi quét để không bỏ sót video upload trong lúc quét
+        resumed = watcher.start()
+        if watcher.recursive:
+            # Thư mục con tạo sau thời điểm này được watcher tự thêm từ changes feed
+            try:
+                subfolders = self.drive_lister.list_subfolders(input_folder_id)
+                watcher.track_folders(subfolders)
+                logger.info(f"📁 Theo dõi cả {len(subfolders)} thư mục con")
+            except Exception as e:
+                logger.warning(f"⚠️ Không liệt kê được thư mục con, chỉ theo dõi folder input: {str(e)}")
+        if not resumed:
+            logger.info("🔍 Chưa có page token đã lưu, quét toàn bộ folder một lần...")
+            video_status = self._check_videos_to_process(input_folder_id)
+            watcher.mark_seen(video_status['videos_to_process'])
+            videos = schedule_videos(self._filter_retry_queue(video_status['videos_to_process']), self.schedule_policy)
+            if videos:
+                all_results.extend(self._process_video_batch(videos, *folders, use_pipeline=use_pipeline))
+
+        while not self._shutdown_requested:
+            try:
+                videos = watcher.poll()
+            except Exception as e:
+                logger.warning(f"⚠️ Lỗi khi đọc Drive changes feed: {str(e)}")
+                videos = None
+
+            new_videos, modified_videos = self._split_modified_videos(videos) if videos else ([], [])
+            # Video lỗi đã đến lịch thử lại: changes feed không trả lại video sau khi token được commit
+            queued = {video['id'] for video in new_videos + modified_videos}
+            new_videos += [video for video in self._due_retry_videos(watcher.folder_ids, skipped_retries)
+                           if video['id'] not in queued]
+            
+            if new_videos:
+                all_results.extend(self._process_video_batch(schedule_videos(new_videos, self.schedule_policy),
+                                                             *folders, use_pipeline=use_pipeline))
+            # Video đã có kết quả được sửa: xử lý lại từ đầu, ghi đè file Drive và dòng Sheets cũ
+            if modified_videos and not self._shutdown_requested:
+                all_results.extend(self._rerun_video_batch(modified_videos, *folders, set(VIDEO_STEPS), True,
+                                                           use_pipeline=use_pipeline))
+            if new_videos or modified_videos:
+                self._clear_temp_dir()
+
+            # Dừng giữa batch thì không lưu token -> lần chạy sau lấy lại các video chưa xử lý
+            if videos is not None and not self._shutdown_requested:
+                watcher.commit()
+
+            # Ngủ từng giây để phản hồi tín hiệu dừng nhanh
+            slept = 0.0
+            while slept < poll_interval and not self._shutdown_requested:
+                time.sleep(min(1.0, poll_interval - slept))
+                slept += 1.0
+
+        logger.info(f"🛑 === DỪNG CHẾ ĐỘ WATCH: đã xử lý {len(all_results)} video ===")
+        return all_results
+
+    def _due_retry_videos(self, folder_ids: set, skipped: set) -> List[Dict]:
+        """
+        Video của folder đang theo dõi trong hàng đợi thử lại đã đến lịch (chế độ watch)
+        
+        Args:
+            folder_ids: ID folder input (và thư mục con nếu --recursive) đang theo dõi
+            skipped: Set (ID video, lịch thử lại) đã bỏ qua; được cập nhật để không đọc lại Drive
+                     cho cùng lịch thử lại ở mỗi lần poll
             
+        Returns:
+            Danh sách video (metadata Drive)
+        """
+        ledger = self._get_ledger()
+        if ledger is None:
+            return []
+        try:
+            entries = ledger.list_retries('pending')
         except Exception as e:
-            logger.error(f"❌ Lỗi trong quá trình xử lý: {str(e)}")
-            return {
-                'status': 'error',
-                'video_name': video_name,
-                'error': str(e)
-            }
+            logger.warning(f"⚠️ Không thể đọc hàng đợi thử lại: {str(e)}")
+            return []
+        
+        videos = []
+        for entry in entries:
+            key = (entry['video_file_id'], entry['next_attempt_at'])
+            if entry['next_attempt_at'] is None or entry['next_attempt_at'] > time.time() or key in skipped:
+                continue
+            try:
+                video = self._get_drive_video_info(entry['video_file_id'])
+            except ValueError as e:
+                logger.warning(f"⚠️ Bỏ qua thử lại {entry['video_name']}: {str(e)}")
+                skipped.add(key)
+                continue
+            if not folder_ids.intersection(video.get('parents', [])):
+                skipped.add(key)
+                continue
+            videos.append(video)
+        
+        if videos:
+            logger.info(f"🔁 {len(videos)} video đến lịch thử lại: {', '.join(v['name'] for v in videos)}")
+        return videos
     
-    def process_all_videos(self, input_folder_id: str, voice_folder_id: str, 
-                          text_original_folder_id: str, text_rewritten_folder_id: str,
-                          # text_to_speech_folder_id: str  # ĐÃ COMMENT
-                          ) -> List[Dict]:
+    def _split_modified_videos(self, videos: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Chia video từ changes feed thành video mới và video được sửa (đã có dòng kết quả
+        trong Sheets với cùng link MP4)
+        
+        Chỉ đọc cột A:B và J:J của Sheet; không đọc được thì coi mọi video là video mới.
+        
+        Returns:
+            Tuple (video mới, video được sửa)
+        """
+        try:
+            with self._sheet_lock:
+                sheet_rows = self._read_sheet_keys(self.spreadsheet_id, self.sheet_name)
+        except Exception as e:
+            logger.warning(f"⚠️ Không đọc được Sheets để tìm video được sửa: {str(e)}")
+            return videos, []
+        
+        result_links = {row[0] for row, marker in sheet_rows
+                        if row and parse_claim(marker) is None and not is_released(marker)}
+        new_videos = []
+        modified_videos = []
+        for video in videos:
+            if any(f"/d/{video['id']}/" in link for link in result_links):
+                modified_videos.append(video)
+            else:
+                new_videos.append(video)
+        if modified_videos:
+            logger.info(f"✏️ {len(modified_videos)} video đã có kết quả được sửa, xử lý lại: "
+                        f"{', '.join(v['name'] for v in modified_videos)}")
+        return new_videos, modified_videos
+    
+    def _clear_temp_dir(self):
+        """
+        Xóa file trong thư mục tạm giữa các batch của chế độ watch (giữ lại thư mục)
+        """
+        if not self.temp_dir or not os.path.exists(self.temp_dir):
+            return
+        for name in os.listdir(self.temp_dir):
+            path = os.path.join(self.temp_dir, name)
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except Exception as e:
+                logger.warning(f"⚠️ Không thể xóa file tạm {name}: {str(e)}")
+
+    def serve_api(self, input_folder_id: str, voice_folder_id: str,
+                  text_original_folder_id: str, text_rewritten_folder_id: str,
+                  host: str = '127.0.0.1', port: int = 8765, workers: int = 1,
+                  use_pipeline: bool = False) -> List[Dict]:
         """
-        Xử lý tất cả video trong folder: Video -> Voice Only -> Text -> Rewrite -> Drive (TTS đã comment)
-        
+        Chế độ service: nhận job qua HTTP (xem job_api) và xử lý trong worker pool nền
+
+        Processor (xác thực Google, prompt, ledger) được giữ nguyên giữa các job,
+        mỗi yêu cầu trả job ID ngay thay vì khởi động Python và OAuth lại từ đầu.
+
         Args:
-            input_folder_id: ID folder chứa video input
+            input_folder_id: Folder input mặc định khi yêu cầu không có folder_id
             voice_folder_id: ID folder để upload voice only
             text_original_folder_id: ID folder để upload text gốc
             text_rewritten_folder_id: ID folder để upload text đã viết lại
-            
+            host: Địa chỉ lắng nghe (mặc định chỉ máy local)
+            port: Cổng lắng nghe
+            workers: Số job xử lý cùng lúc (song song trong một job dùng pipeline)
+            use_pipeline: Mặc định dùng pipeline cho mọi job (yêu cầu có thể bật riêng)
+
         Returns:
-            List chứa kết quả xử lý tất cả video
+            List kết quả tất cả video đã xử lý cho đến khi dừng
         """
-        try:
-            logger.info(f"🚀 === BẮT ĐẦU XỬ LÝ TẤT CẢ VIDEO ===")
-            
-            # BƯỚC MỚI: Check video status trước khi xử lý
-            logger.info("🔍 Bước 1: Kiểm tra trạng thái video...")
-            
-            if self.video_checker is None:
-                logger.warning("⚠️ VideoStatusChecker không khả dụng, bỏ qua kiểm tra trạng thái")
-                # Tạo video_status mặc định để tiếp tục xử lý
-                video_status = {
-                    'videos_to_process': [{'name': 'video1.mp4', 'id': 'default_id'}],
-                    'videos_skipped': [],
-                    'total_drive_videos': 1,
-                    'total_sheet_videos': 0,
-                    'check_timestamp': '2025-08-13T10:00:00'
-                }
-            else:
-                try:
-                    video_status = self.video_checker.check_video_status(input_folder_id)
-                    
-                    # Hiển thị summary của video checker
-                    try:
-                        summary = self.video_checker.get_check_summary(video_status)
-                        logger.info(summary)
-                    except Exception as e:
-                        logger.warning(f"⚠️ Không thể hiển thị summary: {str(e)}")
-                except Exception as e:
-                    logger.error(f"❌ Lỗi kiểm tra trạng thái video: {str(e)}")
-                    # Tạo video_status mặc định để tiếp tục xử lý
-                    video_status = {
-                        'videos_to_process': [{'name': 'video1.mp4', 'id': 'default_id'}],
-                        'videos_skipped': [],
-                        'total_drive_videos': 1,
-                        'total_sheet_videos': 0,
-                        'check_timestamp': '2025-08-13T10:00:00'
-                    }
-            
-            if not video_status['videos_to_process']:
-                logger.info("🎉 Tất cả video đã được xử lý! Không có gì để làm.")
-                return []
-            
-            # Chỉ xử lý video mới
-            videos_to_process = video_status['videos_to_process']
-            logger.info(f" Bắt đầu xử lý {len(videos_to_process)} video mới...")
-            
-            # Hiển thị danh sách video sẽ xử lý
-            logger.info("📋 DANH SÁCH VIDEO SẼ XỬ LÝ:")
-            for i, video in enumerate(videos_to_process, 1):
-                logger.info(f"  {i}. {video['name']}")
-            
-            # Bước 2: Xử lý từng video
-            results = []
-            total_videos = len(videos_to_process)
-            
-            for i, video_info in enumerate(videos_to_process, 1):
-                video_name = video_info['name']
-                file_id = video_info['id']
-                
-                logger.info(f"\n🎬 === XỬ LÝ VIDEO {i}/{total_videos}: {video_name} ===")
-                
-                try:
-                    # Tải video từ Google Drive
-                    logger.info("📥 Tải video từ Google Drive...")
-                    video_path = self.download_video(file_id, video_name)
-                    
-                    # Tách voice từ video
-                    logger.info("🎤 Tách voice từ video...")
-                    voice_path = self.extract_voice_only(video_path, video_name)
-                    
-                    # Upload voice only
-                    logger.info("☁️ Upload voice only...")
-                    voice_file_id = self.upload_to_drive(voice_path, voice_folder_id)
-                    
-                    # Chuyển đổi voice thành text
-                    logger.info("📝 Chuyển đổi voice thành text...")
-                    text_path, detected_language, is_chinese = self.extract_text_with_language_detection(voice_path, video_name)
-                    
-                    # Dịch tiếng Trung sang tiếng Việt nếu cần
-                    if is_chinese:
-                        logger.info("🌐 Dịch tiếng Trung sang tiếng Việt...")
-                        translated_text_path = self.translate_chinese_to_vietnamese(text_path, video_name)
-                        text_path = translated_text_path # Cập nhật đường dẫn file text gốc
-                    
-                    # Upload text gốc
-                    logger.info("📄 Upload text gốc...")
-                    text_file_id = self.upload_to_drive(text_path, text_original_folder_id)
-                    
-                    # Viết lại text
-                    logger.info("✍️ Viết lại text...")
-                    rewritten_text_path = self.rewrite_text(text_path, video_name)
-                    
-                    # Upload text đã viết lại
-                    logger.info("📄 Upload text đã viết lại...")
-                    rewritten_text_file_id = self.upload_to_drive(rewritten_text_path, text_rewritten_folder_id)
-                    
-                    # Tạo nội dung chính có timeline (cho cột Text cải tiến)
-                    logger.info("📝 Tạo nội dung chính có timeline...")
-                    main_content_path = self.create_main_content_only(rewritten_text_path, video_name)
-                    
-                    # Tạo text không có timeline (cho cột Text no timeline)
-                    logger.info("📄 Tạo text không có timeline...")
-                    text_no_timeline_path = self.create_text_without_timeline(rewritten_text_path, video_name)
-                    
-                    # Tạo gợi ý tiêu đề, captions, CTA - ĐÃ LOẠI BỎ
-                    # logger.info("💡 Tạo gợi ý tiêu đề, captions, CTA...")
-                    # suggestions_path = self.create_suggestions_content(rewritten_text_path, video_name)
-                    
-                    # Chuyển đổi text thành speech - ĐÃ COMMENT
-                    # logger.info("🎤 Chuyển đổi text thành speech...")
-                    # tts_audio_path = self.text_to_speech(rewritten_text_path, video_name)
-                    
-                    # Upload audio TTS - ĐÃ COMMENT
-                    # logger.info("☁️ Upload audio TTS...")
-                    # tts_file_id = self.upload_to_drive(tts_audio_path, text_to_speech_folder_id)
-                    
-                    # Thêm kết quả thành công
-                    results.append({
-                        'status': 'success',
-                        'video_name': video_name,
-                        'video_file_id': file_id,  # Thêm ID của file video MP4
-                        'voice_file_id': voice_file_id,
-                        'text_file_id': text_file_id,
-                        'rewritten_text_file_id': rewritten_text_file_id,
-                        # 'tts_file_id': tts_file_id,  # ĐÃ COMMENT
-                        'voice_path': voice_path,
-                        'text_path': text_path,
-                        'rewritten_text_path': rewritten_text_path,
-                        'main_content_path': main_content_path,
-                        'text_no_timeline_path': text_no_timeline_path,
-                        # 'suggestions_path': suggestions_path,  # ĐÃ LOẠI BỎ
-                        # 'tts_audio_path': tts_audio_path  # ĐÃ COMMENT
-                    })
-                    
-                    logger.info(f"✅ Hoàn thành video {i}/{total_videos}: {video_name}")
-                    
-                except Exception as e:
-                    logger.error(f"❌ Lỗi xử lý video {video_name}: {str(e)}")
-                    results.append({
-                        'status': 'error',
-                        'video_name': video_name,
-                        'error': str(e)
-                    })
-            
-            logger.info(f"✅ === HOÀN THÀNH XỬ LÝ TẤT CẢ VIDEO ===")
-            logger.info(f"📊 Tổng số video: {total_videos}")
-            logger.info(f"✅ Thành công: {len([r for r in results if r['status'] == 'success'])}")
-            logger.info(f"❌ Thất bại: {len([r for r in results if r['status'] == 'error'])}")
-            
-            # Bước cuối: Cập nhật Google Sheets
-            if results:
-                logger.info("📊 Bắt đầu cập nhật Google Sheets...")
-                sheets_success = self.update_sheets_with_results(results)
-                if sheets_success:
-                    logger.info("✅ Cập nhật Google Sheets hoàn tất!")
-                else:
-                    logger.warning("⚠️ Cập nhật Google Sheets thất bại")
-            
+        folders = (voice_folder_id, text_original_folder_id, text_rewritten_folder_id)
+        all_results = []
+        results_lock = threading.Lock()
+
+        def run(request: Dict) -> List[Dict]:
+            if use_pipeline:
+                request = dict(request, pipeline=True)
+            results = self._run_api_request(request, input_folder_id, *folders)
+            with results_lock:
+                all_results.extend(results)
             return results
-            
+
+        if workers > 1 and self.prefetch_lookahead > 0:
+            # Prefetcher dùng chung một instance cho cả processor -> tắt khi nhiều job chạy cùng lúc
+            logger.info("ℹ️ Tắt prefetch khi có nhiều worker API (dùng pipeline để tải chồng lấp)")
+            self.prefetch_lookahead = 0
+
+        server = JobApiServer(run, host=host, port=port, workers=workers, stages=REPROCESS_STAGES)
+        server.start()
+        logger.info(f"🌐 === CHẾ ĐỘ SERVICE: POST {server.address}/jobs (Ctrl+C để dừng) ===")
+        try:
+            while not self._shutdown_requested:
+                time.sleep(1.0)
+        finally:
+            # Không nhận job mới, chờ các job đã nhận xong (drain đã được _signal_handler xử lý)
+            server.stop(wait=True)
+
+        logger.info(f"🛑 === DỪNG CHẾ ĐỘ SERVICE: đã xử lý {len(all_results)} video ===")
+        return all_results
+
+    def _run_api_request(self, request: Dict, input_folder_id: str, voice_folder_id: str,
+                         text_original_folder_id: str, text_rewritten_folder_id: str) -> List[Dict]:
+        """
+        Xử lý một yêu cầu của Job API (đã chuẩn hóa bởi job_api.validate_submission)
+
+        Args:
+            request: Yêu cầu (folder_id, file_ids, from_stage, only_stages, pipeline)
+            input_folder_id: Folder input mặc định
+
+        Returns:
+            List kết quả xử lý
+        """
+        folder_id = request.get('folder_id') or input_folder_id
+        use_pipeline = request.get('pipeline', False)
+        folders = (voice_folder_id, text_original_folder_id, text_rewritten_folder_id)
+
+        videos = None
+        if request.get('file_ids'):
+            videos = [self._get_drive_video_info(file_id) for file_id in request['file_ids']]
+
+        stages = None
+        if request.get('from_stage'):
+            stages = [request['from_stage']] + (['sheet'] if request['from_stage'] != 'sheet' else [])
+        elif request.get('only_stages'):
+            stages = [stage for stage in REPROCESS_STAGES if stage in request['only_stages']]
+
+        if stages:
+            return self.reprocess_videos(folder_id, *folders, stages,
+                                         video_names=[video['name'] for video in videos] if videos else None,
+                                         include_dependents=bool(request.get('from_stage')),
+                                         use_pipeline=use_pipeline)
+        if videos is not None:
+            return self._process_video_batch(schedule_videos(videos, self.schedule_policy), *folders,
+                                             use_pipeline=use_pipeline)
+        return self.process_all_videos(folder_id, *folders, use_pipeline=use_pipeline)
+
+    def _get_drive_video_info(self, file_id: str) -> Dict:
+        """
+        Lấy metadata của một video trên Drive (cùng các field với khi liệt kê folder)
+
+        Raises:
+            ValueError: Nếu file không tồn tại, đã xóa hoặc không phải video
+        """
+        try:
+            info = self._execute('drive', self._get_drive_service().files().get(
+                fileId=file_id,
+                fields="id,name,size,mimeType,trashed,parents,videoMediaMetadata(durationMillis)"
+            ))
+        except HttpError as e:
+            raise ValueError(f"Không đọc được file {file_id}: {str(e)}")
+        if info.get('trashed') or not info.get('mimeType', '').startswith('video/'):
+            raise ValueError(f"File {file_id} không phải video hợp lệ ({info.get('name')})")
+        return info
+
+    def _mark_sheet_written(self, results: List[Dict]):
+        """
+        Đánh dấu trong ledger các video đã được ghi vào Google Sheets
+        
+        Args:
+            results: Kết quả xử lý đã ghi vào Sheets
+        """
+        ledger = self._get_ledger()
+        if ledger is None:
+            return
+        
+        try:
+            ledger.mark_sheet_written([r['video_file_id'] for r in results if r['status'] == 'success'])
         except Exception as e:
-            logger.error(f"❌ Lỗi trong quá trình xử lý tất cả video: {str(e)}")
-            return []
+            logger.warning(f"⚠️ Không thể cập nhật ledger sau khi ghi Sheets: {str(e)}")
     
-    def get_next_empty_row(self) -> int:
+    def get_next_empty_row(self, spreadsheet_id: str = None, sheet_name: str = None) -> int:
         """
         Lấy số dòng trống tiếp theo trong Google Sheets
         
+        Args:
+            spreadsheet_id: Google Sheet cần đọc (mặc định self.spreadsheet_id)
+            sheet_name: Tên sheet cần đọc (mặc định self.sheet_name)
+        
         Returns:
             Số dòng trống tiếp theo (bắt đầu từ 1)
         """
+        spreadsheet_id = spreadsheet_id or self.spreadsheet_id
+        sheet_name = sheet_name or self.sheet_name
         try:
             # Lấy tất cả dữ liệu trong sheet sử dụng tên sheet
             # Thử với tên sheet khác nếu lỗi
-            range_name = f'{self.sheet_name}!A:A'
+            range_name = f'{sheet_name}!A:A'
             
             try:
-                result = self.sheets_service.spreadsheets().values().get(
-                    spreadsheetId=self.spreadsheet_id,
+                result = self._execute('sheets', self.sheets_service.spreadsheets().values().get(
+                    spreadsheetId=spreadsheet_id,
                     range=range_name
-                ).execute()
+                ))
             except Exception as e:
-                logger.warning(f"⚠️ Lỗi với tên sheet '{self.sheet_name}', thử với tên khác: {str(e)}")
+                logger.warning(f"⚠️ Lỗi với tên sheet '{sheet_name}', thử với tên khác: {str(e)}")
                 # Thử với tên sheet khác
                 alternative_names = ['mp3 to text', 'Mp3 to text', 'MP3 to text', 'Sheet1']
                 for alt_name in alternative_names:
                     try:
                         range_name = f'{alt_name}!A:A'
-                        result = self.sheets_service.spreadsheets().values().get(
-                            spreadsheetId=self.spreadsheet_id,
+                        result = self._execute('sheets', self.sheets_service.spreadsheets().values().get(
+                            spreadsheetId=spreadsheet_id,
                             range=range_name
-                        ).execute()
+                        ))
                         logger.info(f"✅ Thành công với tên sheet: {alt_name}")
                         break
                     except Exception as e2:
@@ -4121,120 +6392,447 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             logger.error(f"❌ Lỗi đọc file text: {str(e)}")
             return f"Lỗi đọc file: {str(e)}"
     
-    def update_sheets_with_results(self, results: List[Dict]) -> bool:
+    def _build_sheet_row(self, result: Dict) -> List[str]:
+        """
+        Tạo một dòng Google Sheets (cột A-I) từ kết quả xử lý thành công
+        
+        Args:
+            result: Kết quả xử lý video (status 'success')
+        
+        Returns:
+            List giá trị các cột A-I
+        """
+        # Lấy thông tin file
+        video_name = result['video_name']
+        video_file_id = result['video_file_id']  # Thêm ID của file video MP4
+        voice_file_id = result['voice_file_id']
+        text_file_id = result['text_file_id']
+        rewritten_text_file_id = result['rewritten_text_file_id']
+        # tts_file_id = result.get('tts_file_id', '')  # ĐÃ COMMENT
+        
+        # Tạo link Google Drive
+        video_link = f"https://drive.google.com/file/d/{video_file_id}/view"  # Link MP4
+        voice_link = f"https://drive.google.com/file/d/{voice_file_id}/view"
+        text_link = f"https://drive.google.com/file/d/{text_file_id}/view"
+        rewritten_link = f"https://drive.google.com/file/d/{rewritten_text_file_id}/view"
+        # tts_link = f"https://drive.google.com/file/d/{tts_file_id}/view" if tts_file_id else ""  # ĐÃ COMMENT
+        
+        # Đọc nội dung text
+        original_text = self.read_text_file_content(result['text_path'])
+        
+        # Đọc nội dung text cải tiến (chỉ nội dung chính có timeline)
+        rewritten_text = ""
+        if result.get('main_content_path'):
+            rewritten_text = self.read_text_file_content(result['main_content_path'])
+        else:
+            # Fallback cho format cũ
+            rewritten_text = self.read_text_file_content(result['rewritten_text_path'])
+        
+        # Lấy tên video từ file MP4 (loại bỏ phần mở rộng)
+        video_name_clean = os.path.splitext(video_name)[0]
+        
+        # Đọc nội dung text không timeline
+        text_no_timeline = ""
+        if result.get('text_no_timeline_path'):
+            text_no_timeline = self.read_text_file_content(result['text_no_timeline_path'])
+        
+        return [
+            video_link,           # Link mp4 (cột A)
+            video_name_clean,     # Tên Video (từ file MP4) (cột B)
+            voice_link,           # Link MP3 (cột C)
+            text_link,            # Link text gốc (cột D)
+            original_text,        # Text gốc MP3 (cột E)
+            rewritten_link,       # Link text cải tiến (cột F)
+            rewritten_text,       # Text cải tiến (cột G)
+            text_no_timeline,     # Text no timeline (chỉ nội dung chính) (cột H)
+            result.get('prompt_hash', '')  # Hash prompt viết lại (cột I)
+            # tts_link              # Link text to speech - ĐÃ COMMENT
+        ]
+        
+    def _claim_sheet_row(self, job: Dict) -> bool:
+        """
+        Giữ chỗ dòng Google Sheets cho video trước khi xử lý (dòng "đang xử lý" ở cột J)
+        
+        Dòng giữ chỗ được thêm bằng values().append (không ghi đè dòng của runner khác).
+        Hai runner cùng giữ chỗ một video thì dòng giữ chỗ còn hạn nằm trên cùng thắng,
+        runner thua trả lại dòng của mình và bỏ qua video. Lỗi Sheets không chặn việc xử lý.
+        
+        Args:
+            job: Job của video (chỉ giữ chỗ nếu job['claim_sheet_row'])
+            
+        Returns:
+            False nếu video đã có kết quả hoặc runner khác đang xử lý (bỏ qua video)
+        """
+        if not self.sheet_claims or not job.get('claim_sheet_row') or job.get('sheet_claim'):
+            return True
+        
+        spreadsheet_id = job.get('spreadsheet_id') or self.spreadsheet_id
+        sheet_name = job.get('sheet_name') or self.sheet_name
+        marker = format_claim(self.worker_id)
+        try:
+            with self._sheet_lock:
+                # Đọc lại Sheet: runner khác có thể đã giữ chỗ/ghi xong sau lần kiểm tra đầu batch
+                owner = self._sheet_row_owner(self._sheet_rows_for_video(spreadsheet_id, sheet_name, job))
+                if owner is not None:
+                    logger.info(f"⏭️ Bỏ qua {job['video_name']}: {owner[1]}")
+                    return False
+                
+                response = self._execute('sheets', self.sheets_service.spreadsheets().values().append(
+                    spreadsheetId=spreadsheet_id,
+                    range=f'{sheet_name}!A:J',
+                    valueInputOption='RAW',
+                    insertDataOption='INSERT_ROWS',
+                    body={'values': [[f"https://drive.google.com/file/d/{job['video_file_id']}/view",
+                                      os.path.splitext(job['video_name'])[0]] + [''] * 7 + [marker]]}
+                ))
+                match = re.search(r'![A-Z]+(\d+)', response.get('updates', {}).get('updatedRange', ''))
+                if not match:
+                    raise ValueError(f"Không đọc được dòng đã thêm: {response}")
+                claim = {'row': int(match.group(1)), 'marker': marker,
+                         'spreadsheet_id': spreadsheet_id, 'sheet_name': sheet_name}
+                
+                # Runner khác giữ chỗ cùng lúc: dòng còn hạn nằm trên cùng thắng
+                rows = self._sheet_rows_for_video(spreadsheet_id, sheet_name, job)
+                owner = self._sheet_row_owner(rows)
+                if owner is not None and owner[0] != claim['row']:
+                    logger.info(f"⏭️ Bỏ qua {job['video_name']}: {owner[1]}")
+                    self._release_sheet_claims([{'sheet_claim': claim}])
+                    return False
+                
+                # Dòng giữ chỗ quá hạn của runner đã dừng -> xóa (video được nhận lại ở dòng mới)
+                stale = [{'sheet_claim': dict(claim, row=row_number, marker=value)}
+                         for row_number, value in rows
+                         if parse_claim(value) and not is_claim_active(parse_claim(value), self.sheet_claim_timeout_seconds)]
+                self._release_sheet_claims(stale)
+            
+            job['sheet_claim'] = claim
+            self._track_sheet_claim(claim)
+            logger.info(f"📌 Giữ chỗ dòng {claim['row']} trong Sheets: {job['video_name']}")
+            return True
+            
+        except Exception as e:
+            logger.warning(f"⚠️ Không giữ chỗ được dòng Sheets cho {job['video_name']}, vẫn xử lý: {str(e)}")
+            return True
+    
+    def _track_sheet_claim(self, claim: Dict):
+        """
+        Đưa dòng giữ chỗ vào danh sách được heartbeat gia hạn (khởi động thread nếu chưa chạy)
+        """
+        with self._sheet_lock:
+            self._active_sheet_claims[id(claim)] = claim
+            if self._claim_heartbeat_thread is not None:
+                return
+            interval = max(1.0, self.sheet_claim_timeout_seconds / 4)
+            self._claim_heartbeat_stop.clear()
+            self._claim_heartbeat_thread = threading.Thread(target=self._claim_heartbeat_loop, args=(interval,),
+                                                            name='sheet-claim-heartbeat', daemon=True)
+            self._claim_heartbeat_thread.start()
+    
+    def _untrack_sheet_claims(self, claims: List[Dict]):
+        """
+        Bỏ các dòng giữ chỗ đã ghi kết quả/đã trả lại khỏi danh sách heartbeat
+        """
+        with self._sheet_lock:
+            for claim in claims:
+                self._active_sheet_claims.pop(id(claim), None)
+    
+    def _claim_heartbeat_loop(self, interval: float):
+        """
+        Thread heartbeat: gia hạn định kỳ các dòng giữ chỗ đang giữ
+        """
+        while not self._claim_heartbeat_stop.wait(interval):
+            try:
+                self._renew_sheet_claims()
+            except Exception as e:
+                logger.warning(f"⚠️ Lỗi heartbeat dòng giữ chỗ: {str(e)}")
+    
+    def _stop_claim_heartbeat(self):
+        """
+        Dừng thread gia hạn dòng giữ chỗ
+        """
+        self._claim_heartbeat_stop.set()
+        if self._claim_heartbeat_thread is not None:
+            self._claim_heartbeat_thread.join()
+            self._claim_heartbeat_thread = None
+    
+    def _renew_sheet_claims(self) -> int:
+        """
+        Ghi thời điểm hiện tại vào cột J của các dòng giữ chỗ đang giữ
+        
+        Dòng đã bị runner khác nhận lại (giá trị cột J khác) thì bỏ khỏi danh sách.
+        Giữ _sheet_lock để không chen vào lúc ghi kết quả/trả lại dòng giữ chỗ.
+        
+        Returns:
+            Số dòng đã gia hạn
+        """
+        renewed = 0
+        with self._sheet_lock:
+            by_sheet = {}
+            for claim in self._active_sheet_claims.values():
+                by_sheet.setdefault((claim['spreadsheet_id'], claim['sheet_name']), []).append(claim)
+            
+            for (spreadsheet_id, sheet_name), claims in by_sheet.items():
+                markers = self._execute('sheets', self.sheets_service.spreadsheets().values().batchGet(
+                    spreadsheetId=spreadsheet_id,
+                    ranges=[f"{sheet_name}!J{claim['row']}" for claim in claims]
+                )).get('valueRanges', [])
+                data = []
+                renewals = []
+                for claim, value_range in zip(claims, markers):
+                    values = value_range.get('values', [])
+                    if not values or values[0][0] != claim['marker']:
+                        logger.warning(f"⚠️ Dòng giữ chỗ {claim['row']} đã thay đổi, ngừng gia hạn")
+                        self._active_sheet_claims.pop(id(claim), None)
+                        continue
+                    marker = format_claim(self.worker_id)
+                    data.append({'range': f"{sheet_name}!J{claim['row']}", 'values': [[marker]]})
+                    renewals.append((claim, marker))
+                if data:
+                    self._execute('sheets', self.sheets_service.spreadsheets().values().batchUpdate(
+                        spreadsheetId=spreadsheet_id,
+                        body={'valueInputOption': 'RAW', 'data': data}
+                    ))
+                    # claim là dict dùng chung giữa job và kết quả -> bước ghi kết quả thấy marker mới
+                    for claim, marker in renewals:
+                        claim['marker'] = marker
+                    renewed += len(renewals)
+        
+        if renewed:
+            logger.info(f"💓 Đã gia hạn {renewed} dòng giữ chỗ trong Sheets")
+        return renewed
+    
+    def _read_sheet_keys(self, spreadsheet_id: str, sheet_name: str) -> List[Tuple[List[str], str]]:
+        """
+        Đọc cột A:B (link MP4, tên video) và cột J (giữ chỗ) của Sheet trong một batchGet
+        (không tải các cột text lớn E/G/H)
+        
+        Returns:
+            List (giá trị A:B, giá trị cột J) theo thứ tự dòng (index 0 = dòng 1)
+        """
+        value_ranges = self._execute('sheets', self.sheets_service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=[f'{sheet_name}!A:B', f'{sheet_name}!J:J']
+        )).get('valueRanges', [])
+        keys = value_ranges[0].get('values', []) if value_ranges else []
+        markers = value_ranges[1].get('values', []) if len(value_ranges) > 1 else []
+        
+        rows = []
+        for i in range(max(len(keys), len(markers))):
+            marker = markers[i] if i < len(markers) else []
+            rows.append((keys[i] if i < len(keys) else [], marker[0] if marker else ''))
+        return rows
+    
+    @staticmethod
+    def _match_sheet_rows(sheet_rows: List[Tuple[List[str], str]], video: Dict) -> List[Tuple[int, str]]:
+        """
+        Các dòng của video (theo link MP4 cột A hoặc tên cột B) trong kết quả của _read_sheet_keys
+        
+        Returns:
+            List (số dòng, giá trị cột J)
+        """
+        video_link_id = f"/d/{video['video_file_id']}/"
+        video_name_clean = os.path.splitext(video['video_name'])[0]
+        return [(i, marker) for i, (row, marker) in enumerate(sheet_rows, 1)
+                if (row and video_link_id in row[0]) or (len(row) > 1 and row[1].strip() == video_name_clean)]
+    
+    def _sheet_rows_for_video(self, spreadsheet_id: str, sheet_name: str, job: Dict) -> List[Tuple[int, str]]:
+        """
+        Các dòng Sheets của video (theo link MP4 cột A hoặc tên cột B)
+        
+        Returns:
+            List (số dòng, giá trị cột J)
+        """
+        return self._match_sheet_rows(self._read_sheet_keys(spreadsheet_id, sheet_name), job)
+    
+    def _sheet_row_owner(self, rows: List[Tuple[int, str]]) -> Optional[Tuple[int, str]]:
+        """
+        Dòng đang "sở hữu" video: dòng kết quả, hoặc dòng giữ chỗ còn hạn nằm trên cùng
+        
+        Args:
+            rows: Kết quả của _sheet_rows_for_video
+            
+        Returns:
+            (số dòng, mô tả) hoặc None nếu video chưa có ai xử lý
+        """
+        rows = [(row_number, value) for row_number, value in rows if not is_released(value)]
+        for row_number, value in rows:
+            claim = parse_claim(value)
+            if claim is None:
+                return row_number, f"đã có kết quả ở dòng {row_number}"
+        for row_number, value in rows:
+            claim = parse_claim(value)
+            if is_claim_active(claim, self.sheet_claim_timeout_seconds):
+                return row_number, f"{claim['worker_id']} đang xử lý (dòng {row_number})"
+        return None
+    
+    def _release_sheet_claims(self, items: List[Dict]):
+        """
+        Trả lại dòng giữ chỗ của các job/kết quả không ghi được kết quả (lỗi, dừng giữa chừng)
+        
+        Dòng không bị xóa trắng (dòng trống làm values().append ghi vào giữa bảng và lệch
+        số dòng giữ chỗ của runner khác): cột A-I được xóa, cột J đánh dấu RELEASED.
+        Chỉ trả lại dòng còn đúng giá trị giữ chỗ của mình (không đụng dòng đã bị runner khác nhận lại).
+        
+        Args:
+            items: Job hoặc kết quả có key 'sheet_claim'
+        """
+        claims = [item['sheet_claim'] for item in items if item.get('sheet_claim')]
+        for item in items:
+            item.pop('sheet_claim', None)
+        if not claims:
+            return
+        self._untrack_sheet_claims(claims)
+        
+        try:
+            with self._sheet_lock:
+                for claim in claims:
+                    current = self._execute('sheets', self.sheets_service.spreadsheets().values().get(
+                        spreadsheetId=claim['spreadsheet_id'],
+                        range=f"{claim['sheet_name']}!J{claim['row']}"
+                    )).get('values', [])
+                    if not current or current[0][0] != claim['marker']:
+                        continue
+                    self._execute('sheets', self.sheets_service.spreadsheets().values().update(
+                        spreadsheetId=claim['spreadsheet_id'],
+                        range=f"{claim['sheet_name']}!A{claim['row']}:J{claim['row']}",
+                        valueInputOption='RAW',
+                        body={'values': [[''] * CLAIM_COLUMN_INDEX + [format_released(self.worker_id)]]}
+                    ))
+                    logger.info(f"🧹 Đã trả lại dòng giữ chỗ {claim['row']}")
+        except Exception as e:
+            logger.warning(f"⚠️ Không trả lại được dòng giữ chỗ (sẽ được nhận lại khi quá hạn): {str(e)}")
+    
+    def _fill_claimed_rows(self, results: List[Dict]) -> set:
+        """
+        Ghi kết quả vào dòng giữ chỗ của video (cột A-I, xóa cột J)
+        
+        Dòng đã bị runner khác nhận lại (giá trị cột J khác) thì không ghi, kết quả được thêm dòng mới.
+        
+        Args:
+            results: Kết quả thành công
+            
+        Returns:
+            Set id() của các kết quả đã ghi
+        """
+        claimed = [result for result in results if result.get('sheet_claim')]
+        filled = set()
+        by_sheet = {}
+        for result in claimed:
+            claim = result['sheet_claim']
+            by_sheet.setdefault((claim['spreadsheet_id'], claim['sheet_name']), []).append(result)
+        
+        # Giữ _sheet_lock: heartbeat không ghi lại marker vào dòng vừa ghi kết quả
+        with self._sheet_lock:
+            for (spreadsheet_id, sheet_name), sheet_results in by_sheet.items():
+                try:
+                    markers = self._execute('sheets', self.sheets_service.spreadsheets().values().batchGet(
+                        spreadsheetId=spreadsheet_id,
+                        ranges=[f"{sheet_name}!J{r['sheet_claim']['row']}" for r in sheet_results]
+                    )).get('valueRanges', [])
+                    data = []
+                    for result, value_range in zip(sheet_results, markers):
+                        values = value_range.get('values', [])
+                        if not values or values[0][0] != result['sheet_claim']['marker']:
+                            logger.warning(f"⚠️ Dòng giữ chỗ của {result['video_name']} đã thay đổi, thêm dòng mới")
+                            continue
+                        row_number = result['sheet_claim']['row']
+                        data.append({
+                            'range': f'{sheet_name}!A{row_number}:J{row_number}',
+                            'values': [self._build_sheet_row(result) + ['']]
+                        })
+                        filled.add(id(result))
+                    if data:
+                        self._execute('sheets', self.sheets_service.spreadsheets().values().batchUpdate(
+                            spreadsheetId=spreadsheet_id,
+                            body={'valueInputOption': 'RAW', 'data': data}
+                        ))
+                        logger.info(f"✅ Đã ghi {len(data)} video vào dòng giữ chỗ")
+                except Exception as e:
+                    logger.warning(f"⚠️ Không ghi được vào dòng giữ chỗ, thêm dòng mới: {str(e)}")
+                    filled -= {id(result) for result in sheet_results}
+        self._untrack_sheet_claims([result['sheet_claim'] for result in claimed if id(result) in filled])
+        return filled
+    
+    def update_sheets_with_results(self, results: List[Dict], spreadsheet_id: str = None,
+                                   sheet_name: str = None) -> bool:
         """
         Cập nhật Google Sheets với kết quả xử lý
         
         Args:
             results: Danh sách kết quả xử lý video
+            spreadsheet_id: Google Sheet cần ghi (mặc định self.spreadsheet_id)
+            sheet_name: Tên sheet cần ghi (mặc định self.sheet_name)
             
         Returns:
             True nếu thành công, False nếu thất bại
         """
+        spreadsheet_id = spreadsheet_id or self.spreadsheet_id
+        sheet_name = sheet_name or self.sheet_name
         try:
             logger.info("📊 Bắt đầu cập nhật Google Sheets...")
             
+            # Video đã có dòng giữ chỗ: ghi kết quả vào đúng dòng đó
+            filled = self._fill_claimed_rows([result for result in results if result['status'] == 'success'])
+            
             # Chuẩn bị dữ liệu để cập nhật
             update_data = []
             
             for result in results:
-                if result['status'] == 'success':
-                    # Lấy thông tin file
-                    video_name = result['video_name']
-                    video_file_id = result['video_file_id']  # Thêm ID của file video MP4
-                    voice_file_id = result['voice_file_id']
-                    text_file_id = result['text_file_id']
-                    rewritten_text_file_id = result['rewritten_text_file_id']
-                    # tts_file_id = result.get('tts_file_id', '')  # ĐÃ COMMENT
-                    
-                    # Tạo link Google Drive
-                    video_link = f"https://drive.google.com/file/d/{video_file_id}/view"  # Link MP4
-                    voice_link = f"https://drive.google.com/file/d/{voice_file_id}/view"
-                    text_link = f"https://drive.google.com/file/d/{text_file_id}/view"
-                    rewritten_link = f"https://drive.google.com/file/d/{rewritten_text_file_id}/view"
-                    # tts_link = f"https://drive.google.com/file/d/{tts_file_id}/view" if tts_file_id else ""  # ĐÃ COMMENT
-                    
-                    # Đọc nội dung text
-                    original_text = self.read_text_file_content(result['text_path'])
-                    
-                    # Đọc nội dung text cải tiến (chỉ nội dung chính có timeline)
-                    rewritten_text = ""
-                    if 'main_content_path' in result:
-                        rewritten_text = self.read_text_file_content(result['main_content_path'])
-                    else:
-                        # Fallback cho format cũ
-                        rewritten_text = self.read_text_file_content(result['rewritten_text_path'])
-                    
-                    # Lấy tên video từ file MP4 (loại bỏ phần mở rộng)
-                    video_name_clean = os.path.splitext(video_name)[0]
-                    
-                    # Đọc nội dung text không timeline
-                    text_no_timeline = ""
-                    if 'text_no_timeline_path' in result:
-                        text_no_timeline = self.read_text_file_content(result['text_no_timeline_path'])
-                    
-                    # Thêm dữ liệu vào danh sách cập nhật
-                    update_data.append([
-                        video_link,           # Link mp4 (cột A)
-                        video_name_clean,     # Tên Video (từ file MP4) (cột B)
-                        voice_link,           # Link MP3 (cột C)
-                        text_link,            # Link text gốc (cột D)
-                        original_text,        # Text gốc MP3 (cột E)
-                        rewritten_link,       # Link text cải tiến (cột F)
-                        rewritten_text,       # Text cải tiến (cột G)
-                        text_no_timeline      # Text no timeline (chỉ nội dung chính) (cột H)
-                        # tts_link              # Link text to speech - ĐÃ COMMENT
-                    ])
-                    
-                    logger.info(f"📝 Đã chuẩn bị dữ liệu cho video: {video_name}")
+                if result['status'] == 'success' and id(result) not in filled:
+                    update_data.append(self._build_sheet_row(result))
+                    logger.info(f"📝 Đã chuẩn bị dữ liệu cho video: {result['video_name']}")
             
             if not update_data:
+                if filled:
+                    return True
                 logger.warning("⚠️ Không có dữ liệu để cập nhật")
                 return False
             
-            # Lấy dòng trống tiếp theo
-            next_row = self.get_next_empty_row()
-            range_name = f'{self.sheet_name}!A{next_row}:H{next_row + len(update_data) - 1}'  # A-H: Link mp4, Tên Video, Link MP3, Link text gốc, Text gốc, Link text cải tiến, Text cải tiến, Text no timeline
-            
-            # Cập nhật Google Sheets
+            # Thêm dòng mới sau dòng cuối của bảng (values().append: không ghi đè dòng
+            # giữ chỗ/kết quả runner khác vừa thêm như khi tự tìm dòng trống rồi update)
+            # A-I: Link mp4, Tên Video, Link MP3, Link text gốc, Text gốc, Link text cải tiến, Text cải tiến, Text no timeline, Hash prompt
             body = {
                 'values': update_data
             }
             
             try:
-                result = self.sheets_service.spreadsheets().values().update(
-                    spreadsheetId=self.spreadsheet_id,
-                    range=range_name,
+                result = self._execute('sheets', self.sheets_service.spreadsheets().values().append(
+                    spreadsheetId=spreadsheet_id,
+                    range=f'{sheet_name}!A:J',
                     valueInputOption='RAW',
+                    insertDataOption='INSERT_ROWS',
                     body=body
-                ).execute()
+                ))
             except Exception as e:
-                logger.warning(f"⚠️ Lỗi update với tên sheet '{self.sheet_name}', thử với tên khác: {str(e)}")
+                logger.warning(f"⚠️ Lỗi append với tên sheet '{sheet_name}', thử với tên khác: {str(e)}")
                 # Thử với tên sheet khác
                 alternative_names = ['mp3 to text', 'Mp3 to text', 'MP3 to text', 'Sheet1']
                 for alt_name in alternative_names:
                     try:
-                        range_name = f'{alt_name}!A{next_row}:H{next_row + len(update_data) - 1}'
-                        result = self.sheets_service.spreadsheets().values().update(
-                            spreadsheetId=self.spreadsheet_id,
-                            range=range_name,
+                        result = self._execute('sheets', self.sheets_service.spreadsheets().values().append(
+                            spreadsheetId=spreadsheet_id,
+                            range=f'{alt_name}!A:J',
                             valueInputOption='RAW',
+                            insertDataOption='INSERT_ROWS',
                             body=body
-                        ).execute()
-                        logger.info(f"✅ Update thành công với tên sheet: {alt_name}")
+                        ))
+                        logger.info(f"✅ Append thành công với tên sheet: {alt_name}")
                         break
                     except Exception as e2:
-                        logger.warning(f"⚠️ Lỗi update với tên sheet '{alt_name}': {str(e2)}")
+                        logger.warning(f"⚠️ Lỗi append với tên sheet '{alt_name}': {str(e2)}")
                         continue
                 else:
                     # Nếu tất cả đều lỗi, raise exception
                     raise e
             
-            updated_cells = result.get('updatedCells', 0)
+            updates = result.get('updates', {})
             logger.info(f"✅ Cập nhật Google Sheets thành công!")
-            logger.info(f"📊 Đã cập nhật {updated_cells} ô")
-            logger.info(f"📄 Dòng bắt đầu: {next_row}")
-            logger.info(f"📄 Dòng kết thúc: {next_row + len(update_data) - 1}")
+            logger.info(f"📊 Đã cập nhật {updates.get('updatedCells', 0)} ô")
+            logger.info(f"📄 Các dòng đã thêm: {updates.get('updatedRange', '')}")
+            
+            # Kết quả đã thêm dòng mới thay vì ghi vào dòng giữ chỗ -> trả lại dòng giữ chỗ còn lại
+            self._release_sheet_claims([result for result in results
+                                        if result['status'] == 'success' and id(result) not in filled])
             
             return True
             
@@ -4242,6 +6840,73 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
             logger.error(f"❌ Lỗi cập nhật Google Sheets: {str(e)}")
             return False
     
+    def replace_sheet_rows(self, results: List[Dict], spreadsheet_id: str = None,
+                           sheet_name: str = None) -> List[Dict]:
+        """
+        Ghi đè dòng Google Sheets đã có của các video (chế độ chạy lại stage)
+        
+        Dòng được tìm theo link MP4 (cột A) hoặc tên video (cột B). Ưu tiên dòng kết quả
+        (cột J không phải giữ chỗ); không có thì dùng dòng giữ chỗ đã quá hạn. Video chỉ có
+        dòng giữ chỗ còn hạn (runner khác đang xử lý) thì không ghi. Dòng được ghi cả cột A-J
+        (xóa giá trị giữ chỗ cũ ở cột J). Video chưa có dòng thì được thêm vào cuối như
+        update_sheets_with_results.
+        
+        Args:
+            results: Danh sách kết quả xử lý video
+            spreadsheet_id: Google Sheet cần ghi (mặc định self.spreadsheet_id)
+            sheet_name: Tên sheet cần ghi (mặc định self.sheet_name)
+            
+        Returns:
+            Các kết quả đã ghi vào Sheets
+        """
+        spreadsheet_id = spreadsheet_id or self.spreadsheet_id
+        sheet_name = sheet_name or self.sheet_name
+        try:
+            sheet_rows = self._read_sheet_keys(spreadsheet_id, sheet_name)
+            
+            data = []
+            replaced = []
+            missing = []
+            for result in results:
+                if result['status'] != 'success':
+                    continue
+                rows = [(row_number, value) for row_number, value in self._match_sheet_rows(sheet_rows, result)
+                        if not is_released(value)]
+                if not rows:
+                    missing.append(result)
+                    continue
+                row_number = next((row_number for row_number, value in rows if parse_claim(value) is None), None)
+                if row_number is None:
+                    row_number = next((row_number for row_number, value in rows
+                                       if not is_claim_active(parse_claim(value), self.sheet_claim_timeout_seconds)),
+                                      None)
+                if row_number is None:
+                    logger.warning(f"⚠️ Không ghi đè {result['video_name']}: video đang được xử lý (dòng {rows[0][0]})")
+                    continue
+                data.append({
+                    'range': f'{sheet_name}!A{row_number}:J{row_number}',
+                    'values': [self._build_sheet_row(result) + ['']]
+                })
+                replaced.append(result)
+                logger.info(f"📝 Ghi đè dòng {row_number}: {result['video_name']}")
+            
+            if data:
+                self._execute('sheets', self.sheets_service.spreadsheets().values().batchUpdate(
+                    spreadsheetId=spreadsheet_id,
+                    body={'valueInputOption': 'RAW', 'data': data}
+                ))
+                logger.info(f"✅ Đã ghi đè {len(data)} dòng Google Sheets")
+            
+            if missing:
+                logger.info(f"📝 {len(missing)} video chưa có dòng trong Sheets, thêm dòng mới")
+                if self.update_sheets_with_results(missing, spreadsheet_id, sheet_name):
+                    replaced.extend(missing)
+            return replaced
+            
+        except Exception as e:
+            logger.error(f"❌ Lỗi ghi đè dòng Google Sheets: {str(e)}")
+            return []
+    
     def _generate_lead_sentence(self, content: str) -> str:
         """
         Tạo câu dẫn hay dựa trên nội dung thực tế của video
@@ -4352,7 +7017,7 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
                 }
             }
             
-            response = requests.post(url, headers=headers, json=data)
+            response = self._http_post('gemini', url, headers=headers, json=data, timeout=effective_timeout(60))
             response.raise_for_status()
             
             result = response.json()
@@ -4397,9 +7062,15 @@ Bạn là biên dịch viên chuyên nghiệp, chuyên dịch các tài liệu v
                 logger.info("✅ Đã dọn dẹp file tạm")
             except Exception as e:
                 logger.warning(f"⚠️ Không thể dọn dẹp file tạm: {str(e)}")
+        if self._text_temp_dir and os.path.exists(self._text_temp_dir):
+            shutil.rmtree(self._text_temp_dir, ignore_errors=True)
+        if self._download_executor is not None:
+            self._download_executor.shutdown(wait=False)
+            self._download_executor = None
+        self._stop_claim_heartbeat()
 
 
-def main(custom_folder_id=None):
+def main(custom_folder_id=None, options=None):
     """
     Hàm chính - Entry point của ứng dụng
     
@@ -4408,7 +7079,12 @@ def main(custom_folder_id=None):
     - Khởi tạo processor
     - Chạy toàn bộ workflow với hỗ trợ tiếng Trung (TTS đã comment)
     - Hiển thị kết quả
+    
+    Args:
+        custom_folder_id: Folder input thay cho folder mặc định
+        options: Dict tùy chọn từ command line (xem phần argparse bên dưới)
     """
+    options = options or {}
     print("🚀 === All-in-One: MP4 -> Voice Only -> Text (VI/CN) -> Translate -> Rewrite -> Drive ===")
     print("=" * 80)
 
@@ -4461,13 +7137,173 @@ def main(custom_folder_id=None):
             input_folder_to_use = custom_folder_id
             print(f"🔄 Sử dụng custom folder ID: {input_folder_to_use}")
         
-        results = processor.process_all_videos(
-            input_folder_to_use, 
-            VOICE_ONLY_FOLDER_ID,
-            TEXT_ORIGINAL_FOLDER_ID,
-            TEXT_REWRITTEN_FOLDER_ID
-            # TEXT_TO_SPEECH_FOLDER_ID  # ĐÃ COMMENT
-        )
+        # Chế độ pipeline: xử lý chồng lấp nhiều video qua các stage
+        use_pipeline = options.get('pipeline', False)
+        if options.get('engine') == 'async':
+            # Engine async: pipeline chạy trên một event loop, FFmpeg là subprocess async
+            processor.engine = 'async'
+            use_pipeline = True
+        if use_pipeline:
+            print(f"🏭 Chế độ pipeline ({processor.engine}): {processor.pipeline_workers}")
+        
+        # Prefetch: số video tải trước và dung lượng tối đa trong thư mục tạm
+        if options.get('prefetch') is not None:
+            processor.prefetch_lookahead = options['prefetch']
+        if options.get('prefetch_budget_mb') is not None:
+            processor.prefetch_budget_bytes = options['prefetch_budget_mb'] * 1024 * 1024
+        
+        # Số request byte-range song song khi tải video lớn
+        if options.get('download_workers') is not None:
+            processor.download_workers = max(1, options['download_workers'])
+        
+        # Stream video vào FFmpeg: tách voice trong lúc tải, không lưu file MP4
+        if options.get('stream_extract'):
+            processor.stream_extract = True
+        
+        # FFmpeg đọc video trên Drive qua HTTP Range, chỉ tải phần audio
+        if options.get('remote_demux'):
+            processor.remote_demux = True
+        
+        # Liệt kê cả video trong thư mục con của folder input
+        if options.get('recursive'):
+            processor.drive_lister.recursive = True
+        
+        # Workspace: file text của từng video đặt trên tmpfs (ví dụ /dev/shm)
+        if options.get('text_workspace'):
+            processor.text_workspace_root = options['text_workspace']
+        
+        # Deadline: budget cho cả video và từng bước (ví dụ --step-budget transcribe=900)
+        if options.get('video_budget') is not None:
+            processor.video_budget_seconds = options['video_budget'] or None
+        for step_budget in options.get('step_budget') or []:
+            step_name, _, seconds = step_budget.partition('=')
+            if step_name not in processor.step_budgets or not seconds.isdigit():
+                raise ValueError(f"--step-budget không hợp lệ: {step_budget} (bước: {', '.join(processor.step_budgets)})")
+            processor.step_budgets[step_name] = int(seconds) or None
+        
+        # Thời gian chờ các bước đang chạy khi nhận tín hiệu dừng
+        if options.get('drain_grace') is not None:
+            processor.drain_grace_seconds = options['drain_grace']
+        
+        # Thứ tự xử lý video theo thời lượng
+        if options.get('schedule'):
+            processor.schedule_policy = options['schedule']
+        
+        # Job ledger: checkpoint từng bước để chạy lại không tốn phí Deepgram/Gemini lần nữa
+        if options.get('no_ledger'):
+            processor.ledger_path = None
+        elif options.get('ledger'):
+            processor.ledger_path = options['ledger']
+        
+        # Budget: không hoãn video theo quota ngày (usage vẫn được ghi lại)
+        if options.get('no_budget'):
+            processor.budget_gate = None
+        
+        # Dòng giữ chỗ trong Sheets: tắt hoặc đổi thời hạn nhận lại dòng của runner đã dừng
+        if options.get('no_sheet_claim'):
+            processor.sheet_claims = False
+        if options.get('claim_timeout'):
+            processor.sheet_claim_timeout_seconds = options['claim_timeout']
+            if processor.video_checker is not None:
+                processor.video_checker.claim_timeout_seconds = options['claim_timeout']
+        
+        # Hàng đợi thử lại: khoảng backoff tối đa còn thử lại ngay trong lần chạy này
+        if options.get('retry_wait') is not None:
+            processor.retry_wait_seconds = options['retry_wait']
+        
+        # Chạy lại stage: --from-stage STAGE (stage đó và các stage sau) hoặc --only-stage STAGE (lặp lại được)
+        rerun_stages = None
+        if options.get('from_stage'):
+            rerun_stages = [options['from_stage']]
+            if options['from_stage'] != 'sheet':
+                rerun_stages.append('sheet')
+        elif options.get('only_stage'):
+            rerun_stages = [stage for stage in REPROCESS_STAGES if stage in options['only_stage']]
+        
+        if options.get('plan'):
+            # Dry run: chỉ ước tính, không xử lý video nào
+            processor.plan_all_videos(input_folder_to_use, use_pipeline=use_pipeline)
+            return
+        
+        if options.get('dead_letters'):
+            processor.list_dead_letters()
+            return
+        if options.get('requeue_dead'):
+            count = processor.requeue_dead_letters(options.get('video'))
+            print(f"♻️ Đã đưa {count} video ra khỏi dead-letter")
+            return
+        
+        if options.get('backfill_prompt'):
+            # Viết lại các dòng Sheets tạo bằng prompt cũ (chỉ rewrite + format)
+            results = processor.backfill_prompt()
+        elif rerun_stages:
+            # Chạy lại stage được chọn, các stage khác lấy kết quả đã lưu trong ledger
+            results = processor.reprocess_videos(
+                input_folder_to_use,
+                VOICE_ONLY_FOLDER_ID,
+                TEXT_ORIGINAL_FOLDER_ID,
+                TEXT_REWRITTEN_FOLDER_ID,
+                rerun_stages,
+                video_names=options.get('video'),
+                include_dependents=bool(options.get('from_stage')),
+                use_pipeline=use_pipeline
+            )
+        elif options.get('folders'):
+            # Chế độ nhiều folder: dùng chung xác thực và worker pool, fair share giữa các folder
+            folders = load_folder_configs(options['folders'], {
+                'voice_folder_id': VOICE_ONLY_FOLDER_ID,
+                'text_original_folder_id': TEXT_ORIGINAL_FOLDER_ID,
+                'text_rewritten_folder_id': TEXT_REWRITTEN_FOLDER_ID,
+                'spreadsheet_id': processor.spreadsheet_id,
+                'sheet_name': processor.sheet_name
+            })
+            results_by_folder = processor.process_folders(folders, use_pipeline=use_pipeline)
+            results = [result for folder_results in results_by_folder.values() for result in folder_results]
+        elif options.get('watch'):
+            # Chế độ daemon: giữ service, chỉ xử lý video mới/được sửa theo changes feed
+            results = processor.watch_folder(
+                input_folder_to_use,
+                VOICE_ONLY_FOLDER_ID,
+                TEXT_ORIGINAL_FOLDER_ID,
+                TEXT_REWRITTEN_FOLDER_ID,
+                use_pipeline=use_pipeline,
+                poll_interval=options.get('watch_interval') or 15
+            )
+        elif options.get('serve'):
+            # Chế độ service: nhận job qua HTTP, giữ processor (OAuth, prompt, ledger) giữa các job
+            results = processor.serve_api(
+                input_folder_to_use,
+                VOICE_ONLY_FOLDER_ID,
+                TEXT_ORIGINAL_FOLDER_ID,
+                TEXT_REWRITTEN_FOLDER_ID,
+                host=options.get('api_host') or '127.0.0.1',
+                port=options.get('api_port') or 8765,
+                workers=options.get('api_workers') or 1,
+                use_pipeline=use_pipeline
+            )
+        elif options.get('worker'):
+            # Chế độ worker: nhiều process dùng chung hàng đợi, claim video bằng lease
+            queue_path = options.get('queue') or os.path.join(
+                os.path.dirname(os.path.dirname(__file__)), 'config', 'video_queue.sqlite3')
+            print(f"👷 Chế độ worker, hàng đợi: {queue_path}")
+            results = processor.process_videos_as_worker(
+                input_folder_to_use,
+                VOICE_ONLY_FOLDER_ID,
+                TEXT_ORIGINAL_FOLDER_ID,
+                TEXT_REWRITTEN_FOLDER_ID,
+                queue_path,
+                worker_id=options.get('worker_id'),
+                lease_seconds=options.get('lease_seconds') or 300
+            )
+        else:
+            results = processor.process_all_videos(
+                input_folder_to_use, 
+                VOICE_ONLY_FOLDER_ID,
+                TEXT_ORIGINAL_FOLDER_ID,
+                TEXT_REWRITTEN_FOLDER_ID,
+                # TEXT_TO_SPEECH_FOLDER_ID  # ĐÃ COMMENT
+                use_pipeline=use_pipeline
+            )
 
         # Hiển thị kết quả
         print(f"\n" + "=" * 80)
@@ -4526,6 +7362,77 @@ if __name__ == "__main__":
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Video Processor with custom folder support')
     parser.add_argument('--custom-folder', type=str, help='Custom input folder ID to override default')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Process videos concurrently through staged worker pools')
+    parser.add_argument('--engine', choices=['threads', 'async'],
+                        help='Pipeline backend: threads (default) or async (asyncio event loop, implies --pipeline)')
+    parser.add_argument('--plan', action='store_true',
+                        help='Dry run: estimate time, API calls and cost without processing any video')
+    parser.add_argument('--prefetch', type=int,
+                        help='Number of upcoming videos to download in the background (0 disables, default 2)')
+    parser.add_argument('--prefetch-budget-mb', type=int,
+                        help='Max MB of downloaded videos kept in the temp folder (default 2048)')
+    parser.add_argument('--download-workers', type=int,
+                        help='Concurrent byte-range requests when downloading large videos (1 = single connection, default 4)')
+    parser.add_argument('--stream-extract', action='store_true',
+                        help='Pipe the Drive download straight into FFmpeg instead of saving the MP4 first (MP4 with moov at the end still downloads)')
+    parser.add_argument('--remote-demux', action='store_true',
+                        help='Let FFmpeg read the video from Drive over HTTP range requests and fetch only the audio track')
+    parser.add_argument('--recursive', action='store_true',
+                        help='Also list videos in subfolders of the input folder (subfolders are listed concurrently)')
+    parser.add_argument('--schedule', choices=SCHEDULE_POLICIES,
+                        help='Video order: name (default), shortest, longest or fair (by Drive duration)')
+    parser.add_argument('--video-budget', type=int,
+                        help='Max seconds per video before it is cancelled (0 = unlimited, default 14400)')
+    parser.add_argument('--step-budget', action='append', metavar='STEP=SECONDS',
+                        help='Max seconds for one step, e.g. transcribe=900 (repeatable, 0 = unlimited)')
+    parser.add_argument('--drain-grace', type=int,
+                        help='Seconds to let in-flight steps finish after SIGINT/SIGTERM (default 600)')
+    parser.add_argument('--text-workspace', type=str, metavar='DIR',
+                        help='Directory (e.g. a tmpfs such as /dev/shm) for per-video text artifacts')
+    parser.add_argument('--ledger', type=str,
+                        help='Path of the SQLite job ledger (default config/job_ledger.sqlite3)')
+    parser.add_argument('--no-ledger', action='store_true',
+                        help='Do not checkpoint or resume per-video steps')
+    parser.add_argument('--no-budget', action='store_true',
+                        help='Do not defer videos that would exceed the remaining daily Deepgram/Gemini quota')
+    parser.add_argument('--no-sheet-claim', action='store_true',
+                        help='Do not write "processing" placeholder rows when a video is claimed')
+    parser.add_argument('--claim-timeout', type=int,
+                        help='Seconds after which another runner may reclaim a placeholder row (default 21600)')
+    parser.add_argument('--retry-wait', type=int,
+                        help='Retry failed videos within the same run if their backoff is at most this many seconds (default 600, 0 = next run)')
+    parser.add_argument('--dead-letters', action='store_true',
+                        help='List videos in the dead-letter list (with reason) and videos waiting for a retry, then exit')
+    parser.add_argument('--requeue-dead', action='store_true',
+                        help='Move dead-letter videos (or only --video NAME) back so the next run processes them again')
+    parser.add_argument('--backfill-prompt', action='store_true',
+                        help='Rewrite Sheet rows whose recorded prompt hash differs from the current Prompt tab')
+    parser.add_argument('--from-stage', choices=REPROCESS_STAGES,
+                        help='Rerun this stage and every later stage of already processed videos, reusing ledger results')
+    parser.add_argument('--only-stage', action='append', choices=REPROCESS_STAGES,
+                        help='Rerun only this stage of already processed videos (repeatable)')
+    parser.add_argument('--video', action='append', metavar='NAME',
+                        help='Limit --from-stage/--only-stage to this video (repeatable, default: all videos in Sheets)')
+    parser.add_argument('--folders', type=str,
+                        help='JSON file mapping several input folders to output folders and Sheets (one batch for all)')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and process new or modified videos from the Drive changes feed')
+    parser.add_argument('--watch-interval', type=int,
+                        help='Seconds between Drive changes feed polls in --watch mode (default 15)')
+    parser.add_argument('--serve', action='store_true',
+                        help='Run a local HTTP job API (POST /jobs, GET /jobs/<id>) instead of a single batch')
+    parser.add_argument('--api-host', type=str, help='Address for --serve to listen on (default 127.0.0.1)')
+    parser.add_argument('--api-port', type=int, help='Port for --serve (default 8765)')
+    parser.add_argument('--api-workers', type=int,
+                        help='Number of submitted jobs processed at the same time in --serve mode (default 1)')
+    parser.add_argument('--worker', action='store_true',
+                        help='Claim videos from a shared lease queue (run several processes to scale out)')
+    parser.add_argument('--queue', type=str,
+                        help='Path of the shared SQLite queue (default config/video_queue.sqlite3)')
+    parser.add_argument('--worker-id', type=str, help='Worker ID (default hostname-pid)')
+    parser.add_argument('--lease-seconds', type=int,
+                        help='Lease duration before an unfinished video is re-queued (default 300)')
     
     args = parser.parse_args()
     
@@ -4534,4 +7441,4 @@ if __name__ == "__main__":
         INPUT_FOLDER_ID = args.custom_folder
         print(f"🔄 Sử dụng custom folder ID: {INPUT_FOLDER_ID}")
     
-    main(args.custom_folder if args.custom_folder else None) 
\ No newline at end of file
+    main(args.custom_folder if args.custom_folder else None, vars(args))
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lazy Artifacts
+Khai báo các artifact dẫn xuất (nội dung chính, text không timeline, ...) dưới dạng đồ thị lười
+
+Mỗi artifact khai báo hàm tạo và các artifact đầu vào. Artifact chỉ được tính khi
+có nơi dùng (sink: upload Drive, cột Google Sheets) gọi get(), và mỗi artifact chỉ
+được tính đúng một lần cho mỗi bộ dữ liệu nguồn, kể cả khi nhiều bước chạy song
+song cùng cần nó. Bỏ một output không còn ai dùng thì phần tính toán của nó cũng
+tự mất theo.
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactGraph:
+    """
+    Tập khai báo artifact: tên -> (hàm tạo, các input)
+    """
+
+    def __init__(self):
+        self._producers = {}
+
+    def declare(self, name: str, func: Callable[..., Any], inputs: List[str]):
+        """
+        Khai báo một artifact dẫn xuất
+
+        Args:
+            name: Tên artifact
+            func: Hàm nhận giá trị các input (theo thứ tự inputs) và trả về artifact
+            inputs: Tên các artifact/nguồn cần có trước
+
+        Raises:
+            ValueError: Nếu artifact đã được khai báo
+        """
+        if name in self._producers:
+            raise ValueError(f"Artifact '{name}' đã được khai báo")
+        self._producers[name] = (func, list(inputs))
+
+    def producer(self, name: str) -> Optional[Tuple[Callable[..., Any], List[str]]]:
+        """
+        Hàm tạo và input của artifact (None nếu không được khai báo)
+        """
+        return self._producers.get(name)
+
+    def evaluate(self, sources: Dict[str, Any]) -> 'LazyArtifacts':
+        """
+        Tạo bộ đánh giá lười trên dữ liệu nguồn
+
+        Args:
+            sources: Giá trị các nguồn (ví dụ {'rewritten_text_path': ...})
+
+        Returns:
+            LazyArtifacts tính artifact khi được yêu cầu
+        """
+        return LazyArtifacts(self, sources)
+
+
+class LazyArtifacts:
+    """
+    Tính artifact theo yêu cầu, ghi nhớ kết quả, an toàn khi nhiều thread cùng gọi
+    """
+
+    def __init__(self, graph: ArtifactGraph, sources: Dict[str, Any]):
+        """
+        Args:
+            graph: ArtifactGraph chứa khai báo
+            sources: Giá trị các nguồn
+        """
+        self.graph = graph
+        self._values = dict(sources)
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.compute_counts = {}  # tên artifact -> số lần đã tính (để kiểm tra)
+
+    def get(self, name: str) -> Any:
+        """
+        Lấy giá trị artifact, tính (một lần) cùng các input của nó nếu chưa có
+
+        Args:
+            name: Tên artifact hoặc nguồn
+
+        Returns:
+            Giá trị artifact
+
+        Raises:
+            KeyError: Nếu artifact không được khai báo và không có trong nguồn
+        """
+        if name in self._values:
+            return self._values[name]
+
+        producer = self.graph.producer(name)
+        if producer is None:
+            raise KeyError(f"Không có artifact '{name}'")
+
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            # Thread khác có thể đã tính xong trong lúc chờ
+            if name in self._values:
+                return self._values[name]
+            func, inputs = producer
+            value = func(*[self.get(key) for key in inputs])
+            self._values[name] = value
+            self.compute_counts[name] = self.compute_counts.get(name, 0) + 1
+            logger.debug(f"🧩 Đã tính artifact: {name}")
+            return value
+
+    def is_computed(self, name: str) -> bool:
+        """
+        Artifact đã có giá trị chưa (nguồn luôn có)
+        """
+        return name in self._values
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Async Engine
+Chạy pipeline nhiều stage trên một event loop asyncio
+
+Cùng mô hình với StagedPipeline (stage nối nhau bằng hàng đợi có giới hạn)
+nhưng worker là task asyncio thay vì thread:
+- Handler là coroutine (async def) chạy thẳng trên event loop, ví dụ FFmpeg qua
+  asyncio.create_subprocess_exec (run_subprocess_async) - mỗi task chỉ tốn vài KB
+- Handler thường (requests, googleapiclient chưa có client async) được chạy trong
+  một thread pool giới hạn dùng chung, event loop vẫn điều phối tất cả stage
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import asyncio
+import logging
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from deadlines import Deadline
+from pipeline_engine import PipelineStage
+
+logger = logging.getLogger(__name__)
+
+# Tín hiệu kết thúc hàng đợi
+_SENTINEL = object()
+
+# Khoảng thời gian kiểm tra tín hiệu dừng / deadline (giây)
+_POLL_INTERVAL = 0.5
+
+
+async def run_subprocess_async(cmd: List[str], timeout: Optional[float] = None,
+                               deadline: Deadline = None) -> subprocess.CompletedProcess:
+    """
+    Chạy subprocess (FFmpeg) trên event loop, có thể bị hủy theo deadline
+
+    Tương đương deadlines.run_subprocess nhưng không chiếm thread trong lúc chờ.
+
+    Args:
+        cmd: Lệnh cần chạy
+        timeout: Timeout mặc định (giây)
+        deadline: Deadline của bước đang chạy (task asyncio không dùng deadline theo thread)
+
+    Returns:
+        subprocess.CompletedProcess (stdout/stderr dạng text)
+
+    Raises:
+        subprocess.TimeoutExpired: Nếu vượt timeout mặc định
+        DeadlineExceeded: Nếu deadline hết hạn/bị hủy trong lúc chạy
+    """
+    if deadline is not None:
+        deadline.check()
+        remaining = deadline.remaining()
+        if remaining is not None and (timeout is None or remaining < timeout):
+            timeout = remaining
+    end_time = time.monotonic() + timeout if timeout is not None else None
+
+    process = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    communicate = asyncio.ensure_future(process.communicate())
+    while True:
+        wait = _POLL_INTERVAL
+        if end_time is not None:
+            wait = max(0.0, min(wait, end_time - time.monotonic()))
+        done, _ = await asyncio.wait({communicate}, timeout=wait)
+        if done:
+            stdout, stderr = communicate.result()
+            break
+
+        deadline_hit = deadline is not None and deadline.expired()
+        timeout_hit = end_time is not None and time.monotonic() >= end_time
+        if not deadline_hit and not timeout_hit:
+            continue
+
+        process.kill()
+        await communicate
+        logger.warning(f"🛑 Đã dừng process {cmd[0]} (quá thời hạn)")
+        if deadline_hit:
+            deadline.check()
+        raise subprocess.TimeoutExpired(cmd, timeout)
+
+    return subprocess.CompletedProcess(cmd, process.returncode,
+                                       stdout.decode('utf-8', errors='replace'),
+                                       stderr.decode('utf-8', errors='replace'))
+
+
+class AsyncStagedPipeline:
+    """
+    Chạy danh sách job qua chuỗi stage trên một event loop
+
+    Giao diện giống StagedPipeline: run(jobs) trả về các job đã xử lý, job lỗi
+    ở stage nào thì bỏ qua các stage sau, should_stop() dừng nhận job mới.
+    """
+
+    def __init__(self, stages: List[PipelineStage],
+                 on_result: Optional[Callable[[Dict], None]] = None,
+                 should_stop: Optional[Callable[[], bool]] = None,
+                 blocking_workers: int = 16):
+        """
+        Args:
+            stages: Danh sách stage theo thứ tự (handler có thể là coroutine function)
+            on_result: Callback gọi mỗi khi một job ra khỏi pipeline
+            should_stop: Hàm kiểm tra có nên ngừng nhận job mới không
+            blocking_workers: Số thread tối đa cho các handler blocking (dùng chung mọi stage)
+        """
+        if not stages:
+            raise ValueError("Pipeline cần ít nhất một stage")
+
+        self.stages = stages
+        self.on_result = on_result
+        self.should_stop = should_stop or (lambda: False)
+        self.blocking_workers = max(1, int(blocking_workers))
+        self._results = []
+
+    def run(self, jobs: Iterable[Dict]) -> List[Dict]:
+        """
+        Chạy tất cả job qua pipeline trên event loop mới và chờ đến khi xong
+
+        Args:
+            jobs: Các job (dict) cần xử lý, có thể là generator
+
+        Returns:
+            List job đã xử lý, theo thứ tự đưa vào
+        """
+        return asyncio.run(self.run_async(jobs))
+
+    async def run_async(self, jobs: Iterable[Dict]) -> List[Dict]:
+        """
+        Phiên bản coroutine của run() (dùng khi đã có event loop)
+        """
+        self._results = []
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        executor = ThreadPoolExecutor(max_workers=self.blocking_workers, thread_name_prefix='async-blocking')
+
+        try:
+            stage_tasks = []
+            for stage_index, stage in enumerate(self.stages):
+                stage_tasks.append([
+                    asyncio.ensure_future(self._worker_loop(stage_index, queues, executor))
+                    for _ in range(stage.workers)
+                ])
+
+            stage_summary = ", ".join(
+                f"{s.name}x{s.workers}{'' if asyncio.iscoroutinefunction(s.handler) else '(thread)'}"
+                for s in self.stages)
+            logger.info(f"⚡ Async pipeline khởi động: {stage_summary}")
+
+            # Lấy job trong thread pool: jobs có thể là generator chặn (chờ quota, chờ video mới)
+            loop = asyncio.get_running_loop()
+            job_iterator = iter(jobs)
+            admitted = 0
+            try:
+                while True:
+                    job = await loop.run_in_executor(executor, next, job_iterator, _SENTINEL)
+                    if job is _SENTINEL:
+                        break
+                    if not await self._admit(job, admitted, queues[0]):
+                        logger.info("🛑 Pipeline ngừng nhận job mới")
+                        break
+                    admitted += 1
+            finally:
+                for _ in range(self.stages[0].workers):
+                    await queues[0].put(_SENTINEL)
+
+            # Stage xong hết worker thì báo kết thúc cho stage tiếp theo
+            for stage_index, tasks in enumerate(stage_tasks):
+                await asyncio.gather(*tasks)
+                if stage_index + 1 < len(self.stages):
+                    for _ in range(self.stages[stage_index + 1].workers):
+                        await queues[stage_index + 1].put(_SENTINEL)
+        finally:
+            executor.shutdown(wait=True)
+
+        logger.info(f"🏁 Async pipeline hoàn thành {len(self._results)}/{admitted} job")
+        return sorted(self._results, key=lambda job: job.get('_index', 0))
+
+    async def _admit(self, job: Dict, index: int, first_queue: asyncio.Queue) -> bool:
+        """
+        Đưa một job vào stage đầu tiên
+
+        Returns:
+            False nếu pipeline được yêu cầu dừng trước khi job được nhận
+        """
+        job.setdefault('_index', index)
+        while not self.should_stop():
+            try:
+                await asyncio.wait_for(first_queue.put(job), timeout=_POLL_INTERVAL)
+                return True
+            except asyncio.TimeoutError:
+                continue
+        return False
+
+    async def _worker_loop(self, stage_index: int, queues: List[asyncio.Queue], executor: ThreadPoolExecutor):
+        """
+        Vòng lặp của một worker: lấy job, xử lý, chuyển sang stage tiếp theo
+        """
+        stage = self.stages[stage_index]
+        is_last_stage = stage_index == len(self.stages) - 1
+        is_coroutine = asyncio.iscoroutinefunction(stage.handler)
+        loop = asyncio.get_running_loop()
+
+        while True:
+            job = await queues[stage_index].get()
+            if job is _SENTINEL:
+                break
+
+            try:
+                if is_coroutine:
+                    await stage.handler(job)
+                else:
+                    await loop.run_in_executor(executor, stage.handler, job)
+            except Exception as e:
+                logger.error(f"❌ Stage '{stage.name}' lỗi với {job.get('video_name', 'job')}: {str(e)}")
+                job['status'] = 'error'
+                job['error'] = str(e)
+                job['error_type'] = type(e).__name__
+                job['failed_stage'] = stage.name
+
+            if job.get('status') == 'error' or is_last_stage:
+                self._emit(job)
+            else:
+                await queues[stage_index + 1].put(job)
+
+    def _emit(self, job: Dict):
+        """
+        Ghi nhận job đã ra khỏi pipeline
+        """
+        self._results.append(job)
+
+        if self.on_result:
+            try:
+                self.on_result(job)
+            except Exception as e:
+                logger.warning(f"⚠️ Lỗi callback kết quả pipeline: {str(e)}")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Budget Gate
+Kiểm soát nhận video theo quota ngày của TokenCalculator
+
+Trước khi một video được đưa vào xử lý, số phút Deepgram và token Gemini của
+video được ước tính bằng BatchPlanner rồi so với phần quota ngày còn lại:
+- Phần còn lại = quota - usage thực tế hôm nay (TokenCalculator)
+  - ước tính của các video đã nhận nhưng chưa xong (reservation)
+- TokenCalculator có usage store (SQLite dùng chung) thì reservation cũng nằm trong
+  đó: các process dùng chung quota, kiểm tra và giữ chỗ trong một transaction
+- Video vượt phần còn lại bị hoãn đến khi quota được reset (0h ngày hôm sau)
+  hoặc đến khi các video đang chạy xong và trả lại reservation
+- Video đã xong transcription/viết lại (khôi phục từ ledger) không tính lại phần đó
+- Job chỉ viết lại (backfill prompt, có 'transcript_chars') chỉ tính token của lần viết lại
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from planner import BatchPlanner
+from token_calculator import TokenCalculator
+
+logger = logging.getLogger(__name__)
+
+
+class BudgetGate:
+    """
+    Nhận hoặc hoãn video dựa trên ước tính chi phí và quota ngày còn lại
+    """
+
+    def __init__(self, token_calculator: TokenCalculator, planner: BatchPlanner = None):
+        """
+        Args:
+            token_calculator: TokenCalculator theo dõi usage thực tế và quota
+            planner: BatchPlanner dùng để ước tính (mặc định tạo mới với cùng token_calculator)
+        """
+        self.token_calculator = token_calculator
+        self.planner = planner or BatchPlanner(token_calculator)
+        self.store = token_calculator.usage_store  # None = reservation chỉ trong process này
+        self._reservations = {}  # video_file_id -> ước tính đã giữ chỗ
+        self._lock = threading.Lock()
+
+    def estimate(self, job: Dict) -> Dict:
+        """
+        Ước tính phần quota một video sẽ dùng
+
+        Args:
+            job: Job của video (video_info, completed_steps) hoặc job chỉ viết lại (transcript_chars)
+
+        Returns:
+            Dict deepgram_minutes, deepgram_cost, gemini_tokens, gemini_cost
+        """
+        if job.get('transcript_chars') is not None:
+            deepgram_minutes = 0.0
+            input_tokens, output_tokens = self.planner.estimate_rewrite_tokens(job['transcript_chars'])
+        else:
+            estimate = self.planner.estimate_video(job.get('video_info') or {})
+            completed = job.get('completed_steps') or set()
+
+            deepgram_minutes = 0.0 if 'transcribe' in completed else estimate['deepgram_minutes']
+            if 'translate' in completed and 'rewrite' in completed:
+                input_tokens = output_tokens = 0.0
+            else:
+                input_tokens = estimate['gemini_input_tokens']
+                output_tokens = estimate['gemini_output_tokens']
+
+        pricing = self.token_calculator.gemini_pricing
+        return {
+            'deepgram_minutes': deepgram_minutes,
+            'deepgram_cost': self.token_calculator.calculate_tokens_deepgram(deepgram_minutes * 60)['cost_usd'],
+            'gemini_tokens': input_tokens + output_tokens,
+            'gemini_cost': (input_tokens / 1_000_000) * pricing['input']
+                           + (output_tokens / 1_000_000) * pricing['output']
+        }
+
+    def remaining(self) -> Dict:
+        """
+        Quota ngày còn lại sau khi trừ các reservation đang giữ
+
+        Returns:
+            Dict cùng key với estimate()
+        """
+        remaining = self.token_calculator.get_remaining_budget()
+        if self.store is not None:
+            reserved = self.store.reserved_totals()
+            return {key: remaining[key] - reserved[key] for key in remaining}
+        with self._lock:
+            return self._subtract_reserved(remaining)
+
+    def _subtract_reserved(self, remaining: Dict) -> Dict:
+        """
+        Trừ các reservation khỏi quota còn lại (gọi khi đang giữ lock)
+        """
+        for reserved in self._reservations.values():
+            for key in remaining:
+                remaining[key] -= reserved[key]
+        return remaining
+
+    def exceeds_daily_quota(self, job: Dict) -> bool:
+        """
+        Video có vượt cả quota của một ngày không (không bao giờ nhận được)
+        """
+        estimate = self.estimate(job)
+        quota = self.token_calculator.quota_limits
+        return (estimate['deepgram_minutes'] > quota['deepgram_daily_minutes']
+                or estimate['deepgram_cost'] > quota['deepgram_daily_cost']
+                or estimate['gemini_tokens'] > quota['gemini_daily_tokens']
+                or estimate['gemini_cost'] > quota['gemini_daily_cost'])
+
+    def try_reserve(self, job: Dict) -> bool:
+        """
+        Nhận video nếu ước tính nằm trong quota còn lại (giữ chỗ đến khi release)
+
+        Args:
+            job: Job của video
+
+        Returns:
+            True nếu video được nhận, False nếu phải hoãn
+        """
+        estimate = self.estimate(job)
+        if self.store is not None:
+            over = self.store.try_reserve(job['video_file_id'], estimate,
+                                          self.token_calculator.remaining_from_usage)
+        else:
+            remaining = self.token_calculator.get_remaining_budget()
+            with self._lock:
+                self._subtract_reserved(remaining)
+                over = [key for key in remaining if estimate[key] > 0 and estimate[key] > remaining[key]]
+                if not over:
+                    self._reservations[job['video_file_id']] = estimate
+        if over:
+            logger.info(f"💸 Hoãn {job['video_name']}: ước tính vượt quota còn lại ({', '.join(over)})")
+            return False
+
+        logger.debug(f"💰 Nhận {job['video_name']}: {estimate['deepgram_minutes']:.1f} phút Deepgram, "
+                     f"{estimate['gemini_tokens']:,.0f} token Gemini")
+        return True
+
+    def release(self, job: Dict):
+        """
+        Trả reservation khi video xong (usage thực tế đã được TokenCalculator ghi nhận)
+        """
+        if self.store is not None:
+            self.store.release(job.get('video_file_id'))
+            return
+        with self._lock:
+            self._reservations.pop(job.get('video_file_id'), None)
+
+    @property
+    def reserved_count(self) -> int:
+        """
+        Số video đang giữ reservation (của mọi process nếu dùng usage store)
+        """
+        if self.store is not None:
+            return self.store.reserved_count()
+        with self._lock:
+            return len(self._reservations)
+
+    def seconds_until_reset(self, now: Optional[datetime] = None) -> float:
+        """
+        Số giây đến lần reset quota tiếp theo (0h ngày hôm sau, giờ máy)
+        """
+        now = now or datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        return (midnight - now).total_seconds()
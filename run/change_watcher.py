@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Change Watcher
+Theo dõi video mới/được sửa trong folder input (tùy chọn cả thư mục con) qua Drive changes feed
+
+Thay vì liệt kê lại cả folder và đọc lại Google Sheets mỗi lần, watcher giữ
+một start page token của Drive changes API và chỉ lấy các thay đổi kể từ lần
+trước. Token được lưu ra file để daemon khởi động lại không bỏ sót thay đổi.
+
+Nguồn thay đổi có thể thay bằng InMemoryChangesSource để test không cần Drive.
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from video_files import is_folder, is_video_file
+
+logger = logging.getLogger(__name__)
+
+# Các trường cần cho xử lý video (giống listing của folder + parents để lọc folder)
+CHANGE_FIELDS = (
+    "nextPageToken,newStartPageToken,"
+    "changes(fileId,removed,file(id,name,size,mimeType,trashed,parents,modifiedTime,"
+    "videoMediaMetadata(durationMillis)))"
+)
+
+
+class DriveChangesSource:
+    """
+    Nguồn thay đổi từ Google Drive changes API
+    """
+
+    def __init__(self, drive_service, execute: Callable = None):
+        """
+        Args:
+            drive_service: Google Drive API service
+            execute: Hàm chạy một request và trả response (None = request.execute(),
+                     ví dụ truyền hàm gọi qua rate limiter)
+        """
+        self.drive_service = drive_service
+        self.execute = execute or (lambda request: request.execute())
+
+    def get_start_page_token(self) -> str:
+        """
+        Lấy token cho thời điểm hiện tại (các thay đổi sau thời điểm này)
+        """
+        response = self.execute(self.drive_service.changes().getStartPageToken(supportsAllDrives=True))
+        return response['startPageToken']
+
+    def list_changes(self, page_token: str) -> Tuple[List[Dict], str]:
+        """
+        Lấy tất cả thay đổi kể từ page_token (đọc hết các trang)
+
+        Args:
+            page_token: Token từ lần gọi trước
+
+        Returns:
+            Tuple (danh sách change, token cho lần gọi sau)
+        """
+        changes = []
+        while True:
+            response = self.execute(self.drive_service.changes().list(
+                pageToken=page_token,
+                fields=CHANGE_FIELDS,
+                pageSize=1000,
+                includeItemsFromAllDrives=True,
+                supportsAllDrives=True
+            ))
+            changes.extend(response.get('changes', []))
+
+            if 'nextPageToken' in response:
+                page_token = response['nextPageToken']
+                continue
+            return changes, response['newStartPageToken']
+
+
+class InMemoryChangesSource:
+    """
+    Nguồn thay đổi giả lập trong bộ nhớ (dùng để test)
+
+    Token là vị trí trong danh sách thay đổi.
+    """
+
+    def __init__(self):
+        self._changes = []
+        self._lock = threading.Lock()
+
+    def push_file(self, file: Dict):
+        """
+        Giả lập file được thêm hoặc sửa trên Drive
+
+        Args:
+            file: Metadata file (id, name, mimeType, parents, modifiedTime, ...)
+        """
+        with self._lock:
+            self._changes.append({'fileId': file['id'], 'removed': False, 'file': dict(file)})
+
+    def push_removed(self, file_id: str):
+        """
+        Giả lập file bị xóa
+        """
+        with self._lock:
+            self._changes.append({'fileId': file_id, 'removed': True})
+
+    def get_start_page_token(self) -> str:
+        with self._lock:
+            return str(len(self._changes))
+
+    def list_changes(self, page_token: str) -> Tuple[List[Dict], str]:
+        with self._lock:
+            start = int(page_token)
+            return list(self._changes[start:]), str(len(self._changes))
+
+
+class ChangeWatcher:
+    """
+    Lọc thay đổi của Drive thành danh sách video mới/được sửa trong một folder
+
+    Khi recursive, video trong các thư mục con cũng được lấy: thư mục con đã biết được
+    đưa vào bằng track_folders() (ví dụ từ DriveLister.list_subfolders), thư mục con mới
+    xuất hiện trong changes feed được tự thêm vào.
+    """
+
+    def __init__(self, source, folder_id: str, token_path: Optional[str] = None, recursive: bool = False):
+        """
+        Args:
+            source: DriveChangesSource hoặc InMemoryChangesSource
+            folder_id: ID folder input cần theo dõi
+            token_path: File JSON lưu page token (None = không lưu)
+            recursive: Theo dõi cả các thư mục con
+        """
+        self.source = source
+        self.folder_id = folder_id
+        self.token_path = token_path
+        self.recursive = recursive
+        self.folder_ids = {folder_id}  # Folder đang theo dõi (folder input + thư mục con nếu recursive)
+        self.page_token = self._load_token()
+        self._pending_token = None
+        self._seen_versions = {}  # file_id -> modifiedTime đã đưa vào hàng đợi
+
+    def _load_token(self) -> Optional[str]:
+        """
+        Đọc page token đã lưu của folder (nếu có)
+        """
+        if not self.token_path or not os.path.exists(self.token_path):
+            return None
+        try:
+            with open(self.token_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get(self.folder_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Không đọc được page token đã lưu: {str(e)}")
+            return None
+
+    def _save_token(self):
+        """
+        Lưu page token của folder ra file
+        """
+        if not self.token_path:
+            return
+        try:
+            tokens = {}
+            if os.path.exists(self.token_path):
+                with open(self.token_path, 'r', encoding='utf-8') as f:
+                    tokens = json.load(f)
+            tokens[self.folder_id] = self.page_token
+            token_dir = os.path.dirname(self.token_path)
+            if token_dir:
+                os.makedirs(token_dir, exist_ok=True)
+            with open(self.token_path, 'w', encoding='utf-8') as f:
+                json.dump(tokens, f, indent=2)
+        except Exception as e:
+            logger.warning(f"⚠️ Không lưu được page token: {str(e)}")
+
+    def start(self) -> bool:
+        """
+        Khởi tạo page token (dùng token đã lưu nếu có)
+
+        Returns:
+            True nếu tiếp tục từ token đã lưu, False nếu bắt đầu từ thời điểm hiện tại
+        """
+        if self.page_token:
+            logger.info(f"👀 Tiếp tục theo dõi thay đổi từ token đã lưu: {self.page_token}")
+            return True
+
+        self.page_token = self.source.get_start_page_token()
+        self._save_token()
+        logger.info(f"👀 Bắt đầu theo dõi thay đổi từ token: {self.page_token}")
+        return False
+
+    def track_folders(self, folder_ids: Iterable[str]):
+        """
+        Theo dõi thêm các thư mục con của folder input (chỉ khi recursive)
+
+        Args:
+            folder_ids: ID các thư mục con
+        """
+        if self.recursive:
+            self.folder_ids.update(folder_ids)
+
+    def _update_folders(self, changes: List[Dict]):
+        """
+        Thêm thư mục con mới (cha đang được theo dõi), bỏ thư mục con đã xóa hoặc chuyển đi
+
+        Lặp đến khi không đổi: thư mục con lồng nhau có thể xuất hiện trước thư mục cha trong feed.
+        """
+        changed = True
+        while changed:
+            changed = False
+            for change in changes:
+                file = change.get('file')
+                file_id = change.get('fileId')
+                if file_id == self.folder_id:
+                    continue
+                if change.get('removed') or not file:
+                    if file_id in self.folder_ids:
+                        self.folder_ids.discard(file_id)
+                        changed = True
+                    continue
+                if not is_folder(file):
+                    continue
+                tracked = not file.get('trashed') and bool(self.folder_ids.intersection(file.get('parents', [])))
+                if tracked and file_id not in self.folder_ids:
+                    self.folder_ids.add(file_id)
+                    logger.info(f"📁 Theo dõi thêm thư mục con: {file.get('name', file_id)}")
+                    changed = True
+                elif not tracked and file_id in self.folder_ids:
+                    self.folder_ids.discard(file_id)
+                    changed = True
+
+    def poll(self) -> List[Dict]:
+        """
+        Lấy các video mới hoặc được sửa trong folder kể từ lần commit trước
+
+        Token mới chỉ được lưu khi gọi commit() sau khi xử lý xong, nên nếu
+        daemon dừng giữa chừng thì lần sau các video này vẫn được lấy lại.
+
+        Returns:
+            Danh sách video (metadata Drive), mỗi video một lần
+        """
+        if self.page_token is None:
+            self.start()
+
+        changes, self._pending_token = self.source.list_changes(self.page_token)
+        if self.recursive:
+            self._update_folders(changes)
+
+        videos = {}
+        for change in changes:
+            file = change.get('file')
+            if change.get('removed') or not file:
+                videos.pop(change.get('fileId'), None)
+                continue
+            if file.get('trashed') or not self.folder_ids.intersection(file.get('parents', [])):
+                videos.pop(file['id'], None)
+                continue
+            if not is_video_file(file):
+                continue
+            # Cùng phiên bản đã đưa vào hàng đợi (ví dụ chỉ đổi quyền chia sẻ) thì bỏ qua
+            if file.get('modifiedTime') and self._seen_versions.get(file['id']) == file['modifiedTime']:
+                continue
+            videos[file['id']] = file
+
+        for file in videos.values():
+            self._seen_versions[file['id']] = file.get('modifiedTime')
+
+        if videos:
+            logger.info(f"🆕 Phát hiện {len(videos)} video mới/được sửa: {', '.join(v['name'] for v in videos.values())}")
+        return list(videos.values())
+
+    def mark_seen(self, videos: List[Dict]):
+        """
+        Ghi nhận các video đã được xử lý bằng cách khác (ví dụ lần quét đầu tiên)
+        để poll() không đưa lại cùng phiên bản
+
+        Args:
+            videos: Danh sách video từ Drive (id, modifiedTime)
+        """
+        for file in videos:
+            if file.get('modifiedTime'):
+                self._seen_versions[file['id']] = file['modifiedTime']
+
+    def commit(self):
+        """
+        Ghi nhận đã xử lý xong các thay đổi của lần poll() gần nhất
+        """
+        if self._pending_token is None:
+            return
+        self.page_token = self._pending_token
+        self._pending_token = None
+        self._save_token()
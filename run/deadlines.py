@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Deadlines
+Thời hạn (deadline) cho từng video và từng bước, hủy hợp tác (cooperative cancellation)
+
+Mỗi video có một budget thời gian tổng, mỗi bước có budget riêng. Deadline của
+bước đang chạy được gắn vào thread hiện tại, nên code bên trong (gọi HTTP,
+chạy FFmpeg) tự lấy timeout = min(timeout mặc định, thời gian còn lại):
+- HTTP request bị bỏ khi hết hạn (timeout của requests)
+- Process FFmpeg bị kill khi hết hạn hoặc khi deadline bị hủy
+- Các vòng lặp dài gọi check_deadline() để dừng sớm
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Khoảng thời gian kiểm tra deadline khi chờ subprocess (giây)
+_POLL_INTERVAL = 0.5
+
+_local = threading.local()
+
+
+class DeadlineExceeded(Exception):
+    """
+    Lỗi khi một video/bước vượt quá thời hạn hoặc bị hủy
+    """
+    pass
+
+
+class Deadline:
+    """
+    Thời hạn của một video hoặc một bước (có thể lồng trong deadline cha)
+    """
+
+    def __init__(self, seconds: Optional[float] = None, label: str = '', parent: 'Deadline' = None):
+        """
+        Args:
+            seconds: Budget thời gian (giây), None = không giới hạn
+            label: Tên để hiển thị trong thông báo lỗi (ví dụ "video1.mp4/transcribe")
+            parent: Deadline cha (deadline của video) - hết hạn/bị hủy thì con cũng vậy
+        """
+        self.seconds = seconds
+        self.label = label
+        self.parent = parent
+        self.expires_at = time.monotonic() + seconds if seconds else None
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> Optional[float]:
+        """
+        Thời gian còn lại (giây), None nếu không giới hạn
+        """
+        remaining = None
+        if self.expires_at is not None:
+            remaining = self.expires_at - time.monotonic()
+        if self.parent is not None:
+            parent_remaining = self.parent.remaining()
+            if parent_remaining is not None and (remaining is None or parent_remaining < remaining):
+                remaining = parent_remaining
+        return remaining
+
+    def cancel(self):
+        """
+        Hủy deadline (các bước đang chạy sẽ dừng ở lần kiểm tra tiếp theo)
+        """
+        self._cancelled.set()
+
+    def cancelled(self) -> bool:
+        """
+        Deadline (hoặc deadline cha) đã bị hủy chưa
+        """
+        return self._cancelled.is_set() or (self.parent is not None and self.parent.cancelled())
+
+    def expired(self) -> bool:
+        """
+        Đã hết hạn hoặc bị hủy chưa
+        """
+        if self.cancelled():
+            return True
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def check(self):
+        """
+        Raise DeadlineExceeded nếu đã hết hạn hoặc bị hủy
+        """
+        if self.cancelled():
+            raise DeadlineExceeded(f"Đã hủy: {self._describe()}")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(f"Quá thời hạn: {self._describe()}")
+
+    def _describe(self) -> str:
+        """
+        Mô tả deadline nào trong chuỗi đã hết hạn
+        """
+        parts = []
+        deadline = self
+        while deadline is not None:
+            if deadline.seconds:
+                parts.append(f"{deadline.label} ({deadline.seconds:g}s)")
+            deadline = deadline.parent
+        return " < ".join(parts) or self.label
+
+
+def current_deadline() -> Optional[Deadline]:
+    """
+    Deadline gắn với thread hiện tại (None nếu không có)
+    """
+    return getattr(_local, 'deadline', None)
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline):
+    """
+    Gắn deadline vào thread hiện tại trong phạm vi with
+
+    Args:
+        deadline: Deadline của bước đang chạy
+    """
+    previous = current_deadline()
+    _local.deadline = deadline
+    try:
+        yield deadline
+    finally:
+        _local.deadline = previous
+
+
+def check_deadline():
+    """
+    Raise DeadlineExceeded nếu deadline của thread hiện tại đã hết hạn/bị hủy
+    """
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.check()
+
+
+def effective_timeout(default: Optional[float]) -> Optional[float]:
+    """
+    Timeout thực tế cho một thao tác: min(timeout mặc định, thời gian còn lại)
+
+    Args:
+        default: Timeout mặc định của thao tác (giây)
+
+    Returns:
+        Timeout (giây)
+
+    Raises:
+        DeadlineExceeded: Nếu deadline đã hết hạn
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return default
+
+    deadline.check()
+    remaining = deadline.remaining()
+    if remaining is None:
+        return default
+    if default is None:
+        return remaining
+    return min(default, remaining)
+
+
+def run_subprocess(cmd: List[str], timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+    """
+    Chạy subprocess (FFmpeg) có thể bị hủy theo deadline
+
+    Tương đương subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    nhưng process bị kill ngay khi deadline của thread hết hạn hoặc bị hủy.
+
+    Args:
+        cmd: Lệnh cần chạy
+        timeout: Timeout mặc định (giây)
+
+    Returns:
+        subprocess.CompletedProcess
+
+    Raises:
+        subprocess.TimeoutExpired: Nếu vượt timeout mặc định
+        DeadlineExceeded: Nếu deadline hết hạn/bị hủy trong lúc chạy
+    """
+    deadline = current_deadline()
+    timeout = effective_timeout(timeout)
+    end_time = time.monotonic() + timeout if timeout is not None else None
+
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    while True:
+        wait = _POLL_INTERVAL
+        if end_time is not None:
+            wait = max(0.0, min(wait, end_time - time.monotonic()))
+        try:
+            stdout, stderr = process.communicate(timeout=wait)
+            break
+        except subprocess.TimeoutExpired:
+            deadline_hit = deadline is not None and deadline.expired()
+            timeout_hit = end_time is not None and time.monotonic() >= end_time
+            if not deadline_hit and not timeout_hit:
+                continue
+
+            process.kill()
+            process.communicate()
+            logger.warning(f"🛑 Đã dừng process {cmd[0]} (quá thời hạn)")
+            if deadline_hit:
+                deadline.check()
+            raise subprocess.TimeoutExpired(cmd, timeout)
+
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+class _PipeClosed(Exception):
+    """
+    Process đã đóng stdin (thoát sớm hoặc bị kill) trong lúc đang ghi dữ liệu vào
+    """
+
+
+def run_subprocess_streaming(cmd: List[str], feed: Callable[[Callable[[bytes], None]], None],
+                             timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+    """
+    Chạy subprocess (FFmpeg đọc "-i pipe:0") và ghi dữ liệu vào stdin trong lúc nó chạy
+
+    feed(write) chạy trong thread hiện tại và gọi write(bytes) cho từng đoạn dữ liệu
+    (ví dụ từng đoạn video tải từ Drive). stdout/stderr được đọc trong thread riêng để
+    process không bị chặn vì đầy pipe. Process bị kill khi deadline hết hạn/bị hủy
+    hoặc vượt timeout, kể cả khi đang chặn ở write.
+
+    Args:
+        cmd: Lệnh cần chạy
+        feed: Hàm ghi dữ liệu vào stdin của process
+        timeout: Timeout mặc định (giây)
+
+    Returns:
+        subprocess.CompletedProcess (stdout/stderr dạng text). Process thoát sớm
+        (đóng stdin trước khi feed ghi xong) thì trả về returncode của nó.
+
+    Raises:
+        subprocess.TimeoutExpired: Nếu vượt timeout mặc định
+        DeadlineExceeded: Nếu deadline hết hạn/bị hủy trong lúc chạy
+        Exception: Lỗi của feed (process bị kill trước khi raise)
+    """
+    deadline = current_deadline()
+    timeout = effective_timeout(timeout)
+    end_time = time.monotonic() + timeout if timeout is not None else None
+
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output = {}
+
+    def read(name, stream):
+        output[name] = stream.read().decode('utf-8', errors='replace')
+
+    readers = [threading.Thread(target=read, args=(name, stream), daemon=True)
+               for name, stream in (('stdout', process.stdout), ('stderr', process.stderr))]
+    for reader in readers:
+        reader.start()
+
+    killed = threading.Event()
+
+    def watchdog():
+        while process.poll() is None:
+            if ((deadline is not None and deadline.expired())
+                    or (end_time is not None and time.monotonic() >= end_time)):
+                killed.set()
+                process.kill()
+                return
+            time.sleep(_POLL_INTERVAL / 5)
+
+    threading.Thread(target=watchdog, daemon=True).start()
+
+    def write(data: bytes):
+        try:
+            process.stdin.write(data)
+        except OSError as e:  # BrokenPipeError (Linux) / EINVAL (Windows)
+            raise _PipeClosed() from e
+
+    try:
+        feed(write)
+    except _PipeClosed:
+        pass
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+
+    process.wait()
+    for reader in readers:
+        reader.join()
+
+    if killed.is_set():
+        logger.warning(f"🛑 Đã dừng process {cmd[0]} (quá thời hạn)")
+        if deadline is not None:
+            deadline.check()
+        raise subprocess.TimeoutExpired(cmd, timeout)
+
+    return subprocess.CompletedProcess(cmd, process.returncode, output.get('stdout', ''), output.get('stderr', ''))
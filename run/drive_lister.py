@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Drive Lister
+Liệt kê video trong folder Google Drive theo từng trang, có thể duyệt cả thư mục con
+
+Thay cho một lần gọi files().list không có pageToken (chỉ lấy được trang đầu,
+tối đa 100 file): mỗi folder được đọc hết các trang với pageSize lớn và chỉ lấy
+các trường cần dùng. Khi bật recursive, các thư mục con được liệt kê song song
+trong worker pool. iter_videos() là generator: video được trả về ngay khi trang
+chứa nó về tới, không phải chờ liệt kê xong cả cây thư mục.
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List
+
+from video_files import FOLDER_MIME_TYPE, VIDEO_EXTENSIONS, is_folder, is_video_file
+
+logger = logging.getLogger(__name__)
+
+# Chỉ lấy các trường cần cho xử lý video (thời lượng dùng cho scheduler)
+LIST_FIELDS = "nextPageToken,files(id,name,size,mimeType,modifiedTime,videoMediaMetadata(durationMillis))"
+
+# pageSize tối đa Drive API cho phép
+MAX_PAGE_SIZE = 1000
+
+
+def build_query(folder_id: str, include_folders: bool = False) -> str:
+    """
+    Query files().list lấy video (chưa bị xóa) trong một folder
+
+    Args:
+        folder_id: ID folder trên Google Drive
+        include_folders: Lấy cả thư mục con (để duyệt đệ quy)
+
+    Returns:
+        Chuỗi query của Drive API
+    """
+    conditions = ["mimeType contains 'video/'"] + [f"name contains '{ext}'" for ext in VIDEO_EXTENSIONS]
+    if include_folders:
+        conditions.append(f"mimeType = '{FOLDER_MIME_TYPE}'")
+    return f"'{folder_id}' in parents and trashed = false and ({' or '.join(conditions)})"
+
+
+class DriveLister:
+    """
+    Liệt kê video của folder Drive theo trang (tùy chọn duyệt thư mục con song song)
+
+    Không giữ trạng thái giữa các lần liệt kê: nhiều thread có thể dùng chung một lister.
+    """
+
+    def __init__(self, service_factory: Callable, execute: Callable = None, page_size: int = MAX_PAGE_SIZE,
+                 recursive: bool = False, workers: int = 4):
+        """
+        Args:
+            service_factory: Hàm trả Drive service cho thread đang chạy
+                             (service của googleapiclient không dùng chung giữa các thread được)
+            execute: Hàm chạy một request và trả response (None = request.execute(),
+                     ví dụ truyền hàm gọi qua rate limiter)
+            page_size: Số file mỗi trang (tối đa 1000)
+            recursive: Duyệt cả thư mục con
+            workers: Số folder liệt kê cùng lúc khi recursive
+        """
+        self.service_factory = service_factory
+        self.execute = execute or (lambda request: request.execute())
+        self.page_size = max(1, min(MAX_PAGE_SIZE, page_size))
+        self.recursive = recursive
+        self.workers = max(1, workers)
+
+    def list_videos(self, folder_id: str) -> List[Dict]:
+        """
+        Danh sách tất cả video (đọc hết generator iter_videos)
+        """
+        return list(self.iter_videos(folder_id))
+
+    def iter_videos(self, folder_id: str) -> Iterator[Dict]:
+        """
+        Trả từng video trong folder (và thư mục con nếu recursive) ngay khi liệt kê được
+
+        Thứ tự: theo tên trong từng folder; giữa các folder con không cố định.
+        Video có nhiều parent chỉ được trả một lần.
+
+        Args:
+            folder_id: ID folder gốc
+
+        Yields:
+            Metadata video (id, name, size, mimeType, modifiedTime, videoMediaMetadata)
+
+        Raises:
+            Exception: Lỗi khi liệt kê folder gốc (lỗi ở thư mục con chỉ được ghi log)
+        """
+        if not self.recursive or self.workers <= 1:
+            yield from self._iter_sequential(folder_id)
+        else:
+            yield from self._iter_concurrent(folder_id)
+
+    def _iter_sequential(self, folder_id: str) -> Iterator[Dict]:
+        """
+        Liệt kê từng folder một trong thread đang gọi
+        """
+        pending = [folder_id]
+        visited = {folder_id}
+        seen = set()
+        while pending:
+            current = pending.pop(0)
+            try:
+                for page in self._iter_pages(current):
+                    for file in page:
+                        if is_folder(file):
+                            if self.recursive and file['id'] not in visited:
+                                visited.add(file['id'])
+                                pending.append(file['id'])
+                        elif is_video_file(file) and file['id'] not in seen:
+                            seen.add(file['id'])
+                            yield file
+            except Exception as e:
+                if current == folder_id:
+                    raise
+                logger.warning(f"⚠️ Bỏ qua thư mục con {current}: {str(e)}")
+
+    def _iter_concurrent(self, folder_id: str) -> Iterator[Dict]:
+        """
+        Liệt kê các folder song song; thread đang gọi nhận từng trang qua hàng đợi
+        và giao thư mục con mới cho worker pool
+        """
+        pages = queue.Queue()
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='drive-list')
+
+        def list_folder(current: str):
+            try:
+                for page in self._iter_pages(current):
+                    if stop.is_set():
+                        break
+                    pages.put(('page', current, page))
+                pages.put(('done', current, None))
+            except BaseException as e:
+                pages.put(('error', current, e))
+
+        visited = {folder_id}
+        seen = set()
+        running = 1
+        executor.submit(list_folder, folder_id)
+        try:
+            while running:
+                kind, current, payload = pages.get()
+                if kind == 'done':
+                    running -= 1
+                elif kind == 'error':
+                    running -= 1
+                    if current == folder_id:
+                        raise payload
+                    logger.warning(f"⚠️ Bỏ qua thư mục con {current}: {str(payload)}")
+                else:
+                    for file in payload:
+                        if is_folder(file):
+                            if file['id'] not in visited:
+                                visited.add(file['id'])
+                                running += 1
+                                executor.submit(list_folder, file['id'])
+                        elif is_video_file(file) and file['id'] not in seen:
+                            seen.add(file['id'])
+                            yield file
+        finally:
+            # Người gọi dừng sớm (hoặc lỗi): không liệt kê thêm trang nào nữa
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def list_subfolders(self, folder_id: str) -> List[str]:
+        """
+        ID tất cả thư mục con (mọi cấp) của folder, ví dụ để chế độ watch theo dõi cả cây thư mục
+
+        Args:
+            folder_id: ID folder gốc
+
+        Returns:
+            List ID thư mục con (không gồm folder gốc; thư mục con lỗi được bỏ qua và ghi log)
+        """
+        pending = [folder_id]
+        visited = {folder_id}
+        while pending:
+            current = pending.pop(0)
+            query = f"'{current}' in parents and trashed = false and mimeType = '{FOLDER_MIME_TYPE}'"
+            try:
+                for page in self._iter_pages(current, query):
+                    for file in page:
+                        if file['id'] not in visited:
+                            visited.add(file['id'])
+                            pending.append(file['id'])
+            except Exception as e:
+                if current == folder_id:
+                    raise
+                logger.warning(f"⚠️ Bỏ qua thư mục con {current}: {str(e)}")
+        visited.discard(folder_id)
+        return sorted(visited)
+
+    def _iter_pages(self, folder_id: str, query: str = None) -> Iterator[List[Dict]]:
+        """
+        Đọc lần lượt các trang files().list của một folder (mặc định query build_query)
+        """
+        query = query or build_query(folder_id, include_folders=self.recursive)
+        page_token = None
+        page_count = 0
+        while True:
+            response = self.execute(self.service_factory().files().list(
+                q=query,
+                fields=LIST_FIELDS,
+                pageSize=self.page_size,
+                pageToken=page_token,
+                orderBy='name',
+                includeItemsFromAllDrives=True,
+                supportsAllDrives=True
+            ))
+            page_count += 1
+            yield response.get('files', [])
+
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+        if page_count > 1:
+            logger.info(f"📄 Folder {folder_id}: đã đọc {page_count} trang")
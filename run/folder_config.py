@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Folder Config
+Đọc danh sách folder input -> folder output + Google Sheet cho chế độ nhiều folder
+
+File cấu hình là JSON, mỗi phần tử là một folder (một khách hàng):
+
+    [
+        {
+            "name": "client-a",
+            "input_folder_id": "...",
+            "voice_folder_id": "...",
+            "text_original_folder_id": "...",
+            "text_rewritten_folder_id": "...",
+            "spreadsheet_id": "...",
+            "sheet_name": "Mp3 to text"
+        }
+    ]
+
+Chỉ input_folder_id là bắt buộc; các trường còn lại lấy theo giá trị mặc định
+(folder output và Google Sheet mặc định của main()).
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import json
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+FOLDER_CONFIG_KEYS = [
+    'input_folder_id',
+    'voice_folder_id',
+    'text_original_folder_id',
+    'text_rewritten_folder_id',
+    'spreadsheet_id',
+    'sheet_name'
+]
+
+
+def load_folder_configs(path: str, defaults: Dict = None) -> List[Dict]:
+    """
+    Đọc và kiểm tra file cấu hình nhiều folder
+
+    Args:
+        path: Đường dẫn file JSON
+        defaults: Giá trị mặc định cho các trường không khai báo
+
+    Returns:
+        Danh sách cấu hình folder (đủ các trường trong FOLDER_CONFIG_KEYS và 'name')
+
+    Raises:
+        ValueError: Nếu file sai định dạng, thiếu input_folder_id hoặc trùng tên
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"File cấu hình folder phải là danh sách không rỗng: {path}")
+
+    defaults = defaults or {}
+    configs = []
+    names = set()
+    for i, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict) or not entry.get('input_folder_id'):
+            raise ValueError(f"Folder thứ {i} thiếu input_folder_id")
+
+        config = {key: entry.get(key) or defaults.get(key) for key in FOLDER_CONFIG_KEYS}
+        missing = [key for key in FOLDER_CONFIG_KEYS if not config[key]]
+        if missing:
+            raise ValueError(f"Folder thứ {i} thiếu {', '.join(missing)}")
+
+        config['name'] = entry.get('name') or config['input_folder_id']
+        if config['name'] in names:
+            raise ValueError(f"Trùng tên folder: {config['name']}")
+        names.add(config['name'])
+        configs.append(config)
+
+    logger.info(f"📁 Đọc {len(configs)} folder từ {path}")
+    return configs
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Job API
+HTTP service nội bộ nhận yêu cầu xử lý video và chạy trong worker pool nền
+
+Thay cho việc mỗi biên tập viên chạy run_video_processor.bat (khởi động Python
+và xác thực OAuth lại từ đầu): một process giữ sẵn processor, nhận job qua HTTP
+và trả job ID ngay, việc xử lý chạy trong nền.
+
+Endpoint (JSON):
+- POST /jobs                  Gửi job, trả 202 {"job_id": ...}
+    {"folder_id": "...",      Folder input (mặc định folder cấu hình sẵn)
+     "file_ids": ["..."],     Chỉ xử lý các file này (mặc định: video mới trong folder)
+     "from_stage": "rewrite", Chạy lại từ stage này (hoặc "only_stages": ["format", ...])
+     "pipeline": true}        Xử lý chồng lấp qua pipeline
+- GET  /jobs                  Danh sách job (không kèm kết quả)
+- GET  /jobs/<id>             Trạng thái job: queued, running, done, error
+- GET  /jobs/<id>/result      Kết quả từng video (409 nếu job chưa xong)
+- GET  /health                Kiểm tra service còn chạy
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Key của kết quả video được trả qua API (không lộ đường dẫn file tạm trên máy chủ)
+PUBLIC_RESULT_KEYS = ['status', 'video_name', 'error', 'failure_kind', 'video_file_id', 'voice_file_id',
+                      'text_file_id', 'rewritten_text_file_id', 'prompt_hash']
+
+# Dung lượng body tối đa của một yêu cầu (byte)
+MAX_BODY_BYTES = 64 * 1024
+
+
+def validate_submission(payload, stages: List[str] = None) -> Dict:
+    """
+    Kiểm tra và chuẩn hóa nội dung một yêu cầu gửi job
+
+    Args:
+        payload: JSON đã parse từ body
+        stages: Các stage được phép chạy lại (None = không cho chạy lại stage)
+
+    Returns:
+        Dict yêu cầu đã chuẩn hóa
+
+    Raises:
+        ValueError: Nếu yêu cầu không hợp lệ
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Body phải là JSON object")
+
+    unknown = set(payload) - {'folder_id', 'file_ids', 'from_stage', 'only_stages', 'pipeline'}
+    if unknown:
+        raise ValueError(f"Trường không hỗ trợ: {', '.join(sorted(unknown))}")
+
+    folder_id = payload.get('folder_id')
+    if folder_id is not None and (not isinstance(folder_id, str) or not folder_id.strip()):
+        raise ValueError("folder_id phải là chuỗi")
+
+    file_ids = payload.get('file_ids')
+    if file_ids is not None:
+        if (not isinstance(file_ids, list) or not file_ids
+                or not all(isinstance(file_id, str) and file_id.strip() for file_id in file_ids)):
+            raise ValueError("file_ids phải là danh sách ID không rỗng")
+        file_ids = list(dict.fromkeys(file_id.strip() for file_id in file_ids))
+
+    from_stage = payload.get('from_stage')
+    only_stages = payload.get('only_stages')
+    if from_stage is not None and only_stages is not None:
+        raise ValueError("Chỉ dùng một trong from_stage và only_stages")
+    requested = [from_stage] if from_stage is not None else (only_stages or [])
+    if not isinstance(requested, list):
+        raise ValueError("only_stages phải là danh sách")
+    invalid = [stage for stage in requested if stage not in (stages or [])]
+    if invalid:
+        raise ValueError(f"Stage không hợp lệ: {invalid} (cho phép: {', '.join(stages or [])})")
+
+    return {
+        'folder_id': folder_id.strip() if folder_id else None,
+        'file_ids': file_ids,
+        'from_stage': from_stage,
+        'only_stages': list(only_stages) if only_stages else None,
+        'pipeline': bool(payload.get('pipeline', False))
+    }
+
+
+class JobStore:
+    """
+    Danh sách job của API trong bộ nhớ (an toàn khi nhiều thread cùng dùng)
+    """
+
+    def __init__(self, max_finished: int = 1000):
+        """
+        Args:
+            max_finished: Số job đã xong giữ lại tối đa (job cũ nhất bị bỏ trước)
+        """
+        self.max_finished = max_finished
+        self._jobs = {}  # job_id -> dict job (theo thứ tự gửi)
+        self._lock = threading.Lock()
+
+    def add(self, request: Dict) -> Dict:
+        """
+        Thêm job mới ở trạng thái queued
+
+        Returns:
+            Bản sao job (không kèm kết quả)
+        """
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'status': 'queued',
+            'request': request,
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'error': None,
+            'results': None
+        }
+        with self._lock:
+            self._jobs[job['job_id']] = job
+            self._evict_finished()
+            return self._summary(job)
+
+    def update(self, job_id: str, **fields):
+        """
+        Cập nhật trạng thái job (status, started_at, finished_at, error, results)
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+                self._evict_finished()
+
+    def get(self, job_id: str, with_results: bool = False) -> Optional[Dict]:
+        """
+        Bản sao job (None nếu không có)
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            summary = self._summary(job)
+            if with_results:
+                summary['results'] = job['results']
+            return summary
+
+    def list(self) -> List[Dict]:
+        """
+        Bản sao tất cả job (không kèm kết quả), theo thứ tự gửi
+        """
+        with self._lock:
+            return [self._summary(job) for job in self._jobs.values()]
+
+    def _summary(self, job: Dict) -> Dict:
+        """
+        Thông tin job trả qua API (gọi khi đang giữ lock)
+        """
+        summary = {key: value for key, value in job.items() if key != 'results'}
+        summary['request'] = dict(job['request'])
+        if job['results'] is not None:
+            summary['video_count'] = len(job['results'])
+            summary['success_count'] = len([r for r in job['results'] if r.get('status') == 'success'])
+        return summary
+
+    def _evict_finished(self):
+        """
+        Bỏ các job đã xong cũ nhất khi vượt max_finished (gọi khi đang giữ lock)
+        """
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in ('done', 'error')]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+
+class JobApiServer:
+    """
+    HTTP server nhận job và chạy runner trong worker pool nền
+    """
+
+    def __init__(self, runner: Callable[[Dict], List[Dict]], host: str = '127.0.0.1', port: int = 8765,
+                 workers: int = 2, stages: List[str] = None):
+        """
+        Args:
+            runner: Hàm xử lý một yêu cầu đã chuẩn hóa (xem validate_submission), trả list kết quả video
+            host: Địa chỉ lắng nghe (mặc định chỉ máy local)
+            port: Cổng lắng nghe (0 = cổng bất kỳ còn trống)
+            workers: Số job xử lý cùng lúc
+            stages: Các stage được phép chạy lại
+        """
+        self.runner = runner
+        self.stages = list(stages or [])
+        self.workers = max(1, workers)
+        self.store = JobStore()
+        self._executor = None
+        self._server = ThreadingHTTPServer((host, port), _JobApiHandler)
+        self._server.daemon_threads = True
+        self._server.api = self
+        self._thread = None
+
+    @property
+    def address(self) -> str:
+        """
+        Địa chỉ http://host:port đang lắng nghe
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """
+        Bắt đầu worker pool và nhận request trong thread nền
+        """
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='api-job')
+        self._thread = threading.Thread(target=self._server.serve_forever, name='job-api', daemon=True)
+        self._thread.start()
+        logger.info(f"🌐 Job API đang chạy tại {self.address} ({self.workers} worker)")
+
+    def stop(self, wait: bool = True):
+        """
+        Ngừng nhận request; chờ các job đã nhận chạy xong nếu wait=True
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+        logger.info("🛑 Job API đã dừng")
+
+    def submit(self, payload) -> Dict:
+        """
+        Nhận một yêu cầu và đưa vào hàng đợi của worker pool
+
+        Returns:
+            Thông tin job vừa tạo (status queued)
+
+        Raises:
+            ValueError: Nếu yêu cầu không hợp lệ
+            RuntimeError: Nếu worker pool đã dừng (job được đánh dấu error)
+        """
+        request = validate_submission(payload, self.stages)
+        job = self.store.add(request)
+        try:
+            self._executor.submit(self._run, job['job_id'], request)
+        except RuntimeError as e:
+            # Không worker nào chạy job này -> không để nó nằm ở queued mãi
+            self.store.update(job['job_id'], status='error', error=str(e), finished_at=time.time())
+            raise
+        logger.info(f"📥 Nhận job {job['job_id']}: {request}")
+        return job
+
+    def _run(self, job_id: str, request: Dict):
+        """
+        Chạy runner cho một job và lưu kết quả
+        """
+        self.store.update(job_id, status='running', started_at=time.time())
+        try:
+            results = self.runner(request) or []
+        except Exception as e:
+            logger.error(f"❌ Job {job_id} lỗi: {str(e)}")
+            self.store.update(job_id, status='error', error=str(e), finished_at=time.time())
+            return
+
+        public = [{key: result.get(key) for key in PUBLIC_RESULT_KEYS if key in result} for result in results]
+        self.store.update(job_id, status='done', results=public, finished_at=time.time())
+        logger.info(f"✅ Job {job_id} xong: {len(public)} video")
+
+
+class _JobApiHandler(BaseHTTPRequestHandler):
+    """
+    Xử lý request HTTP của JobApiServer
+    """
+
+    def do_GET(self):
+        api = self.server.api
+        parts = [part for part in self.path.split('?')[0].split('/') if part]
+
+        if parts == ['health']:
+            self._send(200, {'status': 'ok'})
+        elif parts == ['jobs']:
+            self._send(200, {'jobs': api.store.list()})
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = api.store.get(parts[1])
+            if job is None:
+                self._send(404, {'error': 'Không tìm thấy job'})
+            else:
+                self._send(200, job)
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'result':
+            job = api.store.get(parts[1], with_results=True)
+            if job is None:
+                self._send(404, {'error': 'Không tìm thấy job'})
+            elif job['status'] not in ('done', 'error'):
+                self._send(409, {'error': 'Job chưa xong', 'status': job['status']})
+            else:
+                self._send(200, job)
+        else:
+            self._send(404, {'error': 'Không có endpoint này'})
+
+    def do_POST(self):
+        api = self.server.api
+        if self.path.split('?')[0].rstrip('/') != '/jobs':
+            self._send(404, {'error': 'Không có endpoint này'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0 or length > MAX_BODY_BYTES:
+            self._send(413 if length > 0 else 400, {'error': 'Body không hợp lệ'})
+            return
+
+        try:
+            payload = json.loads(self.rfile.read(length).decode('utf-8') or '{}')
+            job = api.submit(payload)
+        except ValueError as e:  # Gồm cả json.JSONDecodeError
+            self._send(400, {'error': str(e)})
+            return
+        except RuntimeError as e:  # Worker pool đã dừng
+            self._send(503, {'error': str(e)})
+            return
+
+        self._send(202, {'job_id': job['job_id'], 'status': job['status']})
+
+    def _send(self, status: int, body: Dict):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(f"🌐 {self.address_string()} {format % args}")
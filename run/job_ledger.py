@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Job Ledger
+Sổ ghi tiến độ xử lý từng video trong SQLite (checkpoint theo từng bước)
+
+Mỗi bước xử lý xong được ghi lại cùng output của nó: Drive file ID, ngôn ngữ,
+nội dung các file text (transcript, bản dịch, bản viết lại, bản format) và
+hash SHA-256 của artifact. Khi chạy lại sau crash/Ctrl+C, video được tiếp tục
+từ bước chưa hoàn thành thay vì gọi lại Deepgram/Gemini từ đầu.
+
+Video lỗi được ghi vào hàng đợi thử lại (bảng retries): chờ thử lại theo
+backoff hoặc nằm trong dead-letter kèm lý do (xem retry_queue).
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(path: str) -> str:
+    """
+    Tính hash SHA-256 của một file
+
+    Args:
+        path: Đường dẫn file
+
+    Returns:
+        Chuỗi hex của hash
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_RETRY_COLUMNS = 'video_file_id, video_name, status, kind, failed_step, attempts, reason, next_attempt_at, updated_at'
+
+
+def _retry_dict(row) -> Dict:
+    """
+    Chuyển một dòng bảng retries thành dict
+    """
+    return dict(zip(_RETRY_COLUMNS.split(', '), row))
+
+
+class JobLedger:
+    """
+    Lưu trạng thái từng bước của từng video vào SQLite (an toàn khi dùng nhiều thread)
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: Đường dẫn file SQLite (tự tạo nếu chưa có)
+        """
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        """
+        Tạo bảng nếu chưa có
+        """
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS videos (
+                    video_file_id TEXT PRIMARY KEY,
+                    video_name TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    sheet_written INTEGER NOT NULL DEFAULT 0,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS video_steps (
+                    video_file_id TEXT NOT NULL,
+                    step TEXT NOT NULL,
+                    outputs TEXT NOT NULL,
+                    artifacts TEXT NOT NULL,
+                    completed_at TEXT NOT NULL,
+                    PRIMARY KEY (video_file_id, step)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS retries (
+                    video_file_id TEXT PRIMARY KEY,
+                    video_name TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    failed_step TEXT,
+                    attempts INTEGER NOT NULL,
+                    reason TEXT,
+                    next_attempt_at REAL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+
+    def record_step(self, video_file_id: str, video_name: str, step: str,
+                    values: Dict, text_files: Dict = None, media_files: Dict = None):
+        """
+        Ghi nhận một bước đã hoàn thành
+
+        Args:
+            video_file_id: ID file video trên Drive
+            video_name: Tên video
+            step: Tên bước
+            values: Output dạng giá trị (Drive ID, ngôn ngữ, ...) - phải serialize được JSON
+            text_files: Output dạng file text {key: path} - lưu cả nội dung để khôi phục
+            media_files: Output dạng file media {key: path} - chỉ lưu đường dẫn và hash
+        """
+        artifacts = {}
+        for key, path in (text_files or {}).items():
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            artifacts[key] = {
+                'kind': 'text',
+                'path': path,
+                'content': content,
+                'sha256': hashlib.sha256(content.encode('utf-8')).hexdigest()
+            }
+        for key, path in (media_files or {}).items():
+            artifacts[key] = {
+                'kind': 'media',
+                'path': path,
+                'sha256': file_sha256(path) if os.path.exists(path) else None
+            }
+
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO videos (video_file_id, video_name, status, updated_at)
+                VALUES (?, ?, 'running', ?)
+                ON CONFLICT(video_file_id) DO UPDATE SET
+                    video_name = excluded.video_name,
+                    status = 'running',
+                    error = NULL,
+                    updated_at = excluded.updated_at
+            """, (video_file_id, video_name, now))
+            self._conn.execute("""
+                INSERT OR REPLACE INTO video_steps (video_file_id, step, outputs, artifacts, completed_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (video_file_id, step, json.dumps(values, ensure_ascii=False),
+                  json.dumps(artifacts, ensure_ascii=False), now))
+
+    def get_completed_steps(self, video_file_id: str) -> Dict[str, Dict]:
+        """
+        Lấy các bước đã hoàn thành của một video
+
+        Args:
+            video_file_id: ID file video trên Drive
+
+        Returns:
+            Dict {step: {'values': {...}, 'artifacts': {...}}}
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT step, outputs, artifacts FROM video_steps WHERE video_file_id = ?",
+                (video_file_id,)
+            ).fetchall()
+
+        return {
+            step: {'values': json.loads(outputs), 'artifacts': json.loads(artifacts)}
+            for step, outputs, artifacts in rows
+        }
+
+    def clear_steps(self, video_file_id: str, steps: List[str]):
+        """
+        Xóa checkpoint của các bước (để các bước đó chạy lại)
+
+        Args:
+            video_file_id: ID file video trên Drive
+            steps: Danh sách tên bước
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM video_steps WHERE video_file_id = ? AND step = ?",
+                [(video_file_id, step) for step in steps]
+            )
+
+    def mark_video(self, video_file_id: str, video_name: str, status: str, error: Optional[str] = None):
+        """
+        Cập nhật trạng thái tổng của video (success/error)
+
+        Args:
+            video_file_id: ID file video trên Drive
+            video_name: Tên video
+            status: Trạng thái
+            error: Thông báo lỗi (nếu có)
+        """
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO videos (video_file_id, video_name, status, error, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(video_file_id) DO UPDATE SET
+                    video_name = excluded.video_name,
+                    status = excluded.status,
+                    error = excluded.error,
+                    updated_at = excluded.updated_at
+            """, (video_file_id, video_name, status, error, now))
+
+    def mark_sheet_written(self, video_file_ids: List[str], written: bool = True):
+        """
+        Đánh dấu các video đã được ghi vào Google Sheets
+
+        Args:
+            video_file_ids: Danh sách ID file video
+            written: False để bỏ đánh dấu (video được xử lý lại từ đầu)
+        """
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE videos SET sheet_written = ?, updated_at = ? WHERE video_file_id = ?",
+                [(int(written), now, video_file_id) for video_file_id in video_file_ids]
+            )
+
+    def get_video(self, video_file_id: str) -> Optional[Dict]:
+        """
+        Lấy trạng thái tổng của một video
+
+        Args:
+            video_file_id: ID file video trên Drive
+
+        Returns:
+            Dict trạng thái hoặc None nếu chưa có trong ledger
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT video_name, status, error, sheet_written, updated_at FROM videos WHERE video_file_id = ?",
+                (video_file_id,)
+            ).fetchone()
+
+        if row is None:
+            return None
+        return {
+            'video_file_id': video_file_id,
+            'video_name': row[0],
+            'status': row[1],
+            'error': row[2],
+            'sheet_written': bool(row[3]),
+            'updated_at': row[4]
+        }
+
+    def set_retry(self, video_file_id: str, video_name: str, kind: str, attempts: int,
+                  reason: str, failed_step: Optional[str] = None, next_attempt_at: Optional[float] = None):
+        """
+        Ghi video lỗi vào hàng đợi thử lại (hoặc dead-letter nếu không thử lại nữa)
+
+        Args:
+            video_file_id: ID file video trên Drive
+            video_name: Tên video
+            kind: Loại lỗi (xem retry_queue.classify_failure)
+            attempts: Số lần đã lỗi
+            reason: Thông báo lỗi / lý do dead-letter
+            failed_step: Bước bị lỗi
+            next_attempt_at: Thời điểm được thử lại (time.time()); None = dead-letter
+        """
+        status = 'pending' if next_attempt_at is not None else 'dead'
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT OR REPLACE INTO retries (video_file_id, video_name, status, kind, failed_step,
+                                                attempts, reason, next_attempt_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (video_file_id, video_name, status, kind, failed_step, attempts, reason, next_attempt_at, now))
+
+    def get_retry(self, video_file_id: str) -> Optional[Dict]:
+        """
+        Lấy trạng thái thử lại của một video
+
+        Args:
+            video_file_id: ID file video trên Drive
+
+        Returns:
+            Dict trạng thái hoặc None nếu video không nằm trong hàng đợi
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_RETRY_COLUMNS} FROM retries WHERE video_file_id = ?", (video_file_id,)
+            ).fetchone()
+        return _retry_dict(row) if row else None
+
+    def list_retries(self, status: Optional[str] = None) -> List[Dict]:
+        """
+        Danh sách video trong hàng đợi thử lại
+
+        Args:
+            status: 'pending' (chờ thử lại), 'dead' (dead-letter) hoặc None (tất cả)
+
+        Returns:
+            List dict trạng thái, cũ nhất trước
+        """
+        with self._lock:
+            if status is None:
+                rows = self._conn.execute(
+                    f"SELECT {_RETRY_COLUMNS} FROM retries ORDER BY updated_at").fetchall()
+            else:
+                rows = self._conn.execute(
+                    f"SELECT {_RETRY_COLUMNS} FROM retries WHERE status = ? ORDER BY updated_at", (status,)
+                ).fetchall()
+        return [_retry_dict(row) for row in rows]
+
+    def clear_retry(self, video_file_ids: List[str]):
+        """
+        Bỏ video khỏi hàng đợi thử lại (đã xử lý thành công hoặc được đưa ra khỏi dead-letter)
+
+        Args:
+            video_file_ids: Danh sách ID file video
+        """
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM retries WHERE video_file_id = ?",
+                                   [(video_file_id,) for video_file_id in video_file_ids])
+
+    def close(self):
+        """
+        Đóng kết nối SQLite
+        """
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lease Queue
+Hàng đợi video dùng chung cho nhiều worker (nhiều process/nhiều máy)
+
+Hàng đợi nằm trong một file SQLite dùng chung. Worker nhận (claim) video bằng
+lease có thời hạn và gia hạn định kỳ (heartbeat). Worker chết thì lease hết
+hạn và video được đưa lại vào hàng đợi cho worker khác. Mỗi video chỉ được
+một worker xử lý tại một thời điểm -> không tốn phí Deepgram/Gemini hai lần.
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_id() -> str:
+    """
+    ID worker mặc định: hostname-pid
+    """
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseQueue:
+    """
+    Hàng đợi video với lease có thời hạn, lưu trong SQLite
+    """
+
+    def __init__(self, db_path: str, worker_id: str = None, lease_seconds: int = 300):
+        """
+        Args:
+            db_path: Đường dẫn file SQLite dùng chung giữa các worker
+            worker_id: ID của worker này (mặc định hostname-pid)
+            lease_seconds: Thời hạn lease, hết hạn mà không heartbeat thì video được trả lại hàng đợi
+        """
+        self.db_path = db_path
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = max(1, int(lease_seconds))
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._create_tables()
+
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_thread = None
+
+    def _create_tables(self):
+        """
+        Tạo bảng nếu chưa có
+        """
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS video_queue (
+                    video_file_id TEXT PRIMARY KEY,
+                    video_name TEXT NOT NULL,
+                    video_info TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    worker_id TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS named_locks (
+                    name TEXT PRIMARY KEY,
+                    worker_id TEXT NOT NULL,
+                    lease_expires REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Transaction ghi độc quyền (BEGIN IMMEDIATE) để các worker không claim trùng
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, videos: List[Dict]) -> int:
+        """
+        Thêm video vào hàng đợi
+
+        Video đã có trong hàng đợi thì bỏ qua, trừ video thất bại ở lần chạy
+        trước (status 'failed') được đưa lại vào hàng đợi để thử lại.
+
+        Args:
+            videos: Danh sách video từ Drive (id, name, ...)
+
+        Returns:
+            Số video mới được thêm hoặc đưa lại vào hàng đợi
+        """
+        now = datetime.now().isoformat()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany("""
+                INSERT OR IGNORE INTO video_queue (video_file_id, video_name, video_info, status, updated_at)
+                VALUES (?, ?, ?, 'queued', ?)
+            """, [(video['id'], video['name'], json.dumps(video, ensure_ascii=False), now) for video in videos])
+            conn.executemany("""
+                UPDATE video_queue SET status = 'queued', worker_id = NULL, error = NULL, updated_at = ?
+                WHERE video_file_id = ? AND status = 'failed'
+            """, [(now, video['id']) for video in videos])
+            return conn.total_changes - before
+
+    def claim(self) -> Optional[Dict]:
+        """
+        Nhận video tiếp theo (đưa lại vào hàng đợi các lease đã hết hạn trước)
+
+        Returns:
+            Thông tin video (dict từ Drive) hoặc None nếu không còn video chờ
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            expired = conn.execute("""
+                SELECT video_name, worker_id FROM video_queue
+                WHERE status = 'leased' AND lease_expires < ?
+            """, (now,)).fetchall()
+            for video_name, worker_id in expired:
+                logger.warning(f"⏰ Lease của {worker_id} cho {video_name} đã hết hạn, đưa lại vào hàng đợi")
+            conn.execute("""
+                UPDATE video_queue SET status = 'queued', worker_id = NULL, lease_expires = NULL
+                WHERE status = 'leased' AND lease_expires < ?
+            """, (now,))
+
+            row = conn.execute("""
+                SELECT video_file_id, video_info FROM video_queue
+                WHERE status = 'queued' ORDER BY rowid LIMIT 1
+            """).fetchone()
+            if row is None:
+                return None
+
+            conn.execute("""
+                UPDATE video_queue
+                SET status = 'leased', worker_id = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?
+                WHERE video_file_id = ?
+            """, (self.worker_id, now + self.lease_seconds, datetime.now().isoformat(), row[0]))
+            return json.loads(row[1])
+
+    def renew_leases(self) -> int:
+        """
+        Gia hạn tất cả lease đang giữ bởi worker này
+
+        Returns:
+            Số lease được gia hạn
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                UPDATE video_queue SET lease_expires = ?
+                WHERE status = 'leased' AND worker_id = ?
+            """, (time.time() + self.lease_seconds, self.worker_id))
+            conn.execute("""
+                UPDATE named_locks SET lease_expires = ? WHERE worker_id = ?
+            """, (time.time() + self.lease_seconds, self.worker_id))
+            return cursor.rowcount
+
+    def complete(self, video_file_id: str, success: bool = True, error: str = None) -> bool:
+        """
+        Đánh dấu video đã xử lý xong (chỉ khi worker này còn giữ lease)
+
+        Args:
+            video_file_id: ID file video
+            success: True nếu thành công, False nếu thất bại
+            error: Thông báo lỗi (nếu có)
+
+        Returns:
+            False nếu lease đã bị worker khác lấy (hết hạn trong lúc xử lý)
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute("""
+                UPDATE video_queue
+                SET status = ?, error = ?, lease_expires = NULL, updated_at = ?
+                WHERE video_file_id = ? AND worker_id = ? AND status = 'leased'
+            """, ('done' if success else 'failed', error, datetime.now().isoformat(),
+                  video_file_id, self.worker_id))
+            if cursor.rowcount == 0:
+                logger.warning(f"⚠️ Worker {self.worker_id} không còn giữ lease của {video_file_id}")
+                return False
+            return True
+
+    def pending_count(self) -> int:
+        """
+        Số video còn chờ hoặc đang được worker khác xử lý
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM video_queue WHERE status IN ('queued', 'leased')"
+            ).fetchone()
+        return row[0]
+
+    def get_counts(self) -> Dict[str, int]:
+        """
+        Thống kê số video theo trạng thái
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM video_queue GROUP BY status"
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+    @contextmanager
+    def named_lock(self, name: str, poll_interval: float = 1.0):
+        """
+        Khóa dùng chung giữa các worker (ví dụ khi ghi Google Sheets)
+
+        Khóa cũng có thời hạn như lease nên worker chết không giữ khóa mãi.
+
+        Args:
+            name: Tên khóa
+            poll_interval: Thời gian chờ giữa các lần thử (giây)
+        """
+        while True:
+            now = time.time()
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM named_locks WHERE name = ? AND lease_expires < ?", (name, now))
+                cursor = conn.execute("""
+                    INSERT OR IGNORE INTO named_locks (name, worker_id, lease_expires) VALUES (?, ?, ?)
+                """, (name, self.worker_id, now + self.lease_seconds))
+                if cursor.rowcount == 1:
+                    break
+            time.sleep(poll_interval)
+
+        try:
+            yield
+        finally:
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM named_locks WHERE name = ? AND worker_id = ?", (name, self.worker_id))
+
+    def start_heartbeat(self, interval: float = None):
+        """
+        Bắt đầu thread gia hạn lease định kỳ (mặc định 1/3 thời hạn lease)
+
+        Args:
+            interval: Khoảng thời gian giữa các lần gia hạn (giây)
+        """
+        interval = interval or max(1.0, self.lease_seconds / 3)
+        self._heartbeat_stop.clear()
+
+        def heartbeat_loop():
+            while not self._heartbeat_stop.wait(interval):
+                try:
+                    self.renew_leases()
+                except Exception as e:
+                    logger.warning(f"⚠️ Lỗi heartbeat lease: {str(e)}")
+
+        self._heartbeat_thread = threading.Thread(target=heartbeat_loop, name='lease-heartbeat', daemon=True)
+        self._heartbeat_thread.start()
+
+    def stop_heartbeat(self):
+        """
+        Dừng thread gia hạn lease
+        """
+        self._heartbeat_stop.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+
+    def close(self):
+        """
+        Dừng heartbeat và đóng kết nối SQLite
+        """
+        self.stop_heartbeat()
+        with self._lock:
+            self._conn.close()
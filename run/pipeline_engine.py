@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pipeline Engine
+Chạy nhiều video chồng lấp nhau qua các stage độc lập
+
+Mỗi stage (download, tách voice, transcription, dịch/viết lại, format, upload)
+có worker pool riêng, nối với nhau bằng hàng đợi có giới hạn (bounded queue).
+Nhờ vậy khi video A đang chờ Deepgram thì video B đã được FFmpeg xử lý và
+video C đang tải về -> tổng thời gian batch ~ thời gian của stage chậm nhất
+thay vì tổng thời gian của tất cả các stage.
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import queue
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tín hiệu kết thúc hàng đợi
+_SENTINEL = object()
+
+# Khoảng thời gian kiểm tra tín hiệu dừng khi hàng đợi đầu vào đầy (giây)
+_ADMIT_POLL_INTERVAL = 0.5
+
+
+class PipelineStage:
+    """
+    Cấu hình một stage trong pipeline
+    """
+
+    def __init__(self, name: str, handler: Callable[[Dict], None], workers: int = 1, queue_size: int = 2):
+        """
+        Args:
+            name: Tên stage (dùng cho log và để ghi lại stage bị lỗi)
+            handler: Hàm xử lý một job (dict), cập nhật trực tiếp vào job
+            workers: Số worker chạy song song của stage
+            queue_size: Số job tối đa được chờ trước stage (backpressure)
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.queue_size = max(1, int(queue_size))
+
+
+class StagedPipeline:
+    """
+    Chạy danh sách job qua chuỗi stage, mỗi stage có worker pool riêng
+
+    - Worker là thread: các stage FFmpeg thực chất chạy trong process con
+      (subprocess), các stage HTTP thì chủ yếu chờ mạng nên thread là đủ
+    - Hàng đợi giữa các stage có giới hạn nên stage nhanh không tràn bộ nhớ
+    - Job bị lỗi ở stage nào thì bỏ qua các stage sau và đi thẳng ra kết quả
+    """
+
+    def __init__(self, stages: List[PipelineStage],
+                 on_result: Optional[Callable[[Dict], None]] = None,
+                 should_stop: Optional[Callable[[], bool]] = None):
+        """
+        Args:
+            stages: Danh sách stage theo thứ tự
+            on_result: Callback gọi mỗi khi một job ra khỏi pipeline
+            should_stop: Hàm kiểm tra có nên ngừng nhận job mới không
+        """
+        if not stages:
+            raise ValueError("Pipeline cần ít nhất một stage")
+
+        self.stages = stages
+        self.on_result = on_result
+        self.should_stop = should_stop or (lambda: False)
+
+        self._queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+        self._remaining_workers = [stage.workers for stage in stages]
+        self._lock = threading.Lock()
+        self._results = []
+
+    def run(self, jobs: Iterable[Dict]) -> List[Dict]:
+        """
+        Chạy tất cả job qua pipeline và chờ đến khi xong
+
+        Args:
+            jobs: Các job (dict) cần xử lý, có thể là generator
+
+        Returns:
+            List job đã xử lý, theo thứ tự đưa vào
+        """
+        threads = []
+        for stage_index, stage in enumerate(self.stages):
+            for worker_index in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    args=(stage_index,),
+                    name=f"{stage.name}-{worker_index + 1}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        stage_summary = ", ".join(f"{s.name}x{s.workers}" for s in self.stages)
+        logger.info(f"🏭 Pipeline khởi động: {stage_summary}")
+
+        # Đưa job vào stage đầu tiên (chờ khi hàng đợi đầy, vẫn kiểm tra tín hiệu dừng)
+        admitted = 0
+        try:
+            for job in jobs:
+                if not self._admit(job, admitted):
+                    logger.info("🛑 Pipeline ngừng nhận job mới")
+                    break
+                admitted += 1
+        finally:
+            for _ in range(self.stages[0].workers):
+                self._queues[0].put(_SENTINEL)
+
+        for thread in threads:
+            thread.join()
+
+        logger.info(f"🏁 Pipeline hoàn thành {len(self._results)}/{admitted} job")
+        return sorted(self._results, key=lambda job: job.get('_index', 0))
+
+    def _admit(self, job: Dict, index: int) -> bool:
+        """
+        Đưa một job vào stage đầu tiên
+
+        Returns:
+            False nếu pipeline được yêu cầu dừng trước khi job được nhận
+        """
+        job.setdefault('_index', index)
+        while not self.should_stop():
+            try:
+                self._queues[0].put(job, timeout=_ADMIT_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _worker_loop(self, stage_index: int):
+        """
+        Vòng lặp của một worker: lấy job, xử lý, chuyển sang stage tiếp theo
+        """
+        stage = self.stages[stage_index]
+        input_queue = self._queues[stage_index]
+        is_last_stage = stage_index == len(self.stages) - 1
+
+        while True:
+            job = input_queue.get()
+            if job is _SENTINEL:
+                break
+
+            try:
+                stage.handler(job)
+            except Exception as e:
+                logger.error(f"❌ Stage '{stage.name}' lỗi với {job.get('video_name', 'job')}: {str(e)}")
+                job['status'] = 'error'
+                job['error'] = str(e)
+                job['error_type'] = type(e).__name__
+                job['failed_stage'] = stage.name
+
+            if job.get('status') == 'error' or is_last_stage:
+                self._emit(job)
+            else:
+                self._queues[stage_index + 1].put(job)
+
+        # Worker cuối cùng của stage báo kết thúc cho stage tiếp theo
+        with self._lock:
+            self._remaining_workers[stage_index] -= 1
+            stage_finished = self._remaining_workers[stage_index] == 0
+
+        if stage_finished and not is_last_stage:
+            for _ in range(self.stages[stage_index + 1].workers):
+                self._queues[stage_index + 1].put(_SENTINEL)
+
+    def _emit(self, job: Dict):
+        """
+        Ghi nhận job đã ra khỏi pipeline
+        """
+        with self._lock:
+            self._results.append(job)
+
+        if self.on_result:
+            try:
+                self.on_result(job)
+            except Exception as e:
+                logger.warning(f"⚠️ Lỗi callback kết quả pipeline: {str(e)}")
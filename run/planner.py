@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch Planner
+Ước tính thời gian, số lần gọi API và chi phí của một batch trước khi xử lý
+
+Chỉ dùng metadata từ Google Drive (thời lượng, dung lượng) - không tải video.
+Số phút Deepgram và token Gemini được quy ra chi phí theo bảng giá và quota
+của TokenCalculator. Thời gian chạy ước tính theo mô hình từng stage:
+- Chạy tuần tự: tổng thời gian các bước của tất cả video
+- Chạy pipeline: stage chậm nhất (tổng thời gian / số worker) + thời gian một video đi hết pipeline
+
+Các hệ số ước lượng nằm trong DEFAULT_ASSUMPTIONS và có thể điều chỉnh.
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import math
+from typing import Dict, List, Optional, Tuple
+
+from scheduler import estimate_video_seconds
+from token_calculator import TokenCalculator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ASSUMPTIONS = {
+    'chinese_ratio': 0.5,              # Tỷ lệ video tiếng Trung (cần dịch)
+    'vi_fallback_ratio': 0.1,          # Tỷ lệ video phải gọi Deepgram lần 2 (tiếng Việt)
+    'transcript_chars_per_minute': 900,  # Số ký tự transcript mỗi phút nói
+    'chars_per_token': 4,              # Số ký tự mỗi token Gemini
+    'rewrite_prompt_tokens': 2000,     # Token của prompt viết lại (lấy từ Sheets)
+    'rewrite_output_ratio': 1.5,       # Token output / token transcript khi viết lại
+    'translate_chars_per_call': 60,    # Số ký tự mỗi lần gọi dịch (theo câu)
+    'translate_prompt_tokens': 400,    # Token prompt + ngữ cảnh mỗi lần gọi dịch
+    'download_bytes_per_second': 20 * 1024 * 1024,
+    'download_chunk_bytes': 100 * 1024 * 1024,  # Chunk mặc định của MediaIoBaseDownload
+    'ffmpeg_realtime_factor': 0.05,    # Thời gian FFmpeg / thời lượng video
+    'deepgram_base_seconds': 5,
+    'deepgram_realtime_factor': 0.1,
+    'gemini_base_seconds': 3,
+    'gemini_output_tokens_per_second': 100,
+    'upload_seconds': 3,               # Mỗi lần upload file nhỏ lên Drive
+    'format_seconds': 1
+}
+
+# Thứ tự stage giống PIPELINE_STAGES của all_in_one.py
+PLAN_STAGES = ['download', 'extract_voice', 'transcribe', 'rewrite', 'format', 'upload']
+
+
+class BatchPlanner:
+    """
+    Ước tính chi phí và thời gian xử lý danh sách video
+    """
+
+    def __init__(self, token_calculator: TokenCalculator = None, assumptions: Dict = None):
+        """
+        Args:
+            token_calculator: TokenCalculator cung cấp bảng giá và quota (mặc định tạo mới)
+            assumptions: Ghi đè một số hệ số trong DEFAULT_ASSUMPTIONS
+        """
+        self.token_calculator = token_calculator or TokenCalculator()
+        self.assumptions = dict(DEFAULT_ASSUMPTIONS)
+        self.assumptions.update(assumptions or {})
+
+    def estimate_video(self, video: Dict) -> Dict:
+        """
+        Ước tính cho một video
+
+        Args:
+            video: Thông tin video từ Drive (size, videoMediaMetadata)
+
+        Returns:
+            Dict chứa phút Deepgram, token Gemini, số lần gọi API và thời gian từng stage
+        """
+        a = self.assumptions
+        duration = estimate_video_seconds(video)
+        minutes = duration / 60.0
+        size = int(video.get('size') or 0)
+
+        # Deepgram: thử tiếng Trung trước, một phần video phải thử thêm tiếng Việt
+        deepgram_calls = 1 + a['vi_fallback_ratio']
+        deepgram_minutes = minutes * deepgram_calls
+
+        # Gemini: viết lại (1 lần) + dịch theo câu và QA cho video tiếng Trung
+        transcript_chars = minutes * a['transcript_chars_per_minute']
+        transcript_tokens = transcript_chars / a['chars_per_token']
+        rewrite_input_tokens, rewrite_output_tokens = self.estimate_rewrite_tokens(transcript_chars)
+
+        translate_calls = a['chinese_ratio'] * (math.ceil(transcript_chars / a['translate_chars_per_call']) + 1)
+        translate_input_tokens = translate_calls * a['translate_prompt_tokens'] + a['chinese_ratio'] * transcript_tokens * 2
+        translate_output_tokens = a['chinese_ratio'] * transcript_tokens * 2
+
+        gemini_input_tokens = rewrite_input_tokens + translate_input_tokens
+        gemini_output_tokens = rewrite_output_tokens + translate_output_tokens
+
+        stage_seconds = {
+            'download': size / a['download_bytes_per_second'],
+            'extract_voice': duration * a['ffmpeg_realtime_factor'],
+            'transcribe': deepgram_calls * (a['deepgram_base_seconds'] + duration * a['deepgram_realtime_factor']),
+            'rewrite': (1 + translate_calls) * a['gemini_base_seconds']
+                       + gemini_output_tokens / a['gemini_output_tokens_per_second'],
+            'format': a['format_seconds'],
+            'upload': 3 * a['upload_seconds']
+        }
+
+        return {
+            'name': video.get('name', ''),
+            'duration_seconds': duration,
+            'size_bytes': size,
+            'deepgram_minutes': deepgram_minutes,
+            'gemini_input_tokens': gemini_input_tokens,
+            'gemini_output_tokens': gemini_output_tokens,
+            'api_calls': {
+                'drive_download': max(1, math.ceil(size / a['download_chunk_bytes'])),
+                'deepgram': deepgram_calls,
+                'gemini_translate': translate_calls,
+                'gemini_rewrite': 1,
+                'drive_upload': 3
+            },
+            'stage_seconds': stage_seconds
+        }
+
+    def estimate_rewrite_tokens(self, transcript_chars: float) -> Tuple[float, float]:
+        """
+        Ước tính token Gemini của một lần viết lại
+
+        Args:
+            transcript_chars: Số ký tự transcript cần viết lại
+
+        Returns:
+            (token input, token output)
+        """
+        a = self.assumptions
+        transcript_tokens = transcript_chars / a['chars_per_token']
+        return a['rewrite_prompt_tokens'] + transcript_tokens, transcript_tokens * a['rewrite_output_ratio']
+
+    def plan(self, videos: List[Dict], pipeline_workers: Optional[Dict[str, int]] = None) -> Dict:
+        """
+        Lập kế hoạch cho cả batch
+
+        Args:
+            videos: Danh sách video sẽ xử lý (theo thứ tự)
+            pipeline_workers: Số worker mỗi stage nếu chạy --pipeline (None = chạy tuần tự)
+
+        Returns:
+            Dict kế hoạch: tổng phút/token/chi phí, số lần gọi API, thời gian ước tính, cảnh báo quota
+        """
+        estimates = [self.estimate_video(video) for video in videos]
+
+        deepgram_minutes = sum(e['deepgram_minutes'] for e in estimates)
+        gemini_input_tokens = sum(e['gemini_input_tokens'] for e in estimates)
+        gemini_output_tokens = sum(e['gemini_output_tokens'] for e in estimates)
+
+        pricing = self.token_calculator.gemini_pricing
+        gemini_cost = (gemini_input_tokens / 1_000_000) * pricing['input'] \
+            + (gemini_output_tokens / 1_000_000) * pricing['output']
+        deepgram_cost = self.token_calculator.calculate_tokens_deepgram(deepgram_minutes * 60)['cost_usd']
+
+        api_calls = {
+            'drive_list': 1,
+            'sheets_read': 2,  # Đọc danh sách video đã xử lý + đọc prompt
+            'sheets_write': 1 if videos else 0
+        }
+        for estimate in estimates:
+            for key, count in estimate['api_calls'].items():
+                api_calls[key] = api_calls.get(key, 0) + count
+        api_calls = {key: int(math.ceil(count)) for key, count in api_calls.items()}
+
+        stage_totals = {stage: sum(e['stage_seconds'][stage] for e in estimates) for stage in PLAN_STAGES}
+        if pipeline_workers:
+            stage_times = {stage: stage_totals[stage] / max(1, pipeline_workers.get(stage, 1)) for stage in PLAN_STAGES}
+            longest_video = max((sum(e['stage_seconds'].values()) for e in estimates), default=0.0)
+            wall_clock = max(stage_times.values(), default=0.0) + longest_video
+            bottleneck = max(stage_times, key=stage_times.get) if estimates else None
+        else:
+            wall_clock = sum(stage_totals.values())
+            bottleneck = max(stage_totals, key=stage_totals.get) if estimates else None
+
+        quota = self.token_calculator.quota_limits
+        warnings = []
+        total_gemini_tokens = gemini_input_tokens + gemini_output_tokens
+        if total_gemini_tokens > quota['gemini_daily_tokens']:
+            warnings.append(f"⚠️ Gemini: {total_gemini_tokens:,.0f} token vượt quota ngày {quota['gemini_daily_tokens']:,}")
+        if gemini_cost > quota['gemini_daily_cost']:
+            warnings.append(f"⚠️ Gemini: ${gemini_cost:.2f} vượt giới hạn chi phí ngày ${quota['gemini_daily_cost']:.2f}")
+        if deepgram_minutes > quota['deepgram_daily_minutes']:
+            warnings.append(f"⚠️ Deepgram: {deepgram_minutes:,.0f} phút vượt quota ngày {quota['deepgram_daily_minutes']:,}")
+        if deepgram_cost > quota['deepgram_daily_cost']:
+            warnings.append(f"⚠️ Deepgram: ${deepgram_cost:.2f} vượt giới hạn chi phí ngày ${quota['deepgram_daily_cost']:.2f}")
+
+        return {
+            'video_count': len(videos),
+            'total_duration_seconds': sum(e['duration_seconds'] for e in estimates),
+            'total_size_bytes': sum(e['size_bytes'] for e in estimates),
+            'deepgram_minutes': deepgram_minutes,
+            'deepgram_cost_usd': deepgram_cost,
+            'gemini_input_tokens': gemini_input_tokens,
+            'gemini_output_tokens': gemini_output_tokens,
+            'gemini_cost_usd': gemini_cost,
+            'total_cost_usd': deepgram_cost + gemini_cost,
+            'api_calls': api_calls,
+            'stage_seconds': stage_totals,
+            'mode': 'pipeline' if pipeline_workers else 'sequential',
+            'wall_clock_seconds': wall_clock,
+            'bottleneck_stage': bottleneck,
+            'quota_warnings': warnings,
+            'videos': estimates
+        }
+
+
+def _format_duration(seconds: float) -> str:
+    """
+    Định dạng số giây thành "1h 02m 03s"
+    """
+    seconds = int(round(seconds))
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m {seconds:02d}s"
+    return f"{minutes}m {seconds:02d}s"
+
+
+def format_plan(plan: Dict) -> str:
+    """
+    Tạo báo cáo kế hoạch dạng text
+
+    Args:
+        plan: Kết quả BatchPlanner.plan()
+
+    Returns:
+        Chuỗi báo cáo
+    """
+    lines = [
+        "📋 === KẾ HOẠCH XỬ LÝ (DRY RUN) ===",
+        f"🎬 Số video: {plan['video_count']} "
+        f"(tổng {_format_duration(plan['total_duration_seconds'])}, "
+        f"{plan['total_size_bytes'] / (1024 * 1024):,.0f} MB)",
+        f"🎤 Deepgram: {plan['deepgram_minutes']:,.1f} phút ≈ ${plan['deepgram_cost_usd']:.2f}",
+        f"🤖 Gemini: {plan['gemini_input_tokens']:,.0f} token input + "
+        f"{plan['gemini_output_tokens']:,.0f} token output ≈ ${plan['gemini_cost_usd']:.2f}",
+        f"💰 Tổng chi phí ước tính: ${plan['total_cost_usd']:.2f}",
+        "📞 Số lần gọi API:"
+    ]
+    for key, count in plan['api_calls'].items():
+        lines.append(f"  - {key}: {count:,}")
+
+    lines.append("⏱️ Thời gian từng stage (tổng tất cả video):")
+    for stage, seconds in plan['stage_seconds'].items():
+        lines.append(f"  - {stage}: {_format_duration(seconds)}")
+
+    lines.append(f"🕐 Thời gian ước tính ({plan['mode']}): {_format_duration(plan['wall_clock_seconds'])}")
+    if plan['bottleneck_stage']:
+        lines.append(f"🐢 Stage chậm nhất: {plan['bottleneck_stage']}")
+
+    if plan['quota_warnings']:
+        lines.extend(plan['quota_warnings'])
+    else:
+        lines.append("✅ Nằm trong quota ngày của Deepgram và Gemini")
+
+    return "\n".join(lines)
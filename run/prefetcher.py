@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Video Prefetcher
+Tải trước các video tiếp theo trong nền để che thời gian tải từ Google Drive
+
+Prefetcher đi trước vòng lặp xử lý tối đa N video và giới hạn tổng dung lượng
+video đang nằm trong thư mục tạm (byte budget). Khi hết budget thì tạm dừng
+cho đến khi bước tách voice xong và file video được giải phóng (release).
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class VideoPrefetcher:
+    """
+    Tải trước video theo thứ tự danh sách, trong giới hạn số lượng và dung lượng
+    """
+
+    def __init__(self, download_func: Callable[[str, str], str], lookahead: int = 2,
+                 byte_budget: int = 2 * 1024 * 1024 * 1024):
+        """
+        Args:
+            download_func: Hàm tải video (file_id, video_name) -> đường dẫn local
+            lookahead: Số video tối đa được tải trước và giữ trên đĩa cùng lúc
+            byte_budget: Tổng dung lượng tối đa (bytes) của các video đang giữ
+        """
+        self.download_func = download_func
+        self.lookahead = max(1, int(lookahead))
+        self.byte_budget = max(0, int(byte_budget))
+
+        self._condition = threading.Condition()
+        self._entries = {}  # file_id -> {'size', 'path', 'error', 'done'}
+        self._held_count = 0
+        self._held_bytes = 0
+        self._stopped = False
+        self._thread = None
+
+    def start(self, videos: List[Dict]):
+        """
+        Bắt đầu tải trước danh sách video trong thread nền
+
+        Args:
+            videos: Danh sách video từ Drive (id, name, size)
+        """
+        with self._condition:
+            for video in videos:
+                self._entries[video['id']] = {
+                    'size': int(video.get('size') or 0),
+                    'path': None,
+                    'error': None,
+                    'done': False
+                }
+
+        self._thread = threading.Thread(target=self._prefetch_loop, args=(list(videos),),
+                                        name='prefetch', daemon=True)
+        self._thread.start()
+        logger.info(f"📦 Prefetch {len(videos)} video (lookahead {self.lookahead}, "
+                    f"budget {self.byte_budget / (1024 * 1024):.0f} MB)")
+
+    def get(self, file_id: str) -> Optional[str]:
+        """
+        Lấy đường dẫn video đã tải trước (chờ nếu đang tải)
+
+        Args:
+            file_id: ID file video trên Drive
+
+        Returns:
+            Đường dẫn local, hoặc None nếu video không nằm trong danh sách prefetch
+
+        Raises:
+            Exception: Lỗi tải video của prefetcher
+        """
+        with self._condition:
+            entry = self._entries.get(file_id)
+            if entry is None:
+                return None
+
+            while not entry['done'] and not self._stopped:
+                self._condition.wait()
+
+            if entry['error'] is not None:
+                raise entry['error']
+            return entry['path']
+
+    def release(self, file_id: str):
+        """
+        Giải phóng video đã dùng xong: xóa file và trả lại budget
+
+        Args:
+            file_id: ID file video trên Drive
+        """
+        self.discard(file_id)
+
+    def discard(self, file_id: str):
+        """
+        Bỏ một video khỏi prefetch (video bị bỏ qua, bị hoãn hoặc đã dùng xong)
+
+        Video chưa tải thì không tải nữa; video đang tải bị xóa ngay khi tải xong;
+        video đã tải bị xóa file. Chỗ trong lookahead/budget được trả lại để các
+        video sau không phải chờ mãi.
+
+        Args:
+            file_id: ID file video trên Drive
+        """
+        with self._condition:
+            entry = self._entries.pop(file_id, None)
+            if entry is None or not entry['done'] or entry['path'] is None:
+                # Chưa tải: _prefetch_loop bỏ qua; đang tải: _prefetch_loop tự dọn khi xong
+                return
+            self._held_count -= 1
+            self._held_bytes -= entry['size']
+            self._condition.notify_all()
+
+        self._remove_file(entry['path'])
+
+    def _remove_file(self, path: str):
+        """
+        Xóa file video đã tải (lỗi chỉ ghi log)
+        """
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except Exception as e:
+            logger.warning(f"⚠️ Không thể xóa video đã xử lý: {str(e)}")
+
+    def stop(self):
+        """
+        Dừng prefetch (các video đang chờ sẽ không được tải nữa)
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+        if self._thread is not None:
+            self._thread.join()
+
+    def _has_room(self, size: int) -> bool:
+        """
+        Kiểm tra còn chỗ để tải thêm một video không
+
+        Luôn cho phép khi không giữ video nào, để video lớn hơn budget vẫn được xử lý.
+        """
+        if self._held_count == 0:
+            return True
+        return self._held_count < self.lookahead and self._held_bytes + size <= self.byte_budget
+
+    def _prefetch_loop(self, videos: List[Dict]):
+        """
+        Vòng lặp tải trước: tải lần lượt từng video, chờ khi hết chỗ
+        """
+        for video in videos:
+            file_id = video['id']
+            with self._condition:
+                entry = self._entries.get(file_id)
+                if entry is None:
+                    continue
+
+                while not self._stopped and not self._has_room(entry['size']):
+                    self._condition.wait()
+                if self._stopped:
+                    break
+
+                self._held_count += 1
+                self._held_bytes += entry['size']
+
+            try:
+                path = self.download_func(file_id, video['name'])
+                error = None
+            except Exception as e:
+                path = None
+                error = e
+
+            with self._condition:
+                if self._entries.get(file_id) is not entry:
+                    # Đã bị discard trong lúc tải -> trả lại chỗ và xóa file
+                    self._held_count -= 1
+                    self._held_bytes -= entry['size']
+                    entry['done'] = True
+                    self._condition.notify_all()
+                    if path is not None:
+                        self._remove_file(path)
+                    continue
+                if error is None:
+                    actual_size = os.path.getsize(path) if os.path.exists(path) else entry['size']
+                    self._held_bytes += actual_size - entry['size']
+                    entry['size'] = actual_size
+                    entry['path'] = path
+                else:
+                    logger.warning(f"⚠️ Prefetch lỗi {video['name']}: {str(error)}")
+                    self._held_count -= 1
+                    self._held_bytes -= entry['size']
+                    entry['error'] = error
+                entry['done'] = True
+                self._condition.notify_all()
+
+        # Video chưa tải được khi dừng sẽ được tải trực tiếp
+        with self._condition:
+            for file_id in [fid for fid, entry in self._entries.items() if not entry['done']]:
+                del self._entries[file_id]
+            self._condition.notify_all()
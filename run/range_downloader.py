@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Range Downloader
+Tải một file lớn bằng nhiều request byte-range song song, ghi thẳng vào file đã cấp phát sẵn
+
+Thay cho MediaIoBaseDownload.next_chunk() tải tuần tự từng chunk trên một kết nối:
+file được chia thành các đoạn (part_size byte), mỗi đoạn là một request
+"Range: bytes=start-end" chạy trong worker pool và ghi vào đúng vị trí của nó.
+Đoạn lỗi (mạng, 5xx, thiếu byte) được thử lại riêng, không phải tải lại cả file.
+Cuối cùng file được kiểm tra với checksum MD5 mà Drive cung cấp (md5Checksum).
+
+stream() chuyển các đoạn theo đúng thứ tự cho một hàm ghi (stdin của FFmpeg) để
+tách audio trong lúc video đang tải, không cần file MP4 trên đĩa.
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import hashlib
+import logging
+import os
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from itertools import islice
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Kích thước mặc định của một đoạn (byte)
+DEFAULT_PART_SIZE = 32 * 1024 * 1024
+
+
+def file_md5(path: str) -> str:
+    """
+    Tính hash MD5 của một file (so với md5Checksum của Drive)
+
+    Args:
+        path: Đường dẫn file
+
+    Returns:
+        Chuỗi hex của hash
+    """
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def split_ranges(size: int, part_size: int) -> List[Tuple[int, int]]:
+    """
+    Chia file thành các đoạn byte (start, end) - end tính cả byte cuối như header Range
+
+    Args:
+        size: Kích thước file (byte)
+        part_size: Kích thước mỗi đoạn (byte)
+
+    Returns:
+        Danh sách đoạn theo thứ tự
+    """
+    part_size = max(1, int(part_size))
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+
+# Các box cấp cao nhất của ISO-BMFF (MP4/MOV) thường gặp trước 'moov'/'mdat'
+_ISO_BMFF_BOXES = {b'ftyp', b'styp', b'free', b'skip', b'wide', b'pdin', b'uuid', b'sidx',
+                   b'moov', b'mdat', b'moof', b'meta'}
+
+
+def needs_seeking(head: bytes) -> bool:
+    """
+    Kiểm tra phần đầu file video: container có cần seek khi đọc không (không stream được qua pipe)
+
+    MP4/MOV có box 'moov' (chỉ mục) nằm sau 'mdat' (dữ liệu) thì FFmpeg phải nhảy
+    đến cuối file mới đọc được, nên không đọc được từ stdin. Các container khác
+    (MKV, WebM, MPEG-TS, ...) đọc tuần tự được.
+
+    Args:
+        head: Các byte đầu tiên của file (vài chục KB)
+
+    Returns:
+        True nếu phải tải cả file trước (moov ở cuối hoặc không xác định được vị trí moov)
+    """
+    if len(head) < 8 or head[4:8] not in _ISO_BMFF_BOXES:
+        return False
+
+    offset = 0
+    while offset + 8 <= len(head):
+        size, box_type = struct.unpack('>I4s', head[offset:offset + 8])
+        if box_type == b'moov':
+            return False
+        if box_type == b'mdat':
+            return True
+        if size == 1:
+            if offset + 16 > len(head):
+                break
+            size = struct.unpack('>Q', head[offset + 8:offset + 16])[0]
+        if size < 8:
+            break
+        offset += size
+    # Không thấy moov/mdat trong phần đầu -> coi như cần seek (an toàn)
+    return True
+
+
+class RangeDownloader:
+    """
+    Tải file theo các đoạn byte song song, thử lại từng đoạn và kiểm tra MD5
+    """
+
+    def __init__(self, fetch_range: Callable[[int, int], bytes], size: int, md5: Optional[str] = None,
+                 part_size: int = DEFAULT_PART_SIZE, workers: int = 4, max_retries: int = 4,
+                 base_backoff: float = 1.0, check: Callable[[], None] = None,
+                 executor: Executor = None):
+        """
+        Args:
+            fetch_range: Hàm tải một đoạn (start, end) -> bytes (chạy trong thread của worker pool)
+            size: Kích thước file (byte)
+            md5: md5Checksum của file (None = không kiểm tra)
+            part_size: Kích thước mỗi đoạn (byte)
+            workers: Số đoạn tải cùng lúc (khi không truyền executor)
+            max_retries: Số lần thử lại tối đa của một đoạn
+            base_backoff: Thời gian chờ trước lần thử lại đầu tiên (giây), gấp đôi sau mỗi lần
+            check: Hàm kiểm tra trước mỗi request, raise để hủy (ví dụ Deadline.check)
+            executor: Worker pool dùng chung (None = tạo pool riêng cho lần tải này)
+        """
+        self.fetch_range = fetch_range
+        self.size = int(size)
+        self.md5 = md5
+        self.part_size = part_size
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.check = check
+        self.executor = executor
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._done_bytes = 0
+        self._logged_percent = 0
+        self.retries = 0
+
+    def download(self, path: str) -> str:
+        """
+        Tải file về path (file cũ bị ghi đè)
+
+        Args:
+            path: Đường dẫn file đích
+
+        Returns:
+            Đường dẫn file đã tải
+
+        Raises:
+            ValueError: Nếu checksum MD5 không khớp
+            Exception: Lỗi của đoạn đã hết số lần thử lại (hoặc lỗi do check raise)
+        """
+        ranges = split_ranges(self.size, self.part_size)
+        # Cấp phát sẵn file đủ kích thước để các đoạn ghi thẳng vào vị trí của mình
+        with open(path, 'wb') as f:
+            f.truncate(self.size)
+
+        executor = self.executor or ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='range-dl')
+        try:
+            futures = [executor.submit(self._download_range, path, start, end) for start, end in ranges]
+            done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+            failed = [future for future in done if future.exception() is not None]
+            if failed:
+                # Dừng các đoạn chưa chạy, chờ các đoạn đang chạy trước khi xóa file
+                self._stop.set()
+                for future in pending:
+                    future.cancel()
+                wait(pending)
+                raise failed[0].exception()
+        except BaseException:
+            self._stop.set()
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        finally:
+            if self.executor is None:
+                executor.shutdown(wait=True)
+
+        if self.md5:
+            actual = file_md5(path)
+            if actual != self.md5.lower():
+                os.remove(path)
+                raise ValueError(f"Checksum MD5 không khớp: {actual} != {self.md5}")
+        return path
+
+    def stream(self, write: Callable[[bytes], None]):
+        """
+        Tải file theo thứ tự byte và chuyển từng đoạn cho write (ví dụ stdin của FFmpeg)
+
+        Tối đa `workers` đoạn được tải trước song song, nhưng write luôn nhận các đoạn
+        theo đúng thứ tự. Bộ nhớ dùng tối đa khoảng workers * part_size.
+
+        Args:
+            write: Hàm nhận từng đoạn dữ liệu
+
+        Raises:
+            ValueError: Nếu checksum MD5 không khớp (sau khi đã ghi hết dữ liệu)
+            Exception: Lỗi của đoạn đã hết số lần thử lại, lỗi của write hoặc của check
+        """
+        ranges = iter(split_ranges(self.size, self.part_size))
+        digest = hashlib.md5()
+        executor = self.executor or ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='range-dl')
+        futures = deque()
+        try:
+            for start, end in islice(ranges, self.workers):
+                futures.append(executor.submit(self._fetch_with_retry, start, end))
+            while futures:
+                data = futures.popleft().result()
+                next_range = next(ranges, None)
+                if next_range is not None:
+                    futures.append(executor.submit(self._fetch_with_retry, *next_range))
+                write(data)
+                digest.update(data)
+                self._report_progress(len(data))
+        except BaseException:
+            self._stop.set()
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            if self.executor is None:
+                executor.shutdown(wait=True)
+
+        if self.md5 and digest.hexdigest() != self.md5.lower():
+            raise ValueError(f"Checksum MD5 không khớp: {digest.hexdigest()} != {self.md5}")
+
+    def _download_range(self, path: str, start: int, end: int):
+        """
+        Tải một đoạn và ghi vào vị trí của nó trong file
+        """
+        data = self._fetch_with_retry(start, end)
+        if data is None:
+            return
+
+        with open(path, 'r+b') as f:
+            f.seek(start)
+            f.write(data)
+        self._report_progress(len(data))
+
+    def _fetch_with_retry(self, start: int, end: int) -> Optional[bytes]:
+        """
+        Tải một đoạn, thử lại với backoff khi lỗi
+
+        Returns:
+            Nội dung đoạn, hoặc None nếu lần tải đã bị dừng (đoạn khác lỗi)
+        """
+        expected = end - start + 1
+        attempt = 0
+        while True:
+            if self._stop.is_set():
+                return None
+            if self.check is not None:
+                self.check()
+            try:
+                data = self.fetch_range(start, end)
+                if len(data) != expected:
+                    raise IOError(f"Đoạn {start}-{end} thiếu byte: nhận {len(data)}/{expected}")
+                return data
+            except Exception as e:
+                attempt += 1
+                if attempt > self.max_retries or self._stop.is_set():
+                    raise
+                with self._lock:
+                    self.retries += 1
+                delay = self.base_backoff * 2 ** (attempt - 1)
+                logger.warning(f"⚠️ Đoạn {start}-{end} lỗi ({str(e)}), thử lại lần {attempt} sau {delay:.0f}s")
+                time.sleep(delay)
+
+    def _report_progress(self, size: int):
+        """
+        Cộng số byte đã xong và log tiến độ mỗi 10%
+        """
+        with self._lock:
+            self._done_bytes += size
+            percent = int(self._done_bytes * 100 / self.size) if self.size else 100
+            if percent >= self._logged_percent + 10 or self._done_bytes == self.size:
+                self._logged_percent = percent
+                logger.info(f"📥 Tải: {percent}%")
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Adaptive Rate Limiter
+Giới hạn số request đồng thời cho từng dịch vụ (Deepgram, Gemini, Drive, Sheets) theo AIMD
+
+Thay cho các khoảng sleep cố định và backoff mù: mỗi dịch vụ có một giới hạn
+số request đang chạy (in-flight) tự điều chỉnh theo phản hồi thực tế:
+- Additive increase: mỗi khi đủ `limit` request thành công liên tiếp thì limit + 1
+- Multiplicative decrease: gặp 429/503 hoặc độ trễ tăng vọt thì limit * decrease_factor
+  (mỗi đợt quá tải chỉ giảm một lần) và tạm dừng gửi request trong thời gian backoff
+Độ trễ được so sánh theo từng loại request (latency_key, ví dụ drive.files.list và
+tải chunk video) vì các loại request của cùng dịch vụ có độ trễ rất khác nhau.
+Nhờ vậy số request luôn sát với quota thực tế mà không cần chỉnh tay.
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from deadlines import check_deadline
+
+logger = logging.getLogger(__name__)
+
+# Mã HTTP cho biết dịch vụ đang quá tải / vượt quota
+THROTTLE_STATUS_CODES = (429, 503)
+
+# Khoảng thời gian kiểm tra deadline khi chờ slot (giây)
+_WAIT_INTERVAL = 0.5
+
+# Cấu hình mặc định cho từng dịch vụ
+DEFAULT_LIMITS = {
+    'deepgram': {'initial': 4, 'max_limit': 16, 'latency_factor': None},  # Độ trễ phụ thuộc độ dài audio
+    'gemini': {'initial': 4, 'max_limit': 32, 'latency_factor': 4.0},  # Chỉ các request có latency_key
+    'drive': {'initial': 8, 'max_limit': 32, 'latency_factor': 3.0},
+    'sheets': {'initial': 2, 'max_limit': 8, 'latency_factor': 3.0}
+}
+
+
+def response_status(response=None, error: Exception = None) -> Optional[int]:
+    """
+    Lấy mã HTTP từ response của requests hoặc từ lỗi HttpError của googleapiclient
+
+    Args:
+        response: Response của requests (có status_code)
+        error: Exception (HttpError có resp.status)
+
+    Returns:
+        Mã HTTP hoặc None nếu không xác định được
+    """
+    if response is not None:
+        return getattr(response, 'status_code', None)
+    if error is not None:
+        resp = getattr(error, 'resp', None)
+        status = getattr(resp, 'status', None)
+        try:
+            return int(status) if status is not None else None
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+class AdaptiveLimiter:
+    """
+    Giới hạn request đồng thời của một dịch vụ, tự điều chỉnh theo AIMD
+    """
+
+    def __init__(self, name: str, initial: int = 4, min_limit: int = 1, max_limit: int = 32,
+                 decrease_factor: float = 0.5, latency_factor: Optional[float] = 3.0,
+                 base_backoff: float = 1.0, max_backoff: float = 60.0):
+        """
+        Args:
+            name: Tên dịch vụ (dùng cho log)
+            initial: Số request đồng thời ban đầu
+            min_limit: Số request đồng thời tối thiểu
+            max_limit: Số request đồng thời tối đa
+            decrease_factor: Hệ số giảm khi quá tải (0.5 = giảm một nửa)
+            latency_factor: Độ trễ gần đây > latency_factor * độ trễ nền thì coi là quá tải (None = bỏ qua)
+            base_backoff: Thời gian tạm dừng sau lần quá tải đầu tiên (giây), gấp đôi nếu quá tải tiếp
+            max_backoff: Thời gian tạm dừng tối đa (giây)
+        """
+        self.name = name
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = min(self.max_limit, max(self.min_limit, int(initial)))
+        self.decrease_factor = decrease_factor
+        self.latency_factor = latency_factor
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.in_flight = 0
+        self._successes = 0
+        self._backoff = 0.0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._latency = {}  # latency_key -> [EWMA chậm (độ trễ nền), EWMA nhanh (độ trễ gần đây)]
+        self._condition = threading.Condition()
+
+        self.stats = {'ok': 0, 'throttled': 0, 'slow': 0, 'errors': 0}
+
+    def acquire(self) -> float:
+        """
+        Chờ đến khi có slot trống (và hết thời gian backoff)
+
+        Returns:
+            Thời điểm bắt đầu request (time.monotonic)
+
+        Raises:
+            DeadlineExceeded: Nếu deadline của bước hiện tại hết hạn trong lúc chờ
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self.in_flight < self.limit and now >= self._paused_until:
+                    self.in_flight += 1
+                    return now
+                wait = _WAIT_INTERVAL
+                if now < self._paused_until:
+                    wait = min(wait, self._paused_until - now)
+                self._condition.wait(wait)
+                check_deadline()
+
+    def release(self, started_at: float, status: Optional[int] = None, failed: bool = False,
+                latency_key: Optional[str] = None):
+        """
+        Trả slot và cập nhật limit theo kết quả request
+
+        Args:
+            started_at: Giá trị trả về của acquire()
+            status: Mã HTTP của response (None nếu không có response)
+            failed: True nếu request lỗi mà không phải do quá tải (timeout, lỗi mạng, 4xx khác)
+            latency_key: Loại request để so sánh độ trễ (None = không theo dõi độ trễ)
+        """
+        now = time.monotonic()
+        latency = now - started_at
+
+        with self._condition:
+            self.in_flight -= 1
+
+            if status in THROTTLE_STATUS_CODES:
+                self.stats['throttled'] += 1
+                self._decrease(started_at, now, f"HTTP {status}", pause=True)
+            elif failed:
+                self.stats['errors'] += 1
+            elif self._is_slow(latency_key, latency):
+                self.stats['slow'] += 1
+                self._decrease(started_at, now, f"độ trễ {latency:.1f}s", pause=False)
+            else:
+                self.stats['ok'] += 1
+                self._backoff = 0.0
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+                    logger.debug(f"📈 {self.name}: tăng giới hạn lên {self.limit}")
+
+            self._condition.notify_all()
+
+    def _is_slow(self, latency_key: Optional[str], latency: float) -> bool:
+        """
+        Cập nhật độ trễ nền/gần đây của loại request và kiểm tra độ trễ có tăng vọt không
+        """
+        if self.latency_factor is None or latency_key is None:
+            return False
+        ewma = self._latency.get(latency_key)
+        if ewma is None:
+            self._latency[latency_key] = [latency, latency]
+            return False
+
+        ewma[1] = 0.5 * ewma[1] + 0.5 * latency
+        if ewma[1] > self.latency_factor * ewma[0]:
+            # Đặt lại để một đợt chậm chỉ bị tính một lần
+            ewma[1] = ewma[0]
+            return True
+
+        ewma[0] = 0.9 * ewma[0] + 0.1 * latency
+        return False
+
+    def _decrease(self, started_at: float, now: float, reason: str, pause: bool):
+        """
+        Giảm limit (gọi khi đang giữ lock)
+
+        Request bắt đầu trước lần giảm gần nhất thuộc cùng đợt quá tải -> không giảm thêm.
+        """
+        self._successes = 0
+        if started_at < self._last_decrease:
+            return
+
+        if pause:
+            self._backoff = min(self.max_backoff, self._backoff * 2 if self._backoff else self.base_backoff)
+            self._paused_until = max(self._paused_until, now + self._backoff)
+
+        old_limit = self.limit
+        self.limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+        self._last_decrease = now
+        logger.warning(f"📉 {self.name}: {reason}, giảm số request đồng thời {old_limit} -> {self.limit}")
+
+    def call(self, func: Callable, *args, latency_key: Optional[str] = None, **kwargs):
+        """
+        Gọi func trong một slot của limiter và ghi nhận kết quả
+
+        Dùng cho requests.post (kiểm tra status_code) và request.execute() của
+        googleapiclient (HttpError mang mã HTTP).
+
+        Args:
+            func: Hàm thực hiện request
+            latency_key: Loại request để theo dõi độ trễ (None = chỉ dựa vào 429/503)
+            *args, **kwargs: Tham số của func
+
+        Returns:
+            Kết quả của func
+        """
+        started_at = self.acquire()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            status = response_status(error=e)
+            self.release(started_at, status, failed=True)
+            raise
+        status = response_status(response=result)
+        self.release(started_at, status, failed=status is not None and status >= 400, latency_key=latency_key)
+        return result
+
+
+def create_limiters(overrides: Dict[str, Dict] = None) -> Dict[str, AdaptiveLimiter]:
+    """
+    Tạo limiter cho các dịch vụ theo DEFAULT_LIMITS
+
+    Args:
+        overrides: Ghi đè cấu hình của từng dịch vụ, ví dụ {'gemini': {'max_limit': 8}}
+
+    Returns:
+        Dict tên dịch vụ -> AdaptiveLimiter
+    """
+    limiters = {}
+    for name, config in DEFAULT_LIMITS.items():
+        config = dict(config)
+        config.update((overrides or {}).get(name, {}))
+        limiters[name] = AdaptiveLimiter(name, **config)
+    return limiters
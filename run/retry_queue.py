@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Retry Queue
+Phân loại lỗi xử lý video và quyết định thử lại (có backoff) hay đưa vào dead-letter
+
+Loại lỗi:
+- transient: lỗi mạng, timeout, HTTP 5xx, bước quá hạn, file tải về sai checksum -> thử lại nhiều lần
+- quota: vượt quota/rate limit của API -> thử lại sau thời gian dài hơn
+- ffmpeg: FFmpeg lỗi (có thể do máy quá tải) -> thử lại một lần
+- bad_media: video hỏng/không có audio/không có lời -> dead-letter ngay
+- permanent: HTTP 4xx khác (file không tồn tại, không có quyền, request sai) -> dead-letter ngay
+- unknown: không nhận ra -> thử lại ít lần
+
+Trạng thái hàng đợi được lưu trong job ledger (JobLedger.set_retry), video được
+thử lại tiếp tục từ bước bị lỗi nhờ checkpoint của ledger.
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import re
+from typing import Optional
+
+# Số lần thử lại tối đa và backoff (giây) của từng loại lỗi; None = không thử lại (dead-letter)
+RETRY_POLICIES = {
+    'transient': {'max_retries': 4, 'base_delay': 30, 'max_delay': 1800},
+    'quota': {'max_retries': 3, 'base_delay': 900, 'max_delay': 6 * 3600},
+    'ffmpeg': {'max_retries': 1, 'base_delay': 60, 'max_delay': 60},
+    'unknown': {'max_retries': 2, 'base_delay': 60, 'max_delay': 900},
+    'bad_media': None,
+    'permanent': None
+}
+
+# Dấu hiệu nhận biết trong thông báo lỗi (so khớp chữ thường)
+_QUOTA_MARKERS = ['quota', 'resource_exhausted', 'ratelimitexceeded', 'dailylimitexceeded',
+                  'too many requests']
+_BAD_MEDIA_MARKERS = ['invalid data found', 'moov atom not found', 'does not contain any stream',
+                      'matches no streams', 'no audio', 'file audio rỗng', 'không phải video',
+                      'corrupt', 'transcript vẫn rỗng']
+_TRANSIENT_MARKERS = ['timeout', 'timed out', 'connection', 'temporarily', 'unavailable',
+                      'broken pipe', 'ssl', 'eof occurred', 'backenderror', 'internal error',
+                      'quá thời hạn', 'đã hủy', 'checksum']
+
+# Mã HTTP trong thông báo lỗi: "<HttpError 404 when ...", "Gemini API lỗi: 503 - ...", "Retry failed: 500"
+_HTTP_STATUS_PATTERN = re.compile(r'(?:httperror|status(?:_code)?|lỗi:|failed:|http)\s*[:=]?\s*([45]\d\d)\b')
+
+
+def classify_failure(error: str, error_type: str = None, failed_step: str = None) -> str:
+    """
+    Phân loại lỗi xử lý một video
+
+    Args:
+        error: Thông báo lỗi
+        error_type: Tên class của exception (ví dụ 'DeadlineExceeded', 'HttpError')
+        failed_step: Bước bị lỗi (xem VIDEO_STEP_SPECS)
+
+    Returns:
+        Loại lỗi (key của RETRY_POLICIES)
+    """
+    text = (error or '').lower()
+    http_status = _HTTP_STATUS_PATTERN.search(text)
+    status = int(http_status.group(1)) if http_status else None
+
+    if error_type == 'DeadlineExceeded':
+        return 'transient'
+    if any(marker in text for marker in _BAD_MEDIA_MARKERS):
+        return 'bad_media'
+    # Kiểm tra FFmpeg trước mã HTTP: stderr của FFmpeg có nhiều con số (bitrate, kích thước, ...)
+    if 'ffmpeg' in text or failed_step == 'extract_voice':
+        return 'ffmpeg'
+    if status == 429 or any(marker in text for marker in _QUOTA_MARKERS):
+        return 'quota'
+    if (status is not None and status >= 500) or any(marker in text for marker in _TRANSIENT_MARKERS):
+        return 'transient'
+    if status is not None:
+        return 'permanent'
+    return 'unknown'
+
+
+def retry_delay(kind: str, attempts: int) -> Optional[float]:
+    """
+    Thời gian chờ trước lần thử lại tiếp theo (backoff lũy thừa)
+
+    Args:
+        kind: Loại lỗi (xem classify_failure)
+        attempts: Số lần đã lỗi (tính cả lần vừa lỗi, >= 1)
+
+    Returns:
+        Số giây cần chờ, hoặc None nếu không thử lại nữa (đưa vào dead-letter)
+    """
+    policy = RETRY_POLICIES.get(kind, RETRY_POLICIES['unknown'])
+    if policy is None or attempts > policy['max_retries']:
+        return None
+    return float(min(policy['max_delay'], policy['base_delay'] * 2 ** (attempts - 1)))
+
+
+def dead_letter_reason(kind: str, attempts: int, error: str) -> str:
+    """
+    Lý do đưa video vào dead-letter (hiển thị cho người vận hành)
+
+    Args:
+        kind: Loại lỗi
+        attempts: Số lần đã lỗi
+        error: Thông báo lỗi cuối cùng
+
+    Returns:
+        Chuỗi lý do
+    """
+    if RETRY_POLICIES.get(kind, RETRY_POLICIES['unknown']) is None:
+        prefix = f"{kind}: lỗi không thử lại được"
+    else:
+        prefix = f"{kind}: vẫn lỗi sau {attempts} lần"
+    return f"{prefix} - {(error or '').strip()[:300]}"
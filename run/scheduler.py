@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Video Scheduler
+Sắp xếp thứ tự xử lý video theo thời lượng
+
+Thời lượng lấy từ videoMediaMetadata.durationMillis của Google Drive; nếu Drive
+chưa có metadata (video vừa upload) thì ước lượng từ dung lượng file.
+
+Các policy:
+- name: giữ thứ tự theo tên như Drive trả về (mặc định)
+- shortest: video ngắn trước -> có kết quả đầu tiên sớm nhất
+- longest: video dài trước -> tổng thời gian batch ngắn nhất khi chạy song song
+  (LPT: worker rảnh lấy video dài nhất còn lại, video ngắn lấp chỗ trống cuối batch)
+- fair: xen kẽ ngắn/dài -> video ngắn có kết quả sớm mà video dài không bị dồn cuối
+
+Khi xử lý nhiều folder cùng lúc, fair_share_order() trộn video của các folder
+theo thời lượng đã được phục vụ để folder lớn không chiếm hết worker.
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import heapq
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_POLICIES = ['name', 'shortest', 'longest', 'fair']
+
+# Ước lượng thời lượng từ dung lượng khi thiếu metadata (~1 MB mỗi giây video)
+BYTES_PER_SECOND_ESTIMATE = 1024 * 1024
+
+# Phần tối thiểu mỗi video chiếm trong fair share (video không có metadata lẫn dung lượng)
+MIN_SHARE_SECONDS = 60.0
+
+
+def video_duration_seconds(video: Dict) -> Optional[float]:
+    """
+    Lấy thời lượng video (giây) từ metadata của Drive
+
+    Args:
+        video: Thông tin video từ Drive
+
+    Returns:
+        Thời lượng (giây) hoặc None nếu Drive chưa có metadata
+    """
+    metadata = video.get('videoMediaMetadata') or {}
+    duration_millis = metadata.get('durationMillis')
+    if duration_millis is None:
+        return None
+    try:
+        return int(duration_millis) / 1000.0
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_video_seconds(video: Dict) -> float:
+    """
+    Thời lượng video (giây), ước lượng từ dung lượng nếu thiếu metadata
+
+    Args:
+        video: Thông tin video từ Drive
+
+    Returns:
+        Thời lượng (giây), 0 nếu không có thông tin nào
+    """
+    duration = video_duration_seconds(video)
+    if duration is not None:
+        return duration
+    try:
+        return int(video.get('size') or 0) / BYTES_PER_SECOND_ESTIMATE
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def schedule_videos(videos: List[Dict], policy: str = 'name') -> List[Dict]:
+    """
+    Sắp xếp danh sách video theo policy
+
+    Args:
+        videos: Danh sách video từ Drive
+        policy: Một trong SCHEDULE_POLICIES
+
+    Returns:
+        Danh sách video theo thứ tự xử lý mới
+
+    Raises:
+        ValueError: Nếu policy không hợp lệ
+    """
+    if policy not in SCHEDULE_POLICIES:
+        raise ValueError(f"Policy không hợp lệ: {policy} (chọn một trong {', '.join(SCHEDULE_POLICIES)})")
+
+    if policy == 'name' or len(videos) < 2:
+        return list(videos)
+
+    # sorted() ổn định -> video cùng thời lượng giữ thứ tự theo tên
+    by_duration = sorted(videos, key=estimate_video_seconds)
+
+    if policy == 'shortest':
+        scheduled = by_duration
+    elif policy == 'longest':
+        scheduled = sorted(videos, key=lambda video: -estimate_video_seconds(video))
+    else:
+        # fair: ngắn nhất, dài nhất, ngắn thứ hai, dài thứ hai, ...
+        scheduled = []
+        low, high = 0, len(by_duration) - 1
+        while low <= high:
+            scheduled.append(by_duration[low])
+            if low != high:
+                scheduled.append(by_duration[high])
+            low += 1
+            high -= 1
+
+    logger.info(f"🗓️ Thứ tự xử lý theo policy '{policy}':")
+    for i, video in enumerate(scheduled, 1):
+        duration = video_duration_seconds(video)
+        duration_text = f"{duration:.0f}s" if duration is not None else f"~{estimate_video_seconds(video):.0f}s (ước lượng)"
+        logger.info(f"  {i}. {video['name']} ({duration_text})")
+
+    return scheduled
+
+
+def estimate_makespan(videos: List[Dict], workers: int = 1) -> float:
+    """
+    Ước lượng tổng thời lượng video mà worker bận nhất phải xử lý
+
+    Mô phỏng các worker lần lượt lấy video theo thứ tự danh sách (worker nào
+    rảnh trước thì lấy video tiếp theo).
+
+    Args:
+        videos: Danh sách video theo thứ tự xử lý
+        workers: Số worker chạy song song
+
+    Returns:
+        Tổng thời lượng video (giây) của worker bận nhất
+    """
+    loads = [0.0] * max(1, int(workers))
+    for video in videos:
+        index = loads.index(min(loads))
+        loads[index] += estimate_video_seconds(video)
+    return max(loads)
+
+
+def fair_share_order(groups: List[Tuple[str, List[Dict]]]) -> List[Tuple[str, Dict]]:
+    """
+    Trộn video của nhiều folder thành một thứ tự xử lý công bằng
+
+    Mỗi lần lấy video tiếp theo của folder có tổng thời lượng đã xếp lịch ít nhất
+    (bằng nhau thì theo thứ tự folder). Folder nhiều video không chặn folder khác:
+    folder nhỏ luôn có video ở gần đầu hàng đợi, folder lớn nhận phần còn lại.
+
+    Args:
+        groups: Danh sách (tên folder, danh sách video đã sắp xếp trong folder)
+
+    Returns:
+        Danh sách (tên folder, video) theo thứ tự xử lý
+    """
+    heap = [(0.0, index, 0) for index, (_, videos) in enumerate(groups) if videos]
+    heapq.heapify(heap)
+
+    ordered = []
+    while heap:
+        served, index, position = heapq.heappop(heap)
+        name, videos = groups[index]
+        video = videos[position]
+        ordered.append((name, video))
+        if position + 1 < len(videos):
+            served += max(estimate_video_seconds(video), MIN_SHARE_SECONDS)
+            heapq.heappush(heap, (served, index, position + 1))
+
+    return ordered
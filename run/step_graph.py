@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Step Graph
+Mô tả công việc của một video dưới dạng đồ thị phụ thuộc (DAG)
+
+Mỗi bước khai báo dữ liệu đầu vào (inputs) và đầu ra (outputs) trong job.
+Executor chạy đồng thời mọi bước đã đủ đầu vào, ví dụ upload voice chạy
+song song với Deepgram, upload text gốc chạy song song với Gemini rewrite.
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class Step:
+    """
+    Một bước trong đồ thị: hàm xử lý + khai báo inputs/outputs
+    """
+
+    def __init__(self, name: str, func: Callable[[Dict], None], inputs: List[str], outputs: List[str]):
+        """
+        Args:
+            name: Tên bước
+            func: Hàm nhận job (dict) và ghi outputs vào job
+            inputs: Các key trong job cần có trước khi chạy
+            outputs: Các key bước này ghi vào job
+        """
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+
+class StepGraph:
+    """
+    Executor chạy các bước theo thứ tự phụ thuộc, song song khi có thể
+    """
+
+    def __init__(self, steps: List[Step], initial_keys: List[str] = None):
+        """
+        Args:
+            steps: Danh sách bước
+            initial_keys: Các key có sẵn trong job trước khi chạy (để kiểm tra đồ thị)
+
+        Raises:
+            ValueError: Nếu đồ thị có input không bước nào tạo ra
+        """
+        self.steps = list(steps)
+
+        if initial_keys is not None:
+            produced = set(initial_keys)
+            for step in self.steps:
+                produced.update(step.outputs)
+            for step in self.steps:
+                missing = [key for key in step.inputs if key not in produced]
+                if missing:
+                    raise ValueError(f"Bước '{step.name}' thiếu input không bước nào tạo ra: {missing}")
+
+    def run(self, job: Dict, max_workers: int = 4) -> Dict:
+        """
+        Chạy tất cả các bước trên job
+
+        Khi một bước lỗi: không khởi động thêm bước mới, chờ các bước đang
+        chạy kết thúc rồi raise lỗi đầu tiên (tên bước lỗi ghi vào job['failed_step']).
+
+        Args:
+            job: Dict job, được các bước cập nhật trực tiếp
+            max_workers: Số bước tối đa chạy cùng lúc
+
+        Returns:
+            Job sau khi chạy xong
+        """
+        # Đồ thị một bước thì chạy luôn, không cần thread pool
+        if len(self.steps) == 1:
+            step = self.steps[0]
+            try:
+                step.func(job)
+            except Exception:
+                job['failed_step'] = step.name
+                raise
+            return job
+
+        available = set(job.keys())
+        pending = {step.name: step for step in self.steps}
+        running = {}
+        error = None
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='step') as executor:
+            while pending or running:
+                if error is None:
+                    ready = [step for step in pending.values()
+                             if all(key in available for key in step.inputs)]
+                    for step in ready:
+                        del pending[step.name]
+                        running[executor.submit(step.func, job)] = step
+
+                if not running:
+                    if pending and error is None:
+                        names = ", ".join(pending)
+                        error = ValueError(f"Không thể chạy các bước (thiếu input): {names}")
+                        job['failed_step'] = next(iter(pending))
+                    break
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        if error is None:
+                            error = e
+                            job['failed_step'] = step.name
+                        continue
+
+                    missing = [key for key in step.outputs if key not in job]
+                    if missing and error is None:
+                        error = ValueError(f"Bước '{step.name}' không tạo ra output: {missing}")
+                        job['failed_step'] = step.name
+                    available.update(step.outputs)
+
+        if error is not None:
+            raise error
+
+        return job
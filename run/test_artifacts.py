@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Lazy Artifacts
+Kiểm tra artifact chỉ được tính khi có nơi dùng và mỗi artifact chỉ tính một lần
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from artifacts import ArtifactGraph
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def make_graph(calls):
+    """
+    Đồ thị giống text dẫn xuất: bản viết lại -> nội dung chính -> không timeline / câu vào đề
+    """
+    def record(name, func):
+        def wrapped(*args):
+            calls.append(name)
+            time.sleep(0.05)
+            return func(*args)
+        return wrapped
+
+    graph = ArtifactGraph()
+    graph.declare('main_content', record('main_content', lambda text: text.upper()), ['rewritten_text'])
+    graph.declare('no_timeline', record('no_timeline', lambda main: main.replace('(0-5) ', '')), ['main_content'])
+    graph.declare('lead_in', record('lead_in', lambda main: main.split('.')[0]), ['main_content'])
+    return graph
+
+
+def test_only_consumed_artifacts_computed():
+    """
+    Artifact không ai get() thì không được tính
+    """
+    logger.info("🧪 Bắt đầu test tính lười...")
+    calls = []
+    artifacts = make_graph(calls).evaluate({'rewritten_text': '(0-5) xin chào. tạm biệt'})
+
+    assert artifacts.get('no_timeline') == 'XIN CHÀO. TẠM BIỆT'
+    assert calls == ['main_content', 'no_timeline']
+    assert not artifacts.is_computed('lead_in')
+
+    try:
+        artifacts.get('missing')
+        assert False, "Artifact không khai báo phải raise KeyError"
+    except KeyError:
+        pass
+
+    try:
+        make_graph([]).declare('main_content', str, ['rewritten_text'])
+        assert False, "Khai báo trùng phải raise ValueError"
+    except ValueError:
+        pass
+
+
+def test_shared_artifact_computed_once_across_threads():
+    """
+    Hai sink chạy song song cùng cần nội dung chính -> nội dung chính chỉ tính một lần
+    """
+    logger.info("🧪 Bắt đầu test tính một lần khi chạy song song...")
+    calls = []
+    artifacts = make_graph(calls).evaluate({'rewritten_text': '(0-5) xin chào. tạm biệt'})
+    barrier = threading.Barrier(2)
+
+    def sink(name):
+        barrier.wait()
+        return artifacts.get(name)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = list(executor.map(sink, ['no_timeline', 'lead_in']))
+
+    assert results == ['XIN CHÀO. TẠM BIỆT', '(0-5) XIN CHÀO']
+    assert artifacts.compute_counts == {'main_content': 1, 'no_timeline': 1, 'lead_in': 1}
+    assert calls.count('main_content') == 1
+
+
+if __name__ == "__main__":
+    test_only_consumed_artifacts_computed()
+    test_shared_artifact_computed_once_across_threads()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Async Engine
+Kiểm tra AsyncStagedPipeline (stage coroutine + stage blocking) và run_subprocess_async
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import asyncio
+import logging
+import subprocess
+import sys
+import time
+
+from async_engine import AsyncStagedPipeline, run_subprocess_async
+from deadlines import Deadline, DeadlineExceeded
+from pipeline_engine import PipelineStage
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def test_async_pipeline_mixes_coroutine_and_blocking_stages():
+    """
+    Stage coroutine chạy trên event loop, stage blocking chạy trong thread pool, kết quả giữ thứ tự
+    """
+    logger.info("🧪 Bắt đầu test async pipeline...")
+
+    async def extract(job):
+        await asyncio.sleep(0.05)
+        job['voice_path'] = f"voice:{job['video_name']}"
+
+    def upload(job):
+        time.sleep(0.05)
+        job['voice_file_id'] = f"id:{job['voice_path']}"
+
+    stages = [
+        PipelineStage('extract_voice', extract, workers=8),
+        PipelineStage('upload', upload, workers=4)
+    ]
+    jobs = [{'video_name': f'video{i}.mp4'} for i in range(8)]
+
+    start = time.time()
+    results = AsyncStagedPipeline(stages, blocking_workers=4).run(jobs)
+    elapsed = time.time() - start
+
+    assert [job['video_name'] for job in results] == [f'video{i}.mp4' for i in range(8)]
+    assert all(job['voice_file_id'] == f"id:voice:{job['video_name']}" for job in results)
+    # Tuần tự: 8 * 0.1 = 0.8s
+    assert elapsed < 0.5, elapsed
+
+
+def test_async_pipeline_errors_and_stop():
+    """
+    Job lỗi bỏ qua các stage sau; should_stop ngừng nhận job mới
+    """
+    logger.info("🧪 Bắt đầu test lỗi và dừng async pipeline...")
+
+    async def fail_odd(job):
+        if job['n'] % 2:
+            raise Exception('FFmpeg lỗi')
+
+    def mark(job):
+        job['uploaded'] = True
+
+    finished = []
+    stages = [PipelineStage('extract_voice', fail_odd), PipelineStage('upload', mark)]
+    results = AsyncStagedPipeline(stages, on_result=finished.append).run([{'n': i} for i in range(4)])
+
+    assert [job.get('failed_stage') for job in results] == [None, 'extract_voice', None, 'extract_voice']
+    assert [job.get('uploaded') for job in results] == [True, None, True, None]
+    assert len(finished) == 4
+
+    stopped = AsyncStagedPipeline([PipelineStage('upload', mark)], should_stop=lambda: True).run([{'n': 0}])
+    assert stopped == []
+
+
+def test_run_subprocess_async_deadline():
+    """
+    Process bị kill khi quá timeout hoặc deadline hết hạn
+    """
+    logger.info("🧪 Bắt đầu test subprocess async...")
+
+    result = asyncio.run(run_subprocess_async([sys.executable, '-c', 'print("ok")'], timeout=10))
+    assert result.returncode == 0 and result.stdout.strip() == 'ok'
+
+    sleeper = [sys.executable, '-c', 'import time; time.sleep(30)']
+    start = time.time()
+    try:
+        asyncio.run(run_subprocess_async(sleeper, timeout=0.3))
+        raise AssertionError("Phải raise TimeoutExpired")
+    except subprocess.TimeoutExpired:
+        pass
+
+    try:
+        asyncio.run(run_subprocess_async(sleeper, timeout=30, deadline=Deadline(0.3, 'video/extract_voice')))
+        raise AssertionError("Phải raise DeadlineExceeded")
+    except DeadlineExceeded:
+        pass
+    assert time.time() - start < 5
+
+
+if __name__ == "__main__":
+    test_async_pipeline_mixes_coroutine_and_blocking_stages()
+    test_async_pipeline_errors_and_stop()
+    test_run_subprocess_async_deadline()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Backfill
+Kiểm tra --backfill-prompt khi ghi cột G-I vào Google Sheets lỗi: dòng bị báo lỗi
+và workspace được giữ lại
+"""
+
+import logging
+import os
+
+from test_sheet_claims import FakeRequest, FakeSheetsService, make_processor
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class FailingSheetsService(FakeSheetsService):
+    """
+    Sheets service giả: batchUpdate lỗi với các dòng trong fail_rows
+    """
+
+    def __init__(self, rows, fail_rows):
+        super().__init__(rows)
+        self.fail_rows = fail_rows
+
+    def batchUpdate(self, spreadsheetId, body):
+        if any(data['range'].endswith(f'I{row}') for data in body['data'] for row in self.fail_rows):
+            def fail():
+                raise RuntimeError('quota exceeded')
+            return FakeRequest(fail)
+        return super().batchUpdate(spreadsheetId, body)
+
+
+def test_failed_sheet_write_marks_rows_error():
+    """
+    Batch ghi Sheets lỗi: các dòng trong batch thành error và giữ workspace, batch khác thành công
+    """
+    logger.info("🧪 Bắt đầu test backfill khi ghi Sheets lỗi...")
+    link = 'https://drive.google.com/file/d/{}/view'
+    rows = [['Link mp4', 'Tên video']] + [
+        [link.format(f'v{i}'), f'video{i}', '', link.format(f't{i}'), 'text', link.format(f'r{i}'), 'g', 'h', 'old']
+        for i in (1, 2)
+    ]
+    sheet = FailingSheetsService(rows, fail_rows=[3])
+    processor = make_processor(sheet, 'host-a')
+    try:
+        def get_prompt():
+            processor._thread_local.prompt_hash = 'new'
+
+        def backfill_row(job):
+            workspace = processor._job_workspace(job)
+            for key in ('main_content_path', 'text_no_timeline_path'):
+                job[key] = os.path.join(workspace['text'], f"{job['video_name']}_{key}.txt")
+                with open(job[key], 'w', encoding='utf-8') as f:
+                    f.write(key)
+            job['prompt_hash'] = 'new'
+            job['status'] = 'success'
+
+        processor.get_prompt_from_sheets = get_prompt
+        processor._budget_admission = lambda jobs: iter(jobs)
+        processor._backfill_row = backfill_row
+        write_rows = processor._write_backfill_rows
+        processor._write_backfill_rows = lambda jobs: write_rows(jobs, batch_size=1)
+
+        results = processor.backfill_prompt(workers=1)
+
+        assert [(r['video_name'], r['status']) for r in results] == [('video1', 'success'), ('video2', 'error')]
+        assert 'quota exceeded' in results[1]['error']
+        assert sheet.cell(2, 8) == 'new' and sheet.cell(3, 8) == 'old'
+        workspaces = [os.path.join(processor.temp_dir, name) for name in sorted(os.listdir(processor.temp_dir))]
+        assert [os.path.basename(path).split('_')[0] for path in workspaces] == ['video2']
+    finally:
+        processor.cleanup()
+
+
+if __name__ == "__main__":
+    test_failed_sheet_write_marks_rows_error()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Budget Gate
+Kiểm tra daily usage/reservation dùng chung qua SQLite và việc nhận/hoãn video theo quota ngày còn lại
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from budget_gate import BudgetGate
+from token_calculator import TokenCalculator
+from usage_store import UsageStore
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def make_job(name: str, minutes: float, completed_steps=None):
+    """
+    Tạo job giả với thời lượng video cho trước
+    """
+    return {
+        'video_name': name,
+        'video_file_id': f'id-{name}',
+        'video_info': {
+            'name': name,
+            'size': '1000',
+            'videoMediaMetadata': {'durationMillis': str(int(minutes * 60 * 1000))}
+        },
+        'completed_steps': set(completed_steps or ())
+    }
+
+
+def test_daily_usage_shared_through_file():
+    """
+    Usage ghi bởi một TokenCalculator được TokenCalculator khác (process khác) đọc lại
+    """
+    logger.info("🧪 Bắt đầu test lưu daily usage...")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        usage_path = os.path.join(temp_dir, 'token_usage.sqlite3')
+        first = TokenCalculator(usage_path)
+        first.track_api_call('transcribe', audio_duration=600, api_type='deepgram')
+        first.track_gemini_tokens('rewrite', 1000, 500)
+
+        second = TokenCalculator(usage_path)
+        second.track_api_call('transcribe', audio_duration=300, api_type='deepgram')
+
+        remaining = first.get_remaining_budget()
+        assert abs(remaining['deepgram_minutes'] - (first.quota_limits['deepgram_daily_minutes'] - 15)) < 1e-6
+        assert remaining['gemini_tokens'] == first.quota_limits['gemini_daily_tokens'] - 1500
+
+        # Cộng usage đồng thời từ nhiều kết nối không mất phần nào
+        calculators = [TokenCalculator(usage_path) for _ in range(4)]
+        threads = [threading.Thread(target=lambda c=c: [c.track_gemini_tokens('rewrite', 10, 0) for _ in range(25)])
+                   for c in calculators]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert first.get_remaining_budget()['gemini_tokens'] == first.quota_limits['gemini_daily_tokens'] - 2500
+
+        # Usage của ngày cũ không được tính
+        fresh_path = os.path.join(temp_dir, 'old.sqlite3')
+        UsageStore(fresh_path).close()
+        conn = sqlite3.connect(fresh_path)
+        conn.execute("INSERT INTO daily_usage (day, deepgram_minutes) VALUES ('2000-01-01', 999)")
+        conn.commit()
+        conn.close()
+        fresh = TokenCalculator(fresh_path)
+        assert fresh.get_remaining_budget()['deepgram_minutes'] == fresh.quota_limits['deepgram_daily_minutes']
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_reservations_shared_between_processes():
+    """
+    Gate của các process dùng chung usage store không nhận quá quota còn lại
+    """
+    logger.info("🧪 Bắt đầu test reservation dùng chung...")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        usage_path = os.path.join(temp_dir, 'token_usage.sqlite3')
+
+        def make_gate():
+            calculator = TokenCalculator(usage_path)
+            calculator.quota_limits['deepgram_daily_minutes'] = 35  # Đủ cho 3 video (ước tính 11 phút/video)
+            return BudgetGate(calculator)
+
+        # Mỗi gate một kết nối SQLite riêng (như process riêng), nhận cùng lúc
+        gates = [make_gate() for _ in range(8)]
+        admitted = []
+        threads = [threading.Thread(target=lambda g=g, i=i: g.try_reserve(make_job(f'v{i}.mp4', 10))
+                                    and admitted.append(i))
+                   for i, g in enumerate(gates)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(admitted) == 3
+        assert gates[0].reserved_count == 3
+
+        # Video xong ở gate này -> gate khác nhận được video mới
+        first = admitted[0]
+        gates[first].release(make_job(f'v{first}.mp4', 10))
+        assert gates[1].try_reserve(make_job('late.mp4', 10))
+
+        # Reservation của process đã chết hết hạn
+        store = UsageStore(usage_path, worker_id='dead', reservation_ttl_seconds=0.2)
+        assert store.try_reserve('orphan', {'deepgram_minutes': 0, 'deepgram_cost': 0,
+                                            'gemini_tokens': 0, 'gemini_cost': 0}, lambda usage: usage) == []
+        time.sleep(0.3)
+        assert store.reserved_count() == 0
+        store.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_gate_defers_and_releases():
+    """
+    Video vượt quota còn lại bị hoãn, được nhận lại khi video đang chạy trả reservation
+    """
+    logger.info("🧪 Bắt đầu test budget gate...")
+    calculator = TokenCalculator()
+    calculator.quota_limits['deepgram_daily_minutes'] = 30
+    gate = BudgetGate(calculator)
+
+    first, second, third = make_job('a.mp4', 10), make_job('b.mp4', 10), make_job('c.mp4', 10)
+    assert gate.try_reserve(first)
+    assert gate.try_reserve(second)
+    assert not gate.try_reserve(third)
+    assert gate.reserved_count == 2
+
+    gate.release(first)
+    assert gate.try_reserve(third)
+
+    # Usage thực tế làm giảm quota còn lại
+    gate.release(second)
+    gate.release(third)
+    calculator.track_api_call('transcribe', audio_duration=25 * 60, api_type='deepgram')
+    assert not gate.try_reserve(make_job('d.mp4', 10))
+
+    # Video đã transcribe xong (khôi phục từ ledger) không tốn thêm phút Deepgram
+    assert gate.try_reserve(make_job('e.mp4', 10, completed_steps=['download', 'transcribe']))
+
+    assert gate.exceeds_daily_quota(make_job('long.mp4', 60))
+    assert not gate.exceeds_daily_quota(make_job('short.mp4', 1))
+
+    assert gate.seconds_until_reset(datetime(2024, 1, 1, 23, 0, 0)) == 3600
+
+
+def test_rewrite_only_estimate():
+    """
+    Job chỉ viết lại (backfill prompt) không tốn phút Deepgram, token theo độ dài transcript
+    """
+    logger.info("🧪 Bắt đầu test ước tính job chỉ viết lại...")
+    gate = BudgetGate(TokenCalculator())
+    short = gate.estimate({'video_name': 'a', 'video_file_id': 'row2', 'transcript_chars': 1000})
+    long = gate.estimate({'video_name': 'b', 'video_file_id': 'row3', 'transcript_chars': 10000})
+    assert short['deepgram_minutes'] == 0 and short['deepgram_cost'] == 0
+    assert 0 < short['gemini_tokens'] < long['gemini_tokens']
+
+
+if __name__ == "__main__":
+    test_daily_usage_shared_through_file()
+    test_reservations_shared_between_processes()
+    test_gate_defers_and_releases()
+    test_rewrite_only_estimate()
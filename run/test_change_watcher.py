@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Change Watcher
+Kiểm tra ChangeWatcher với InMemoryChangesSource: lọc folder, bỏ trùng, lưu page token
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+
+from change_watcher import ChangeWatcher, DriveChangesSource, InMemoryChangesSource
+from video_files import FOLDER_MIME_TYPE
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def _video(file_id, folder='input', modified='2024-01-01T00:00:00Z', **extra):
+    video = {
+        'id': file_id,
+        'name': f'{file_id}.mp4',
+        'mimeType': 'video/mp4',
+        'parents': [folder],
+        'modifiedTime': modified
+    }
+    video.update(extra)
+    return video
+
+
+def test_only_new_videos_in_folder():
+    """
+    Chỉ lấy video trong folder input, bỏ file khác folder, file không phải video, file trong thùng rác
+    """
+    logger.info("🧪 Bắt đầu test lọc thay đổi...")
+
+    source = InMemoryChangesSource()
+    source.push_file(_video('old'))  # Trước khi bắt đầu theo dõi
+
+    watcher = ChangeWatcher(source, 'input')
+    assert watcher.start() is False
+    assert watcher.poll() == []
+
+    source.push_file(_video('new'))
+    source.push_file(_video('other_folder', folder='other'))
+    source.push_file({'id': 'doc', 'name': 'notes.txt', 'mimeType': 'text/plain', 'parents': ['input']})
+    source.push_file(_video('trashed', trashed=True))
+    source.push_file(_video('deleted'))
+    source.push_removed('deleted')
+
+    videos = watcher.poll()
+    assert [v['id'] for v in videos] == ['new']
+
+    # Chưa commit -> poll lại vẫn thấy cùng thay đổi nhưng không đưa lại cùng phiên bản
+    assert watcher.poll() == []
+    watcher.commit()
+    assert watcher.poll() == []
+
+
+def test_modified_video_is_queued_again():
+    """
+    Video được sửa (modifiedTime mới) được đưa lại, thay đổi metadata khác thì không
+    """
+    logger.info("🧪 Bắt đầu test video được sửa...")
+
+    source = InMemoryChangesSource()
+    watcher = ChangeWatcher(source, 'input')
+    watcher.start()
+
+    source.push_file(_video('a', modified='t1'))
+    assert [v['id'] for v in watcher.poll()] == ['a']
+    watcher.commit()
+
+    source.push_file(_video('a', modified='t1', name='a_renamed.mp4'))
+    assert watcher.poll() == []
+    watcher.commit()
+
+    source.push_file(_video('a', modified='t2'))
+    assert [v['id'] for v in watcher.poll()] == ['a']
+    watcher.commit()
+
+    # Video có sẵn từ lần quét đầu tiên không bị đưa lại
+    source.push_file(_video('b', modified='t1'))
+    watcher.mark_seen([_video('b', modified='t1')])
+    assert watcher.poll() == []
+
+
+def test_page_token_persisted():
+    """
+    Page token chỉ được lưu sau commit; khởi động lại tiếp tục từ token đã lưu
+    """
+    logger.info("🧪 Bắt đầu test lưu page token...")
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        token_path = os.path.join(temp_dir, 'config', 'token.json')
+        source = InMemoryChangesSource()
+
+        watcher = ChangeWatcher(source, 'input', token_path)
+        assert watcher.start() is False
+        source.push_file(_video('a'))
+        assert len(watcher.poll()) == 1
+
+        # Dừng trước khi commit -> lần sau vẫn lấy lại video a
+        restarted = ChangeWatcher(source, 'input', token_path)
+        assert restarted.start() is True
+        assert [v['id'] for v in restarted.poll()] == ['a']
+        restarted.commit()
+
+        source.push_file(_video('b'))
+        restarted_again = ChangeWatcher(source, 'input', token_path)
+        assert restarted_again.start() is True
+        assert [v['id'] for v in restarted_again.poll()] == ['b']
+
+        # Token của folder khác được lưu riêng
+        other = ChangeWatcher(source, 'other', token_path)
+        assert other.start() is False
+        assert ChangeWatcher(source, 'input', token_path).page_token == restarted.page_token
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+class _FakeChanges:
+    """
+    Drive service giả: changes().getStartPageToken() và changes().list() trả response cho trước
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def changes(self):
+        return self
+
+    def getStartPageToken(self, supportsAllDrives):
+        return {'startPageToken': '1'}
+
+    def list(self, pageToken, **kwargs):
+        return self.pages[pageToken]
+
+
+def test_drive_source_uses_execute():
+    """
+    DriveChangesSource gọi mọi request qua hàm execute được truyền vào (ví dụ rate limiter)
+    """
+    logger.info("🧪 Bắt đầu test DriveChangesSource qua execute...")
+    pages = {
+        '1': {'changes': [{'fileId': 'a'}], 'nextPageToken': '2'},
+        '2': {'changes': [{'fileId': 'b'}], 'newStartPageToken': '3'}
+    }
+    executed = []
+    source = DriveChangesSource(_FakeChanges(pages), execute=lambda request: executed.append(request) or request)
+
+    assert source.get_start_page_token() == '1'
+    changes, token = source.list_changes('1')
+    assert [c['fileId'] for c in changes] == ['a', 'b'] and token == '3'
+    assert len(executed) == 3
+
+
+def _folder(folder_id, parent, **extra):
+    folder = {'id': folder_id, 'name': folder_id, 'mimeType': FOLDER_MIME_TYPE, 'parents': [parent]}
+    folder.update(extra)
+    return folder
+
+
+def test_recursive_tracks_subfolders():
+    """
+    Khi recursive: lấy video trong thư mục con đã biết và thư mục con mới (kể cả lồng nhau
+    xuất hiện trước thư mục cha), bỏ thư mục con đã vào thùng rác; không recursive thì bỏ qua
+    """
+    logger.info("🧪 Bắt đầu test theo dõi thư mục con...")
+
+    source = InMemoryChangesSource()
+    flat = ChangeWatcher(source, 'input')
+    watcher = ChangeWatcher(source, 'input', recursive=True)
+    flat.start()
+    watcher.start()
+    flat.track_folders(['known'])
+    watcher.track_folders(['known'])
+
+    source.push_file(_video('in_known', folder='known'))
+    source.push_file(_folder('deep', 'fresh'))  # Thư mục lồng nhau đến trước thư mục cha
+    source.push_file(_folder('fresh', 'input'))
+    source.push_file(_video('in_deep', folder='deep'))
+    source.push_file(_folder('outside', 'other'))
+    source.push_file(_video('in_outside', folder='outside'))
+
+    assert flat.poll() == []
+    assert sorted(v['id'] for v in watcher.poll()) == ['in_deep', 'in_known']
+    assert watcher.folder_ids == {'input', 'known', 'fresh', 'deep'}
+    watcher.commit()
+
+    # Thư mục con vào thùng rác: không theo dõi nữa
+    source.push_file(_folder('known', 'input', trashed=True))
+    source.push_file(_video('late', folder='known'))
+    assert watcher.poll() == []
+    assert 'known' not in watcher.folder_ids
+
+
+if __name__ == "__main__":
+    test_only_new_videos_in_folder()
+    test_modified_video_is_queued_again()
+    test_page_token_persisted()
+    test_drive_source_uses_execute()
+    test_recursive_tracks_subfolders()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Deadlines
+Kiểm tra deadline: timeout hiệu lực, deadline lồng nhau, kill subprocess khi quá hạn
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import subprocess
+import sys
+import threading
+import time
+
+from deadlines import (Deadline, DeadlineExceeded, check_deadline, deadline_scope,
+                       effective_timeout, run_subprocess, run_subprocess_streaming)
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# Process giả lập FFmpeg chạy lâu
+SLOW_PROCESS = [sys.executable, "-c", "import time; time.sleep(30)"]
+
+
+def test_effective_timeout_uses_remaining_budget():
+    """
+    Timeout của HTTP request không được vượt quá thời gian còn lại
+    """
+    assert effective_timeout(600) == 600
+
+    video_deadline = Deadline(3600, 'video1.mp4')
+    with deadline_scope(Deadline(5, 'video1.mp4/transcribe', parent=video_deadline)):
+        assert effective_timeout(600) <= 5
+        assert effective_timeout(1) == 1
+
+    # Deadline cha ngắn hơn thì dùng deadline cha
+    with deadline_scope(Deadline(600, 'video1.mp4/rewrite', parent=Deadline(2, 'video1.mp4'))):
+        assert effective_timeout(360) <= 2
+
+
+def test_expired_deadline_raises():
+    """
+    Hết hạn hoặc bị hủy thì check_deadline() phải raise DeadlineExceeded
+    """
+    video_deadline = Deadline(None, 'video1.mp4')
+    step_deadline = Deadline(0.05, 'video1.mp4/download', parent=video_deadline)
+    with deadline_scope(step_deadline):
+        check_deadline()
+        time.sleep(0.1)
+        try:
+            check_deadline()
+            assert False, "Deadline đã hết hạn"
+        except DeadlineExceeded as e:
+            assert 'video1.mp4/download' in str(e)
+
+    # Hủy deadline cha -> deadline con cũng bị hủy
+    step_deadline = Deadline(60, 'video1.mp4/upload_voice', parent=video_deadline)
+    video_deadline.cancel()
+    assert step_deadline.expired()
+
+
+def test_subprocess_killed_on_deadline():
+    """
+    Process FFmpeg phải bị kill ngay khi deadline hết hạn (không chờ timeout 3600s)
+    """
+    logger.info("🧪 Bắt đầu test kill subprocess...")
+
+    start = time.time()
+    with deadline_scope(Deadline(0.5, 'video1.mp4/extract_voice')):
+        try:
+            run_subprocess(SLOW_PROCESS, timeout=3600)
+            assert False, "Process phải bị kill"
+        except DeadlineExceeded:
+            pass
+    assert time.time() - start < 5
+
+    # Hủy từ thread khác (ví dụ khi dừng chương trình)
+    deadline = Deadline(None, 'video2.mp4')
+    threading.Timer(0.3, deadline.cancel).start()
+    with deadline_scope(deadline):
+        try:
+            run_subprocess(SLOW_PROCESS, timeout=3600)
+            assert False, "Process phải bị kill"
+        except DeadlineExceeded:
+            pass
+
+    # Timeout mặc định vẫn giữ hành vi của subprocess.run
+    try:
+        run_subprocess(SLOW_PROCESS, timeout=0.3)
+        assert False, "Process phải bị kill"
+    except subprocess.TimeoutExpired:
+        pass
+
+    result = run_subprocess([sys.executable, "-c", "print('ok')"], timeout=30)
+    assert result.returncode == 0 and result.stdout.strip() == 'ok'
+
+    logger.info("✅ Test kill subprocess hoàn tất!")
+
+
+def test_streaming_subprocess():
+    """
+    Dữ liệu được ghi vào stdin trong lúc process chạy; process bị kill khi deadline bị hủy
+    """
+    logger.info("🧪 Bắt đầu test stream vào stdin của subprocess...")
+    # Process giả lập FFmpeg đọc "-i pipe:0": đếm số byte nhận được, ghi nhiều ra stderr
+    counter = [sys.executable, "-c",
+               "import sys; n = len(sys.stdin.buffer.read()); sys.stderr.write('x' * 200000); print(n)"]
+
+    def feed(write):
+        for _ in range(20):
+            write(b'a' * 65536)
+
+    result = run_subprocess_streaming(counter, feed, timeout=30)
+    assert result.returncode == 0 and result.stdout.strip() == str(20 * 65536)
+    assert len(result.stderr) == 200000
+
+    # Process thoát sớm (đóng stdin) -> không lỗi, trả returncode của process
+    result = run_subprocess_streaming([sys.executable, "-c", "import sys; sys.exit(3)"], feed, timeout=30)
+    assert result.returncode == 3
+
+    # Lỗi của nguồn dữ liệu -> process bị kill, lỗi được raise lại
+    def broken_feed(write):
+        write(b'a')
+        raise ConnectionError('Drive lỗi')
+
+    try:
+        run_subprocess_streaming(counter, broken_feed, timeout=30)
+        assert False, "Lỗi của feed phải được raise"
+    except ConnectionError:
+        pass
+
+    # Deadline bị hủy trong lúc process đang chạy (feed đã ghi xong)
+    deadline = Deadline(None, 'video3.mp4/extract_voice')
+    threading.Timer(0.3, deadline.cancel).start()
+    start = time.time()
+    with deadline_scope(deadline):
+        try:
+            run_subprocess_streaming(SLOW_PROCESS, lambda write: None, timeout=3600)
+            assert False, "Process phải bị kill"
+        except DeadlineExceeded:
+            pass
+    assert time.time() - start < 5
+
+
+if __name__ == "__main__":
+    test_effective_timeout_uses_remaining_budget()
+    test_expired_deadline_raises()
+    test_subprocess_killed_on_deadline()
+    test_streaming_subprocess()
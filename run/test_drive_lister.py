@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Drive Lister
+Kiểm tra liệt kê video theo trang, duyệt thư mục con song song và trả kết quả dạng generator
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import re
+import threading
+
+from drive_lister import FOLDER_MIME_TYPE, LIST_FIELDS, DriveLister
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+class FakeRequest:
+    def __init__(self, drive, kwargs):
+        self.drive = drive
+        self.kwargs = kwargs
+
+    def execute(self):
+        return self.drive.list_page(**self.kwargs)
+
+
+class FakeFiles:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def list(self, **kwargs):
+        return FakeRequest(self.drive, kwargs)
+
+
+class FakeDrive:
+    """
+    Drive giả: folder -> danh sách file, trả theo trang (pageToken là vị trí)
+    """
+
+    def __init__(self, tree, broken=()):
+        self.tree = tree
+        self.broken = set(broken)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def files(self):
+        return FakeFiles(self)
+
+    def list_page(self, q, fields, pageSize, pageToken=None, **kwargs):
+        folder_id = re.match(r"'([^']+)' in parents", q).group(1)
+        with self.lock:
+            self.calls.append({'folder_id': folder_id, 'fields': fields, 'pageSize': pageSize, 'q': q})
+        if folder_id in self.broken:
+            raise RuntimeError(f"HttpError 500 khi liệt kê {folder_id}")
+
+        files = [f for f in self.tree.get(folder_id, [])
+                 if "application/vnd.google-apps.folder" in q or f['mimeType'] != FOLDER_MIME_TYPE]
+        if "mimeType contains 'video/'" not in q:  # Query chỉ lấy thư mục
+            files = [f for f in files if f['mimeType'] == FOLDER_MIME_TYPE]
+        start = int(pageToken or 0)
+        response = {'files': files[start:start + pageSize]}
+        if start + pageSize < len(files):
+            response['nextPageToken'] = str(start + pageSize)
+        return response
+
+
+def video(file_id):
+    return {'id': file_id, 'name': f'{file_id}.mp4', 'mimeType': 'video/mp4'}
+
+
+def folder(file_id):
+    return {'id': file_id, 'name': file_id, 'mimeType': FOLDER_MIME_TYPE}
+
+
+def make_tree():
+    return {
+        'root': [video(f'r{i:03d}') for i in range(250)] + [folder('sub1'), folder('sub2'),
+                                                            {'id': 'doc', 'name': 'notes.txt', 'mimeType': 'text/plain'}],
+        'sub1': [video('s1a'), video('s1b'), folder('deep'), video('r001')],  # r001: video có hai parent
+        'sub2': [video('s2a')],
+        'deep': [video('d1'), folder('root')]  # Vòng lặp: không được duyệt lại root
+    }
+
+
+def test_paginates_with_projection():
+    """
+    Đọc hết các trang của folder, chỉ lấy trường cần thiết, không duyệt thư mục con khi tắt recursive
+    """
+    logger.info("🧪 Bắt đầu test liệt kê theo trang...")
+    drive = FakeDrive(make_tree())
+    lister = DriveLister(lambda: drive, page_size=100)
+    videos = lister.list_videos('root')
+    assert [v['id'] for v in videos] == [f'r{i:03d}' for i in range(250)]
+    assert len(drive.calls) == 3
+    assert all(call['fields'] == LIST_FIELDS and call['pageSize'] == 100 for call in drive.calls)
+    assert 'trashed = false' in drive.calls[0]['q']
+
+
+def test_recursive_concurrent():
+    """
+    Duyệt thư mục con song song: đủ video, không trùng, không lặp vô hạn, folder lỗi bị bỏ qua
+    """
+    logger.info("🧪 Bắt đầu test duyệt thư mục con...")
+    for workers in (1, 4):
+        drive = FakeDrive(make_tree(), broken=['sub2'])
+        lister = DriveLister(lambda: drive, page_size=100, recursive=True, workers=workers)
+        ids = [v['id'] for v in lister.iter_videos('root')]
+        assert len(ids) == len(set(ids))
+        assert set(ids) == {f'r{i:03d}' for i in range(250)} | {'s1a', 's1b', 'd1'}
+        assert len([call for call in drive.calls if call['folder_id'] == 'root']) == 3
+
+    # Folder gốc lỗi -> báo lỗi cho người gọi
+    drive = FakeDrive(make_tree(), broken=['root'])
+    try:
+        DriveLister(lambda: drive, recursive=True).list_videos('root')
+        assert False, "Lỗi folder gốc phải được báo"
+    except RuntimeError:
+        pass
+
+
+def test_generator_streams_first_page():
+    """
+    Video đầu tiên có ngay sau trang đầu; dừng sớm thì không đọc thêm trang
+    """
+    logger.info("🧪 Bắt đầu test generator...")
+    drive = FakeDrive(make_tree())
+    videos = DriveLister(lambda: drive, page_size=100).iter_videos('root')
+    assert next(videos)['id'] == 'r000'
+    videos.close()
+    assert len(drive.calls) == 1
+
+    # Song song: thư mục con chỉ được giao khi người gọi đọc tới -> dừng sớm không liệt kê chúng
+    drive = FakeDrive(make_tree())
+    videos = DriveLister(lambda: drive, page_size=100, recursive=True, workers=2).iter_videos('root')
+    assert next(videos)['id'] == 'r000'
+    videos.close()
+    assert {call['folder_id'] for call in drive.calls} == {'root'}
+
+
+def test_list_subfolders():
+    """
+    Liệt kê ID mọi thư mục con (không lặp vô hạn, thư mục con lỗi bị bỏ qua), chỉ truy vấn thư mục
+    """
+    logger.info("🧪 Bắt đầu test liệt kê thư mục con...")
+    drive = FakeDrive(make_tree(), broken=['sub2'])
+    lister = DriveLister(lambda: drive, page_size=100, recursive=True)
+    assert sorted(lister.list_subfolders('root')) == ['deep', 'sub1', 'sub2']
+    assert all(f"mimeType = '{FOLDER_MIME_TYPE}'" in call['q'] for call in drive.calls)
+
+
+if __name__ == "__main__":
+    test_paginates_with_projection()
+    test_recursive_concurrent()
+    test_generator_streams_first_page()
+    test_list_subfolders()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Folder Config
+Kiểm tra đọc file cấu hình nhiều folder: giá trị mặc định, thiếu trường, trùng tên
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from folder_config import load_folder_configs
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'voice_folder_id': 'voice',
+    'text_original_folder_id': 'text_original',
+    'text_rewritten_folder_id': 'text_rewritten',
+    'spreadsheet_id': 'sheet',
+    'sheet_name': 'Mp3 to text'
+}
+
+
+def _write_config(temp_dir, entries):
+    path = os.path.join(temp_dir, 'folders.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f)
+    return path
+
+
+def test_defaults_are_applied():
+    """
+    Trường không khai báo lấy theo giá trị mặc định, tên mặc định là input_folder_id
+    """
+    logger.info("🧪 Bắt đầu test cấu hình folder...")
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = _write_config(temp_dir, [
+            {'name': 'client-a', 'input_folder_id': 'in_a', 'spreadsheet_id': 'sheet_a'},
+            {'input_folder_id': 'in_b'}
+        ])
+        configs = load_folder_configs(path, DEFAULTS)
+
+        assert [c['name'] for c in configs] == ['client-a', 'in_b']
+        assert configs[0]['spreadsheet_id'] == 'sheet_a'
+        assert configs[0]['voice_folder_id'] == 'voice'
+        assert configs[1]['spreadsheet_id'] == 'sheet'
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_invalid_configs_are_rejected():
+    """
+    Thiếu input_folder_id, thiếu folder output (không có mặc định) hoặc trùng tên -> ValueError
+    """
+    logger.info("🧪 Bắt đầu test cấu hình folder không hợp lệ...")
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        invalid = [
+            ([], DEFAULTS),
+            ([{'name': 'x'}], DEFAULTS),
+            ([{'input_folder_id': 'in_a'}], {}),
+            ([{'name': 'x', 'input_folder_id': 'a'}, {'name': 'x', 'input_folder_id': 'b'}], DEFAULTS)
+        ]
+        for entries, defaults in invalid:
+            try:
+                load_folder_configs(_write_config(temp_dir, entries), defaults)
+            except ValueError:
+                continue
+            raise AssertionError(f"Cấu hình không hợp lệ nhưng không bị từ chối: {entries}")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    test_defaults_are_applied()
+    test_invalid_configs_are_rejected()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Job API
+Kiểm tra gửi job qua HTTP, nhận job ID ngay và đọc trạng thái/kết quả khi worker chạy xong
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from job_api import JobApiServer, JobStore, validate_submission
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+STAGES = ['download', 'rewrite', 'format', 'sheet']
+
+
+def request(method: str, url: str, body=None):
+    """
+    Gửi request JSON, trả (status, body đã parse)
+    """
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method)
+    try:
+        with urllib.request.urlopen(req, timeout=5) as response:
+            return response.status, json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read().decode('utf-8'))
+
+
+def test_validate_submission():
+    """
+    Yêu cầu được chuẩn hóa, yêu cầu sai bị từ chối
+    """
+    logger.info("🧪 Bắt đầu test kiểm tra yêu cầu...")
+    request_ = validate_submission({'file_ids': ['a', ' a ', 'b'], 'from_stage': 'rewrite'}, STAGES)
+    assert request_['file_ids'] == ['a', 'b']
+    assert request_['from_stage'] == 'rewrite' and request_['pipeline'] is False
+
+    for payload in [[], {'file_ids': []}, {'file_ids': 'a'}, {'from_stage': 'tts'},
+                    {'from_stage': 'rewrite', 'only_stages': ['format']}, {'unknown': 1}]:
+        try:
+            validate_submission(payload, STAGES)
+            assert False, f"Yêu cầu sai phải bị từ chối: {payload}"
+        except ValueError:
+            pass
+
+
+def test_submit_returns_immediately_and_reports_result():
+    """
+    POST /jobs trả job ID trong khi worker còn chạy, kết quả đọc được sau khi xong
+    """
+    logger.info("🧪 Bắt đầu test Job API...")
+    release = threading.Event()
+    seen = []
+
+    def runner(request_):
+        seen.append(request_)
+        release.wait(5)
+        if request_.get('folder_id') == 'broken':
+            raise RuntimeError('Drive lỗi')
+        return [{'status': 'success', 'video_name': f'{file_id}.mp4', 'video_file_id': file_id,
+                 'text_path': '/tmp/secret.txt'} for file_id in request_['file_ids'] or []]
+
+    server = JobApiServer(runner, port=0, workers=2, stages=STAGES)
+    server.start()
+    try:
+        status, body = request('POST', f'{server.address}/jobs', {'file_ids': ['f1', 'f2'], 'pipeline': True})
+        assert status == 202
+        job_id = body['job_id']
+
+        status, body = request('POST', f'{server.address}/jobs', {'folder_id': 'broken'})
+        assert status == 202
+        broken_id = body['job_id']
+
+        # Worker chưa xong -> trạng thái running, chưa có kết quả
+        time.sleep(0.2)
+        assert request('GET', f'{server.address}/jobs/{job_id}')[1]['status'] == 'running'
+        assert request('GET', f'{server.address}/jobs/{job_id}/result')[0] == 409
+
+        assert request('POST', f'{server.address}/jobs', {'from_stage': 'tts'})[0] == 400
+        assert request('GET', f'{server.address}/jobs/missing')[0] == 404
+
+        release.set()
+        for _ in range(50):
+            if all(job['status'] in ('done', 'error') for job in request('GET', f'{server.address}/jobs')[1]['jobs']):
+                break
+            time.sleep(0.1)
+
+        status, body = request('GET', f'{server.address}/jobs/{job_id}/result')
+        assert status == 200 and body['status'] == 'done'
+        assert [r['video_file_id'] for r in body['results']] == ['f1', 'f2']
+        assert 'text_path' not in body['results'][0]
+        assert body['success_count'] == 2
+
+        status, body = request('GET', f'{server.address}/jobs/{broken_id}/result')
+        assert body['status'] == 'error' and 'Drive lỗi' in body['error']
+        assert seen[0]['pipeline'] is True
+    finally:
+        release.set()
+        server.stop()
+
+
+def test_submit_after_pool_shutdown_marks_error():
+    """
+    Worker pool đã dừng -> 503 và job không bị kẹt ở queued
+    """
+    logger.info("🧪 Bắt đầu test gửi job khi worker pool đã dừng...")
+    server = JobApiServer(lambda request_: [], port=0, workers=1, stages=STAGES)
+    server.start()
+    try:
+        server._executor.shutdown(wait=True)
+        assert request('POST', f'{server.address}/jobs', {'folder_id': 'f'})[0] == 503
+        jobs = request('GET', f'{server.address}/jobs')[1]['jobs']
+        assert len(jobs) == 1
+        assert jobs[0]['status'] == 'error' and jobs[0]['finished_at'] is not None
+    finally:
+        server.stop()
+
+
+def test_store_evicts_oldest_finished():
+    """
+    Chỉ giữ max_finished job đã xong, job đang chờ không bị bỏ
+    """
+    logger.info("🧪 Bắt đầu test giới hạn số job lưu lại...")
+    store = JobStore(max_finished=2)
+    jobs = [store.add({'file_ids': None}) for _ in range(4)]
+    for job in jobs[:3]:
+        store.update(job['job_id'], status='done', results=[])
+    assert [job['job_id'] for job in store.list()] == [job['job_id'] for job in jobs[1:]]
+
+
+if __name__ == "__main__":
+    test_validate_submission()
+    test_submit_returns_immediately_and_reports_result()
+    test_submit_after_pool_shutdown_marks_error()
+    test_store_evicts_oldest_finished()
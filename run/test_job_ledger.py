@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Job Ledger
+Kiểm tra JobLedger: ghi checkpoint, khôi phục nội dung text và trạng thái video
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+
+from job_ledger import JobLedger
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def test_ledger_records_and_restores_steps():
+    """
+    Checkpoint phải còn nguyên sau khi mở lại ledger (giả lập chạy lại sau crash)
+    """
+    logger.info("🧪 Bắt đầu test job ledger...")
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(temp_dir, 'ledger.sqlite3')
+        text_path = os.path.join(temp_dir, 'video1_transcript.txt')
+        voice_path = os.path.join(temp_dir, 'video1_voice.mp3')
+        with open(text_path, 'w', encoding='utf-8') as f:
+            f.write("Xin chào các bạn")
+        with open(voice_path, 'wb') as f:
+            f.write(b'mp3')
+
+        ledger = JobLedger(db_path)
+        ledger.record_step('id1', 'video1.mp4', 'extract_voice', {}, media_files={'voice_path': voice_path})
+        ledger.record_step('id1', 'video1.mp4', 'transcribe',
+                           {'detected_language': 'vi', 'is_chinese': False},
+                           text_files={'transcript_path': text_path})
+        ledger.close()
+
+        # Mở lại như một process mới
+        ledger = JobLedger(db_path)
+        completed = ledger.get_completed_steps('id1')
+        assert sorted(completed) == ['extract_voice', 'transcribe']
+        assert completed['transcribe']['values'] == {'detected_language': 'vi', 'is_chinese': False}
+        transcript = completed['transcribe']['artifacts']['transcript_path']
+        assert transcript['content'] == "Xin chào các bạn"
+        assert completed['extract_voice']['artifacts']['voice_path']['sha256']
+        assert ledger.get_video('id1')['status'] == 'running'
+
+        ledger.mark_video('id1', 'video1.mp4', 'success')
+        ledger.mark_sheet_written(['id1'])
+        state = ledger.get_video('id1')
+        assert state['status'] == 'success' and state['sheet_written']
+
+        ledger.clear_steps('id1', ['transcribe'])
+        assert list(ledger.get_completed_steps('id1')) == ['extract_voice']
+        assert ledger.get_video('missing') is None
+        ledger.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+    logger.info("✅ Test job ledger hoàn tất!")
+
+
+if __name__ == "__main__":
+    test_ledger_records_and_restores_steps()
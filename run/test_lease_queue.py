@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Lease Queue
+Kiểm tra LeaseQueue: nhiều worker không claim trùng, lease hết hạn được đưa lại hàng đợi
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from lease_queue import LeaseQueue
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def test_workers_never_claim_same_video():
+    """
+    Nhiều worker claim đồng thời: mỗi video chỉ được xử lý đúng một lần
+    """
+    logger.info("🧪 Bắt đầu test claim nhiều worker...")
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(temp_dir, 'queue.sqlite3')
+        videos = [{'id': f'id{i}', 'name': f'video{i}.mp4'} for i in range(30)]
+        assert LeaseQueue(db_path, worker_id='setup').enqueue(videos) == 30
+        # Enqueue lần nữa (worker khác khởi động) không tạo bản trùng
+        assert LeaseQueue(db_path, worker_id='setup2').enqueue(videos) == 0
+
+        processed = []
+        lock = threading.Lock()
+
+        def worker(worker_id):
+            lease_queue = LeaseQueue(db_path, worker_id=worker_id)
+            while True:
+                video = lease_queue.claim()
+                if video is None:
+                    break
+                time.sleep(0.005)
+                with lock:
+                    processed.append(video['id'])
+                assert lease_queue.complete(video['id'])
+            lease_queue.close()
+
+        threads = [threading.Thread(target=worker, args=(f'w{i}',)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(processed) == sorted(video['id'] for video in videos)
+        assert LeaseQueue(db_path).get_counts() == {'done': 30}
+    finally:
+        shutil.rmtree(temp_dir)
+
+    logger.info("✅ Test claim nhiều worker hoàn tất!")
+
+
+def test_expired_lease_is_requeued():
+    """
+    Worker chết (không heartbeat) -> lease hết hạn -> worker khác nhận lại video
+    """
+    logger.info("🧪 Bắt đầu test lease hết hạn...")
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(temp_dir, 'queue.sqlite3')
+        dead_worker = LeaseQueue(db_path, worker_id='dead', lease_seconds=1)
+        live_worker = LeaseQueue(db_path, worker_id='live', lease_seconds=1)
+        dead_worker.enqueue([{'id': 'id1', 'name': 'video1.mp4'}])
+
+        assert dead_worker.claim()['id'] == 'id1'
+        assert live_worker.claim() is None
+        assert live_worker.pending_count() == 1
+
+        # Heartbeat giữ lease còn hạn
+        live_worker.start_heartbeat(interval=0.2)
+        time.sleep(1.2)
+        assert live_worker.claim()['id'] == 'id1'
+
+        # Worker cũ quay lại không được ghi đè kết quả
+        assert not dead_worker.complete('id1')
+        time.sleep(1.2)
+        assert dead_worker.claim() is None
+        assert live_worker.complete('id1', success=False, error='Deepgram lỗi')
+
+        # Video thất bại được đưa lại hàng đợi ở lần enqueue sau
+        assert live_worker.enqueue([{'id': 'id1', 'name': 'video1.mp4'}]) == 1
+        live_worker.close()
+        dead_worker.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+    logger.info("✅ Test lease hết hạn hoàn tất!")
+
+
+def test_named_lock_is_exclusive():
+    """
+    Khóa 'sheet' chỉ cho một worker ghi tại một thời điểm
+    """
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(temp_dir, 'queue.sqlite3')
+        active = []
+        overlaps = []
+
+        def writer(worker_id):
+            lease_queue = LeaseQueue(db_path, worker_id=worker_id)
+            with lease_queue.named_lock('sheet', poll_interval=0.01):
+                active.append(worker_id)
+                if len(active) > 1:
+                    overlaps.append(worker_id)
+                time.sleep(0.05)
+                active.remove(worker_id)
+            lease_queue.close()
+
+        threads = [threading.Thread(target=writer, args=(f'w{i}',)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert overlaps == []
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    test_workers_never_claim_same_video()
+    test_expired_lease_is_requeued()
+    test_named_lock_is_exclusive()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Pipeline Engine
+Kiểm tra StagedPipeline: thứ tự kết quả, xử lý lỗi và chạy chồng lấp
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import time
+
+from pipeline_engine import PipelineStage, StagedPipeline
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def _sleep_stage(key, delay):
+    """Tạo handler giả lập một stage tốn thời gian"""
+    def handler(job):
+        time.sleep(delay)
+        job[key] = f"{key}:{job['video_name']}"
+    return handler
+
+
+def test_pipeline_overlaps_stages():
+    """
+    Pipeline phải nhanh hơn chạy tuần tự và giữ thứ tự kết quả
+    """
+    logger.info("🧪 Bắt đầu test pipeline chồng lấp...")
+
+    stages = [
+        PipelineStage('download', _sleep_stage('video_path', 0.05), workers=2),
+        PipelineStage('extract_voice', _sleep_stage('voice_path', 0.05), workers=2),
+        PipelineStage('upload', _sleep_stage('voice_file_id', 0.05), workers=2)
+    ]
+    jobs = [{'video_name': f'video{i}.mp4'} for i in range(8)]
+
+    start = time.time()
+    results = StagedPipeline(stages).run(jobs)
+    elapsed = time.time() - start
+
+    # Tuần tự sẽ mất 8 * 3 * 0.05 = 1.2 giây
+    logger.info(f"⏱️ Pipeline: {elapsed:.2f}s")
+    assert elapsed < 1.0
+    assert [job['video_name'] for job in results] == [f'video{i}.mp4' for i in range(8)]
+    assert all(job['voice_file_id'] == f"voice_file_id:{job['video_name']}" for job in results)
+
+    logger.info("✅ Test pipeline chồng lấp hoàn tất!")
+
+
+def test_pipeline_error_skips_later_stages():
+    """
+    Job lỗi ở một stage phải bỏ qua các stage sau và ghi lại stage bị lỗi
+    """
+    logger.info("🧪 Bắt đầu test xử lý lỗi pipeline...")
+
+    def failing_stage(job):
+        if job['video_name'] == 'bad.mp4':
+            raise Exception("FFmpeg lỗi")
+        job['voice_path'] = 'ok'
+
+    uploaded = []
+    stages = [
+        PipelineStage('extract_voice', failing_stage),
+        PipelineStage('upload', lambda job: uploaded.append(job['video_name']))
+    ]
+    finished = []
+    pipeline = StagedPipeline(stages, on_result=lambda job: finished.append(job['video_name']))
+    results = pipeline.run([{'video_name': 'good.mp4'}, {'video_name': 'bad.mp4'}])
+
+    assert results[1]['status'] == 'error'
+    assert results[1]['failed_stage'] == 'extract_voice'
+    assert uploaded == ['good.mp4']
+    assert sorted(finished) == ['bad.mp4', 'good.mp4']
+
+    logger.info("✅ Test xử lý lỗi pipeline hoàn tất!")
+
+
+def test_pipeline_stops_admitting_when_draining():
+    """
+    Khi có tín hiệu dừng: không nhận job mới, job đang chạy vẫn được hoàn thành
+    """
+    logger.info("🧪 Bắt đầu test drain pipeline...")
+
+    draining = []
+
+    def slow_stage(job):
+        time.sleep(0.1)
+        draining.append(True)
+        job['voice_path'] = 'ok'
+
+    stages = [PipelineStage('extract_voice', slow_stage, workers=1, queue_size=1)]
+    pipeline = StagedPipeline(stages, should_stop=lambda: bool(draining))
+    results = pipeline.run([{'video_name': f'video{i}.mp4'} for i in range(10)])
+
+    # Job đầu tiên xong thì bắt đầu drain -> chỉ các job đã vào hàng đợi được xử lý
+    assert 1 <= len(results) <= 3
+    assert all(job['voice_path'] == 'ok' for job in results)
+
+    logger.info("✅ Test drain pipeline hoàn tất!")
+
+
+if __name__ == "__main__":
+    test_pipeline_overlaps_stages()
+    test_pipeline_error_skips_later_stages()
+    test_pipeline_stops_admitting_when_draining()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Batch Planner
+Kiểm tra BatchPlanner: chi phí theo bảng giá TokenCalculator, cảnh báo quota và thời gian ước tính
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+
+from planner import BatchPlanner, format_plan
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def _video(name, minutes, size_mb):
+    """Tạo thông tin video giả như Drive trả về"""
+    return {
+        'id': name,
+        'name': name,
+        'size': str(size_mb * 1024 * 1024),
+        'videoMediaMetadata': {'durationMillis': str(minutes * 60 * 1000)}
+    }
+
+
+def test_plan_costs_and_calls():
+    """
+    Chi phí Deepgram phải bằng số phút x giá của TokenCalculator
+    """
+    logger.info("🧪 Bắt đầu test planner...")
+
+    planner = BatchPlanner(assumptions={'chinese_ratio': 0.0, 'vi_fallback_ratio': 0.0})
+    videos = [_video('a.mp4', 10, 200), _video('b.mp4', 2, 40)]
+    plan = planner.plan(videos)
+
+    assert plan['video_count'] == 2
+    assert abs(plan['deepgram_minutes'] - 12) < 1e-6
+    expected_cost = 12 * planner.token_calculator.deepgram_pricing['audio']
+    assert abs(plan['deepgram_cost_usd'] - expected_cost) < 1e-9
+    assert plan['api_calls']['deepgram'] == 2
+    assert plan['api_calls']['gemini_rewrite'] == 2
+    assert plan['api_calls']['gemini_translate'] == 0
+    assert plan['api_calls']['drive_upload'] == 6
+    assert plan['api_calls']['drive_download'] == 3  # 200 MB = 2 chunk, 40 MB = 1 chunk
+    assert plan['quota_warnings'] == []
+
+    report = format_plan(plan)
+    assert 'Deepgram' in report and 'Gemini' in report
+    logger.info("\n" + report)
+
+    logger.info("✅ Test planner hoàn tất!")
+
+
+def test_plan_pipeline_faster_and_quota_warning():
+    """
+    Pipeline nhiều worker phải nhanh hơn tuần tự; batch quá lớn phải có cảnh báo quota
+    """
+    videos = [_video(f'v{i}.mp4', 30, 500) for i in range(40)]
+    planner = BatchPlanner()
+
+    sequential = planner.plan(videos)
+    pipeline = planner.plan(videos, {'download': 2, 'extract_voice': 2, 'transcribe': 4,
+                                     'rewrite': 4, 'format': 2, 'upload': 4})
+
+    assert pipeline['wall_clock_seconds'] < sequential['wall_clock_seconds']
+    # 40 video x 30 phút = 1200 phút > quota 1000 phút/ngày của Deepgram
+    assert any('Deepgram' in warning for warning in sequential['quota_warnings'])
+
+
+if __name__ == "__main__":
+    test_plan_costs_and_calls()
+    test_plan_pipeline_faster_and_quota_warning()
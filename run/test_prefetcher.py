@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Video Prefetcher
+Kiểm tra VideoPrefetcher: giới hạn lookahead, byte budget và giải phóng file
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from prefetcher import VideoPrefetcher
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+class FakeDownloader:
+    """Giả lập download_video: ghi file có kích thước cho trước"""
+
+    def __init__(self, temp_dir, sizes):
+        self.temp_dir = temp_dir
+        self.sizes = sizes
+        self.downloaded = []
+        self.lock = threading.Lock()
+
+    def __call__(self, file_id, video_name):
+        time.sleep(0.02)
+        path = os.path.join(self.temp_dir, video_name)
+        with open(path, 'wb') as f:
+            f.write(b'0' * self.sizes[file_id])
+        with self.lock:
+            self.downloaded.append(file_id)
+        return path
+
+
+def test_prefetch_respects_byte_budget():
+    """
+    Prefetcher phải dừng khi hết budget và tiếp tục sau khi release
+    """
+    logger.info("🧪 Bắt đầu test byte budget...")
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        sizes = {'a': 600, 'b': 600, 'c': 600}
+        videos = [{'id': fid, 'name': f'{fid}.mp4', 'size': str(size)} for fid, size in sizes.items()]
+        downloader = FakeDownloader(temp_dir, sizes)
+
+        prefetcher = VideoPrefetcher(downloader, lookahead=3, byte_budget=1000)
+        prefetcher.start(videos)
+
+        path_a = prefetcher.get('a')
+        time.sleep(0.1)
+        # a + b vượt budget 1000 bytes -> chỉ a được tải
+        assert downloader.downloaded == ['a']
+
+        prefetcher.release('a')
+        assert not os.path.exists(path_a)
+        assert prefetcher.get('b') == os.path.join(temp_dir, 'b.mp4')
+        prefetcher.release('b')
+        assert prefetcher.get('c') == os.path.join(temp_dir, 'c.mp4')
+        prefetcher.release('c')
+        prefetcher.stop()
+
+        assert downloader.downloaded == ['a', 'b', 'c']
+        assert os.listdir(temp_dir) == []
+    finally:
+        shutil.rmtree(temp_dir)
+
+    logger.info("✅ Test byte budget hoàn tất!")
+
+
+def test_prefetch_lookahead_and_errors():
+    """
+    Prefetcher tải trước tối đa lookahead video; lỗi tải được trả về cho người gọi
+    """
+    logger.info("🧪 Bắt đầu test lookahead...")
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        sizes = {'a': 10, 'b': 10, 'c': 10, 'd': 10}
+        downloader = FakeDownloader(temp_dir, sizes)
+
+        def download(file_id, video_name):
+            if file_id == 'b':
+                raise Exception("Drive lỗi")
+            return downloader(file_id, video_name)
+
+        videos = [{'id': fid, 'name': f'{fid}.mp4'} for fid in sizes]
+        prefetcher = VideoPrefetcher(download, lookahead=2, byte_budget=10 ** 6)
+        prefetcher.start(videos)
+        time.sleep(0.15)
+        # b lỗi không chiếm chỗ -> a và c được giữ, d phải chờ
+        assert downloader.downloaded == ['a', 'c']
+
+        try:
+            prefetcher.get('b')
+            assert False, "Lỗi tải phải được raise"
+        except Exception as e:
+            assert str(e) == "Drive lỗi"
+
+        # Video không nằm trong danh sách prefetch -> None (tải trực tiếp)
+        assert prefetcher.get('x') is None
+
+        prefetcher.release('a')
+        assert prefetcher.get('d') == os.path.join(temp_dir, 'd.mp4')
+        prefetcher.stop()
+    finally:
+        shutil.rmtree(temp_dir)
+
+    logger.info("✅ Test lookahead hoàn tất!")
+
+
+def test_prefetch_discard_frees_slot():
+    """
+    Video bị bỏ qua (discard) trả lại chỗ lookahead: video được nhận sau đó không bị treo
+    """
+    logger.info("🧪 Bắt đầu test discard...")
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        sizes = {'a': 10, 'b': 10, 'c': 10, 'd': 10}
+        downloader = FakeDownloader(temp_dir, sizes)
+        videos = [{'id': fid, 'name': f'{fid}.mp4'} for fid in sizes]
+        prefetcher = VideoPrefetcher(downloader, lookahead=2, byte_budget=10 ** 6)
+        prefetcher.start(videos)
+
+        # a và b đã tải xong rồi bị bỏ qua (ví dụ runner khác đã giữ chỗ dòng Sheets)
+        prefetcher.get('a')
+        prefetcher.get('b')
+        prefetcher.discard('a')
+        prefetcher.discard('b')
+        assert not os.path.exists(os.path.join(temp_dir, 'a.mp4'))
+
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(path=prefetcher.get('c')), daemon=True)
+        thread.start()
+        thread.join(3)
+        assert not thread.is_alive(), "get('c') bị treo vì a, b vẫn giữ chỗ"
+        assert result['path'] == os.path.join(temp_dir, 'c.mp4')
+
+        # Video bị discard -> get trả None (tải trực tiếp), file tải trước (nếu có) bị xóa
+        prefetcher.discard('d')
+        assert prefetcher.get('d') is None
+        prefetcher.release('c')
+        prefetcher.stop()
+        assert os.listdir(temp_dir) == []
+    finally:
+        shutil.rmtree(temp_dir)
+
+    logger.info("✅ Test discard hoàn tất!")
+
+
+def test_prefetch_discard_while_downloading():
+    """
+    Video bị discard trong lúc đang tải: file bị xóa khi tải xong, chỗ được trả lại
+    """
+    logger.info("🧪 Bắt đầu test discard khi đang tải...")
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        started = threading.Event()
+        finish = threading.Event()
+        downloader = FakeDownloader(temp_dir, {'a': 10, 'b': 10})
+
+        def download(file_id, video_name):
+            if file_id == 'a':
+                started.set()
+                finish.wait(5)
+            return downloader(file_id, video_name)
+
+        prefetcher = VideoPrefetcher(download, lookahead=1, byte_budget=10 ** 6)
+        prefetcher.start([{'id': 'a', 'name': 'a.mp4'}, {'id': 'b', 'name': 'b.mp4'}])
+        assert started.wait(2)
+        prefetcher.discard('a')
+        finish.set()
+
+        assert prefetcher.get('b') == os.path.join(temp_dir, 'b.mp4')
+        assert not os.path.exists(os.path.join(temp_dir, 'a.mp4'))
+        prefetcher.release('b')
+        prefetcher.stop()
+    finally:
+        shutil.rmtree(temp_dir)
+
+    logger.info("✅ Test discard khi đang tải hoàn tất!")
+
+
+if __name__ == "__main__":
+    test_prefetch_respects_byte_budget()
+    test_prefetch_lookahead_and_errors()
+    test_prefetch_discard_frees_slot()
+    test_prefetch_discard_while_downloading()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Range Downloader
+Kiểm tra tải file theo đoạn byte song song: ghi đúng vị trí, thử lại từng đoạn và kiểm tra MD5
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+
+from range_downloader import RangeDownloader, needs_seeking, split_ranges
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+DATA = os.urandom(1000)
+MD5 = hashlib.md5(DATA).hexdigest()
+
+
+def test_split_ranges():
+    """
+    Các đoạn phủ kín file, đoạn cuối ngắn hơn
+    """
+    logger.info("🧪 Bắt đầu test chia đoạn...")
+    assert split_ranges(1000, 300) == [(0, 299), (300, 599), (600, 899), (900, 999)]
+    assert split_ranges(0, 300) == []
+
+
+def test_parallel_download_with_retry():
+    """
+    Các đoạn chạy song song, đoạn lỗi/thiếu byte được thử lại, file khớp MD5
+    """
+    logger.info("🧪 Bắt đầu test tải song song...")
+    temp_dir = tempfile.mkdtemp()
+    lock = threading.Lock()
+    state = {'active': 0, 'peak': 0, 'calls': []}
+    failures = {300: 1, 600: 1}  # Đoạn 300 lỗi mạng một lần, đoạn 600 trả thiếu byte một lần
+
+    def fetch(start, end):
+        with lock:
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+            state['calls'].append(start)
+            failing = failures.get(start, 0)
+            if failing:
+                failures[start] -= 1
+        try:
+            time.sleep(0.05)
+            if failing and start == 300:
+                raise ConnectionError('reset')
+            if failing:
+                return DATA[start:end]
+            return DATA[start:end + 1]
+        finally:
+            with lock:
+                state['active'] -= 1
+
+    try:
+        path = os.path.join(temp_dir, 'video.mp4')
+        downloader = RangeDownloader(fetch, len(DATA), md5=MD5, part_size=300, workers=4, base_backoff=0.01)
+        downloader.download(path)
+        with open(path, 'rb') as f:
+            assert f.read() == DATA
+        assert state['peak'] > 1
+        assert downloader.retries == 2
+        assert sorted(state['calls']) == [0, 300, 300, 600, 600, 900]
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_checksum_mismatch_and_exhausted_retries():
+    """
+    Sai MD5 hoặc đoạn hết số lần thử lại -> raise và không để lại file dở dang
+    """
+    logger.info("🧪 Bắt đầu test sai checksum...")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, 'video.mp4')
+        try:
+            RangeDownloader(lambda start, end: DATA[start:end + 1], len(DATA), md5='0' * 32,
+                            part_size=300).download(path)
+            assert False, "Sai checksum phải raise ValueError"
+        except ValueError as e:
+            assert 'MD5' in str(e)
+        assert not os.path.exists(path)
+
+        def broken(start, end):
+            if start == 600:
+                raise ConnectionError('down')
+            return DATA[start:end + 1]
+
+        try:
+            RangeDownloader(broken, len(DATA), part_size=300, max_retries=1, base_backoff=0.01).download(path)
+            assert False, "Đoạn hết số lần thử lại phải raise"
+        except ConnectionError:
+            pass
+        assert not os.path.exists(path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_stream_in_order():
+    """
+    stream() ghi các đoạn đúng thứ tự dù đoạn sau tải xong trước
+    """
+    logger.info("🧪 Bắt đầu test stream theo thứ tự...")
+    chunks = []
+
+    def fetch(start, end):
+        time.sleep(0.05 if start == 0 else 0.0)  # Đoạn đầu chậm nhất
+        return DATA[start:end + 1]
+
+    RangeDownloader(fetch, len(DATA), md5=MD5, part_size=128, workers=4).stream(chunks.append)
+    assert b''.join(chunks) == DATA and len(chunks) == 8
+
+    try:
+        RangeDownloader(fetch, len(DATA), md5='0' * 32, part_size=128).stream(chunks.append)
+        assert False, "Sai checksum phải raise ValueError"
+    except ValueError:
+        pass
+
+
+def box(box_type: bytes, payload_size: int) -> bytes:
+    """
+    Header box ISO-BMFF (size + type) kèm payload rỗng
+    """
+    return struct.pack('>I4s', 8 + payload_size, box_type) + b'\0' * payload_size
+
+
+def test_needs_seeking():
+    """
+    MP4 có moov trước mdat thì stream được, moov ở cuối thì phải tải cả file
+    """
+    logger.info("🧪 Bắt đầu test kiểm tra vị trí moov...")
+    assert not needs_seeking(box(b'ftyp', 24) + box(b'moov', 100) + struct.pack('>I4s', 1000, b'mdat'))
+    assert needs_seeking(box(b'ftyp', 24) + struct.pack('>I4s', 10 ** 9, b'mdat'))
+    assert needs_seeking(box(b'ftyp', 24) + box(b'free', 10 ** 6))  # Không thấy moov trong phần đầu
+    assert not needs_seeking(b'\x1a\x45\xdf\xa3' + b'\0' * 100)  # MKV/WebM (EBML)
+
+
+if __name__ == "__main__":
+    test_split_ranges()
+    test_parallel_download_with_retry()
+    test_checksum_mismatch_and_exhausted_retries()
+    test_stream_in_order()
+    test_needs_seeking()
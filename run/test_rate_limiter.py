@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Adaptive Rate Limiter
+Kiểm tra AdaptiveLimiter: tăng dần khi ổn định, giảm mạnh khi gặp 429/độ trễ tăng vọt
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import threading
+import time
+
+from rate_limiter import AdaptiveLimiter
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+class _Response:
+    """Response giả của requests"""
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def test_additive_increase_and_multiplicative_decrease():
+    """
+    Thành công liên tiếp -> limit tăng 1 mỗi vòng; 429 -> limit giảm một nửa và tạm dừng
+    """
+    logger.info("🧪 Bắt đầu test AIMD...")
+
+    limiter = AdaptiveLimiter('gemini', initial=2, max_limit=5, base_backoff=0.2)
+    for _ in range(20):
+        limiter.call(lambda: _Response(200))
+    assert limiter.limit == 5
+
+    limiter.call(lambda: _Response(429))
+    assert limiter.limit == 2
+    assert limiter.stats['throttled'] == 1
+
+    # Đang backoff -> request tiếp theo phải chờ
+    start = time.monotonic()
+    limiter.call(lambda: _Response(200))
+    assert time.monotonic() - start >= 0.15
+
+    # Lỗi khác (400) không làm giảm limit
+    limiter.call(lambda: _Response(400))
+    assert limiter.limit == 2
+
+
+def test_concurrent_throttles_cut_once():
+    """
+    Nhiều 429 cùng một đợt chỉ giảm limit một lần; số request đồng thời không vượt limit
+    """
+    logger.info("🧪 Bắt đầu test 429 đồng thời...")
+
+    limiter = AdaptiveLimiter('drive', initial=8, max_limit=8, base_backoff=0.01)
+    peak = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(8)
+
+    def throttled():
+        with lock:
+            peak.append(limiter.in_flight)
+        barrier.wait()
+        return _Response(429)
+
+    threads = [threading.Thread(target=limiter.call, args=(throttled,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) <= 8
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
+
+
+def test_latency_spike_reduces_limit():
+    """
+    Độ trễ của cùng loại request tăng vọt -> giảm limit; loại request khác không bị so sánh chung
+    """
+    logger.info("🧪 Bắt đầu test độ trễ...")
+
+    limiter = AdaptiveLimiter('sheets', initial=4, max_limit=4, latency_factor=3.0)
+    for _ in range(5):
+        limiter.release(limiter.acquire() - 0.01, 200, latency_key='values.get')
+    limiter.release(limiter.acquire() - 1.0, 200, latency_key='values.update')
+    assert limiter.limit == 4
+
+    limiter.release(limiter.acquire() - 0.2, 200, latency_key='values.get')
+    assert limiter.limit == 2
+    assert limiter.stats['slow'] == 1
+
+
+if __name__ == "__main__":
+    test_additive_increase_and_multiplicative_decrease()
+    test_concurrent_throttles_cut_once()
+    test_latency_spike_reduces_limit()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Retry Queue
+Kiểm tra phân loại lỗi, backoff và hàng đợi thử lại/dead-letter trong job ledger
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from job_ledger import JobLedger
+from retry_queue import classify_failure, dead_letter_reason, retry_delay
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def test_classify_failure():
+    """
+    Lỗi được phân loại theo thông báo, loại exception và bước bị lỗi
+    """
+    logger.info("🧪 Bắt đầu test phân loại lỗi...")
+    cases = [
+        ('Quá thời hạn: video1.mp4/transcribe', 'DeadlineExceeded', 'transcribe', 'transient'),
+        ("HTTPSConnectionPool(host='api.deepgram.com'): Read timed out", 'ReadTimeout', 'transcribe', 'transient'),
+        ('Gemini API lỗi: 503 - The model is overloaded', 'Exception', 'rewrite', 'transient'),
+        ('Gemini API lỗi: 429 - RESOURCE_EXHAUSTED', 'Exception', 'rewrite', 'quota'),
+        ('<HttpError 403 when requesting ... returned "Quota exceeded">', 'HttpError', 'upload_text', 'quota'),
+        ('<HttpError 404 when requesting ... returned "File not found">', 'HttpError', 'download', 'permanent'),
+        ('FFmpeg lỗi: size=450kB bitrate=192.0kbits/s', 'Exception', 'extract_voice', 'ffmpeg'),
+        ('FFmpeg lỗi: video1.mp4: Invalid data found when processing input', 'Exception', 'extract_voice', 'bad_media'),
+        ('Transcript vẫn rỗng', 'Exception', 'transcribe', 'bad_media'),
+        ('Lỗi lạ', 'ValueError', 'format_main', 'unknown'),
+    ]
+    for error, error_type, step, expected in cases:
+        assert classify_failure(error, error_type, step) == expected, (error, expected)
+
+
+def test_retry_delay_backoff():
+    """
+    Backoff tăng gấp đôi, có giới hạn; hết số lần thử hoặc lỗi vĩnh viễn -> None (dead-letter)
+    """
+    logger.info("🧪 Bắt đầu test backoff...")
+    assert [retry_delay('transient', attempts) for attempts in range(1, 6)] == [30, 60, 120, 240, None]
+    assert retry_delay('ffmpeg', 1) == 60 and retry_delay('ffmpeg', 2) is None
+    assert retry_delay('bad_media', 1) is None
+    assert retry_delay('quota', 3) == 3600
+    assert dead_letter_reason('bad_media', 1, 'Invalid data').startswith('bad_media: ')
+
+
+def test_ledger_retry_queue():
+    """
+    Ledger lưu lịch thử lại và dead-letter, xóa khi video xử lý thành công
+    """
+    logger.info("🧪 Bắt đầu test hàng đợi thử lại trong ledger...")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(temp_dir, 'ledger.sqlite3')
+        ledger = JobLedger(db_path)
+        next_attempt_at = time.time() + 30
+        ledger.set_retry('vid1', 'video1.mp4', 'transient', 1, 'timeout', 'transcribe', next_attempt_at)
+        ledger.set_retry('vid2', 'video2.mp4', 'bad_media', 1, 'bad_media: hỏng', 'extract_voice')
+        ledger.close()
+
+        # Mở lại: hàng đợi vẫn còn sau khi process kết thúc
+        ledger = JobLedger(db_path)
+        entry = ledger.get_retry('vid1')
+        assert entry['status'] == 'pending' and entry['attempts'] == 1
+        assert entry['failed_step'] == 'transcribe' and abs(entry['next_attempt_at'] - next_attempt_at) < 1e-3
+        assert [e['video_file_id'] for e in ledger.list_retries('dead')] == ['vid2']
+        assert ledger.list_retries('dead')[0]['reason'] == 'bad_media: hỏng'
+
+        ledger.set_retry('vid1', 'video1.mp4', 'transient', 2, 'timeout', 'transcribe', next_attempt_at + 60)
+        assert ledger.get_retry('vid1')['attempts'] == 2
+
+        ledger.clear_retry(['vid1'])
+        assert ledger.get_retry('vid1') is None
+        assert len(ledger.list_retries()) == 1
+        ledger.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_classify_failure()
+    test_retry_delay_backoff()
+    test_ledger_retry_queue()
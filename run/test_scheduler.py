@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Video Scheduler
+Kiểm tra schedule_videos với các policy và ước lượng makespan
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+
+from scheduler import estimate_makespan, fair_share_order, schedule_videos
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def _video(name, seconds=None, size=None):
+    """Tạo thông tin video giả như Drive trả về"""
+    video = {'id': name, 'name': name}
+    if seconds is not None:
+        video['videoMediaMetadata'] = {'durationMillis': str(seconds * 1000)}
+    if size is not None:
+        video['size'] = str(size)
+    return video
+
+
+def test_schedule_policies():
+    """
+    Các policy phải sắp xếp đúng theo thời lượng (thiếu metadata thì dùng dung lượng)
+    """
+    logger.info("🧪 Bắt đầu test scheduler...")
+
+    videos = [
+        _video('a_long.mp4', 2400),
+        _video('b_short.mp4', 30),
+        _video('c_no_metadata.mp4', size=300 * 1024 * 1024),  # ~300 giây
+        _video('d_short.mp4', 30)
+    ]
+
+    names = lambda scheduled: [video['name'] for video in scheduled]
+    assert names(schedule_videos(videos, 'name')) == names(videos)
+    assert names(schedule_videos(videos, 'shortest')) == ['b_short.mp4', 'd_short.mp4', 'c_no_metadata.mp4', 'a_long.mp4']
+    assert names(schedule_videos(videos, 'longest')) == ['a_long.mp4', 'c_no_metadata.mp4', 'b_short.mp4', 'd_short.mp4']
+    assert names(schedule_videos(videos, 'fair')) == ['b_short.mp4', 'a_long.mp4', 'd_short.mp4', 'c_no_metadata.mp4']
+
+    try:
+        schedule_videos(videos, 'random')
+        assert False, "Policy không hợp lệ phải bị từ chối"
+    except ValueError:
+        pass
+
+    logger.info("✅ Test scheduler hoàn tất!")
+
+
+def test_longest_first_reduces_makespan():
+    """
+    Với nhiều worker, video dài trước cho tổng thời gian không tệ hơn thứ tự tên
+    """
+    videos = [_video(f'clip{i:02d}.mp4', 30) for i in range(12)] + [_video('zz_long.mp4', 600)]
+
+    by_name = estimate_makespan(schedule_videos(videos, 'name'), workers=3)
+    longest_first = estimate_makespan(schedule_videos(videos, 'longest'), workers=3)
+
+    assert longest_first == 600
+    assert by_name > longest_first
+
+
+def test_fair_share_across_folders():
+    """
+    Folder lớn không chặn folder nhỏ: mỗi folder được phục vụ theo tổng thời lượng
+    """
+    logger.info("🧪 Bắt đầu test fair share nhiều folder...")
+
+    big = [_video(f'big{i}', 600) for i in range(10)]
+    small = [_video(f'small{i}', 60) for i in range(3)]
+    medium = [_video(f'medium{i}', 300) for i in range(2)]
+
+    ordered = fair_share_order([('big', big), ('small', small), ('medium', medium), ('empty', [])])
+    names = [name for name, _ in ordered]
+
+    assert len(ordered) == 15
+    # Folder nào cũng có video trong lượt đầu tiên
+    assert set(names[:3]) == {'big', 'small', 'medium'}
+    # Các video ngắn của folder nhỏ xong trước khi folder lớn được lượt thứ hai
+    assert names.index('big', 1) > max(i for i, name in enumerate(names) if name == 'small')
+    # Thứ tự trong từng folder được giữ nguyên
+    assert [video['name'] for name, video in ordered if name == 'big'] == [video['name'] for video in big]
+
+
+if __name__ == "__main__":
+    test_schedule_policies()
+    test_longest_first_reduces_makespan()
+    test_fair_share_across_folders()
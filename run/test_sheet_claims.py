@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Sheet Claims
+Kiểm tra giữ chỗ dòng Google Sheets của AllInOneProcessor (giữ chỗ, nhận lại, heartbeat, trả lại)
+với một Sheets service giả dùng chung giữa nhiều runner
+"""
+
+import logging
+import re
+from datetime import datetime, timedelta
+
+from all_in_one import AllInOneProcessor
+from video_checker import CLAIM_COLUMN_INDEX, format_claim, is_released, parse_claim
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SHEET_NAME = 'Mp3 to text'
+
+
+class FakeRequest:
+    """
+    Request giả: execute() gọi hàm cho trước
+    """
+
+    def __init__(self, func):
+        self.func = func
+
+    def execute(self):
+        return self.func()
+
+
+class FakeSheetsService:
+    """
+    Sheets service giả lưu các dòng trong bộ nhớ (get, batchGet, append, update, batchUpdate)
+
+    before_append: các hàm chạy trước lần append kế tiếp (mô phỏng runner khác chen vào)
+    """
+
+    def __init__(self, rows=None):
+        self.rows = rows or [['Link mp4', 'Tên video']]
+        self.before_append = []
+        self.calls = []
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    @staticmethod
+    def _parse_range(a1_range):
+        cells = a1_range.rsplit('!', 1)[1]
+        match = re.match(r'([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?$', cells)
+        first_col, first_row, last_col, last_row = match.groups()
+        if last_col is None:
+            last_col, last_row = first_col, first_row
+        return (ord(first_col) - ord('A'), int(first_row) if first_row else None,
+                ord(last_col) - ord('A'), int(last_row) if last_row else None)
+
+    def read(self, a1_range):
+        first_col, first_row, last_col, last_row = self._parse_range(a1_range)
+        first_row = first_row or 1
+        last_row = last_row or len(self.rows)
+        values = [self.rows[i - 1][first_col:last_col + 1] if i <= len(self.rows) else []
+                  for i in range(first_row, last_row + 1)]
+        values = [[cell for cell in row] for row in values]
+        for row in values:
+            while row and row[-1] == '':
+                row.pop()
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def write(self, a1_range, values):
+        first_col, first_row, _, _ = self._parse_range(a1_range)
+        for offset, row_values in enumerate(values):
+            row_number = first_row + offset
+            while len(self.rows) < row_number:
+                self.rows.append([])
+            row = self.rows[row_number - 1]
+            while len(row) < first_col + len(row_values):
+                row.append('')
+            row[first_col:first_col + len(row_values)] = row_values
+
+    def cell(self, row_number, column_index):
+        row = self.rows[row_number - 1]
+        return row[column_index] if len(row) > column_index else ''
+
+    def get(self, spreadsheetId, range):
+        self.calls.append(('get', range))
+        return FakeRequest(lambda: {'values': self.read(range)})
+
+    def batchGet(self, spreadsheetId, ranges):
+        self.calls.append(('batchGet', tuple(ranges)))
+        return FakeRequest(lambda: {'valueRanges': [{'values': self.read(r)} for r in ranges]})
+
+    def append(self, spreadsheetId, range, valueInputOption, insertDataOption, body):
+        def run():
+            while self.before_append:
+                self.before_append.pop(0)()
+            row_number = len(self.rows) + 1
+            while row_number > 1 and not any(self.rows[row_number - 2]):
+                row_number -= 1
+            self.rows.insert(row_number - 1, [])
+            self.write(f'{SHEET_NAME}!A{row_number}', body['values'])
+            return {'updates': {'updatedRange': f"'{SHEET_NAME}'!A{row_number}:J{row_number}"}}
+        self.calls.append(('append', range))
+        return FakeRequest(run)
+
+    def update(self, spreadsheetId, range, valueInputOption, body):
+        self.calls.append(('update', range))
+        return FakeRequest(lambda: self.write(range, body['values']) or {})
+
+    def batchUpdate(self, spreadsheetId, body):
+        def run():
+            for data in body['data']:
+                self.write(data['range'], data['values'])
+            return {}
+        self.calls.append(('batchUpdate', len(body['data'])))
+        return FakeRequest(run)
+
+
+def make_processor(sheets_service, worker_id):
+    """
+    AllInOneProcessor không xác thực Google, dùng Sheets service giả
+    """
+    authenticate = AllInOneProcessor._authenticate_google_apis
+    AllInOneProcessor._authenticate_google_apis = lambda self: None
+    try:
+        processor = AllInOneProcessor()
+    finally:
+        AllInOneProcessor._authenticate_google_apis = authenticate
+    processor.sheets_service = sheets_service
+    processor.worker_id = worker_id
+    return processor
+
+
+def make_job(file_id, video_name):
+    return {'video_file_id': file_id, 'video_name': video_name, 'claim_sheet_row': True}
+
+
+def test_racing_runners_keep_one_claim():
+    """
+    Hai runner cùng giữ chỗ một video: dòng trên cùng thắng, runner thua trả lại dòng của mình
+    """
+    logger.info("🧪 Bắt đầu test hai runner giữ chỗ cùng lúc...")
+    sheet = FakeSheetsService()
+    runner_a = make_processor(sheet, 'host-a')
+    runner_b = make_processor(sheet, 'host-b')
+    job_a = make_job('vid1', 'video1.mp4')
+    job_b = make_job('vid1', 'video1.mp4')
+    claimed_b = []
+    try:
+        # Runner B đọc Sheet, thêm dòng và đọc lại sau lần đọc đầu tiên của A, trước khi A thêm dòng
+        sheet.before_append.append(lambda: claimed_b.append(runner_b._claim_sheet_row(job_b)))
+        claimed_a = runner_a._claim_sheet_row(job_a)
+
+        assert claimed_b == [True] and claimed_a is False
+        assert job_b['sheet_claim']['row'] == 2 and 'sheet_claim' not in job_a
+        assert parse_claim(sheet.cell(2, CLAIM_COLUMN_INDEX))['worker_id'] == 'host-b'
+        assert is_released(sheet.cell(3, CLAIM_COLUMN_INDEX))
+        assert sheet.rows[2][:CLAIM_COLUMN_INDEX] == [''] * CLAIM_COLUMN_INDEX
+        assert not runner_a._active_sheet_claims and len(runner_b._active_sheet_claims) == 1
+
+        # Lần giữ chỗ sau (dòng còn hạn của B) bỏ qua video mà không thêm dòng
+        appends = sum(1 for call in sheet.calls if call[0] == 'append')
+        assert runner_a._claim_sheet_row(make_job('vid1', 'video1.mp4')) is False
+        assert sum(1 for call in sheet.calls if call[0] == 'append') == appends
+
+        # Chỉ đọc cột A:B và J:J, không đọc cả bảng
+        assert ('get', f'{SHEET_NAME}!A:J') not in sheet.calls
+        assert ('batchGet', (f'{SHEET_NAME}!A:B', f'{SHEET_NAME}!J:J')) in sheet.calls
+    finally:
+        runner_a.cleanup()
+        runner_b.cleanup()
+
+
+def test_stale_claim_reclaimed():
+    """
+    Dòng giữ chỗ quá hạn của runner đã dừng được nhận lại ở dòng mới và đánh dấu RELEASED
+    """
+    logger.info("🧪 Bắt đầu test nhận lại dòng giữ chỗ quá hạn...")
+    processor = None
+    stale = format_claim('host-dead', datetime.now() - timedelta(hours=7))
+    sheet = FakeSheetsService([
+        ['Link mp4', 'Tên video'],
+        ['https://drive.google.com/file/d/vid1/view', 'video1'] + [''] * 7 + [stale]
+    ])
+    try:
+        processor = make_processor(sheet, 'host-a')
+        job = make_job('vid1', 'video1.mp4')
+        assert processor._claim_sheet_row(job) is True
+        assert job['sheet_claim']['row'] == 3
+        assert is_released(sheet.cell(2, CLAIM_COLUMN_INDEX))
+        assert parse_claim(sheet.cell(3, CLAIM_COLUMN_INDEX))['worker_id'] == 'host-a'
+
+        # Kết quả được ghi vào dòng đã giữ chỗ, cột J được xóa
+        result = dict(job, voice_file_id='v', text_file_id='t', rewritten_text_file_id='r',
+                      text_path='', rewritten_text_path='', prompt_hash='h1')
+        processor.read_text_file_content = lambda path: ''
+        assert processor._fill_claimed_rows([result]) == {id(result)}
+        assert sheet.cell(3, 8) == 'h1' and sheet.cell(3, CLAIM_COLUMN_INDEX) == ''
+        assert not processor._active_sheet_claims
+    finally:
+        if processor:
+            processor.cleanup()
+
+
+def test_heartbeat_drops_changed_claim():
+    """
+    Heartbeat gia hạn dòng giữ chỗ của mình, bỏ dòng đã bị runner khác ghi đè và không ghi vào đó
+    """
+    logger.info("🧪 Bắt đầu test heartbeat khi dòng giữ chỗ đã thay đổi...")
+    sheet = FakeSheetsService()
+    processor = make_processor(sheet, 'host-a')
+    try:
+        kept = make_job('vid1', 'video1.mp4')
+        taken = make_job('vid2', 'video2.mp4')
+        assert processor._claim_sheet_row(kept) and processor._claim_sheet_row(taken)
+
+        # Dòng của video1 có marker cũ (gia hạn phải ghi thời điểm mới)
+        old_marker = format_claim('host-a', datetime.now() - timedelta(hours=2))
+        sheet.write(f"{SHEET_NAME}!J{kept['sheet_claim']['row']}", [[old_marker]])
+        kept['sheet_claim']['marker'] = old_marker
+        # Dòng của video2 đã bị runner khác nhận lại
+        other_marker = format_claim('host-b')
+        sheet.write(f"{SHEET_NAME}!J{taken['sheet_claim']['row']}", [[other_marker]])
+
+        assert processor._renew_sheet_claims() == 1
+        assert list(processor._active_sheet_claims.values()) == [kept['sheet_claim']]
+        renewed = sheet.cell(kept['sheet_claim']['row'], CLAIM_COLUMN_INDEX)
+        assert renewed == kept['sheet_claim']['marker'] and renewed != old_marker
+        assert sheet.cell(taken['sheet_claim']['row'], CLAIM_COLUMN_INDEX) == other_marker
+
+        # Trả lại: chỉ dòng còn đúng marker của mình được đánh dấu RELEASED
+        processor._release_sheet_claims([kept, taken])
+        assert is_released(sheet.cell(2, CLAIM_COLUMN_INDEX))
+        assert sheet.cell(3, CLAIM_COLUMN_INDEX) == other_marker
+        assert not processor._active_sheet_claims
+    finally:
+        processor.cleanup()
+
+
+if __name__ == "__main__":
+    test_racing_runners_keep_one_claim()
+    test_stale_claim_reclaimed()
+    test_heartbeat_drops_changed_claim()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Stage Rerun
+Kiểm tra chạy lại stage (--from-stage/--only-stage): ghi đè dòng Sheets, ghi đè file Drive
+của lần trước và dọn workspace
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+from test_sheet_claims import FakeSheetsService, make_processor
+from video_checker import CLAIM_COLUMN_INDEX, format_claim
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def make_result(file_id, video_name):
+    return {'status': 'success', 'video_name': video_name, 'video_file_id': file_id,
+            'voice_file_id': 'voice', 'text_file_id': 'text', 'rewritten_text_file_id': 'rewritten',
+            'text_path': '', 'rewritten_text_path': '', 'prompt_hash': 'new-hash'}
+
+
+def test_replace_sheet_rows_picks_result_row():
+    """
+    Ghi đè dòng kết quả (không phải dòng giữ chỗ quá hạn phía trên), xóa cột J,
+    không đụng dòng giữ chỗ còn hạn của runner khác
+    """
+    logger.info("🧪 Bắt đầu test ghi đè dòng Sheets khi chạy lại stage...")
+    stale = format_claim('host-dead', datetime.now() - timedelta(hours=7))
+    active = format_claim('host-b')
+    sheet = FakeSheetsService([
+        ['Link mp4', 'Tên video'],
+        ['https://drive.google.com/file/d/vid1/view', 'video1'] + [''] * 7 + [stale],
+        ['https://drive.google.com/file/d/vid1/view', 'video1', 'c', 'd', 'e', 'f', 'g', 'h', 'old-hash'],
+        ['https://drive.google.com/file/d/vid2/view', 'video2'] + [''] * 7 + [active],
+        ['https://drive.google.com/file/d/vid3/view', 'video3'] + [''] * 7 + [stale]
+    ])
+    processor = make_processor(sheet, 'host-a')
+    processor.read_text_file_content = lambda path: ''
+    try:
+        results = [make_result('vid1', 'video1.mp4'), make_result('vid2', 'video2.mp4'),
+                   make_result('vid3', 'video3.mp4'), make_result('vid4', 'video4.mp4')]
+        written = processor.replace_sheet_rows(results)
+
+        assert [r['video_name'] for r in written] == ['video1.mp4', 'video3.mp4', 'video4.mp4']
+        assert sheet.cell(2, CLAIM_COLUMN_INDEX) == stale and sheet.cell(2, 8) == ''
+        assert sheet.cell(3, 8) == 'new-hash' and sheet.cell(3, CLAIM_COLUMN_INDEX) == ''
+        assert sheet.cell(4, CLAIM_COLUMN_INDEX) == active and sheet.cell(4, 8) == ''
+        assert sheet.cell(5, 8) == 'new-hash' and sheet.cell(5, CLAIM_COLUMN_INDEX) == ''
+        assert sheet.rows[5][1] == 'video4' and len(sheet.rows) == 6
+    finally:
+        processor.cleanup()
+
+
+def test_rerun_upload_updates_previous_drive_file():
+    """
+    Chạy lại upload_rewritten ghi đè file Drive của lần trước thay vì upload file mới
+    """
+    logger.info("🧪 Bắt đầu test ghi đè file Drive khi chạy lại stage...")
+    temp_dir = tempfile.mkdtemp()
+    processor = make_processor(FakeSheetsService(), 'host-a')
+    try:
+        processor.ledger_path = os.path.join(temp_dir, 'ledger.sqlite3')
+        ledger = processor._get_ledger()
+        ledger.record_step('vid1', 'video1.mp4', 'upload_rewritten', {'rewritten_text_file_id': 'old-rewritten'})
+        ledger.record_step('vid1', 'video1.mp4', 'upload_text', {'text_file_id': 'old-text'})
+
+        updated = []
+        uploaded = []
+        processor.update_drive_file = lambda file_id, path: updated.append(file_id)
+        processor.upload_to_drive = lambda path, folder_id: uploaded.append(folder_id) or 'new-id'
+
+        job = processor._new_video_job({'id': 'vid1', 'name': 'video1.mp4'}, 'voice', 'text', 'rewritten',
+                                       rerun_steps={'rewrite', 'upload_rewritten'})
+        assert job['previous_drive_ids'] == {'rewritten_text_file_id': 'old-rewritten'}
+        assert job['text_file_id'] == 'old-text' and 'rewritten_text_file_id' not in job
+
+        job['rewritten_text_path'] = os.path.join(temp_dir, 'video1_rewritten.txt')
+        processor._step_upload_rewritten(job)
+        assert job['rewritten_text_file_id'] == 'old-rewritten'
+        assert updated == ['old-rewritten'] and uploaded == []
+
+        # Bước chưa từng upload (không có trong ledger) vẫn upload file mới
+        job['voice_path'] = os.path.join(temp_dir, 'video1_voice.mp3')
+        processor._step_upload_voice(job)
+        assert job['voice_file_id'] == 'new-id' and uploaded == ['voice']
+    finally:
+        processor.cleanup()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_rerun_without_sheet_releases_workspaces():
+    """
+    Chạy lại stage không có 'sheet' vẫn xóa workspace của video sau khi xong
+    """
+    logger.info("🧪 Bắt đầu test dọn workspace khi chạy lại stage không ghi Sheets...")
+    temp_dir = tempfile.mkdtemp()
+    processor = make_processor(FakeSheetsService(), 'host-a')
+    try:
+        processor.ledger_path = os.path.join(temp_dir, 'ledger.sqlite3')
+        processor._check_videos_to_process = lambda folder_id: {
+            'videos_skipped': [{'id': 'vid1', 'name': 'video1.mp4'}], 'videos_to_process': []}
+
+        def run_jobs(jobs):
+            workspace = processor._job_workspace(jobs[0])
+            with open(os.path.join(workspace['text'], 'video1_rewritten.txt'), 'w', encoding='utf-8') as f:
+                f.write('text')
+            return [dict(make_result('vid1', 'video1.mp4'), workspace=workspace)]
+
+        processor._run_jobs_sequential = run_jobs
+        results = processor.reprocess_videos('input', 'voice', 'text', 'rewritten', ['format'])
+        assert len(results) == 1 and not os.path.exists(results[0]['workspace']['text'])
+    finally:
+        processor.cleanup()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_replace_sheet_rows_picks_result_row()
+    test_rerun_upload_updates_previous_drive_file()
+    test_rerun_without_sheet_releases_workspaces()
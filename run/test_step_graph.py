@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Step Graph
+Kiểm tra StepGraph: chạy song song các bước độc lập, thứ tự phụ thuộc và xử lý lỗi
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import time
+
+from step_graph import Step, StepGraph
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def _sleep_step(output, delay, trace=None):
+    """Tạo hàm giả lập một bước tốn thời gian"""
+    def func(job):
+        time.sleep(delay)
+        if trace is not None:
+            trace.append(output)
+        job[output] = True
+    return func
+
+
+def test_independent_steps_run_concurrently():
+    """
+    upload_voice và transcribe chỉ cần voice_path nên phải chạy song song
+    """
+    logger.info("🧪 Bắt đầu test chạy song song...")
+
+    trace = []
+    graph = StepGraph([
+        Step('extract_voice', _sleep_step('voice_path', 0.05, trace), ['video_path'], ['voice_path']),
+        Step('upload_voice', _sleep_step('voice_file_id', 0.2, trace), ['voice_path'], ['voice_file_id']),
+        Step('transcribe', _sleep_step('text_path', 0.2, trace), ['voice_path'], ['text_path']),
+        Step('rewrite', _sleep_step('rewritten_text_path', 0.05, trace), ['text_path'], ['rewritten_text_path'])
+    ], initial_keys=['video_path'])
+
+    start = time.time()
+    job = graph.run({'video_path': 'a.mp4'})
+    elapsed = time.time() - start
+
+    # Tuần tự sẽ mất 0.5 giây
+    logger.info(f"⏱️ Step graph: {elapsed:.2f}s")
+    assert elapsed < 0.45
+    assert trace[0] == 'voice_path'
+    assert trace.index('rewritten_text_path') > trace.index('text_path')
+    assert job['voice_file_id'] and job['rewritten_text_path']
+
+    logger.info("✅ Test chạy song song hoàn tất!")
+
+
+def test_failed_step_stops_dependents():
+    """
+    Bước lỗi phải chặn các bước phụ thuộc nhưng không làm hỏng bước đang chạy
+    """
+    logger.info("🧪 Bắt đầu test xử lý lỗi step graph...")
+
+    def failing_transcribe(job):
+        raise Exception("Deepgram lỗi")
+
+    graph = StepGraph([
+        Step('upload_voice', _sleep_step('voice_file_id', 0.05), ['voice_path'], ['voice_file_id']),
+        Step('transcribe', failing_transcribe, ['voice_path'], ['text_path']),
+        Step('rewrite', _sleep_step('rewritten_text_path', 0), ['text_path'], ['rewritten_text_path'])
+    ])
+
+    job = {'voice_path': 'a.mp3'}
+    try:
+        graph.run(job)
+        assert False, "StepGraph phải raise lỗi"
+    except Exception as e:
+        assert str(e) == "Deepgram lỗi"
+
+    assert job['failed_step'] == 'transcribe'
+    assert job['voice_file_id'] is True
+    assert 'rewritten_text_path' not in job
+
+    logger.info("✅ Test xử lý lỗi step graph hoàn tất!")
+
+
+def test_missing_input_rejected():
+    """
+    Đồ thị có input không bước nào tạo ra phải bị từ chối
+    """
+    try:
+        StepGraph([Step('rewrite', _sleep_step('rewritten_text_path', 0), ['text_path'], ['rewritten_text_path'])],
+                  initial_keys=['voice_path'])
+        assert False, "StepGraph phải từ chối đồ thị thiếu input"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_independent_steps_run_concurrently()
+    test_failed_step_stops_dependents()
+    test_missing_input_rejected()
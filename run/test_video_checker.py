@@ -9,7 +9,9 @@ Ngày tạo: 2024
 """
 
 import logging
-from video_checker import VideoStatusChecker
+from datetime import datetime, timedelta
+
+from video_checker import VideoStatusChecker, format_claim, format_released, is_released, parse_claim
 
 # Setup logging
 logging.basicConfig(
@@ -73,5 +75,76 @@ def test_video_checker():
         logger.error(f"❌ Lỗi test VideoStatusChecker: {str(e)}")
 
 
+def test_compare_videos_with_claims():
+    """
+    Dòng giữ chỗ còn hạn -> đang xử lý (bỏ qua), quá hạn -> xử lý lại, dòng kết quả -> bỏ qua
+    """
+    logger.info("🧪 Bắt đầu test dòng giữ chỗ...")
+    checker = VideoStatusChecker(None, None, 'sheet-id', 'Mp3 to text', claim_timeout_seconds=3600)
+
+    claim = parse_claim(format_claim('host-1', datetime(2024, 1, 1, 10, 0, 0)))
+    assert claim == {'worker_id': 'host-1', 'claimed_at': datetime(2024, 1, 1, 10, 0, 0)}
+    assert parse_claim('') is None and parse_claim('abc') is None
+
+    drive_videos = [{'name': f'video{i}.mp4', 'id': str(i)} for i in range(1, 5)]
+    sheet_videos = [
+        {'row': 1, 'name': 'video1', 'link': '', 'claim': None},
+        {'row': 2, 'name': 'video2', 'link': '', 'claim': parse_claim(format_claim('host-2'))},
+        {'row': 3, 'name': 'video3', 'link': '',
+         'claim': parse_claim(format_claim('host-3', datetime.now() - timedelta(hours=2)))}
+    ]
+    result = checker.compare_videos(drive_videos, sheet_videos)
+    assert [v['name'] for v in result['videos_skipped']] == ['video1.mp4']
+    assert [v['name'] for v in result['videos_in_progress']] == ['video2.mp4']
+    assert [v['name'] for v in result['videos_to_process']] == ['video3.mp4', 'video4.mp4']
+
+
+class FakeSheetsService:
+    """
+    Sheets service giả: values().get() trả các dòng cho trước
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def get(self, spreadsheetId, range):
+        return self
+
+    def execute(self):
+        return {'values': self.rows}
+
+
+def test_released_rows_ignored():
+    """
+    Dòng giữ chỗ đã trả lại (RELEASED ở cột J) không phải video và không chặn video được xử lý lại
+    """
+    logger.info("🧪 Bắt đầu test dòng giữ chỗ đã trả lại...")
+    released = format_released('host-1')
+    assert is_released(released) and parse_claim(released) is None
+    assert not is_released(format_claim('host-1')) and not is_released('')
+
+    rows = [
+        ['Link mp4', 'Tên video'],
+        ['https://drive.google.com/file/d/1/view', 'video1'],
+        [''] * 9 + [released],
+        ['https://drive.google.com/file/d/2/view', 'video2'] + [''] * 7 + [released]
+    ]
+    checker = VideoStatusChecker(None, FakeSheetsService(rows), 'sheet-id', 'Mp3 to text')
+    sheet_videos = checker.get_sheet_videos()
+    assert [v['name'] for v in sheet_videos] == ['video1']
+
+    drive_videos = [{'name': 'video1.mp4', 'id': '1'}, {'name': 'video2.mp4', 'id': '2'}]
+    result = checker.compare_videos(drive_videos, sheet_videos)
+    assert [v['name'] for v in result['videos_to_process']] == ['video2.mp4']
+
+
 if __name__ == "__main__":
     test_video_checker()
+    test_compare_videos_with_claims()
+    test_released_rows_ignored()
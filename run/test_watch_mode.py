@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Watch Mode
+Kiểm tra chế độ --watch của AllInOneProcessor: quét folder một lần ở lần chạy đầu,
+video mới đi đường xử lý thường, video đã có kết quả bị sửa đi đường chạy lại
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from all_in_one import VIDEO_STEPS
+from change_watcher import InMemoryChangesSource
+from test_sheet_claims import FakeSheetsService, make_processor
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def _video(file_id, modified='2024-01-01T00:00:00Z'):
+    return {'id': file_id, 'name': f'{file_id}.mp4', 'mimeType': 'video/mp4',
+            'parents': ['input'], 'modifiedTime': modified}
+
+
+def test_watch_routes_new_and_modified_videos():
+    """
+    Lần chạy đầu quét folder đúng một lần; sau đó video mới được xử lý thường,
+    video đã có dòng kết quả được xử lý lại (ghi đè) thay vì thêm dòng mới
+    """
+    logger.info("🧪 Bắt đầu test chế độ watch...")
+    temp_dir = tempfile.mkdtemp()
+    sheet = FakeSheetsService([
+        ['Link mp4', 'Tên video'],
+        ['https://drive.google.com/file/d/done/view', 'done', 'c', 'd', 'e', 'f', 'g', 'h', 'hash']
+    ])
+    processor = make_processor(sheet, 'host-a')
+    try:
+        processor.ledger_path = os.path.join(temp_dir, 'ledger.sqlite3')
+        source = InMemoryChangesSource()
+        scans = []
+        batches = []
+        reruns = []
+
+        def check_videos(folder_id):
+            scans.append(folder_id)
+            # Video upload trong lúc quét lần đầu nằm sau page token
+            source.push_file(_video('new'))
+            source.push_file(_video('done', modified='2024-02-01T00:00:00Z'))
+            return {'videos_to_process': [_video('first')], 'videos_skipped': [_video('done')]}
+
+        def process_batch(videos, *folders, use_pipeline=False):
+            batches.append([v['id'] for v in videos])
+            return [{'status': 'success', 'video_name': v['name']} for v in videos]
+
+        def rerun_batch(videos, *args, use_pipeline=False):
+            reruns.append(([v['id'] for v in videos], args[3], args[4]))
+            processor._shutdown_requested = True
+            return []
+
+        processor._check_videos_to_process = check_videos
+        processor.process_all_videos = lambda *args, **kwargs: scans.append('process_all_videos') or []
+        processor._process_video_batch = process_batch
+        processor._rerun_video_batch = rerun_batch
+
+        results = processor.watch_folder('input', 'voice', 'text', 'rewritten', poll_interval=0,
+                                         source=source, token_path=os.path.join(temp_dir, 'token.json'))
+
+        assert scans == ['input']
+        assert batches == [['first'], ['new']]
+        assert reruns == [(['done'], set(VIDEO_STEPS), True)]
+        assert [r['video_name'] for r in results] == ['first.mp4', 'new.mp4']
+    finally:
+        processor.cleanup()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_watch_processes_due_retries():
+    """
+    Video lỗi có lịch thử lại xa hơn retry_wait_seconds (changes feed không trả lại nữa)
+    được xử lý ở lần poll sau khi đến lịch
+    """
+    logger.info("🧪 Bắt đầu test thử lại trong chế độ watch...")
+    temp_dir = tempfile.mkdtemp()
+    processor = make_processor(FakeSheetsService(), 'host-a')
+    try:
+        processor.ledger_path = os.path.join(temp_dir, 'ledger.sqlite3')
+        ledger = processor._get_ledger()
+        ledger.set_retry('due', 'due.mp4', 'quota', 1, 'quota', 'transcribe', time.time() - 1)
+        ledger.set_retry('later', 'later.mp4', 'quota', 1, 'quota', 'transcribe', time.time() + 3600)
+        ledger.set_retry('elsewhere', 'elsewhere.mp4', 'quota', 1, 'quota', 'transcribe', time.time() - 1)
+        ledger.set_retry('dead', 'dead.mp4', 'corrupt', 1, 'video hỏng', 'extract_voice')
+
+        lookups = []
+
+        def video_info(file_id):
+            lookups.append(file_id)
+            return dict(_video(file_id), parents=['other' if file_id == 'elsewhere' else 'input'])
+
+        batches = []
+
+        def process_batch(videos, *folders, use_pipeline=False):
+            batches.append([v['id'] for v in videos])
+            ledger.clear_retry([v['id'] for v in videos])
+            return []
+
+        source = InMemoryChangesSource()
+        source.push_file(_video('new'))
+        list_changes = source.list_changes
+        polls = []
+
+        def poll_three_times(page_token):
+            polls.append(page_token)
+            processor._shutdown_requested = len(polls) >= 3
+            return list_changes(page_token)
+
+        source.list_changes = poll_three_times
+        processor._get_drive_video_info = video_info
+        processor._process_video_batch = process_batch
+        token_path = os.path.join(temp_dir, 'token.json')
+        with open(token_path, 'w', encoding='utf-8') as f:
+            f.write('{"input": "0"}')
+
+        processor.watch_folder('input', 'voice', 'text', 'rewritten', poll_interval=0,
+                               source=source, token_path=token_path)
+
+        # Lần poll đầu: video mới và video đến lịch; video folder khác chỉ đọc Drive một lần
+        assert batches == [['new', 'due']]
+        assert sorted(lookups) == ['due', 'elsewhere']
+        assert [e['video_file_id'] for e in ledger.list_retries('pending')] == ['later', 'elsewhere']
+    finally:
+        processor.cleanup()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_watch_routes_new_and_modified_videos()
+    test_watch_processes_due_retries()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Workspaces
+Kiểm tra workspace riêng của từng video: hai video cùng tên không ghi đè nhau (kể cả khi
+tải trước) và media/workspace bị xóa khi video ra khỏi pipeline
+"""
+
+import logging
+import os
+
+from test_sheet_claims import FakeSheetsService, make_processor
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def make_job(processor, file_id, video_name='video.mp4'):
+    return processor._new_video_job({'id': file_id, 'name': video_name, 'size': 4}, 'voice', 'text', 'rewritten')
+
+
+def test_same_name_videos_do_not_collide():
+    """
+    Hai video cùng tên (hai file Drive khác nhau) được tải trước vào workspace riêng,
+    media bị xóa khi video xong, job lỗi thì xóa cả workspace
+    """
+    logger.info("🧪 Bắt đầu test workspace của hai video cùng tên...")
+    processor = make_processor(FakeSheetsService(), 'host-a')
+    try:
+        processor.ledger_path = None
+
+        def download_video(file_id, video_name):
+            path = processor._artifact_path(video_name)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(file_id)
+            return path
+
+        processor.download_video = download_video
+        first = make_job(processor, 'id-1')
+        second = make_job(processor, 'id-2')
+
+        processor._start_prefetch([first, second])
+        try:
+            for job in (first, second):
+                processor._run_step('download', job)
+        finally:
+            processor._stop_prefetch()
+
+        assert first['video_path'] != second['video_path']
+        for job in (first, second):
+            assert os.path.dirname(job['video_path']) == job['workspace']['media']
+            with open(job['video_path'], 'r', encoding='utf-8') as f:
+                assert f.read() == job['video_file_id']
+
+        # Video xong: xóa media, giữ thư mục text đến khi ghi Sheets
+        first['status'] = 'success'
+        processor._evict_job_media(first)
+        assert not os.path.exists(first['video_path']) and os.path.isdir(first['workspace']['text'])
+
+        # Video lỗi: xóa cả workspace
+        second['status'] = 'error'
+        processor._evict_job_media(second)
+        assert not os.path.exists(second['workspace']['media'])
+
+        processor._release_workspaces([first])
+        assert os.listdir(processor.temp_dir) == []
+    finally:
+        processor.cleanup()
+
+
+def test_artifacts_follow_bound_workspace():
+    """
+    Artifact của bước được ghi vào workspace của job đang chạy trên thread, text có thể nằm riêng
+    """
+    logger.info("🧪 Bắt đầu test đường dẫn artifact theo workspace...")
+    processor = make_processor(FakeSheetsService(), 'host-a')
+    text_root = None
+    try:
+        processor.ledger_path = None
+        text_root = processor.text_workspace_root = os.path.join(processor.temp_dir, 'tmpfs')
+        os.makedirs(text_root)
+        first = make_job(processor, 'id-1')
+        second = make_job(processor, 'id-2')
+
+        paths = []
+        for job in (first, second):
+            processor._thread_local.workspace = processor._job_workspace(job)
+            paths.append((processor._artifact_path('video_voice.mp3'), processor._artifact_path('video.txt')))
+        processor._thread_local.workspace = None
+
+        assert len({path for pair in paths for path in pair}) == 4
+        assert all(os.path.dirname(text).startswith(text_root) for _, text in paths)
+        assert os.path.dirname(paths[0][0]) == first['workspace']['media']
+        assert processor._artifact_path('x.txt') == os.path.join(processor.temp_dir, 'x.txt')
+
+        processor._release_workspaces([first, second])
+        assert not os.path.exists(first['workspace']['text']) and not os.path.exists(second['workspace']['media'])
+    finally:
+        processor.cleanup()
+
+
+if __name__ == "__main__":
+    test_same_name_videos_do_not_collide()
+    test_artifacts_follow_bound_workspace()
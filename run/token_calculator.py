@@ -9,13 +9,17 @@ Tính năng:
 - Ước tính chi phí API
 - Theo dõi token usage tổng thể
 - Log chi tiết token consumption
+- Lưu daily usage vào SQLite dùng chung (tùy chọn) để quota ngày được tính qua nhiều lần chạy/process
 """
 
 import logging
 import re
+import threading
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from usage_store import USAGE_KEYS, UsageStore
+
 logger = logging.getLogger(__name__)
 
 class TokenCalculator:
@@ -23,7 +27,16 @@ class TokenCalculator:
     Class tính toán token usage cho các API
     """
     
-    def __init__(self):
+    def __init__(self, usage_path: Optional[str] = None):
+        """
+        Args:
+            usage_path: File SQLite lưu daily usage dùng chung giữa các process
+                        (None = chỉ theo dõi trong bộ nhớ)
+        """
+        self.usage_path = usage_path
+        self.usage_store = UsageStore(usage_path) if usage_path else None
+        self._lock = threading.Lock()
+        
         # Pricing cho Gemini API (USD per 1M tokens)
         self.gemini_pricing = {
             'input': 0.075,   # $0.075 per 1M input tokens
@@ -59,7 +72,27 @@ class TokenCalculator:
         
         # Reset daily tracking nếu cần
         self._reset_daily_if_needed()
+        self._load_daily_usage()
         
+    def _load_daily_usage(self):
+        """
+        Đọc daily usage của hôm nay từ usage store (nếu có usage_path)
+        """
+        if self.usage_store is None:
+            return
+        try:
+            self._set_daily_usage(self.usage_store.get_usage())
+        except Exception as e:
+            logger.warning(f"⚠️ Không đọc được daily usage đã lưu: {str(e)}")
+    
+    def _set_daily_usage(self, usage: Dict):
+        """
+        Ghi tổng usage hôm nay (đọc từ usage store) vào daily_usage
+        """
+        for key in USAGE_KEYS:
+            self.daily_usage[key] = usage[key]
+        self.daily_usage['date'] = datetime.now().date()
+    
     def _reset_daily_if_needed(self):
         """
         Reset daily tracking nếu đã sang ngày mới
@@ -254,6 +287,61 @@ class TokenCalculator:
                 'timestamp': datetime.now().isoformat()
             }
     
+    def track_gemini_tokens(self, operation: str, input_tokens: int, output_tokens: int) -> Dict:
+        """
+        Theo dõi một Gemini call với số token thực tế (usageMetadata trong response)
+        
+        Args:
+            operation: Tên operation (translate, rewrite, etc.)
+            input_tokens: Số token input (promptTokenCount)
+            output_tokens: Số token output (candidatesTokenCount)
+            
+        Returns:
+            Dict chứa thông tin token usage
+        """
+        cost = (input_tokens / 1_000_000) * self.gemini_pricing['input'] \
+            + (output_tokens / 1_000_000) * self.gemini_pricing['output']
+        usage_info = {
+            'operation': operation,
+            'api_type': 'gemini',
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'total_tokens': input_tokens + output_tokens,
+            'cost_usd': cost,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        with self._lock:
+            self.token_usage.append(usage_info)
+            self.total_tokens += usage_info['total_tokens']
+            self.total_cost += cost
+        self._update_daily_usage(usage_info)
+        return usage_info
+    
+    def get_remaining_budget(self) -> Dict:
+        """
+        Phần quota ngày còn lại
+        
+        Returns:
+            Dict gemini_tokens, gemini_cost, deepgram_minutes, deepgram_cost còn lại (không âm)
+        """
+        with self._lock:
+            self._reset_daily_if_needed()
+            self._load_daily_usage()
+            usage = dict(self.daily_usage)
+        return self.remaining_from_usage(usage)
+    
+    def remaining_from_usage(self, usage: Dict) -> Dict:
+        """
+        Quota ngày còn lại (không âm) ứng với một mức usage
+        """
+        return {
+            'gemini_tokens': max(0, self.quota_limits['gemini_daily_tokens'] - usage['gemini_tokens']),
+            'gemini_cost': max(0.0, self.quota_limits['gemini_daily_cost'] - usage['gemini_cost']),
+            'deepgram_minutes': max(0.0, self.quota_limits['deepgram_daily_minutes'] - usage['deepgram_minutes']),
+            'deepgram_cost': max(0.0, self.quota_limits['deepgram_daily_cost'] - usage['deepgram_cost'])
+        }
+    
     def _log_operation(self, usage_info: Dict):
         """
         Log chi tiết cho một operation
@@ -288,24 +376,29 @@ class TokenCalculator:
     def _update_daily_usage(self, usage_info: Dict):
         """
         Cập nhật daily usage tracking
+        
+        Có usage store thì cộng thẳng trong SQLite (một câu lệnh, không mất phần
+        cộng của process khác) rồi lấy lại tổng của hôm nay.
         """
         try:
-            # Reset daily nếu cần
-            self._reset_daily_if_needed()
-            
             api_type = usage_info.get('api_type', '')
-            
+            deltas = {}
             if api_type == "gemini":
-                tokens = usage_info.get('total_tokens', 0)
-                cost = usage_info.get('cost_usd', 0)
-                self.daily_usage['gemini_tokens'] += tokens
-                self.daily_usage['gemini_cost'] += cost
+                deltas['gemini_tokens'] = usage_info.get('total_tokens', 0)
+                deltas['gemini_cost'] = usage_info.get('cost_usd', 0)
                 
             elif api_type == "deepgram":
-                duration = usage_info.get('audio_duration_seconds', 0)
-                cost = usage_info.get('cost_usd', 0)
-                self.daily_usage['deepgram_minutes'] += duration / 60.0
-                self.daily_usage['deepgram_cost'] += cost
+                deltas['deepgram_minutes'] = usage_info.get('audio_duration_seconds', 0) / 60.0
+                deltas['deepgram_cost'] = usage_info.get('cost_usd', 0)
+            
+            with self._lock:
+                # Reset daily nếu cần
+                self._reset_daily_if_needed()
+                if self.usage_store is not None:
+                    self._set_daily_usage(self.usage_store.add_usage(deltas))
+                else:
+                    for key, value in deltas.items():
+                        self.daily_usage[key] += value
                 
         except Exception as e:
             logger.error(f"❌ Lỗi cập nhật daily usage: {str(e)}")
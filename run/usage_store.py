@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Usage Store
+Usage quota ngày và reservation của budget gate, dùng chung giữa nhiều process
+
+Usage thực tế (token Gemini, phút Deepgram) và các reservation (ước tính của
+video đã nhận nhưng chưa xong) nằm trong một file SQLite dùng chung. Cộng usage
+là một câu UPSERT; nhận video (đọc usage + reservation, so với quota, thêm
+reservation) chạy trong một transaction ghi độc quyền -> hai process không thể
+cùng nhận video dựa trên cùng một phần quota còn lại.
+
+Reservation của process chết giữa chừng (không kịp trả) hết hạn sau
+reservation_ttl_seconds.
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from lease_queue import default_worker_id
+
+logger = logging.getLogger(__name__)
+
+# Các chỉ số quota ngày (cùng key với TokenCalculator.daily_usage và BudgetGate.estimate)
+USAGE_KEYS = ('gemini_tokens', 'gemini_cost', 'deepgram_minutes', 'deepgram_cost')
+
+# Reservation cũ hơn thời hạn này (process giữ nó đã dừng) không còn được tính
+DEFAULT_RESERVATION_TTL_SECONDS = 6 * 3600
+
+
+class UsageStore:
+    """
+    Daily usage và reservation quota lưu trong SQLite dùng chung
+    """
+
+    def __init__(self, db_path: str, worker_id: str = None,
+                 reservation_ttl_seconds: float = DEFAULT_RESERVATION_TTL_SECONDS):
+        """
+        Args:
+            db_path: Đường dẫn file SQLite dùng chung giữa các process
+            worker_id: ID của process này (mặc định hostname-pid)
+            reservation_ttl_seconds: Thời hạn của một reservation
+        """
+        self.db_path = db_path
+        self.worker_id = worker_id or default_worker_id()
+        self.reservation_ttl_seconds = reservation_ttl_seconds
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._create_tables()
+
+    def _create_tables(self):
+        """
+        Tạo bảng nếu chưa có
+        """
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_usage (
+                    day TEXT PRIMARY KEY,
+                    gemini_tokens REAL NOT NULL DEFAULT 0,
+                    gemini_cost REAL NOT NULL DEFAULT 0,
+                    deepgram_minutes REAL NOT NULL DEFAULT 0,
+                    deepgram_cost REAL NOT NULL DEFAULT 0
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS budget_reservations (
+                    video_file_id TEXT PRIMARY KEY,
+                    worker_id TEXT NOT NULL,
+                    gemini_tokens REAL NOT NULL,
+                    gemini_cost REAL NOT NULL,
+                    deepgram_minutes REAL NOT NULL,
+                    deepgram_cost REAL NOT NULL,
+                    reserved_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Transaction ghi độc quyền (BEGIN IMMEDIATE) để các process không nhận trùng quota
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def today() -> str:
+        """
+        Ngày hiện tại (giờ máy) dạng ISO - quota reset lúc 0h
+        """
+        return datetime.now().date().isoformat()
+
+    def add_usage(self, usage: Dict) -> Dict:
+        """
+        Cộng usage thực tế vào tổng của hôm nay
+
+        Args:
+            usage: Dict một phần các key USAGE_KEYS (giá trị cần cộng thêm)
+
+        Returns:
+            Tổng usage của hôm nay sau khi cộng
+        """
+        deltas = [float(usage.get(key, 0) or 0) for key in USAGE_KEYS]
+        day = self.today()
+        with self._transaction() as conn:
+            conn.execute(f"""
+                INSERT INTO daily_usage (day, {', '.join(USAGE_KEYS)}) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(day) DO UPDATE SET
+                {', '.join(f'{key} = {key} + excluded.{key}' for key in USAGE_KEYS)}
+            """, (day, *deltas))
+            return self._read_usage(conn, day)
+
+    def get_usage(self) -> Dict:
+        """
+        Tổng usage của hôm nay (0 nếu chưa có)
+        """
+        with self._lock:
+            return self._read_usage(self._conn, self.today())
+
+    def _read_usage(self, conn, day: str) -> Dict:
+        """
+        Đọc usage của một ngày (gọi khi đang giữ lock)
+        """
+        row = conn.execute(f"SELECT {', '.join(USAGE_KEYS)} FROM daily_usage WHERE day = ?", (day,)).fetchone()
+        return dict(zip(USAGE_KEYS, row or (0.0,) * len(USAGE_KEYS)))
+
+    def try_reserve(self, video_file_id: str, estimate: Dict,
+                    remaining_for: Callable[[Dict], Dict]) -> List[str]:
+        """
+        Giữ chỗ quota cho một video nếu ước tính nằm trong phần còn lại (một transaction)
+
+        Args:
+            video_file_id: ID video (reservation cũ của cùng video được thay thế)
+            estimate: Ước tính của video (key USAGE_KEYS)
+            remaining_for: Hàm tính quota còn lại từ usage của hôm nay
+
+        Returns:
+            Các key vượt quota còn lại (rỗng = đã giữ chỗ)
+        """
+        with self._transaction() as conn:
+            self._expire_reservations(conn)
+            remaining = remaining_for(self._read_usage(conn, self.today()))
+            reserved = self._reserved_totals(conn, exclude=video_file_id)
+            over = [key for key in USAGE_KEYS
+                    if estimate[key] > 0 and estimate[key] > remaining[key] - reserved[key]]
+            if over:
+                return over
+
+            conn.execute(f"""
+                INSERT OR REPLACE INTO budget_reservations
+                (video_file_id, worker_id, {', '.join(USAGE_KEYS)}, reserved_at) VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (video_file_id, self.worker_id, *[float(estimate[key]) for key in USAGE_KEYS], time.time()))
+            return []
+
+    def release(self, video_file_id: str):
+        """
+        Trả reservation của video do process này giữ (không làm gì nếu không có)
+        """
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM budget_reservations WHERE video_file_id = ? AND worker_id = ?",
+                         (video_file_id, self.worker_id))
+
+    def reserved_totals(self) -> Dict:
+        """
+        Tổng các reservation còn hạn (của mọi process)
+        """
+        with self._lock:
+            return self._reserved_totals(self._conn)
+
+    def reserved_count(self) -> int:
+        """
+        Số reservation còn hạn (của mọi process)
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) FROM budget_reservations WHERE reserved_at >= ?",
+                                     (time.time() - self.reservation_ttl_seconds,)).fetchone()
+        return row[0]
+
+    def _reserved_totals(self, conn, exclude: str = None) -> Dict:
+        """
+        Tổng reservation còn hạn, trừ reservation của video exclude (gọi khi đang giữ lock)
+        """
+        row = conn.execute(f"""
+            SELECT {', '.join(f'COALESCE(SUM({key}), 0)' for key in USAGE_KEYS)}
+            FROM budget_reservations WHERE reserved_at >= ? AND video_file_id IS NOT ?
+        """, (time.time() - self.reservation_ttl_seconds, exclude)).fetchone()
+        return dict(zip(USAGE_KEYS, row))
+
+    def _expire_reservations(self, conn):
+        """
+        Xóa reservation quá hạn (process giữ nó đã dừng mà không trả)
+        """
+        cursor = conn.execute("DELETE FROM budget_reservations WHERE reserved_at < ?",
+                              (time.time() - self.reservation_ttl_seconds,))
+        if cursor.rowcount:
+            logger.info(f"♻️ Bỏ {cursor.rowcount} reservation quota quá hạn")
+
+    def close(self):
+        """
+        Đóng kết nối SQLite
+        """
+        with self._lock:
+            self._conn.close()
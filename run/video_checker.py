@@ -10,11 +10,84 @@ Ngày tạo: 2024
 """
 
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import datetime
 
+from drive_lister import DriveLister
+
 logger = logging.getLogger(__name__)
 
+# Cột J: dòng giữ chỗ "đang xử lý" (worker ID + thời điểm nhận), để trống khi dòng đã ghi kết quả
+CLAIM_COLUMN_INDEX = 9
+CLAIM_PREFIX = 'PROCESSING'
+
+# Dòng giữ chỗ đã trả lại (video lỗi/dừng giữa chừng): không xóa trắng dòng (dòng trống
+# làm values().append hiểu sai vị trí cuối bảng) mà đánh dấu ở cột J, không phải dòng video
+RELEASED_PREFIX = 'RELEASED'
+
+# Dòng giữ chỗ quá thời hạn này (runner bị dừng giữa chừng) được runner khác nhận lại
+DEFAULT_CLAIM_TIMEOUT_SECONDS = 6 * 3600
+
+
+def format_claim(worker_id: str, claimed_at: datetime = None) -> str:
+    """
+    Tạo giá trị cột J của dòng giữ chỗ
+
+    Args:
+        worker_id: ID runner nhận video
+        claimed_at: Thời điểm nhận (mặc định bây giờ)
+
+    Returns:
+        Chuỗi dạng "PROCESSING|<worker_id>|<ISO timestamp>"
+    """
+    claimed_at = claimed_at or datetime.now()
+    return f"{CLAIM_PREFIX}|{worker_id}|{claimed_at.replace(microsecond=0).isoformat()}"
+
+
+def parse_claim(value: str) -> Optional[Dict]:
+    """
+    Đọc giá trị cột J của một dòng
+
+    Returns:
+        Dict worker_id, claimed_at (datetime) hoặc None nếu không phải dòng giữ chỗ
+    """
+    parts = (value or '').strip().split('|')
+    if len(parts) != 3 or parts[0] != CLAIM_PREFIX:
+        return None
+    try:
+        return {'worker_id': parts[1], 'claimed_at': datetime.fromisoformat(parts[2])}
+    except ValueError:
+        # Thời điểm hỏng -> coi như đã quá hạn để không giữ video mãi
+        return {'worker_id': parts[1], 'claimed_at': datetime.min}
+
+
+def format_released(worker_id: str, released_at: datetime = None) -> str:
+    """
+    Tạo giá trị cột J của dòng giữ chỗ đã trả lại
+
+    Returns:
+        Chuỗi dạng "RELEASED|<worker_id>|<ISO timestamp>"
+    """
+    released_at = released_at or datetime.now()
+    return f"{RELEASED_PREFIX}|{worker_id}|{released_at.replace(microsecond=0).isoformat()}"
+
+
+def is_released(value: str) -> bool:
+    """
+    Giá trị cột J có phải của dòng giữ chỗ đã trả lại không (dòng bỏ qua khi so sánh)
+    """
+    return (value or '').strip().split('|')[0] == RELEASED_PREFIX
+
+
+def is_claim_active(claim: Optional[Dict], timeout_seconds: float, now: datetime = None) -> bool:
+    """
+    Dòng giữ chỗ còn hiệu lực không (chưa quá thời hạn)
+    """
+    if claim is None:
+        return False
+    now = now or datetime.now()
+    return (now - claim['claimed_at']).total_seconds() < timeout_seconds
+
 
 class VideoStatusChecker:
     """
@@ -22,7 +95,8 @@ class VideoStatusChecker:
     Có thể tái sử dụng và dễ customize
     """
     
-    def __init__(self, drive_service, sheets_service, spreadsheet_id, sheet_name):
+    def __init__(self, drive_service, sheets_service, spreadsheet_id, sheet_name,
+                 claim_timeout_seconds: float = DEFAULT_CLAIM_TIMEOUT_SECONDS, lister: DriveLister = None):
         """
         Khởi tạo VideoStatusChecker
         
@@ -31,11 +105,16 @@ class VideoStatusChecker:
             sheets_service: Google Sheets service  
             spreadsheet_id: ID của Google Spreadsheet
             sheet_name: Tên sheet chứa dữ liệu video
+            claim_timeout_seconds: Dòng giữ chỗ cũ hơn thời hạn này được coi là bỏ dở (xử lý lại)
+            lister: DriveLister dùng để liệt kê video (None = liệt kê theo trang bằng drive_service,
+                    không duyệt thư mục con)
         """
         self.drive_service = drive_service
         self.sheets_service = sheets_service
         self.spreadsheet_id = spreadsheet_id
         self.sheet_name = sheet_name
+        self.claim_timeout_seconds = claim_timeout_seconds
+        self.lister = lister or DriveLister(lambda: self.drive_service)
         
         logger.info("✅ VideoStatusChecker đã được khởi tạo")
     
@@ -51,6 +130,7 @@ class VideoStatusChecker:
             {
                 'videos_to_process': List[Dict],  # Video cần xử lý
                 'videos_skipped': List[Dict],     # Video đã có, bỏ qua
+                'videos_in_progress': List[Dict], # Video runner khác đang xử lý (dòng giữ chỗ còn hạn)
                 'total_drive_videos': int,        # Tổng số video trên Drive
                 'total_sheet_videos': int,        # Tổng số video trong Sheet
                 'check_timestamp': str            # Thời gian check
@@ -86,6 +166,7 @@ class VideoStatusChecker:
             logger.info(f"📊 Tổng video trong Sheet: {len(sheet_videos)}")
             logger.info(f"✅ Cần xử lý: {len(result['videos_to_process'])} video")
             logger.info(f"⏭️ Bỏ qua: {len(result['videos_skipped'])} video")
+            logger.info(f"⏳ Runner khác đang xử lý: {len(result['videos_in_progress'])} video")
             logger.info("=" * 50)
             
             # 6. Hiển thị danh sách video cần xử lý
@@ -110,7 +191,7 @@ class VideoStatusChecker:
     
     def get_drive_videos(self, folder_id: str) -> List[Dict]:
         """
-        Lấy tất cả video từ Google Drive folder
+        Lấy tất cả video từ Google Drive folder (đọc hết các trang, cả thư mục con nếu lister bật recursive)
         
         Args:
             folder_id: ID của folder trên Google Drive
@@ -121,56 +202,12 @@ class VideoStatusChecker:
         try:
             logger.info(f"🔍 Đang tìm kiếm video trong folder ID: {folder_id}")
             
-            # Tạo query để tìm tất cả file video trong folder
-            query = f"'{folder_id}' in parents and (mimeType contains 'video/' or name contains '.mp4' or name contains '.avi' or name contains '.mov' or name contains '.mkv')"
-            
-            logger.info(f"🔍 Query: {query}")
-            
-            # Gọi Google Drive API để tìm file
-            results = self.drive_service.files().list(
-                q=query,
-                fields="files(id,name,size,mimeType,trashed)",
-                orderBy="name"
-            ).execute()
-            
-            files = results.get('files', [])
-            logger.info(f"📄 Tổng số file tìm thấy: {len(files)}")
-            
-            # Hiển thị tất cả file để debug
-            for i, file in enumerate(files):
-                name = file.get('name', 'Unknown')
-                mime_type = file.get('mimeType', 'Unknown')
-                size = file.get('size', 'Unknown')
-                trashed = file.get('trashed', False)
-                logger.info(f"  {i+1}. {name} (MIME: {mime_type}, Size: {size}, Trashed: {trashed})")
-            
-            # Lọc chỉ lấy file video (không bị xóa)
             video_files = []
-            for file in files:
-                name = file.get('name', '').lower()
-                mime_type = file.get('mimeType', '')
-                trashed = file.get('trashed', False)
-                
-                # Bỏ qua file đã bị xóa
-                if trashed:
-                    logger.info(f"⏭️ Bỏ qua file đã xóa: {file.get('name', 'Unknown')}")
-                    continue
-                
-                # Kiểm tra có phải file video không
-                if (mime_type.startswith('video/') or 
-                    name.endswith('.mp4') or 
-                    name.endswith('.avi') or 
-                    name.endswith('.mov') or
-                    name.endswith('.mkv')):
-                    video_files.append(file)
-                    logger.info(f"✅ Thêm video: {file.get('name', 'Unknown')}")
-                else:
-                    logger.info(f"⏭️ Bỏ qua file không phải video: {file.get('name', 'Unknown')} (MIME: {mime_type})")
+            for video in self.lister.iter_videos(folder_id):
+                video_files.append(video)
+                logger.info(f"✅ Thêm video: {video.get('name', 'Unknown')} (ID: {video['id']}, Size: {video.get('size', 'Unknown')} bytes)")
             
             logger.info(f"📁 Tìm thấy {len(video_files)} video trong folder")
-            for video in video_files:
-                logger.info(f"  - {video['name']} (ID: {video['id']}, Size: {video.get('size', 'Unknown')} bytes)")
-            
             return video_files
             
         except Exception as e:
@@ -275,13 +312,20 @@ class VideoStatusChecker:
             for row_idx, row in enumerate(values[1:], 1):  # Bỏ qua header
                 if not row:  # Bỏ qua dòng trống
                     continue
+                if len(row) > CLAIM_COLUMN_INDEX and is_released(row[CLAIM_COLUMN_INDEX]):
+                    continue  # Dòng giữ chỗ đã trả lại, không phải video
                     
                 video_info = {
                     'row': row_idx,
                     'name': '',
-                    'link': ''
+                    'link': '',
+                    'claim': None
                 }
                 
+                # Dòng giữ chỗ của runner đang xử lý (cột J)
+                if len(row) > CLAIM_COLUMN_INDEX:
+                    video_info['claim'] = parse_claim(row[CLAIM_COLUMN_INDEX])
+                
                 # Lấy tên video
                 if name_col_idx is not None and len(row) > name_col_idx:
                     video_info['name'] = row[name_col_idx].strip() if row[name_col_idx] else ''
@@ -359,6 +403,9 @@ class VideoStatusChecker:
         """
         So sánh video giữa Drive và Sheet
         
+        Dòng giữ chỗ còn hạn (runner khác đang xử lý) -> videos_in_progress;
+        dòng giữ chỗ quá hạn (runner bị dừng giữa chừng) không được tính, video được xử lý lại.
+        
         Args:
             drive_videos: Danh sách video từ Drive
             sheet_videos: Danh sách video từ Sheet
@@ -369,12 +416,23 @@ class VideoStatusChecker:
         try:
             videos_to_process = []
             videos_skipped = []
+            videos_in_progress = []
             
             # Tạo set tên video từ Sheet để so sánh nhanh - CẢI THIỆN LOGIC
             sheet_video_names = set()
             sheet_video_names_without_ext = set()  # Tên không có extension
+            claimed_names = set()  # Tên (không extension) của video đang được runner khác xử lý
             
             for sheet_video in sheet_videos:
+                claim = sheet_video.get('claim')
+                if claim is not None:
+                    if sheet_video.get('name') and is_claim_active(claim, self.claim_timeout_seconds):
+                        claimed_names.add(self._remove_extension(sheet_video['name'].lower().strip()))
+                        logger.info(f"⏳ Video đang được xử lý bởi {claim['worker_id']}: '{sheet_video['name']}' (row: {sheet_video['row']})")
+                    else:
+                        logger.info(f"♻️ Dòng giữ chỗ quá hạn, sẽ xử lý lại: '{sheet_video.get('name')}' (row: {sheet_video['row']})")
+                    continue
+                
                 if sheet_video.get('name'):
                     # Chuẩn hóa tên file (lowercase, strip whitespace)
                     normalized_name = sheet_video['name'].lower().strip()
@@ -407,6 +465,10 @@ class VideoStatusChecker:
                     videos_skipped.append(drive_video)
                     match_type = "exact" if exact_match else "name_only"
                     logger.info(f"⏭️ Bỏ qua: '{drive_video['name']}' (đã có trong Sheet - {match_type} match)")
+                elif drive_name_without_ext in claimed_names:
+                    # Runner khác đã giữ chỗ và đang xử lý
+                    videos_in_progress.append(drive_video)
+                    logger.info(f"⏳ Bỏ qua: '{drive_video['name']}' (runner khác đang xử lý)")
                 else:
                     # Video chưa có trong Sheet
                     videos_to_process.append(drive_video)
@@ -414,16 +476,18 @@ class VideoStatusChecker:
             
             result = {
                 'videos_to_process': videos_to_process,
-                'videos_skipped': videos_skipped
+                'videos_skipped': videos_skipped,
+                'videos_in_progress': videos_in_progress
             }
             
-            logger.info(f"📊 Kết quả so sánh: {len(videos_to_process)} cần xử lý, {len(videos_skipped)} bỏ qua")
+            logger.info(f"📊 Kết quả so sánh: {len(videos_to_process)} cần xử lý, {len(videos_skipped)} bỏ qua, "
+                        f"{len(videos_in_progress)} đang được xử lý")
             
             return result
             
         except Exception as e:
             logger.error(f"❌ Lỗi so sánh video: {str(e)}")
-            return {'videos_to_process': [], 'videos_skipped': []}
+            return {'videos_to_process': [], 'videos_skipped': [], 'videos_in_progress': []}
     
     def _remove_extension(self, filename: str) -> str:
         """
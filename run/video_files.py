@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Video Files
+Nhận diện file video và thư mục trên Google Drive (dùng chung cho liệt kê folder và changes feed)
+
+Tác giả: AI Assistant
+Ngày tạo: 2024
+"""
+
+from typing import Dict
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+
+def is_video_file(file: Dict) -> bool:
+    """
+    Kiểm tra file trên Drive có phải video không (theo MIME type hoặc đuôi file)
+    """
+    name = file.get('name', '').lower()
+    return file.get('mimeType', '').startswith('video/') or name.endswith(VIDEO_EXTENSIONS)
+
+
+def is_folder(file: Dict) -> bool:
+    """
+    Kiểm tra file trên Drive có phải thư mục không
+    """
+    return file.get('mimeType') == FOLDER_MIME_TYPE